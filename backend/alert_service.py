@@ -1,13 +1,30 @@
 """
 Serviço de alertas e notificações
 """
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
-from .models import Alert, AlertRule, Client
+from typing import List, Optional, Dict, Any, Tuple
+from .models import Alert, AlertRule, Atestado, Client, Upload
 from .analytics import Analytics
 from .email_service import EmailService
 import json
+import time
+
+# Tipos de regra avaliados (ambos a partir do total de dias perdidos)
+TIPOS_AVALIADOS = ("dias_perdidos", "taxa_absenteismo")
+
+_DIAS_PERIODO = {"mensal": 30, "trimestral": 90, "anual": 365}
+
+
+def janela_periodo(periodo: Optional[str], hoje: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(mes_inicio, mes_fim) da regra; período desconhecido = sem filtro de data"""
+    dias = _DIAS_PERIODO.get(periodo)
+    if dias is None:
+        return None, None
+    hoje = hoje or datetime.now()
+    return (hoje - timedelta(days=dias)).strftime("%Y-%m"), hoje.strftime("%Y-%m")
+
 
 class AlertService:
     """Serviço para gerenciamento de alertas"""
@@ -129,74 +146,162 @@ class AlertService:
     def _check_rule(self, rule: AlertRule, analytics: Analytics, client_id: int) -> Optional[Alert]:
         """Verifica uma regra específica"""
         try:
-            # Calcula período baseado na configuração
-            hoje = datetime.now()
-            if rule.periodo == "mensal":
-                mes_inicio = (hoje - timedelta(days=30)).strftime("%Y-%m")
-                mes_fim = hoje.strftime("%Y-%m")
-            elif rule.periodo == "trimestral":
-                mes_inicio = (hoje - timedelta(days=90)).strftime("%Y-%m")
-                mes_fim = hoje.strftime("%Y-%m")
-            elif rule.periodo == "anual":
-                mes_inicio = (hoje - timedelta(days=365)).strftime("%Y-%m")
-                mes_fim = hoje.strftime("%Y-%m")
-            else:
-                mes_inicio = None
-                mes_fim = None
-            
-            # Busca métricas baseado no tipo de regra
-            if rule.tipo == "dias_perdidos":
-                metricas = analytics.metricas_gerais(client_id, mes_inicio, mes_fim)
-                valor_atual = metricas.get('total_dias_perdidos', 0)
-            elif rule.tipo == "taxa_absenteismo":
-                metricas = analytics.metricas_gerais(client_id, mes_inicio, mes_fim)
-                # Calcula taxa (dias perdidos / dias úteis estimados)
-                dias_uteis = 22 if rule.periodo == "mensal" else 66 if rule.periodo == "trimestral" else 220
-                valor_atual = (metricas.get('total_dias_perdidos', 0) / dias_uteis) * 100 if dias_uteis > 0 else 0
-            else:
+            if rule.tipo not in TIPOS_AVALIADOS:
                 return None
-            
-            # Verifica condição
-            should_alert = False
-            if rule.condicao == "maior_que" and valor_atual > rule.valor_limite:
-                should_alert = True
-            elif rule.condicao == "menor_que" and valor_atual < rule.valor_limite:
-                should_alert = True
-            elif rule.condicao == "igual" and valor_atual == rule.valor_limite:
-                should_alert = True
-            elif rule.condicao == "diferente" and valor_atual != rule.valor_limite:
-                should_alert = True
-            
-            if should_alert:
-                # Verifica se já existe alerta recente para evitar spam
-                recent_alert = self.db.query(Alert).filter(
-                    Alert.client_id == client_id,
-                    Alert.tipo == rule.tipo,
-                    Alert.is_resolvido == False,
-                    Alert.created_at >= datetime.now() - timedelta(days=1)
-                ).first()
-                
-                if not recent_alert:
-                    titulo = f"Alerta: {rule.nome}"
-                    mensagem = f"O valor atual ({valor_atual:.2f}) {rule.condicao.replace('_', ' ')} o limite configurado ({rule.valor_limite})."
-                    
-                    severidade = "high" if valor_atual > rule.valor_limite * 1.5 else "medium"
-                    
-                    return self.create_alert(
-                        client_id=client_id,
-                        tipo=rule.tipo,
-                        titulo=titulo,
-                        mensagem=mensagem,
-                        severidade=severidade,
-                        dados={"regra_id": rule.id, "valor_atual": valor_atual, "valor_limite": rule.valor_limite},
-                        enviar_email=rule.enviar_email
-                    )
-        
+            mes_inicio, mes_fim = janela_periodo(rule.periodo)
+            metricas = analytics.metricas_gerais(client_id, mes_inicio, mes_fim)
+            return self._aplicar_regra(rule, metricas.get('total_dias_perdidos', 0), client_id)
         except Exception as e:
             print(f"Erro ao verificar regra {rule.id}: {e}")
         
         return None
     
+    def _condicao_atingida(self, rule: AlertRule, total_dias_perdidos: float) -> Tuple[bool, float]:
+        """(regra disparada?, valor atual) para os dias perdidos da janela"""
+        if rule.tipo == "dias_perdidos":
+            valor_atual = total_dias_perdidos
+        elif rule.tipo == "taxa_absenteismo":
+            # Calcula taxa (dias perdidos / dias úteis estimados)
+            dias_uteis = 22 if rule.periodo == "mensal" else 66 if rule.periodo == "trimestral" else 220
+            valor_atual = (total_dias_perdidos / dias_uteis) * 100 if dias_uteis > 0 else 0
+        else:
+            return False, 0.0
+        
+        # Verifica condição
+        should_alert = False
+        if rule.condicao == "maior_que" and valor_atual > rule.valor_limite:
+            should_alert = True
+        elif rule.condicao == "menor_que" and valor_atual < rule.valor_limite:
+            should_alert = True
+        elif rule.condicao == "igual" and valor_atual == rule.valor_limite:
+            should_alert = True
+        elif rule.condicao == "diferente" and valor_atual != rule.valor_limite:
+            should_alert = True
+        return should_alert, valor_atual
+    
+    def _aplicar_regra(self, rule: AlertRule, total_dias_perdidos: float, client_id: int) -> Optional[Alert]:
+        """Compara o valor da regra com o limite e cria o alerta (sem repetir no mesmo dia)"""
+        should_alert, valor_atual = self._condicao_atingida(rule, total_dias_perdidos)
+        
+        if should_alert:
+            # Verifica se já existe alerta recente para evitar spam
+            recent_alert = self.db.query(Alert).filter(
+                Alert.client_id == client_id,
+                Alert.tipo == rule.tipo,
+                Alert.is_resolvido == False,
+                Alert.created_at >= datetime.now() - timedelta(days=1)
+            ).first()
+            
+            if not recent_alert:
+                titulo = f"Alerta: {rule.nome}"
+                mensagem = f"O valor atual ({valor_atual:.2f}) {rule.condicao.replace('_', ' ')} o limite configurado ({rule.valor_limite})."
+                
+                severidade = "high" if valor_atual > rule.valor_limite * 1.5 else "medium"
+                
+                return self.create_alert(
+                    client_id=client_id,
+                    tipo=rule.tipo,
+                    titulo=titulo,
+                    mensagem=mensagem,
+                    severidade=severidade,
+                    dados={"regra_id": rule.id, "valor_atual": valor_atual, "valor_limite": rule.valor_limite},
+                    enviar_email=rule.enviar_email
+                )
+        
+        return None
+    
+    def verificar_alteracoes(self, avaliadas: Dict[int, tuple], hoje: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Avalia, de todas as empresas, só as regras ativas cujo estado mudou desde a última
+        avaliação: data_version da empresa, janela do período (inclui o dia) ou a própria
+        regra (updated_at). Regras disparadas mas suprimidas por um alerta recente não
+        entram no estado e são reavaliadas até o alerta expirar ou ser resolvido.
+        
+        Os dias perdidos saem de uma consulta agrupada por empresa para cada período
+        (mensal/trimestral/anual/total), só com as empresas que precisam ser avaliadas.
+        
+        Args:
+            avaliadas: {regra_id: chave da última avaliação}; atualizado aqui e guardado
+                pelo chamador entre os ciclos
+            hoje: data de referência (padrão: agora)
+        
+        Returns:
+            Resumo do ciclo: regras/empresas avaliadas, consultas, alertas criados e tempos (ms)
+        """
+        inicio = time.perf_counter()
+        hoje = hoje or datetime.now()
+        regras = self.db.query(AlertRule, Client.data_version).join(
+            Client, Client.id == AlertRule.client_id
+        ).filter(
+            AlertRule.is_active == True,
+            AlertRule.tipo.in_(TIPOS_AVALIADOS)
+        ).all()
+        
+        # Regras pendentes agrupadas pela janela do período
+        pendentes: Dict[tuple, List[tuple]] = {}
+        ativas = set()
+        for rule, data_version in regras:
+            ativas.add(rule.id)
+            janela = janela_periodo(rule.periodo, hoje)
+            chave = (int(data_version or 0), janela, hoje.date(), rule.updated_at)
+            if avaliadas.get(rule.id) != chave:
+                pendentes.setdefault(janela, []).append((rule, chave))
+        # Regras removidas/desativadas saem do estado
+        for regra_id in set(avaliadas) - ativas:
+            del avaliadas[regra_id]
+        
+        resumo = {
+            'regras_ativas': len(regras),
+            'regras_avaliadas': 0,
+            'empresas_avaliadas': 0,
+            'consultas': 0,
+            'alertas': 0,
+            'ms_por_periodo': {},
+        }
+        empresas = set()
+        for (mes_inicio, mes_fim), itens in pendentes.items():
+            inicio_periodo = time.perf_counter()
+            clientes = sorted({rule.client_id for rule, _ in itens})
+            dias = self._dias_perdidos_por_empresa(clientes, mes_inicio, mes_fim)
+            resumo['consultas'] += 1
+            for rule, chave in itens:
+                total = dias.get(rule.client_id, 0.0)
+                try:
+                    if self._aplicar_regra(rule, total, rule.client_id):
+                        resumo['alertas'] += 1
+                        avaliadas[rule.id] = chave
+                    elif self._condicao_atingida(rule, total)[0]:
+                        # Disparo suprimido por alerta recente: sem registrar a chave, a regra
+                        # volta a cada ciclo e dispara assim que o alerta expira ou é resolvido
+                        avaliadas.pop(rule.id, None)
+                    else:
+                        avaliadas[rule.id] = chave
+                except Exception as e:
+                    # Sem registrar a chave: a regra volta no próximo ciclo
+                    self.db.rollback()
+                    print(f"Erro ao verificar regra {rule.id}: {e}")
+            resumo['regras_avaliadas'] += len(itens)
+            empresas.update(clientes)
+            periodo = f"{mes_inicio}..{mes_fim}" if mes_inicio else "total"
+            resumo['ms_por_periodo'][periodo] = round((time.perf_counter() - inicio_periodo) * 1000, 1)
+        
+        resumo['empresas_avaliadas'] = len(empresas)
+        resumo['ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        return resumo
+    
+    def _dias_perdidos_por_empresa(self, client_ids: List[int], mes_inicio: Optional[str],
+                                   mes_fim: Optional[str]) -> Dict[int, float]:
+        """Soma de dias perdidos por empresa na janela (mesma soma de Analytics.metricas_gerais)"""
+        query = self.db.query(
+            Upload.client_id,
+            func.sum(Atestado.dias_atestados)
+        ).join(Atestado, Atestado.upload_id == Upload.id).filter(Upload.client_id.in_(client_ids))
+        if mes_inicio:
+            query = query.filter(Upload.mes_referencia >= mes_inicio)
+        if mes_fim:
+            query = query.filter(Upload.mes_referencia <= mes_fim)
+        return {client_id: float(total or 0) for client_id, total in query.group_by(Upload.client_id)}
+    
     def get_alerts(
         self,
         client_id: Optional[int] = None,
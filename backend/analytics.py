@@ -2,8 +2,9 @@
 Analytics - Cálculos de métricas e análises
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, or_
+from sqlalchemy import func, extract, or_, case
 from .models import Atestado, Upload, Client
+from .cache_service import cache_por_cliente
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Union
 import calendar
@@ -35,6 +36,7 @@ class Analytics:
     def __init__(self, db: Session):
         self.db = db
     
+    @cache_por_cliente("analytics")
     def metricas_gerais(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario = None, setor = None) -> Dict[str, Any]:
         """
         Calcula métricas gerais - CÓDIGO NOVO E LIMPO
@@ -96,6 +98,7 @@ class Analytics:
             'funcionarios_afetados': funcionarios_unicos
         }
     
+    @cache_por_cliente("analytics")
     def top_cids(self, client_id: int, limit: int = 5, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """
         TOP Doenças mais frequentes
@@ -212,6 +215,7 @@ class Analytics:
         
         return resultado_final
     
+    @cache_por_cliente("analytics")
     def top_setores(self, client_id: int, limit: int = 5, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """TOP Setores"""
         query = self.db.query(
@@ -250,14 +254,34 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def top_funcionarios(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """TOP Funcionários - Agrupa apenas por nome para somar todos os dias"""
+        # Setor e gênero do PRIMEIRO registro (menor id) de cada funcionário no cliente,
+        # resolvidos na mesma consulta via ROW_NUMBER (evita 1 consulta por funcionário)
+        primeiro_registro = self.db.query(
+            Atestado.nomecompleto.label('nome'),
+            Atestado.setor.label('setor'),
+            Atestado.genero.label('genero'),
+            func.row_number().over(
+                partition_by=Atestado.nomecompleto,
+                order_by=Atestado.id
+            ).label('ordem')
+        ).join(Upload).filter(
+            Upload.client_id == client_id
+        ).subquery()
+        
         query = self.db.query(
             Atestado.nomecompleto,
             func.count(Atestado.id).label('quantidade'),
             func.sum(Atestado.dias_atestados).label('dias_perdidos'),
-            func.sum(Atestado.horas_perdi).label('horas_perdidas')
-        ).join(Upload).filter(
+            func.sum(Atestado.horas_perdi).label('horas_perdidas'),
+            func.min(primeiro_registro.c.setor).label('setor'),
+            func.min(primeiro_registro.c.genero).label('genero')
+        ).join(Upload).outerjoin(
+            primeiro_registro,
+            (primeiro_registro.c.nome == Atestado.nomecompleto) & (primeiro_registro.c.ordem == 1)
+        ).filter(
             Upload.client_id == client_id
         ).filter(
             (Atestado.nomecompleto != '') | (Atestado.nome_funcionario != ''),
@@ -279,22 +303,15 @@ class Analytics:
         
         results = query.all()
         
-        # Busca setor e gênero do primeiro registro de cada funcionário para exibição
         funcionarios_completos = []
         for r in results:
             if not r.nomecompleto:
                 continue  # Pula se não tiver nome
-                
-            # Busca setor e genero do primeiro registro desse funcionário
-            primeiro = self.db.query(Atestado.setor, Atestado.genero).join(Upload).filter(
-                Upload.client_id == client_id,
-                Atestado.nomecompleto == r.nomecompleto
-            ).first()
             
             funcionarios_completos.append({
                 'nome': r.nomecompleto or 'Não informado',
-                'setor': primeiro.setor if primeiro and primeiro.setor else 'Não informado',
-                'genero': primeiro.genero if primeiro and primeiro.genero else '-',
+                'setor': r.setor or 'Não informado',
+                'genero': r.genero or '-',
                 'quantidade': r.quantidade or 0,
                 'dias_perdidos': round(r.dias_perdidos or 0, 2),
                 'horas_perdidas': round(r.horas_perdidas or 0, 2)
@@ -302,8 +319,23 @@ class Analytics:
         
         return funcionarios_completos
     
+    @cache_por_cliente("analytics")
     def evolucao_mensal(self, client_id: int, meses: int = 12, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Evolução mensal dos atestados"""
+        if not funcionario:
+            # Só período/setor: lê os agregados mensais materializados (O(meses))
+            from .rollup_service import RollupService
+            serie = RollupService(self.db).serie_mensal(client_id, meses, mes_inicio, mes_fim, setor)
+            return [
+                {
+                    'mes': r['mes'],
+                    'quantidade': r['quantidade'],
+                    'dias_perdidos': round(r['dias'], 2),
+                    'horas_perdidas': round(r['horas'], 2)
+                }
+                for r in reversed(serie)
+            ]
+        
         query = self.db.query(
             Upload.mes_referencia,
             func.count(Atestado.id).label('quantidade'),
@@ -338,6 +370,7 @@ class Analytics:
         
         return list(reversed(dados))
     
+    @cache_por_cliente("analytics")
     def distribuicao_genero(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Distribuição por gênero"""
         # Função para normalizar gênero
@@ -371,6 +404,8 @@ class Analytics:
         from .analytics_helper import aplicar_filtro_funcionario, aplicar_filtro_setor
         query = aplicar_filtro_funcionario(query, funcionario)
         query = aplicar_filtro_setor(query, setor)
+        
+        query = query.group_by(Atestado.genero)
 
         results = query.all()
         
@@ -404,6 +439,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def distribuicao_genero_funcionarios(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Distribuição de FUNCIONÁRIOS ÚNICOS por gênero"""
         # Função para normalizar gênero
@@ -496,6 +532,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def distribuicao_genero_mensal(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Distribuição mensal por gênero (atestados)"""
         # Função de normalização reaproveitada
@@ -551,6 +588,7 @@ class Analytics:
         
         return dados
     
+    @cache_por_cliente("analytics")
     def top_escalas(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """TOP Escalas com mais atestados"""
         query = self.db.query(
@@ -587,6 +625,7 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def top_motivos(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """TOP Motivos de Incidência com mais atestados (com percentual)"""
         # Primeiro calcula o total
@@ -600,12 +639,10 @@ class Analytics:
             total_query = total_query.filter(Upload.mes_referencia >= mes_inicio)
         if mes_fim:
             total_query = total_query.filter(Upload.mes_referencia <= mes_fim)
-        if funcionario:
-            total_query = total_query.filter(
-                (Atestado.nomecompleto == funcionario) | (Atestado.nome_funcionario == funcionario)
-            )
-        if setor:
-            total_query = total_query.filter(Atestado.setor == setor)
+        # Aplica filtros usando helper (suporta string ou lista)
+        from .analytics_helper import aplicar_filtro_funcionario, aplicar_filtro_setor
+        total_query = aplicar_filtro_funcionario(total_query, funcionario)
+        total_query = aplicar_filtro_setor(total_query, setor)
         
         total = total_query.scalar() or 1
         
@@ -643,6 +680,7 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def dias_perdidos_por_centro_custo(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """TOP Centros de Custo por dias perdidos (centro_custo = setor)"""
         query = self.db.query(
@@ -692,6 +730,7 @@ class Analytics:
         print(f"📊 Total de centros de custo retornados: {len(resultado)}")
         return resultado
     
+    @cache_por_cliente("analytics")
     def distribuicao_dias_por_atestado(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Distribuição de dias por atestado (histograma)"""
         query = self.db.query(Atestado.dias_atestados).join(Upload).filter(
@@ -743,6 +782,7 @@ class Analytics:
             if quantidade > 0
         ]
     
+    @cache_por_cliente("analytics")
     def media_dias_por_cid(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Média de dias por CID"""
         query = self.db.query(
@@ -804,6 +844,7 @@ class Analytics:
         
         return resultado_final
     
+    @cache_por_cliente("analytics")
     def dias_perdidos_por_motivo(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Dias perdidos por motivo de atestado"""
         query = self.db.query(
@@ -840,6 +881,7 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def evolucao_por_setor(self, client_id: int, meses: int = 12, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> Dict[str, List[Dict[str, Any]]]:
         """Evolução de dias perdidos por setor ao longo dos meses"""
         # Busca todos os setores
@@ -853,12 +895,10 @@ class Analytics:
             setores_query = setores_query.filter(Upload.mes_referencia >= mes_inicio)
         if mes_fim:
             setores_query = setores_query.filter(Upload.mes_referencia <= mes_fim)
-        if funcionario:
-            setores_query = setores_query.filter(
-                (Atestado.nomecompleto == funcionario) | (Atestado.nome_funcionario == funcionario)
-            )
-        if setor:
-            setores_query = setores_query.filter(Atestado.setor == setor)
+        # Aplica filtros usando helper (suporta string ou lista)
+        from .analytics_helper import aplicar_filtro_funcionario, aplicar_filtro_setor
+        setores_query = aplicar_filtro_funcionario(setores_query, funcionario)
+        setores_query = aplicar_filtro_setor(setores_query, setor)
         
         setores = [s[0] for s in setores_query.all() if s[0]]
         
@@ -902,6 +942,7 @@ class Analytics:
         
         return evolucao_por_setor
     
+    @cache_por_cliente("analytics")
     def comparativo_dias_horas(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Comparativo de dias vs horas perdidas por setor"""
         query = self.db.query(
@@ -938,6 +979,7 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def frequencia_atestados_por_funcionario(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Frequência de atestados por funcionário (quantos têm 1, 2, 3+ atestados)"""
         query = self.db.query(
@@ -992,6 +1034,7 @@ class Analytics:
             if qtd > 0
         ]
     
+    @cache_por_cliente("analytics")
     def dias_perdidos_setor_genero(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Dias perdidos por setor e gênero"""
         query = self.db.query(
@@ -1033,6 +1076,7 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def classificacao_funcionarios_roda_ouro(self, client_id: int, limit: int = 15, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Classificação por Funcionário - Roda de Ouro (soma dias de atestados, não conta atestados)"""
         query = self.db.query(
@@ -1068,6 +1112,7 @@ class Analytics:
             for r in results
         ]
     
+    @cache_por_cliente("analytics")
     def classificacao_setores_roda_ouro(self, client_id: int, limit: int = 15, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Classificação por Setor - Roda de Ouro (soma dias de afastamento, não conta atestados)"""
         # Query mais flexível - aceita setor vazio ou NULL, mas agrupa por setor
@@ -1107,6 +1152,7 @@ class Analytics:
         print(f"📊 Total de setores retornados: {len(resultado)}")
         return resultado
     
+    @cache_por_cliente("analytics")
     def classificacao_doencas_roda_ouro(self, client_id: int, limit: int = 15, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Classificação por Doença - Roda de Ouro (soma dias perdidos por nome real da doença) - USA COLUNA 'Doença' DOS DADOS ORIGINAIS"""
         import json
@@ -1230,18 +1276,20 @@ class Analytics:
         else:
             return 'OUTRAS'
     
-    def dias_atestados_por_ano_coerencia(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> Dict[str, Any]:
-        """Dias atestados por ano com coerência (COERENTE vs SEM COERÊNCIA) - agrupa por ano e mês - USA COLUNAS 'ano', 'mês' E 'coerente' DOS DADOS ORIGINAIS"""
-        import json
-        from datetime import datetime
-        
-        # Busca todos os registros
-        query = self.db.query(
-            Atestado.dias_atestados,
-            Atestado.data_afastamento,
-            Atestado.dados_originais,
-            Upload.mes_referencia
-        ).join(Upload).filter(
+    def _query_ano_mes_planilha(self, client_id: int, colunas: list = (), agregados: list = (), mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None):
+        """
+        Agregados por ano/mês da planilha, ano/mês de afastamento e mês de referência
+        (mais as `colunas` extras) — grupos pequenos, resolvidos por _ano_mes_registro.
+        """
+        chaves = [
+            Atestado.ano_planilha,
+            Atestado.mes_planilha,
+            extract('year', Atestado.data_afastamento).label('ano_afastamento'),
+            extract('month', Atestado.data_afastamento).label('mes_afastamento'),
+            Upload.mes_referencia,
+            *colunas,
+        ]
+        query = self.db.query(*chaves, *agregados).join(Upload).filter(
             Upload.client_id == client_id
         )
         
@@ -1254,86 +1302,64 @@ class Analytics:
         query = aplicar_filtro_funcionario(query, funcionario)
         query = aplicar_filtro_setor(query, setor)
         
-        registros = query.all()
+        return query.group_by(*chaves).all()
+    
+    @staticmethod
+    def _ano_mes_registro(r):
+        """
+        Ano e mês (strings) de um grupo: prioridade para as colunas "ano"/"mês" da
+        planilha, depois data_afastamento, depois mes_referencia.
+        """
+        ano = str(r.ano_planilha) if r.ano_planilha is not None else None
+        mes = str(r.mes_planilha).zfill(2) if r.mes_planilha is not None else None
+        
+        if not ano and r.ano_afastamento is not None:
+            ano = str(int(r.ano_afastamento))
+            mes = str(int(r.mes_afastamento)).zfill(2)
+        
+        if not ano and r.mes_referencia:
+            partes = r.mes_referencia.split('-')
+            if len(partes) >= 2:
+                ano = partes[0]
+                mes = partes[1]
+            elif len(partes) == 1 and len(partes[0]) == 4:
+                ano = partes[0]
+                mes = '01'
+        
+        return ano, mes
+    
+    @cache_por_cliente("analytics")
+    def dias_atestados_por_ano_coerencia(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> Dict[str, Any]:
+        """Dias atestados por ano com coerência (COERENTE vs SEM COERÊNCIA) - agrupa por ano e mês - USA COLUNAS 'ano', 'mês' E 'coerente' DA PLANILHA (extraídas na gravação)"""
+        grupos = self._query_ano_mes_planilha(
+            client_id,
+            colunas=[Atestado.coerencia],
+            agregados=[func.sum(Atestado.dias_atestados).label('dias')],
+            mes_inicio=mes_inicio, mes_fim=mes_fim, funcionario=funcionario, setor=setor
+        )
         
         # Agrupa por ano (e depois por mês dentro do ano)
         dados_por_ano = {}
         dados_por_mes_ano = {}  # Para detalhamento mensal
         
-        for r in registros:
-            # Tenta obter ano e mês dos dados originais (colunas "ano" e "mês")
-            ano = None
-            mes = None
-            mes_ano_key = None
-            coerente_valor = None
-            
-            # Prioridade 1: Busca nos dados originais (colunas "ano" e "mês" da planilha RODA DE OURO)
-            if r.dados_originais:
-                try:
-                    dados_orig = json.loads(r.dados_originais)
-                    # Busca colunas "ano" e "mês" (nomes exatos da planilha)
-                    ano_str = dados_orig.get('ano') or dados_orig.get('Ano') or dados_orig.get('ANO')
-                    mes_str = dados_orig.get('mês') or dados_orig.get('Mês') or dados_orig.get('MÊS') or dados_orig.get('mes')
-                    
-                    if ano_str:
-                        ano = str(ano_str).strip()
-                    if mes_str:
-                        mes = str(mes_str).strip().zfill(2)
-                    
-                    # Busca coluna "coerente" dos dados originais
-                    coerente_valor = dados_orig.get('coerente') or dados_orig.get('Coerente') or dados_orig.get('COERENTE')
-                except:
-                    pass
-            
-            # Prioridade 2: Se não encontrou nos dados originais, usa data_afastamento
-            if not ano and r.data_afastamento:
-                ano = str(r.data_afastamento.year)
-                mes = str(r.data_afastamento.month).zfill(2)
-            
-            # Prioridade 3: Se ainda não encontrou, usa mes_referencia
-            if not ano and r.mes_referencia:
-                partes = r.mes_referencia.split('-')
-                if len(partes) >= 2:
-                    ano = partes[0]
-                    mes = partes[1]
-                elif len(partes) == 1 and len(partes[0]) == 4:
-                    ano = partes[0]
-                    mes = '01'
-            
+        for r in grupos:
+            ano, mes = self._ano_mes_registro(r)
             if not ano:
                 continue
             
-            # Monta chave mês-ano
-            if mes:
-                mes_ano_key = f"{ano}-{mes}"
+            mes_ano_key = f"{ano}-{mes}" if mes else None
             
-            # Agrupa por ano
             if ano not in dados_por_ano:
                 dados_por_ano[ano] = {'coerente': 0, 'sem_coerencia': 0}
+            if mes_ano_key and mes_ano_key not in dados_por_mes_ano:
+                dados_por_mes_ano[mes_ano_key] = {'coerente': 0, 'sem_coerencia': 0}
             
-            # Agrupa por mês-ano (para detalhamento)
+            # Sem informação de coerência conta como SEM coerência (mais conservador)
+            chave = 'coerente' if r.coerencia else 'sem_coerencia'
+            dias = r.dias or 0
+            dados_por_ano[ano][chave] += dias
             if mes_ano_key:
-                if mes_ano_key not in dados_por_mes_ano:
-                    dados_por_mes_ano[mes_ano_key] = {'coerente': 0, 'sem_coerencia': 0}
-            
-            # Verifica coerência: usa coluna "coerente" dos dados originais se disponível
-            if coerente_valor:
-                # Usa valor direto da coluna "coerente"
-                is_coerente = str(coerente_valor).upper().strip() == 'COERENTE'
-            else:
-                # Fallback: usa função de verificação
-                is_coerente = self._verificar_coerencia(r.dados_originais, r.dias_atestados)
-            
-            dias = r.dias_atestados or 0
-            
-            if is_coerente:
-                dados_por_ano[ano]['coerente'] += dias
-                if mes_ano_key:
-                    dados_por_mes_ano[mes_ano_key]['coerente'] += dias
-            else:
-                dados_por_ano[ano]['sem_coerencia'] += dias
-                if mes_ano_key:
-                    dados_por_mes_ano[mes_ano_key]['sem_coerencia'] += dias
+                dados_por_mes_ano[mes_ano_key][chave] += dias
         
         # Converte para lista ordenada (por ano)
         anos_ordenados = sorted(dados_por_ano.keys())
@@ -1352,71 +1378,17 @@ class Analytics:
         }
     
     def _verificar_coerencia(self, dados_originais_json: str, dias_atestados: float) -> bool:
-        """Verifica se o atestado é coerente baseado nos dados originais - USA COLUNA 'coerente' DOS DADOS ORIGINAIS"""
-        import json
-        
-        if not dados_originais_json:
-            # Se não tem dados originais, assume SEM coerência (mais conservador)
-            return False
-        
-        try:
-            dados_originais = json.loads(dados_originais_json)
-            
-            # PRIORIDADE 1: Busca coluna "coerente" (nome exato da coluna na planilha RODA DE OURO)
-            coerente_valor = dados_originais.get('coerente') or dados_originais.get('Coerente') or dados_originais.get('COERENTE')
-            if coerente_valor:
-                valor_str = str(coerente_valor).upper().strip()
-                if valor_str == 'COERENTE':
-                    return True
-                elif 'SEM COER' in valor_str or 'SEM_COER' in valor_str or 'SEMCOER' in valor_str:
-                    return False
-                elif 'NÃO' in valor_str or 'NAO' in valor_str or 'N' in valor_str or 'FALSE' in valor_str or '0' in valor_str:
-                    return False
-                else:
-                    return True  # Se tem valor mas não é claramente negativo, assume coerente
-            
-            # PRIORIDADE 2: Busca em "Parecer Médico" (pode conter "COERENTE" ou "SEM COERÊNCIA")
-            parecer = dados_originais.get('Parecer Médico') or dados_originais.get('Parecer Medico') or dados_originais.get('PAREcer Médico')
-            if parecer:
-                parecer_str = str(parecer).upper()
-                if 'COERENTE' in parecer_str and 'SEM COER' not in parecer_str:
-                    return True
-                elif 'SEM COER' in parecer_str:
-                    return False
-            
-            # PRIORIDADE 3: Procura campos relacionados a coerência (fallback)
-            for key, value in dados_originais.items():
-                key_upper = str(key).upper()
-                value_str = str(value).upper() if value else ''
-                
-                # Verifica se tem campo "SEM COERÊNCIA" primeiro (tem prioridade)
-                if 'SEM COER' in key_upper or 'SEM_COER' in key_upper or 'SEMCOER' in key_upper:
-                    if 'SIM' in value_str or 'S' in value_str or 'TRUE' in value_str or '1' in value_str:
-                        return False  # SEM coerência
-                    elif 'NÃO' in value_str or 'NAO' in value_str or 'N' in value_str or 'FALSE' in value_str or '0' in value_str:
-                        return True  # NÃO tem sem coerência = coerente
-                
-                # Verifica se tem campo de coerência
-                if 'COERENTE' in key_upper or 'COERENCIA' in key_upper:
-                    if 'SIM' in value_str or 'S' in value_str or 'TRUE' in value_str or '1' in value_str:
-                        return True  # COERENTE
-                    elif 'NÃO' in value_str or 'NAO' in value_str or 'N' in value_str or 'FALSE' in value_str or '0' in value_str:
-                        return False  # NÃO coerente = sem coerência
-            
-            # Se não encontrou campo de coerência, assume SEM coerência por padrão (mais conservador)
-            return False
-        except:
-            # Se der erro ao parsear, assume SEM coerência (mais conservador)
-            return False
+        """Verifica se o atestado é coerente baseado nos dados originais (sem informação = SEM coerência)"""
+        from .campos_derivados import extrair_campos_derivados
+        return bool(extrair_campos_derivados(dados_originais_json)['coerencia'])
     
+    @cache_por_cliente("analytics")
     def analise_atestados_coerencia(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> Dict[str, Any]:
         """Análise de atestados por coerência (para gráfico de rosca)"""
-        import json
-        
+        dias = func.coalesce(Atestado.dias_atestados, 0)
         query = self.db.query(
-            Atestado.dias_atestados,
-            Atestado.dados_originais,
-            Upload.mes_referencia
+            func.sum(case((Atestado.coerencia.is_(True), dias), else_=0)).label('coerente'),
+            func.sum(case((Atestado.coerencia.is_(True), 0), else_=dias)).label('sem_coerencia')
         ).join(Upload).filter(
             Upload.client_id == client_id
         )
@@ -1430,19 +1402,9 @@ class Analytics:
         query = aplicar_filtro_funcionario(query, funcionario)
         query = aplicar_filtro_setor(query, setor)
         
-        registros = query.all()
-        
-        total_coerente = 0
-        total_sem_coerencia = 0
-        
-        for r in registros:
-            dias = r.dias_atestados or 0
-            coerente = self._verificar_coerencia(r.dados_originais, dias)
-            
-            if coerente:
-                total_coerente += dias
-            else:
-                total_sem_coerencia += dias
+        r = query.one()
+        total_coerente = r.coerente or 0
+        total_sem_coerencia = r.sem_coerencia or 0
         
         total = total_coerente + total_sem_coerencia
         
@@ -1454,15 +1416,32 @@ class Analytics:
             'percentual_sem_coerencia': (total_sem_coerencia / total * 100) if total > 0 else 0
         }
     
+    @cache_por_cliente("analytics")
     def tempo_servico_atestados(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
-        """Tempo de Serviço x Atestados - USA COLUNA 'Admissão' DOS DADOS ORIGINAIS - Analisa se funcionários mais antigos ou mais novos dão mais atestados"""
-        import json
-        from datetime import datetime, date
+        """Tempo de Serviço x Atestados - USA COLUNA 'Admissão' DA PLANILHA (extraída na gravação) - Analisa se funcionários mais antigos ou mais novos dão mais atestados"""
+        from datetime import date
+        import math
+        
+        # Faixas por anos de serviço ((hoje - admissão).days / 365.25): anos < N
+        # equivale a admissão >= hoje - floor(N * 365.25) dias
+        hoje = date.today()
+        
+        def admitido_desde(anos):
+            return hoje - timedelta(days=math.floor(anos * 365.25))
+        
+        faixa = case(
+            (Atestado.data_admissao.is_(None), 'Não informado'),
+            (Atestado.data_admissao >= admitido_desde(1), '0-1 ano'),
+            (Atestado.data_admissao >= admitido_desde(3), '1-3 anos'),
+            (Atestado.data_admissao >= admitido_desde(5), '3-5 anos'),
+            (Atestado.data_admissao >= admitido_desde(10), '5-10 anos'),
+            else_='10+ anos'
+        ).label('faixa')
         
         query = self.db.query(
-            Atestado.dados_originais,
-            Atestado.dias_atestados,
-            Atestado.nomecompleto
+            faixa,
+            func.coalesce(func.sum(Atestado.dias_atestados), 0).label('dias_afastamento'),
+            func.count(Atestado.id).label('quantidade_atestados')
         ).join(Upload).filter(
             Upload.client_id == client_id
         )
@@ -1476,111 +1455,18 @@ class Analytics:
         query = aplicar_filtro_funcionario(query, funcionario)
         query = aplicar_filtro_setor(query, setor)
         
-        registros = query.all()
-        
-        # Função para calcular tempo de serviço em anos
-        def calcular_tempo_servico(data_admissao_str):
-            """Calcula tempo de serviço em anos a partir da data de admissão"""
-            if not data_admissao_str:
-                return None
-            
-            try:
-                # Tenta vários formatos de data
-                data_admissao = None
-                if isinstance(data_admissao_str, str):
-                    # Tenta formato DD/MM/YYYY
-                    try:
-                        data_admissao = datetime.strptime(data_admissao_str, '%d/%m/%Y').date()
-                    except:
-                        # Tenta formato YYYY-MM-DD
-                        try:
-                            data_admissao = datetime.strptime(data_admissao_str, '%Y-%m-%d').date()
-                        except:
-                            # Tenta formato DD-MM-YYYY
-                            try:
-                                data_admissao = datetime.strptime(data_admissao_str, '%d-%m-%Y').date()
-                            except:
-                                # Tenta apenas ano (YYYY)
-                                try:
-                                    ano = int(data_admissao_str[:4])
-                                    data_admissao = date(ano, 1, 1)
-                                except:
-                                    pass
-                
-                if not data_admissao:
-                    return None
-                
-                # Calcula diferença em anos
-                hoje = date.today()
-                anos = (hoje - data_admissao).days / 365.25
-                return anos
-            except:
-                return None
-        
-        # Função para categorizar tempo de serviço em faixas
-        def categorizar_tempo_servico(anos):
-            """Categoriza tempo de serviço em faixas"""
-            if anos is None:
-                return 'Não informado'
-            elif anos < 1:
-                return '0-1 ano'
-            elif anos < 3:
-                return '1-3 anos'
-            elif anos < 5:
-                return '3-5 anos'
-            elif anos < 10:
-                return '5-10 anos'
-            else:
-                return '10+ anos'
-        
-        # Agrupa por faixa de tempo de serviço
-        dados_por_faixa = {}
-        
-        for r in registros:
-            # Busca coluna "Admissão" nos dados originais
-            data_admissao_str = None
-            if r.dados_originais:
-                try:
-                    dados_orig = json.loads(r.dados_originais)
-                    # Busca coluna "Admissão" (nome exato da planilha RODA DE OURO)
-                    data_admissao_str = dados_orig.get('Admissão') or dados_orig.get('admissão') or dados_orig.get('ADMISSÃO') or dados_orig.get('Admissao')
-                except:
-                    pass
-            
-            # Calcula tempo de serviço
-            anos_servico = calcular_tempo_servico(data_admissao_str)
-            faixa = categorizar_tempo_servico(anos_servico)
-            
-            # Agrupa por faixa e soma dias de afastamento
-            if faixa not in dados_por_faixa:
-                dados_por_faixa[faixa] = {
-                    'faixa': faixa,
-                    'dias_afastamento': 0,
-                    'quantidade_atestados': 0
-                }
-            
-            dias = r.dias_atestados or 0
-            dados_por_faixa[faixa]['dias_afastamento'] += dias
-            dados_por_faixa[faixa]['quantidade_atestados'] += 1
+        dados_por_faixa = {r.faixa: r for r in query.group_by(faixa).all()}
         
         # Ordena faixas por ordem lógica
         ordem_faixas = ['0-1 ano', '1-3 anos', '3-5 anos', '5-10 anos', '10+ anos', 'Não informado']
         resultado = []
         for faixa_ordem in ordem_faixas:
             if faixa_ordem in dados_por_faixa:
+                r = dados_por_faixa[faixa_ordem]
                 resultado.append({
-                    'faixa_tempo_servico': dados_por_faixa[faixa_ordem]['faixa'],
-                    'dias_afastamento': round(dados_por_faixa[faixa_ordem]['dias_afastamento'], 2),
-                    'quantidade_atestados': dados_por_faixa[faixa_ordem]['quantidade_atestados']
-                })
-        
-        # Adiciona outras faixas que não estão na ordem padrão (se houver)
-        for faixa, dados in dados_por_faixa.items():
-            if faixa not in ordem_faixas:
-                resultado.append({
-                    'faixa_tempo_servico': dados['faixa'],
-                    'dias_afastamento': round(dados['dias_afastamento'], 2),
-                    'quantidade_atestados': dados['quantidade_atestados']
+                    'faixa_tempo_servico': faixa_ordem,
+                    'dias_afastamento': round(r.dias_afastamento, 2),
+                    'quantidade_atestados': r.quantidade_atestados
                 })
         
         print(f"📊 Tempo Serviço x Atestados - {len(resultado)} faixas encontradas")
@@ -1589,6 +1475,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def horas_perdidas_por_genero(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Horas perdidas por gênero (calcula se horas_perdi estiver zerado)"""
         # Calcula horas: se horas_perdi > 0 usa ele, senão calcula dias_atestados * horas_dia
@@ -1650,6 +1537,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def horas_perdidas_por_setor(self, client_id: int, limit: int = 10, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Horas perdidas por setor (calcula se horas_perdi estiver zerado)"""
         query = self.db.query(
@@ -1707,130 +1595,59 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def evolucao_mensal_horas(self, client_id: int, meses: int = 12, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Evolução mensal de horas perdidas - MESMO RACIOCÍNIO DE dias_atestados_por_ano_coerencia: agrupa mês a mês"""
-        import json
-        from datetime import datetime
-        
-        # Busca todos os registros (mesmo padrão de dias_atestados_por_ano_coerencia)
-        query = self.db.query(
-            Atestado.horas_perdi,
-            Atestado.dias_atestados,
-            Atestado.horas_dia,
-            Atestado.data_afastamento,
-            Atestado.dados_originais,
-            Upload.mes_referencia
-        ).join(Upload).filter(
-            Upload.client_id == client_id
+        # Horas perdidas por registro: se horas_perdi tem valor, usa ele, senão dias * horas_dia
+        horas_registro = case(
+            (func.coalesce(Atestado.horas_perdi, 0) != 0, Atestado.horas_perdi),
+            (func.coalesce(Atestado.horas_dia, 0) > 0, func.coalesce(Atestado.dias_atestados, 0) * Atestado.horas_dia),
+            else_=0
+        )
+        grupos = self._query_ano_mes_planilha(
+            client_id,
+            agregados=[
+                func.sum(horas_registro).label('horas'),
+                func.sum(Atestado.dias_atestados).label('dias'),
+                func.count(Atestado.id).label('quantidade'),
+            ],
+            mes_inicio=mes_inicio, mes_fim=mes_fim, funcionario=funcionario, setor=setor
         )
-        
-        if mes_inicio:
-            query = query.filter(Upload.mes_referencia >= mes_inicio)
-        if mes_fim:
-            query = query.filter(Upload.mes_referencia <= mes_fim)
-        
-        from .analytics_helper import aplicar_filtro_funcionario, aplicar_filtro_setor
-        query = aplicar_filtro_funcionario(query, funcionario)
-        query = aplicar_filtro_setor(query, setor)
-        
-        registros = query.all()
-        
-        # Agrupa por mês-ano (mesmo padrão de dias_atestados_por_ano_coerencia)
-        dados_por_mes_ano = {}  # Chave: "YYYY-MM", Valor: {horas_perdidas, semanas_perdidas, dias_perdidos, quantidade}
         
         # Considerando semana = 44 horas
         SEMANA_HORAS = 44
         
-        for r in registros:
-            # Tenta obter ano e mês dos dados originais (colunas "ano" e "mês") - MESMO PADRÃO
-            ano = None
-            mes = None
-            mes_ano_key = None
-            
-            # Prioridade 1: Busca nos dados originais (colunas "ano" e "mês" da planilha)
-            if r.dados_originais:
-                try:
-                    dados_orig = json.loads(r.dados_originais)
-                    # Busca colunas "ano" e "mês" (nomes exatos da planilha)
-                    ano_str = dados_orig.get('ano') or dados_orig.get('Ano') or dados_orig.get('ANO')
-                    mes_str = dados_orig.get('mês') or dados_orig.get('Mês') or dados_orig.get('MÊS') or dados_orig.get('mes')
-                    
-                    if ano_str:
-                        ano = str(ano_str).strip()
-                    if mes_str:
-                        mes = str(mes_str).strip().zfill(2)
-                except:
-                    pass
-            
-            # Prioridade 2: Se não encontrou nos dados originais, usa data_afastamento
-            if not ano and r.data_afastamento:
-                ano = str(r.data_afastamento.year)
-                mes = str(r.data_afastamento.month).zfill(2)
-            
-            # Prioridade 3: Se ainda não encontrou, usa mes_referencia
-            if not ano and r.mes_referencia:
-                partes = r.mes_referencia.split('-')
-                if len(partes) >= 2:
-                    ano = partes[0]
-                    mes = partes[1]
-                elif len(partes) == 1 and len(partes[0]) == 4:
-                    ano = partes[0]
-                    mes = '01'
-            
+        dados_por_mes_ano = {}  # Chave: "YYYY-MM", Valor: {horas_perdidas, dias_perdidos, quantidade}
+        for r in grupos:
+            ano, mes = self._ano_mes_registro(r)
             if not ano:
                 continue
             
-            # Monta chave mês-ano (formato "YYYY-MM")
-            if mes:
-                mes_ano_key = f"{ano}-{mes}"
-            else:
-                mes_ano_key = f"{ano}-01"  # Fallback para janeiro se não tiver mês
+            # Monta chave mês-ano (formato "YYYY-MM"); janeiro se não tiver mês
+            mes_ano_key = f"{ano}-{mes or '01'}"
             
-            # Inicializa estrutura para este mês-ano se não existir
             if mes_ano_key not in dados_por_mes_ano:
-                dados_por_mes_ano[mes_ano_key] = {
-                    'horas_perdidas': 0.0,
-                    'semanas_perdidas': 0.0,
-                    'dias_perdidos': 0.0,
-                    'quantidade': 0
-                }
+                dados_por_mes_ano[mes_ano_key] = {'horas_perdidas': 0.0, 'dias_perdidos': 0.0, 'quantidade': 0}
             
-            # Calcula horas perdidas: se horas_perdi tem valor, usa ele, senão calcula
-            horas_perdidas = float(r.horas_perdi or 0)
-            if horas_perdidas == 0:
-                # Calcula: dias * horas_dia
-                dias_total = float(r.dias_atestados or 0)
-                horas_dia_valor = float(r.horas_dia or 0)
-                if horas_dia_valor > 0:
-                    horas_perdidas = dias_total * horas_dia_valor
-            
-            semanas_perdidas = horas_perdidas / SEMANA_HORAS if SEMANA_HORAS > 0 else 0
-            dias_perdidos = float(r.dias_atestados or 0)
-            
-            # Acumula valores para este mês-ano
-            dados_por_mes_ano[mes_ano_key]['horas_perdidas'] += horas_perdidas
-            dados_por_mes_ano[mes_ano_key]['semanas_perdidas'] += semanas_perdidas
-            dados_por_mes_ano[mes_ano_key]['dias_perdidos'] += dias_perdidos
-            dados_por_mes_ano[mes_ano_key]['quantidade'] += 1
+            dados_por_mes_ano[mes_ano_key]['horas_perdidas'] += float(r.horas or 0)
+            dados_por_mes_ano[mes_ano_key]['dias_perdidos'] += float(r.dias or 0)
+            dados_por_mes_ano[mes_ano_key]['quantidade'] += r.quantidade
         
-        # Ordena meses (mesmo padrão de dias_atestados_por_ano_coerencia)
-        meses_ordenados = sorted(dados_por_mes_ano.keys())
-        
-        # Converte para lista de dicionários (mesmo formato esperado pelo frontend)
+        # Converte para lista de dicionários, do mais antigo para o mais recente
         dados = []
-        for mes_ano in meses_ordenados:
+        for mes_ano in sorted(dados_por_mes_ano.keys()):
             dados_mes = dados_por_mes_ano[mes_ano]
             dados.append({
                 'mes': mes_ano,
                 'horas_perdidas': round(dados_mes['horas_perdidas'], 2),
-                'semanas_perdidas': round(dados_mes['semanas_perdidas'], 2),
+                'semanas_perdidas': round(dados_mes['horas_perdidas'] / SEMANA_HORAS, 2),
                 'dias_perdidos': round(dados_mes['dias_perdidos'], 2),
                 'quantidade': dados_mes['quantidade']
             })
         
-        # Já está ordenado crescente (do mais antigo para o mais recente) - MESMO PADRÃO
         return dados
     
+    @cache_por_cliente("analytics")
     def comparativo_periodos(self, client_id: int, tipo_comparacao: str = 'mes', funcionario: str = None, setor: str = None) -> Dict[str, Any]:
         """
         Comparativo entre períodos (mês atual vs anterior, trimestre atual vs anterior)
@@ -1989,6 +1806,7 @@ class Analytics:
         else:
             raise ValueError(f"Tipo de comparação inválido: {tipo_comparacao}. Use 'mes' ou 'trimestre'")
     
+    @cache_por_cliente("analytics")
     def analise_detalhada_genero(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> Dict[str, Any]:
         """Análise detalhada por gênero (dias, horas, percentuais, comparações)"""
         # Busca dados por gênero
@@ -2027,6 +1845,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def comparativo_dias_horas_genero(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Comparativo de dias vs horas perdidas por gênero"""
         generos_data = self.horas_perdidas_por_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
@@ -2044,6 +1863,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def horas_perdidas_setor_genero(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """Horas perdidas por setor e gênero (cruzamento)"""
         query = self.db.query(
@@ -2108,6 +1928,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def taxa_absenteismo_mensal(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """
         Calcula taxa de absenteísmo mensal (%)
@@ -2115,7 +1936,7 @@ class Analytics:
         Assume 22 dias úteis por mês como padrão
         """
         # Busca evolução mensal (já tem dias perdidos por mês)
-        evolucao = self.evolucao_mensal(client_id, mes_inicio, mes_fim, funcionario, setor)
+        evolucao = self.evolucao_mensal(client_id, None, mes_inicio=mes_inicio, mes_fim=mes_fim, funcionario=funcionario, setor=setor)
         
         resultado = []
         dias_uteis_padrao = 22  # Média de dias úteis por mês
@@ -2158,6 +1979,7 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def comparativo_ano_anterior(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """
         Compara período atual com mesmo período do ano anterior
@@ -2272,13 +2094,14 @@ class Analytics:
         # Retorna apenas se houver pelo menos um mês com dados
         return resultado if len(resultado) > 0 else []
     
+    @cache_por_cliente("analytics")
     def analise_sazonalidade(self, client_id: int, funcionario: str = None, setor: str = None) -> List[Dict[str, Any]]:
         """
         Analisa sazonalidade calculando médias por mês do ano (Jan, Fev, Mar...)
         Agrupa todos os anos disponíveis e calcula média para cada mês
         """
         # Busca TODOS os dados históricos
-        evolucao = self.evolucao_mensal(client_id, None, None, funcionario, setor)
+        evolucao = self.evolucao_mensal(client_id, None, funcionario=funcionario, setor=setor)
         
         # Agrupa por mês do ano (01-12)
         mapa_meses = {}
@@ -2332,47 +2155,35 @@ class Analytics:
         
         return resultado
     
+    @cache_por_cliente("analytics")
     def heatmap_setores_meses(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None) -> Dict[str, Any]:
         """
         Gera dados para heatmap: Setores (linhas) x Meses (colunas) = Dias Perdidos
         Retorna estrutura pronta para renderização de matriz de calor
         """
-        # Query: agrupa por setor e mês
-        query = self.db.query(
-            Atestado.setor,
-            Upload.mes_referencia,
-            func.sum(Atestado.dias_atestados).label('dias_perdidos')
-        ).join(Upload).filter(
-            Upload.client_id == client_id
-        ).group_by(
-            Atestado.setor,
-            Upload.mes_referencia
-        )
-        
-        # Filtros
-        if mes_inicio:
-            query = query.filter(Upload.mes_referencia >= mes_inicio)
-        if mes_fim:
-            query = query.filter(Upload.mes_referencia <= mes_fim)
-        
-        from .analytics_helper import aplicar_filtro_funcionario
-        query = aplicar_filtro_funcionario(query, funcionario)
-        
-        resultados = query.all()
+        if not funcionario:
+            # Sem filtro de funcionário: lê os agregados mensais por setor
+            from .rollup_service import RollupService
+            resultados = [
+                (r['valor'], r['mes'], r['dias'])
+                for r in RollupService(self.db).por_dimensao(client_id, 'setor', mes_inicio, mes_fim)
+            ]
+        else:
+            resultados = self._heatmap_setores_meses_bruto(client_id, mes_inicio, mes_fim, funcionario)
         
         # Monta estrutura: {setor: {mes: dias}}
         mapa_setores = {}
         meses_unicos = set()
         
-        for r in resultados:
-            setor = r.setor or 'Não informado'
-            mes = r.mes_referencia
-            dias = float(r.dias_perdidos or 0)
+        for setor, mes, dias_perdidos in resultados:
+            setor = setor or 'Não informado'
+            dias = float(dias_perdidos or 0)
             
             if setor not in mapa_setores:
                 mapa_setores[setor] = {}
             
-            mapa_setores[setor][mes] = dias
+            # Setor NULL e '' caem na mesma linha 'Não informado': soma
+            mapa_setores[setor][mes] = mapa_setores[setor].get(mes, 0) + dias
             meses_unicos.add(mes)
         
         # Ordena meses cronologicamente
@@ -2409,6 +2220,30 @@ class Analytics:
             'total_meses': len(meses_ordenados)
         }
     
+    def _heatmap_setores_meses_bruto(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None):
+        """Dias perdidos por (setor, mês) direto dos atestados (com filtro de funcionário)"""
+        query = self.db.query(
+            Atestado.setor,
+            Upload.mes_referencia,
+            func.sum(Atestado.dias_atestados).label('dias_perdidos')
+        ).join(Upload).filter(
+            Upload.client_id == client_id
+        ).group_by(
+            Atestado.setor,
+            Upload.mes_referencia
+        )
+        
+        if mes_inicio:
+            query = query.filter(Upload.mes_referencia >= mes_inicio)
+        if mes_fim:
+            query = query.filter(Upload.mes_referencia <= mes_fim)
+        
+        from .analytics_helper import aplicar_filtro_funcionario
+        query = aplicar_filtro_funcionario(query, funcionario)
+        
+        return query.all()
+    
+    @cache_por_cliente("analytics")
     def top_cids_por_setor(self, client_id: int, top_n: int = 3, mes_inicio: str = None, mes_fim: str = None, funcionario: str = None) -> List[Dict[str, Any]]:
         """
         Retorna os top CIDs de cada setor
@@ -2441,13 +2276,7 @@ class Analytics:
             ).join(Upload).filter(
                 Upload.client_id == client_id,
                 Atestado.setor == setor
-            ).group_by(
-                Atestado.cid,
-                Atestado.diagnostico,
-                Atestado.descricao_cid
-            ).order_by(
-                func.sum(Atestado.dias_atestados).desc()
-            ).limit(top_n)
+            )
             
             if mes_inicio:
                 query = query.filter(Upload.mes_referencia >= mes_inicio)
@@ -2457,7 +2286,14 @@ class Analytics:
             from .analytics_helper import aplicar_filtro_funcionario
             query = aplicar_filtro_funcionario(query, funcionario)
             
-            cids = query.all()
+            # Filtros antes do LIMIT (filter() depois de limit() é rejeitado pelo SQLAlchemy)
+            cids = query.group_by(
+                Atestado.cid,
+                Atestado.diagnostico,
+                Atestado.descricao_cid
+            ).order_by(
+                func.sum(Atestado.dias_atestados).desc()
+            ).limit(top_n).all()
             
             # CORREÇÃO: Se diagnóstico é genérico, mostra apenas código CID
             diagnosticos_genericos = [
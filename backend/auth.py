@@ -12,6 +12,7 @@ import os
 import secrets
 from .database import get_db
 from .models import User, Config
+from .cache_usuarios import UsuarioAutenticado, usuario_autenticado
 
 # Carrega variáveis de ambiente do arquivo .env se existir
 try:
@@ -93,8 +94,8 @@ def authenticate_user(db: Session, username: str, password: str):
 def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
-) -> User:
-    """Obtém usuário atual a partir do token"""
+) -> UsuarioAutenticado:
+    """Obtém usuário atual a partir do token (cache_usuarios: sem consulta enquanto válido)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não autenticado",
@@ -110,7 +111,7 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = usuario_autenticado(db, username)
     if user is None:
         raise credentials_exception
     if not user.is_active:
@@ -1,90 +1,209 @@
 """
 Tarefas em background - agendador de relatórios e verificação de alertas
+
+As tarefas rodam fora do event loop do uvicorn: uma thread de disparo acorda a
+cada `intervalo` segundos e entrega cada tarefa a um pool de threads próprio
+(ThreadPoolExecutor "agendador"), cada execução com a sua sessão. Consultas
+SQLAlchemy, geração de relatório e envio SMTP não seguram mais as requisições HTTP.
+
+Proteção contra sobreposição: uma tarefa que ainda está rodando quando chega o
+próximo disparo não é enfileirada de novo (o disparo é contado em `ignoradas`).
+Cada tarefa guarda execuções, erros e tempos (última, máxima, média) em MetricasTarefa.
+
+Alertas: só as regras cuja empresa teve dados alterados (data_version), cuja janela
+virou ou que foram editadas são avaliadas (AlertService.verificar_alteracoes).
 """
-import asyncio
-from datetime import datetime, timedelta
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
 from sqlalchemy.orm import Session
+
 from .database import SessionLocal
 from .report_scheduler import ReportScheduler
 from .alert_service import AlertService
-from .models import Client
+
+
+@dataclass
+class MetricasTarefa:
+    """Tempos e contadores de uma tarefa agendada"""
+    execucoes: int = 0
+    erros: int = 0
+    ignoradas: int = 0  # disparos descartados porque a execução anterior não terminou
+    em_execucao: bool = False
+    ultima_duracao_ms: float = 0.0
+    maior_duracao_ms: float = 0.0
+    total_ms: float = 0.0
+    ultimo_inicio: Optional[str] = None
+    ultimo_erro: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        dados = asdict(self)
+        dados['media_ms'] = round(self.total_ms / self.execucoes, 1) if self.execucoes else 0.0
+        return dados
+
 
 class BackgroundTaskManager:
-    """Gerenciador de tarefas em background"""
-    
-    def __init__(self):
+    """Gerenciador de tarefas em background (thread de disparo + pool próprio)"""
+
+    def __init__(self, session_factory=SessionLocal, intervalo: float = 60.0, workers: int = 2):
+        self.session_factory = session_factory
+        self.intervalo = intervalo
+        self.workers = workers
         self.running = False
-        self.task = None
-    
-    async def start(self):
+        self.tarefas: Dict[str, Callable[[Session], None]] = {
+            'relatorios': self._process_reports,
+            'alertas': self._check_alerts,
+        }
+        self.metricas: Dict[str, MetricasTarefa] = {nome: MetricasTarefa() for nome in self.tarefas}
+        self._travas = {nome: threading.Lock() for nome in self.tarefas}
+        self._lock_metricas = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Alertas: chave da última avaliação de cada regra e resumo do último ciclo
+        self.alertas_avaliados: Dict[int, tuple] = {}
+        self.ultimo_ciclo_alertas: Optional[dict] = None
+
+    def start(self) -> None:
         """Inicia o gerenciador de tarefas"""
+        if self._thread is not None:
+            return
         self.running = True
-        self.task = asyncio.create_task(self._run_tasks())
-    
-    async def stop(self):
-        """Para o gerenciador de tarefas"""
+        self._parar.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agendador")
+        self._thread = threading.Thread(target=self._run_tasks, name="agendador-disparo", daemon=True)
+        self._thread.start()
+        print(f"⏰ Agendador iniciado (a cada {self.intervalo:g}s, {self.workers} workers)")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Para os disparos; sem timeout, espera a tarefa em andamento terminar"""
         self.running = False
-        if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
-    
-    async def _run_tasks(self):
-        """Loop principal de tarefas"""
-        while self.running:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=timeout is None, cancel_futures=True)
+            self._executor = None
+
+    def disparar(self) -> Dict[str, bool]:
+        """Entrega ao pool as tarefas que não estão rodando; devolve {tarefa: enfileirada}"""
+        enfileiradas = {}
+        for nome in self.tarefas:
+            if not self._travas[nome].acquire(blocking=False):
+                with self._lock_metricas:
+                    self.metricas[nome].ignoradas += 1
+                enfileiradas[nome] = False
+                continue
             try:
-                # Processa relatórios agendados
-                await self._process_reports()
-                
-                # Verifica alertas
-                await self._check_alerts()
-                
-                # Aguarda 1 minuto antes da próxima verificação
-                await asyncio.sleep(60)
-            
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                print(f"Erro em tarefa background: {e}")
-                await asyncio.sleep(60)
-    
-    async def _process_reports(self):
-        """Processa relatórios agendados"""
+                self._executor.submit(self.executar, nome, True)
+            except RuntimeError:  # pool encerrado durante o stop
+                self._travas[nome].release()
+                enfileiradas[nome] = False
+                continue
+            enfileiradas[nome] = True
+        return enfileiradas
+
+    def executar(self, nome: str, trava_adquirida: bool = False) -> bool:
+        """
+        Executa uma tarefa na thread atual, com sessão própria e métricas.
+        Sem a trava (chamada direta de scripts/testes), não roda em paralelo com o pool.
+        """
+        trava = self._travas[nome]
+        if not trava_adquirida and not trava.acquire(blocking=False):
+            with self._lock_metricas:
+                self.metricas[nome].ignoradas += 1
+            return False
+        metricas = self.metricas[nome]
+        with self._lock_metricas:
+            metricas.em_execucao = True
+            metricas.ultimo_inicio = datetime.now().isoformat(timespec="seconds")
+        inicio = time.perf_counter()
+        erro = None
         try:
-            db = SessionLocal()
+            db = self.session_factory()
             try:
-                scheduler = ReportScheduler(db)
-                results = scheduler.process_scheduled_reports()
-                if results:
-                    print(f"📧 Processados {len(results)} relatórios agendados")
+                self.tarefas[nome](db)
             finally:
                 db.close()
         except Exception as e:
-            print(f"Erro ao processar relatórios: {e}")
-    
-    async def _check_alerts(self):
-        """Verifica regras de alerta"""
-        try:
-            db = SessionLocal()
+            erro = str(e)
+            print(f"Erro em tarefa background ({nome}): {e}")
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            with self._lock_metricas:
+                metricas.em_execucao = False
+                metricas.execucoes += 1
+                metricas.ultima_duracao_ms = round(duracao, 1)
+                metricas.maior_duracao_ms = max(metricas.maior_duracao_ms, metricas.ultima_duracao_ms)
+                metricas.total_ms += duracao
+                if erro is not None:
+                    metricas.erros += 1
+                    metricas.ultimo_erro = erro
+            trava.release()
+        return erro is None
+
+    def resumo(self) -> Dict[str, dict]:
+        """Métricas de cada tarefa (cópia)"""
+        with self._lock_metricas:
+            return {nome: m.to_dict() for nome, m in self.metricas.items()}
+
+    def _run_tasks(self) -> None:
+        """Loop de disparo (thread própria): entrega as tarefas e espera o intervalo"""
+        while not self._parar.is_set():
             try:
-                # Busca todas as empresas ativas
-                clients = db.query(Client).all()
-                alert_service = AlertService(db)
-                
-                for client in clients:
-                    try:
-                        alerts = alert_service.check_alert_rules(client.id)
-                        if alerts:
-                            print(f"⚠️ Criados {len(alerts)} alertas para empresa {client.id}")
-                    except Exception as e:
-                        print(f"Erro ao verificar alertas da empresa {client.id}: {e}")
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"Erro ao verificar alertas: {e}")
+                self.disparar()
+            except Exception as e:
+                print(f"Erro em tarefa background: {e}")
+            self._parar.wait(self.intervalo)
+
+    def _process_reports(self, db: Session) -> None:
+        """Processa relatórios agendados"""
+        scheduler = ReportScheduler(db)
+        results = scheduler.process_scheduled_reports()
+        if results:
+            print(f"📧 Processados {len(results)} relatórios agendados")
+
+    def _check_alerts(self, db: Session) -> None:
+        """Verifica regras de alerta que mudaram (dados, janela ou regra) desde o último ciclo"""
+        resumo = AlertService(db).verificar_alteracoes(self.alertas_avaliados)
+        self.ultimo_ciclo_alertas = resumo
+        if resumo['regras_avaliadas']:
+            print(f"⚠️ Alertas: {resumo['regras_avaliadas']} regras de {resumo['empresas_avaliadas']} empresas "
+                  f"avaliadas em {resumo['ms']:.0f} ms ({resumo['consultas']} consultas), "
+                  f"{resumo['alertas']} alertas criados")
+
+
+# Instância global (iniciada no startup se ABSENTEISMO_AGENDADOR estiver ligado)
+background_manager: Optional[BackgroundTaskManager] = None
+
+
+def init_background_tasks() -> Optional[BackgroundTaskManager]:
+    """
+    Inicia o agendador de relatórios/alertas.
+
+    ABSENTEISMO_AGENDADOR=1 liga (padrão desligado: num deploy com vários workers,
+    só um processo deve enviar os relatórios). ABSENTEISMO_AGENDADOR_INTERVALO
+    define os segundos entre disparos (padrão 60).
+    """
+    global background_manager
+    if background_manager is not None:
+        return background_manager
+    if (os.environ.get("ABSENTEISMO_AGENDADOR") or "").strip().lower() not in {"1", "true", "yes", "on"}:
+        return None
+    intervalo = float((os.environ.get("ABSENTEISMO_AGENDADOR_INTERVALO") or "60").strip())
+    background_manager = BackgroundTaskManager(intervalo=intervalo)
+    background_manager.start()
+    return background_manager
 
-# Instância global
-background_manager = BackgroundTaskManager()
 
+def stop_background_tasks() -> None:
+    global background_manager
+    if background_manager is not None:
+        background_manager.stop(timeout=5)
+        background_manager = None
@@ -1,12 +1,35 @@
 """
 Serviço de Backup Automático do Banco de Dados
 Backup diário automático com retenção configurável
+
+O backup usa a API de backup online do SQLite (sqlite3.Connection.backup) em vez de
+copiar o arquivo: a cópia é consistente mesmo com escritas em andamento e é feita
+em passos de ABSENTEISMO_BACKUP_PAGINAS páginas, com uma pausa de
+ABSENTEISMO_BACKUP_PAUSA_MS entre eles para liberar o banco aos escritores (com
+escrita contínua, a cópia termina num passo só, ver _copiar_online).
+
+- Completo (<prefixo>_absenteismo_backup_<ts>.db.gz): o snapshot é comprimido em
+  fluxo (gzip) e ganha um arquivo .pages com o hash de cada página.
+- Incremental (<prefixo>_absenteismo_backup_<ts>.delta.gz): só as páginas que mudaram
+  desde o último completo (diferencial); a restauração aplica o delta sobre o completo.
+
+Os arquivos vão para backup_dir (padrão: ABSENTEISMO_BACKUP_DIR ou "backups").
+Cada execução registra tipo, duração, vazão e tamanhos em `historico`, e o backup
+gravado é verificado: restaurado num arquivo temporário, aberto somente leitura e
+checado com PRAGMA quick_check.
 """
+import gzip
+import hashlib
+import json
 import os
 import shutil
+import sqlite3
+import struct
+import uuid
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 import threading
 import time
 
@@ -17,26 +40,83 @@ try:
 except ImportError:
     logger = None
 
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    return int(raw) if raw else default
+
+
+PAGINAS_POR_PASSO = max(1, _env_int("ABSENTEISMO_BACKUP_PAGINAS", 1024))
+PAUSA_PASSO_MS = max(0, _env_int("ABSENTEISMO_BACKUP_PAUSA_MS", 5))
+MAX_REINICIOS = 3
+
+SUFIXO_COMPLETO = ".db.gz"
+SUFIXO_INCREMENTAL = ".delta.gz"
+SUFIXO_PAGINAS = ".pages"
+_SUFIXOS_BACKUP = (".db", SUFIXO_COMPLETO, SUFIXO_INCREMENTAL)  # .db: backups antigos (cópia do arquivo)
+_HASH_BYTES = 16
+_PAGINA = struct.Struct(">I")
+
+
+class _BackupReiniciado(Exception):
+    """Cópia em passos recomeçou vezes demais por causa de escritas concorrentes"""
+
+
+def _eh_backup(nome: str) -> bool:
+    return 'backup' in nome and nome.endswith(_SUFIXOS_BACKUP)
+
+
+def _tipo_backup(nome: str) -> str:
+    if nome.endswith(SUFIXO_INCREMENTAL):
+        return "incremental"
+    if nome.endswith(SUFIXO_COMPLETO):
+        return "completo"
+    return "arquivo"
+
+
+def _tamanho_pagina(caminho: str) -> int:
+    """page_size do cabeçalho do arquivo SQLite (offset 16, 1 = 65536)"""
+    with open(caminho, "rb") as f:
+        f.seek(16)
+        valor = struct.unpack(">H", f.read(2))[0]
+    return 65536 if valor == 1 else valor
+
+
+def _hash_pagina(pagina: bytes) -> bytes:
+    return hashlib.blake2b(pagina, digest_size=_HASH_BYTES).digest()
+
+
+def _cabecalho_incremental(caminho: str) -> dict:
+    with gzip.open(caminho, "rb") as f:
+        return json.loads(f.readline())
+
+
 class BackupService:
     """Serviço de backup automático"""
-    
-    def __init__(self, db_path: str, backup_dir: str = "backups"):
+
+    def __init__(self, db_path: str, backup_dir: Optional[str] = None):
+        backup_dir = backup_dir or (os.environ.get("ABSENTEISMO_BACKUP_DIR") or "").strip() or "backups"
         self.db_path = db_path
         self.backup_dir = backup_dir
         self.retention_days = 7  # Mantém backups dos últimos 7 dias
         self.running = False
         self.thread = None
-        
+        # Métricas das últimas execuções (mais recente no fim)
+        self.historico: deque = deque(maxlen=50)
+
         # Cria diretório de backups
         os.makedirs(backup_dir, exist_ok=True)
-    
-    def create_backup(self, prefix: str = "auto") -> Optional[str]:
+
+    def create_backup(self, prefix: str = "auto", incremental: bool = False, verificar: bool = True) -> Optional[str]:
         """
         Cria backup do banco de dados
-        
+
         Args:
             prefix: Prefixo do backup (auto, manual, etc.)
-            
+            incremental: Grava só as páginas alteradas desde o último completo
+                (sem completo compatível, faz um completo)
+            verificar: Restaura e roda quick_check no backup gravado
+
         Returns:
             Caminho do backup criado ou None se falhar
         """
@@ -44,141 +124,376 @@ class BackupService:
             if logger:
                 logger.warning(f"Banco de dados não encontrado: {self.db_path}")
             return None
-        
+
+        backup_path = None
         try:
-            # Nome do backup com timestamp
+            inicio = time.perf_counter()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"{prefix}_absenteismo_backup_{timestamp}.db"
+            base = self._ultimo_completo() if incremental else None
+            sufixo = SUFIXO_INCREMENTAL if base else SUFIXO_COMPLETO
+            backup_filename = f"{prefix}_absenteismo_backup_{timestamp}{sufixo}"
             backup_path = os.path.join(self.backup_dir, backup_filename)
-            
-            # Copia o banco
-            shutil.copy2(self.db_path, backup_path)
-            
-            # Tamanho do backup
-            size_mb = os.path.getsize(backup_path) / (1024 * 1024)
-            
+
+            # Snapshot consistente via API de backup, num arquivo temporário
+            snapshot = os.path.join(self.backup_dir, f".{backup_filename}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                copia = self._copiar_online(snapshot)
+                tamanho_banco = os.path.getsize(snapshot)
+                execucao = None
+                if base:
+                    execucao = self._gravar_incremental(snapshot, backup_path, base)
+                if execucao is None:
+                    if base:  # page_size mudou (VACUUM): o incremental não se aplica
+                        backup_path = backup_path[:-len(SUFIXO_INCREMENTAL)] + SUFIXO_COMPLETO
+                        backup_filename = os.path.basename(backup_path)
+                    execucao = self._gravar_completo(snapshot, backup_path)
+                execucao.update(copia)
+            finally:
+                if os.path.exists(snapshot):
+                    os.remove(snapshot)
+            duracao_copia = time.perf_counter() - inicio
+
+            verificado = None
+            if verificar:
+                verificado = self.verificar_backup(backup_path)
+                if not verificado:
+                    raise RuntimeError(f"Backup {backup_filename} não passou no quick_check")
+
+            duracao = time.perf_counter() - inicio
+            tamanho = os.path.getsize(backup_path)
+            execucao.update({
+                "filename": backup_filename,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "duracao_s": round(duracao, 3),
+                "tamanho_banco_mb": round(tamanho_banco / (1024 * 1024), 2),
+                "tamanho_mb": round(tamanho / (1024 * 1024), 2),
+                # Vazão da cópia (banco lido por segundo), sem contar a verificação
+                "vazao_mb_s": round(tamanho_banco / (1024 * 1024) / duracao_copia, 2) if duracao_copia > 0 else None,
+                "verificado": verificado,
+            })
+            self.historico.append(execucao)
+
             if logger:
-                logger.info(f"Backup criado: {backup_filename} ({size_mb:.2f} MB)")
-            
+                logger.info(
+                    f"Backup {execucao['tipo']} criado: {backup_filename} ({execucao['tamanho_mb']:.2f} MB de "
+                    f"{execucao['tamanho_banco_mb']:.2f} MB, {duracao:.1f}s, {execucao['vazao_mb_s']} MB/s)"
+                )
+
             # Limpa backups antigos
             self.clean_old_backups()
-            
+
             return backup_path
-            
+
         except Exception as e:
             if logger:
                 logger.error(f"Erro ao criar backup: {e}")
-            
+            if backup_path:
+                for resto in (backup_path, backup_path + ".parcial", backup_path + ".parcial" + SUFIXO_PAGINAS):
+                    if os.path.exists(resto):
+                        self._remover_backup(resto)
+
             # Notifica falha (opcional)
             try:
                 from .notification_service import notification_service
                 notification_service.notify_backup_failed(str(e))
             except:
                 pass
-            
+
             return None
-    
+
+    @property
+    def ultimo_backup(self) -> Optional[Dict]:
+        """Métricas da última execução bem-sucedida"""
+        return self.historico[-1] if self.historico else None
+
+    def _copiar_online(self, destino: str) -> Dict:
+        """
+        Copia o banco com a API de backup do SQLite, em passos, pausando entre eles.
+
+        Uma escrita de outra conexão faz a cópia recomeçar no passo seguinte; depois de
+        MAX_REINICIOS recomeços (escrita contínua), a cópia é refeita num passo só: em
+        modo WAL esse passo lê um snapshot sem bloquear os escritores.
+        """
+        progresso = {"restantes": None, "reinicios": 0}
+
+        def _pausa_entre_passos(status, restantes, total):
+            anterior = progresso["restantes"]
+            progresso["restantes"] = restantes
+            if anterior is not None and restantes > anterior:
+                progresso["reinicios"] += 1
+                if progresso["reinicios"] > MAX_REINICIOS:
+                    raise _BackupReiniciado()
+            if restantes and PAUSA_PASSO_MS:
+                time.sleep(PAUSA_PASSO_MS / 1000)
+
+        origem = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn_destino = sqlite3.connect(destino)
+            try:
+                passo_unico = False
+                try:
+                    origem.backup(conn_destino, pages=PAGINAS_POR_PASSO, progress=_pausa_entre_passos)
+                except _BackupReiniciado:
+                    passo_unico = True
+                    origem.backup(conn_destino)
+                # Cópia fora do modo WAL: abre somente leitura sem -wal/-shm
+                conn_destino.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                conn_destino.close()
+        finally:
+            origem.close()
+        return {"reinicios": min(progresso["reinicios"], MAX_REINICIOS), "passo_unico": passo_unico}
+
+    def _gravar_completo(self, snapshot: str, destino: str) -> Dict:
+        """Comprime o snapshot em fluxo e grava o hash de cada página (.pages)"""
+        tamanho_pagina = _tamanho_pagina(snapshot)
+        hashes = bytearray(struct.pack(">I", tamanho_pagina))
+        paginas = 0
+        parcial = destino + ".parcial"
+        with open(snapshot, "rb") as origem, gzip.open(parcial, "wb") as saida:
+            while True:
+                pagina = origem.read(tamanho_pagina)
+                if not pagina:
+                    break
+                saida.write(pagina)
+                hashes += _hash_pagina(pagina)
+                paginas += 1
+        with open(parcial + SUFIXO_PAGINAS, "wb") as f:
+            f.write(hashes)
+        os.replace(parcial + SUFIXO_PAGINAS, destino + SUFIXO_PAGINAS)
+        os.replace(parcial, destino)
+        return {"tipo": "completo", "base": None, "paginas": paginas, "paginas_gravadas": paginas}
+
+    def _gravar_incremental(self, snapshot: str, destino: str, base: str) -> Optional[Dict]:
+        """
+        Grava as páginas que diferem do completo `base`; None se o page_size mudou.
+        Formato: linha JSON de cabeçalho + registros (número da página, 4 bytes) + página.
+        """
+        with open(base + SUFIXO_PAGINAS, "rb") as f:
+            hashes_base = f.read()
+        tamanho_pagina = _tamanho_pagina(snapshot)
+        if struct.unpack(">I", hashes_base[:4])[0] != tamanho_pagina:
+            return None
+        hashes_base = memoryview(hashes_base)[4:]
+        paginas_base = len(hashes_base) // _HASH_BYTES
+
+        paginas = os.path.getsize(snapshot) // tamanho_pagina
+        cabecalho = {
+            "formato": 1,
+            "base": os.path.basename(base),
+            "tamanho_pagina": tamanho_pagina,
+            "paginas": paginas,
+        }
+        gravadas = 0
+        parcial = destino + ".parcial"
+        with open(snapshot, "rb") as origem, gzip.open(parcial, "wb") as saida:
+            saida.write(json.dumps(cabecalho).encode() + b"\n")
+            for numero in range(1, paginas + 1):
+                pagina = origem.read(tamanho_pagina)
+                inicio_hash = (numero - 1) * _HASH_BYTES
+                if numero <= paginas_base and hashes_base[inicio_hash:inicio_hash + _HASH_BYTES] == _hash_pagina(pagina):
+                    continue
+                saida.write(_PAGINA.pack(numero))
+                saida.write(pagina)
+                gravadas += 1
+        os.replace(parcial, destino)
+        return {"tipo": "incremental", "base": os.path.basename(base), "paginas": paginas, "paginas_gravadas": gravadas}
+
+    def _ultimo_completo(self) -> Optional[str]:
+        """Completo mais recente com hashes de página (base dos incrementais)"""
+        candidatos = [
+            os.path.join(self.backup_dir, f) for f in os.listdir(self.backup_dir)
+            if _eh_backup(f) and f.endswith(SUFIXO_COMPLETO)
+            and os.path.exists(os.path.join(self.backup_dir, f + SUFIXO_PAGINAS))
+        ]
+        return max(candidatos, key=os.path.getmtime) if candidatos else None
+
+    def restaurar_backup(self, arquivo: str, destino: str) -> str:
+        """
+        Reconstrói o banco de um backup em `destino` (não substitui o banco em uso)
+
+        Args:
+            arquivo: Caminho (ou nome, dentro de backup_dir) do backup
+            destino: Arquivo .db a gerar
+        """
+        if not os.path.exists(arquivo):
+            arquivo = os.path.join(self.backup_dir, arquivo)
+        if arquivo.endswith(SUFIXO_INCREMENTAL):
+            with gzip.open(arquivo, "rb") as f:
+                cabecalho = json.loads(f.readline())
+                self.restaurar_backup(os.path.join(self.backup_dir, cabecalho["base"]), destino)
+                tamanho_pagina = cabecalho["tamanho_pagina"]
+                with open(destino, "r+b") as saida:
+                    while True:
+                        numero = f.read(_PAGINA.size)
+                        if not numero:
+                            break
+                        saida.seek((_PAGINA.unpack(numero)[0] - 1) * tamanho_pagina)
+                        saida.write(f.read(tamanho_pagina))
+                    saida.truncate(cabecalho["paginas"] * tamanho_pagina)
+        elif arquivo.endswith(SUFIXO_COMPLETO):
+            with gzip.open(arquivo, "rb") as f, open(destino, "wb") as saida:
+                shutil.copyfileobj(f, saida, 1024 * 1024)
+        else:
+            shutil.copyfile(arquivo, destino)
+        return destino
+
+    def verificar_backup(self, arquivo: str) -> bool:
+        """Restaura num temporário, abre somente leitura e roda PRAGMA quick_check"""
+        temporario = os.path.join(self.backup_dir, f".verificacao_{uuid.uuid4().hex[:8]}.db")
+        try:
+            self.restaurar_backup(arquivo, temporario)
+            conn = sqlite3.connect(f"{Path(temporario).resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                resultado = conn.execute("PRAGMA quick_check").fetchone()
+            finally:
+                conn.close()
+            return bool(resultado) and resultado[0] == "ok"
+        except Exception as e:
+            if logger:
+                logger.error(f"Verificação do backup {arquivo} falhou: {e}")
+            return False
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def _remover_backup(self, file_path: str):
+        os.remove(file_path)
+        if os.path.exists(file_path + SUFIXO_PAGINAS):
+            os.remove(file_path + SUFIXO_PAGINAS)
+
     def clean_old_backups(self):
-        """Remove backups mais antigos que retention_days"""
+        """Remove backups mais antigos que retention_days (e incrementais sem o completo base)"""
         try:
             cutoff_date = datetime.now() - timedelta(days=self.retention_days)
-            
+
             for file in os.listdir(self.backup_dir):
-                if file.endswith('.db') and 'backup' in file:
+                if _eh_backup(file):
                     file_path = os.path.join(self.backup_dir, file)
                     file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    
+
                     if file_time < cutoff_date:
                         try:
-                            os.remove(file_path)
+                            self._remover_backup(file_path)
                             if logger:
                                 logger.info(f"Backup antigo removido: {file}")
                         except Exception as e:
                             if logger:
                                 logger.warning(f"Erro ao remover backup antigo {file}: {e}")
+
+            for file in os.listdir(self.backup_dir):
+                if file.endswith(SUFIXO_PAGINAS) and not os.path.exists(
+                        os.path.join(self.backup_dir, file[:-len(SUFIXO_PAGINAS)])):
+                    os.remove(os.path.join(self.backup_dir, file))
+                elif _eh_backup(file) and file.endswith(SUFIXO_INCREMENTAL):
+                    file_path = os.path.join(self.backup_dir, file)
+                    try:
+                        base = _cabecalho_incremental(file_path)["base"]
+                        if not os.path.exists(os.path.join(self.backup_dir, base)):
+                            os.remove(file_path)
+                            if logger:
+                                logger.info(f"Backup incremental sem o completo base removido: {file}")
+                    except Exception as e:
+                        if logger:
+                            logger.warning(f"Erro ao verificar backup incremental {file}: {e}")
         except Exception as e:
             if logger:
                 logger.error(f"Erro ao limpar backups antigos: {e}")
-    
-    def start_auto_backup(self, interval_hours: int = 24):
+
+    def start_auto_backup(self, interval_hours: int = 24, incremental_hours: Optional[float] = None):
         """
         Inicia backup automático em background
-        
+
         Args:
-            interval_hours: Intervalo entre backups em horas (padrão: 24h)
+            interval_hours: Intervalo entre backups completos em horas (padrão: 24h)
+            incremental_hours: Se definido, faz backups incrementais nesse intervalo
+                entre os completos
         """
         if self.running:
             if logger:
                 logger.warning("Backup automático já está rodando")
             return
-        
+
         self.running = True
-        
+
         def backup_loop():
+            ultimo_completo = None
             while self.running:
                 try:
+                    agora = time.monotonic()
+                    completo = (incremental_hours is None or ultimo_completo is None
+                                or agora - ultimo_completo >= interval_hours * 3600)
                     # Cria backup
-                    self.create_backup(prefix="auto")
-                    
+                    if self.create_backup(prefix="auto", incremental=not completo) and completo:
+                        ultimo_completo = agora
+
                     # Aguarda próximo backup
-                    time.sleep(interval_hours * 3600)
+                    time.sleep((interval_hours if incremental_hours is None else incremental_hours) * 3600)
                 except Exception as e:
                     if logger:
                         logger.error(f"Erro no loop de backup: {e}")
                     # Aguarda 1 hora antes de tentar novamente
                     time.sleep(3600)
-        
+
         self.thread = threading.Thread(target=backup_loop, daemon=True)
         self.thread.start()
-        
+
         if logger:
-            logger.info(f"Backup automático iniciado (intervalo: {interval_hours}h)")
-    
+            incremental = f", incrementais a cada {incremental_hours}h" if incremental_hours else ""
+            logger.info(f"Backup automático iniciado (intervalo: {interval_hours}h{incremental})")
+
     def stop_auto_backup(self):
         """Para backup automático"""
         self.running = False
         if logger:
             logger.info("Backup automático parado")
-    
+
     def get_backup_list(self) -> list:
         """Retorna lista de backups disponíveis"""
         backups = []
         try:
             for file in os.listdir(self.backup_dir):
-                if file.endswith('.db') and 'backup' in file:
+                if _eh_backup(file):
                     file_path = os.path.join(self.backup_dir, file)
                     size_mb = os.path.getsize(file_path) / (1024 * 1024)
                     modified = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    
+
                     backups.append({
                         "filename": file,
+                        "tipo": _tipo_backup(file),
                         "size_mb": round(size_mb, 2),
                         "created": modified.isoformat(),
                         "path": file_path
                     })
-            
+
             # Ordena por data (mais recente primeiro)
             backups.sort(key=lambda x: x["created"], reverse=True)
-            
+
         except Exception as e:
             if logger:
                 logger.error(f"Erro ao listar backups: {e}")
-        
+
         return backups
 
 # Instância global (será inicializada no startup)
 backup_service: Optional[BackupService] = None
 
 def init_backup_service(db_path: str):
-    """Inicializa serviço de backup"""
+    """
+    Inicializa serviço de backup
+
+    ABSENTEISMO_BACKUP_INCREMENTAL_HORAS liga backups incrementais nesse intervalo
+    entre os completos diários (padrão: só completos).
+    """
     global backup_service
     try:
         backup_service = BackupService(db_path)
+        incremental = (os.environ.get("ABSENTEISMO_BACKUP_INCREMENTAL_HORAS") or "").strip()
         # Inicia backup automático diário
-        backup_service.start_auto_backup(interval_hours=24)
+        backup_service.start_auto_backup(interval_hours=24,
+                                         incremental_hours=float(incremental) if incremental else None)
         return backup_service
     except Exception as e:
         if logger:
             logger.error(f"Erro ao inicializar backup service: {e}")
         return None
-
@@ -0,0 +1,424 @@
+"""
+Cache compartilhado entre os workers do gunicorn (mesmo host), em um arquivo SQLite.
+
+Com vários workers uvicorn cada processo tinha o próprio CacheService e a
+invalidação de um worker não chegava aos outros. Este backend implementa a mesma
+interface do CacheService sobre um arquivo SQLite em WAL que todos os workers abrem.
+
+O arquivo guarda só gerações e valores operacionais (chaves com prefixo em
+PREFIXOS_NO_ARQUIVO, ex.: notificações), serializados em JSON. Respostas com dados
+de trabalhadores (nomes, CIDs, dados de saúde) e o usuário autenticado ficam no
+CacheService em memória de cada worker, com chaves que incluem as gerações do
+arquivo: a invalidação continua valendo para todos, sem dados pessoais em disco e
+sem desserializar pickle de um arquivo gravável por outros processos.
+
+- cache_entradas: chave -> valor (JSON), tamanho, expiração e último acesso
+  (relógio de parede, comum aos processos). LRU aproximado: o acesso só é
+  regravado depois de TOQUE_SEGUNDOS, para que leituras não virem escritas.
+- cache_totais: contagem e bytes mantidos por triggers; checar os limites é O(1).
+- cache_versoes: geração de cada namespace. invalidate_namespace é um único
+  UPSERT atômico e todos os workers enxergam a nova geração na leitura seguinte
+  (a "difusão" da invalidação é o próprio arquivo).
+- update(): leitura-alteração-escrita dentro de BEGIN IMMEDIATE, atômica entre processos.
+
+Se o arquivo falhar (disco, travamento além do busy timeout), as operações caem
+no CacheService em memória do processo por REABRIR_APOS segundos; invalidações
+feitas nesse intervalo são reaplicadas no arquivo quando ele volta, para que
+nenhum worker sirva entradas antigas de um cliente alterado.
+
+Ativado por ABSENTEISMO_CACHE_BACKEND=sqlite (ver cache_service.criar_cache_service).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Importa logger (com fallback)
+try:
+    from .logger import get_logger
+    logger = get_logger("cache")
+except ImportError:
+    logger = None
+
+TOQUE_SEGUNDOS = 5.0
+REABRIR_APOS = 5.0
+# Únicas chaves cujos valores vão para o arquivo; as demais ficam na memória do worker
+PREFIXOS_NO_ARQUIVO: Tuple[str, ...] = ("notifications:",)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cache_entradas (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    expira_em REAL NOT NULL,
+    acesso_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entradas_acesso ON cache_entradas (acesso_em);
+CREATE INDEX IF NOT EXISTS ix_cache_entradas_expira ON cache_entradas (expira_em);
+CREATE TABLE IF NOT EXISTS cache_versoes (
+    namespace TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache_totais (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entradas INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totais (id, entradas, bytes) VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS tr_cache_entradas_ins AFTER INSERT ON cache_entradas BEGIN
+    UPDATE cache_totais SET entradas = entradas + 1, bytes = bytes + NEW.tamanho WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_cache_entradas_del AFTER DELETE ON cache_entradas BEGIN
+    UPDATE cache_totais SET entradas = entradas - 1, bytes = bytes - OLD.tamanho WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_cache_entradas_upd AFTER UPDATE OF tamanho ON cache_entradas BEGIN
+    UPDATE cache_totais SET bytes = bytes - OLD.tamanho + NEW.tamanho WHERE id = 1;
+END;
+"""
+
+
+def _nome_namespace(namespace: Any) -> str:
+    return json.dumps(namespace, default=str)
+
+
+def _serializar(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class SQLiteCacheCompartilhado:
+    """Backend de cache em arquivo SQLite, visível a todos os processos do host"""
+
+    compartilhado = True
+
+    def __init__(
+        self,
+        caminho: str,
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: int = 60,
+        intervalo_limpeza: int = 60,
+        fallback=None,
+        timeout: float = 2.0,
+        prefixos_no_arquivo: Tuple[str, ...] = PREFIXOS_NO_ARQUIVO,
+    ):
+        from .cache_service import CacheService
+
+        self.caminho = caminho
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.intervalo_limpeza = intervalo_limpeza
+        self.timeout = timeout
+        self.prefixos_no_arquivo = tuple(prefixos_no_arquivo)
+        self.fallback = fallback or CacheService(max_entries, max_bytes, default_ttl, intervalo_limpeza)
+        # Contadores deste processo (os totais de entradas/bytes vêm do arquivo)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._indisponivel_ate = 0.0
+        self._pendentes: set = set()
+        self._proxima_limpeza = time.time() + intervalo_limpeza
+
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        conn = self._conexao()
+        conn.executescript(_ESQUEMA)
+        # Entradas em pickle de versões anteriores nunca são desserializadas
+        conn.execute("DELETE FROM cache_entradas WHERE typeof(valor) = 'blob'")
+
+    # ------------------------------------------------------------------
+    # Conexão e fallback
+    # ------------------------------------------------------------------
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Processo filho (fork) não reaproveita a conexão do pai
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _fechar_conexao(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @property
+    def disponivel(self) -> bool:
+        return time.time() >= self._indisponivel_ate
+
+    def _executar(self, operacao: Callable, alternativa: Callable):
+        """Roda a operação no arquivo; em erro do SQLite usa o LRU em memória por REABRIR_APOS s"""
+        if not self.disponivel:
+            return alternativa()
+        try:
+            if self._pendentes:
+                self._reaplicar_pendentes()
+            return operacao(self._conexao())
+        except sqlite3.Error as e:
+            with self._lock:
+                self.falhas += 1
+                self._indisponivel_ate = time.time() + REABRIR_APOS
+            self._fechar_conexao()
+            if logger:
+                logger.warning(f"Cache compartilhado indisponível ({self.caminho}): {e}; usando memória local")
+            return alternativa()
+
+    def _reaplicar_pendentes(self):
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, set()
+        try:
+            conn = self._conexao()
+            for nome in pendentes:
+                self._incrementar_versao(conn, nome)
+        except sqlite3.Error:
+            with self._lock:
+                self._pendentes |= pendentes
+            raise
+
+    # ------------------------------------------------------------------
+    # Interface do CacheService
+    # ------------------------------------------------------------------
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def _generate_key(self, prefix: str, *args, **kwargs) -> str:
+        return self.fallback._generate_key(prefix, *args, **kwargs)
+
+    def _no_arquivo(self, key: str) -> bool:
+        return key.startswith(self.prefixos_no_arquivo)
+
+    def geracao(self, namespace: Any) -> int:
+        def _ler(conn):
+            row = conn.execute(
+                "SELECT versao FROM cache_versoes WHERE namespace = ?", (_nome_namespace(namespace),)
+            ).fetchone()
+            return row[0] if row else 0
+
+        return self._executar(_ler, lambda: self.fallback.geracao(namespace))
+
+    def invalidate_namespace(self, namespace: Any):
+        nome = _nome_namespace(namespace)
+        with self._lock:
+            self.invalidations += 1
+
+        def _pendente():
+            # Reaplicada no arquivo quando ele voltar; enquanto isso vale a geração local
+            with self._lock:
+                self._pendentes.add(nome)
+            self.fallback.invalidate_namespace(namespace)
+
+        self._executar(lambda conn: self._incrementar_versao(conn, nome), _pendente)
+
+    @staticmethod
+    def _incrementar_versao(conn: sqlite3.Connection, nome: str):
+        conn.execute(
+            "INSERT INTO cache_versoes (namespace, versao) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET versao = versao + 1",
+            (nome,),
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self._no_arquivo(key):
+            return self.fallback.get(key)
+
+        def _ler(conn):
+            agora = time.time()
+            self._limpeza_periodica(conn, agora)
+            row = conn.execute(
+                "SELECT valor, expira_em, acesso_em FROM cache_entradas WHERE chave = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._contar("misses")
+                return None
+            dados, expira_em, acesso_em = row
+            if agora >= expira_em:
+                conn.execute("DELETE FROM cache_entradas WHERE chave = ? AND expira_em <= ?", (key, agora))
+                self._contar("expirations", "misses")
+                return None
+            if agora - acesso_em >= TOQUE_SEGUNDOS:
+                conn.execute("UPDATE cache_entradas SET acesso_em = ? WHERE chave = ?", (agora, key))
+            self._contar("hits")
+            return json.loads(dados)
+
+        return self._executar(_ler, lambda: self.fallback.get(key))
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        if not self.enabled:
+            return
+        if not self._no_arquivo(key):
+            self.fallback.set(key, value, ttl)
+            return
+        try:
+            dados = _serializar(value)
+        except (TypeError, ValueError) as e:
+            if logger:
+                logger.warning(f"Valor não armazenado no cache ({key}): {e}")
+            return
+        if len(dados.encode()) > self.max_bytes:
+            return
+        ttl = ttl or self.default_ttl
+
+        def _gravar(conn):
+            agora = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._gravar_entrada(conn, key, dados, agora + ttl, agora)
+                self._aplicar_limites(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        self._executar(_gravar, lambda: self.fallback.set(key, value, ttl))
+
+    def update(self, key: str, func: Callable[[Any], Any], ttl: Optional[int] = None) -> Any:
+        """Grava func(valor atual ou None) de forma atômica entre processos; retorna o novo valor"""
+        ttl = ttl or self.default_ttl
+        if not self._no_arquivo(key):
+            return self.fallback.update(key, func, ttl)
+
+        def _alterar(conn):
+            agora = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT valor, expira_em FROM cache_entradas WHERE chave = ?", (key,)
+                ).fetchone()
+                atual = json.loads(row[0]) if row and row[1] > agora else None
+                novo = func(atual)
+                try:
+                    dados = _serializar(novo)
+                except (TypeError, ValueError) as e:
+                    if logger:
+                        logger.warning(f"Valor não armazenado no cache ({key}): {e}")
+                    dados = None
+                if dados is not None and len(dados.encode()) <= self.max_bytes:
+                    self._gravar_entrada(conn, key, dados, agora + ttl, agora)
+                    self._aplicar_limites(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return novo
+
+        return self._executar(_alterar, lambda: self.fallback.update(key, func, ttl))
+
+    def get_or_set(self, key: str, func: Callable, ttl: Optional[int] = None, *args, **kwargs) -> Any:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = func(*args, **kwargs)
+        self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key: str):
+        self.fallback.invalidate(key)
+        self._executar(lambda conn: conn.execute("DELETE FROM cache_entradas WHERE chave = ?", (key,)),
+                       lambda: None)
+
+    def invalidate_prefix(self, prefix: str):
+        self.fallback.invalidate_prefix(prefix)
+        self._executar(
+            lambda conn: conn.execute(
+                "DELETE FROM cache_entradas WHERE chave >= ? AND chave < ?", (prefix, prefix + "\uffff")
+            ),
+            lambda: None,
+        )
+
+    def clear(self):
+        self.fallback.clear()
+        self._executar(lambda conn: conn.execute("DELETE FROM cache_entradas"), lambda: None)
+
+    def purge_expired(self) -> int:
+        def _purgar(conn):
+            agora = time.time()
+            self._proxima_limpeza = agora + self.intervalo_limpeza
+            removidas = conn.execute("DELETE FROM cache_entradas WHERE expira_em <= ?", (agora,)).rowcount
+            self._contar("expirations", n=removidas)
+            return removidas
+
+        return self._executar(_purgar, self.fallback.purge_expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        def _totais(conn):
+            return conn.execute("SELECT entradas, bytes FROM cache_totais WHERE id = 1").fetchone()
+
+        entradas, total_bytes = self._executar(_totais, lambda: (None, None)) or (None, None)
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "backend": "sqlite",
+                "path": self.caminho,
+                "available": self.disponivel,
+                "failures": self.falhas,
+                "total_entries": entradas,
+                "bytes": total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "fallback": self.fallback.get_stats(),
+            }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _contar(self, *nomes: str, n: int = 1):
+        with self._lock:
+            for nome in nomes:
+                setattr(self, nome, getattr(self, nome) + n)
+
+    @staticmethod
+    def _gravar_entrada(conn, key: str, dados: str, expira_em: float, agora: float):
+        conn.execute(
+            "INSERT INTO cache_entradas (chave, valor, tamanho, expira_em, acesso_em) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor, tamanho = excluded.tamanho, "
+            "expira_em = excluded.expira_em, acesso_em = excluded.acesso_em",
+            (key, dados, len(dados.encode()), expira_em, agora),
+        )
+
+    def _aplicar_limites(self, conn):
+        """Remove as entradas de acesso mais antigo até caber em max_entries e max_bytes"""
+        while True:
+            entradas, total_bytes = conn.execute(
+                "SELECT entradas, bytes FROM cache_totais WHERE id = 1"
+            ).fetchone()
+            if entradas <= self.max_entries and total_bytes <= self.max_bytes:
+                return
+            removidas = conn.execute(
+                "DELETE FROM cache_entradas WHERE chave IN "
+                "(SELECT chave FROM cache_entradas ORDER BY acesso_em LIMIT ?)",
+                (max(entradas - self.max_entries, 1),),
+            ).rowcount
+            self._contar("evictions", n=removidas)
+            if not removidas:
+                return
+
+    def _limpeza_periodica(self, conn, agora: float):
+        if agora >= self._proxima_limpeza:
+            self._proxima_limpeza = agora + self.intervalo_limpeza
+            removidas = conn.execute("DELETE FROM cache_entradas WHERE expira_em <= ?", (agora,)).rowcount
+            self._contar("expirations", n=removidas)
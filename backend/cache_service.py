@@ -1,11 +1,45 @@
 """
 Serviço de Cache Inteligente
-Cache de dados frequentes com invalidação automática
+Cache LRU em memória, limitado por entradas e bytes, com TTL e invalidação por cliente
+
+- LRU: OrderedDict; ao passar de max_entries ou max_bytes, sai a entrada menos usada.
+- Expiração preguiçosa (na leitura) e periódica (varredura a cada intervalo_limpeza).
+- Valores guardados serializados (pickle): o tamanho em bytes é exato e cada leitura
+  devolve uma cópia, então o chamador pode alterar o resultado sem sujar o cache.
+- Invalidação O(1) por cliente via gerações: a chave inclui a geração do cliente;
+  invalidar só incrementa a geração e as entradas antigas saem pelo LRU/TTL.
+
+As leituras de Analytics, InsightsEngine, MetricService e DashboardAggregator usam
+@cache_por_cliente. A geração do cliente sobe no commit de qualquer sessão que
+alterou dados dele (RollupService marca o cliente; os eventos de flush abaixo
+cobrem alterações ORM em Upload/Atestado/Produtividade/Client feitas fora dele).
+
+Na mesma transação, antes do commit, clients.data_version dos clientes marcados
+é incrementado: é a versão persistida que os ETags HTTP (http_cache.py) usam. Nas
+rotas com ETag ela também entra na chave do cache, para que alterações feitas por
+outro worker (cujas gerações este processo não vê) troquem a chave junto com o ETag.
+
+Backends: CacheService (memória do processo, padrão) ou SQLiteCacheCompartilhado
+(cache_compartilhado.py, um arquivo visto por todos os workers do gunicorn), escolhido
+por ABSENTEISMO_CACHE_BACKEND. Os dois têm a mesma interface (get/set/update/
+geracao/invalidate_namespace/...). No compartilhado, as gerações ficam no arquivo e os
+valores das leituras de clientes ficam no CacheService em memória de cada worker.
 """
-from typing import Any, Optional, Dict, Callable
-from datetime import datetime, timedelta
+from typing import Any, Optional, Dict, Callable, Tuple
+from collections import OrderedDict
+import functools
 import hashlib
+import inspect
 import json
+import os
+import pickle
+import threading
+import time
+import uuid
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
 # Importa logger (com fallback)
 try:
@@ -14,13 +48,50 @@ try:
 except ImportError:
     logger = None
 
+# Chave em Session.info com os clientes alterados na transação (None = todos do banco)
+_INFO_ALTERADOS = "cache_clientes_alterados"
+# Chave em Session.info com o clients.data_version lido com o ETag na transação, por cliente
+_INFO_VERSOES = "cache_versoes_clientes"
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    return int(raw) if raw else default
+
+
 class CacheService:
-    """Serviço de cache com TTL"""
-    
-    def __init__(self):
-        self.cache: Dict[str, Dict[str, Any]] = {}
-        self.default_ttl = 300  # 5 minutos padrão
-    
+    """Cache LRU com TTL, limite de entradas/bytes e gerações por namespace"""
+
+    # Visível só a este processo (ver SQLiteCacheCompartilhado)
+    compartilhado = False
+
+    def __init__(
+        self,
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: int = 60,
+        intervalo_limpeza: int = 60,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.intervalo_limpeza = intervalo_limpeza
+        # chave -> (valor serializado, expira_em monotônico)
+        self.cache: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.bytes = 0
+        self.geracoes: Dict[Any, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.RLock()
+        self._proxima_limpeza = time.monotonic() + intervalo_limpeza
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Gera chave de cache única"""
         key_data = {
@@ -30,47 +101,80 @@ class CacheService:
         }
         key_str = json.dumps(key_data, sort_keys=True, default=str)
         return f"{prefix}:{hashlib.md5(key_str.encode()).hexdigest()}"
-    
+
+    def geracao(self, namespace: Any) -> int:
+        """Geração atual do namespace (entra na chave das entradas dele)"""
+        return self.geracoes.get(namespace, 0)
+
+    def invalidate_namespace(self, namespace: Any):
+        """Invalida todas as entradas do namespace em O(1) (nova geração)"""
+        with self._lock:
+            self.geracoes[namespace] = self.geracoes.get(namespace, 0) + 1
+            self.invalidations += 1
+
     def get(self, key: str) -> Optional[Any]:
         """
         Obtém valor do cache
-        
+
         Args:
             key: Chave do cache
-            
+
         Returns:
-            Valor ou None se não existir/expirado
+            Valor (cópia) ou None se não existir/expirado
         """
-        if key not in self.cache:
-            return None
-        
-        entry = self.cache[key]
-        
-        # Verifica expiração
-        if datetime.now() > entry["expires_at"]:
-            del self.cache[key]
-            return None
-        
-        return entry["value"]
-    
+        agora = time.monotonic()
+        with self._lock:
+            self._limpeza_periodica(agora)
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Verifica expiração
+            if agora >= entry[1]:
+                self._remover(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.cache.move_to_end(key)
+            self.hits += 1
+            dados = entry[0]
+        return pickle.loads(dados)
+
     def set(self, key: str, value: Any, ttl: Optional[int] = None):
         """
         Define valor no cache
-        
+
         Args:
             key: Chave do cache
-            value: Valor a armazenar
+            value: Valor a armazenar (precisa ser serializável com pickle)
             ttl: Time to live em segundos (None = default)
         """
+        if not self.enabled:
+            return
+        try:
+            dados = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            if logger:
+                logger.warning(f"Valor não armazenado no cache ({key}): {e}")
+            return
+        if len(dados) > self.max_bytes:
+            return
+
         ttl = ttl or self.default_ttl
-        expires_at = datetime.now() + timedelta(seconds=ttl)
-        
-        self.cache[key] = {
-            "value": value,
-            "expires_at": expires_at,
-            "created_at": datetime.now().isoformat()
-        }
-    
+        agora = time.monotonic()
+        with self._lock:
+            self._limpeza_periodica(agora)
+            if key in self.cache:
+                self._remover(key)
+            self.cache[key] = (dados, agora + ttl)
+            self.bytes += len(dados)
+            while len(self.cache) > self.max_entries or self.bytes > self.max_bytes:
+                _, (antigos, _) = self.cache.popitem(last=False)
+                self.bytes -= len(antigos)
+                self.evictions += 1
+
     def get_or_set(
         self,
         key: str,
@@ -81,13 +185,13 @@ class CacheService:
     ) -> Any:
         """
         Obtém do cache ou executa função e armazena
-        
+
         Args:
             key: Chave do cache
             func: Função a executar se não estiver em cache
             ttl: Time to live
             *args, **kwargs: Argumentos para a função
-            
+
         Returns:
             Valor do cache ou resultado da função
         """
@@ -95,64 +199,312 @@ class CacheService:
         cached = self.get(key)
         if cached is not None:
             return cached
-        
+
         # Executa função
         value = func(*args, **kwargs)
-        
+
         # Armazena no cache
         self.set(key, value, ttl)
-        
+
         return value
-    
+
+    def update(self, key: str, func: Callable[[Any], Any], ttl: Optional[int] = None) -> Any:
+        """Grava func(valor atual ou None) de forma atômica; retorna o novo valor"""
+        with self._lock:
+            novo = func(self.get(key))
+            self.set(key, novo, ttl)
+        return novo
+
     def invalidate(self, key: str):
         """Remove entrada do cache"""
-        if key in self.cache:
-            del self.cache[key]
-    
+        with self._lock:
+            if key in self.cache:
+                self._remover(key)
+
     def invalidate_prefix(self, prefix: str):
-        """Remove todas as entradas com prefixo"""
-        keys_to_remove = [k for k in self.cache.keys() if k.startswith(prefix)]
-        for key in keys_to_remove:
-            del self.cache[key]
-    
+        """Remove todas as entradas com prefixo (varredura; para clientes use invalidate_namespace)"""
+        with self._lock:
+            keys_to_remove = [k for k in self.cache.keys() if k.startswith(prefix)]
+            for key in keys_to_remove:
+                self._remover(key)
+
     def clear(self):
         """Limpa todo o cache"""
-        self.cache.clear()
-    
+        with self._lock:
+            self.cache.clear()
+            self.bytes = 0
+
+    def purge_expired(self) -> int:
+        """Remove as entradas expiradas; retorna quantas saíram"""
+        agora = time.monotonic()
+        with self._lock:
+            expiradas = [k for k, (_, expira_em) in self.cache.items() if agora >= expira_em]
+            for key in expiradas:
+                self._remover(key)
+            self.expirations += len(expiradas)
+            self._proxima_limpeza = agora + self.intervalo_limpeza
+        return len(expiradas)
+
     def get_stats(self) -> Dict[str, Any]:
-        """Retorna estatísticas do cache"""
-        total = len(self.cache)
-        expired = sum(
-            1 for entry in self.cache.values()
-            if datetime.now() > entry["expires_at"]
+        """Retorna estatísticas do cache (contadores, sem percorrer as entradas)"""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "total_entries": len(self.cache),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remover(self, key: str):
+        dados, _ = self.cache.pop(key)
+        self.bytes -= len(dados)
+
+    def _limpeza_periodica(self, agora: float):
+        if agora >= self._proxima_limpeza:
+            self.purge_expired()
+
+
+def criar_cache_service():
+    """
+    Backend configurado por ambiente:
+    ABSENTEISMO_CACHE_BACKEND=memory (padrão) | sqlite (compartilhado entre workers,
+    arquivo em ABSENTEISMO_CACHE_PATH, padrão database/cache_compartilhado.db).
+    ABSENTEISMO_CACHE_MAX_ENTRIES=0 desliga o cache.
+    """
+    local = CacheService(
+        max_entries=_env_int("ABSENTEISMO_CACHE_MAX_ENTRIES", 2000),
+        max_bytes=_env_int("ABSENTEISMO_CACHE_MAX_MB", 64) * 1024 * 1024,
+        default_ttl=_env_int("ABSENTEISMO_CACHE_TTL", 60),
+    )
+    backend = (os.environ.get("ABSENTEISMO_CACHE_BACKEND") or "memory").strip().lower()
+    if backend != "sqlite" or not local.enabled:
+        return local
+
+    from .cache_compartilhado import SQLiteCacheCompartilhado
+    from .database import DB_PATH
+
+    caminho = (os.environ.get("ABSENTEISMO_CACHE_PATH") or "").strip() or os.path.join(
+        os.path.dirname(DB_PATH), "cache_compartilhado.db"
+    )
+    try:
+        return SQLiteCacheCompartilhado(
+            caminho, local.max_entries, local.max_bytes, local.default_ttl, fallback=local
         )
-        
-        return {
-            "total_entries": total,
-            "active_entries": total - expired,
-            "expired_entries": expired
-        }
+    except Exception as e:
+        if logger:
+            logger.warning(f"Cache compartilhado não iniciado ({caminho}): {e}; usando memória local")
+        return local
+
 
 # Instância global
-cache_service = CacheService()
-
-# Helpers para cache comum
-def cache_client(client_id: int, ttl: int = 3600):
-    """Cache para dados de cliente (1 hora)"""
-    return cache_service.get_or_set(
-        f"client:{client_id}",
-        lambda: None,  # Será substituído pela função real
-        ttl=ttl
+cache_service = criar_cache_service()
+
+# ==================== CACHE POR CLIENTE ====================
+
+# Cada engine (banco) recebe um token próprio: bancos diferentes nunca compartilham entradas
+_tokens_engine: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_tokens_lock = threading.Lock()
+
+
+def _token_banco(engine) -> str:
+    """
+    Arquivo SQLite: token derivado do arquivo (caminho, dispositivo, inode), igual em
+    todos os workers e novo se o arquivo for substituído. Banco em memória: aleatório.
+    """
+    url = engine.url
+    database = url.database
+    if url.get_backend_name() == "sqlite" and database and database != ":memory:" and not database.startswith("file:"):
+        try:
+            caminho = os.path.realpath(database)
+            st = os.stat(caminho)
+            return hashlib.sha1(f"{caminho}:{st.st_dev}:{st.st_ino}".encode()).hexdigest()[:12]
+        except OSError:
+            pass
+    return uuid.uuid4().hex[:12]
+
+
+def _token_engine(db: Session) -> str:
+    bind = db.get_bind()
+    engine = getattr(bind, "engine", bind)
+    with _tokens_lock:
+        token = _tokens_engine.get(engine)
+        if token is None:
+            token = _tokens_engine[engine] = _token_banco(engine)
+    return token
+
+
+def _namespace_cliente(client_id: int) -> Tuple[str, int]:
+    return ("client", int(client_id))
+
+
+def registrar_versao_cliente(db: Session, client_id: int, data_version: Optional[int]):
+    """
+    Registra, até o fim da transação, o clients.data_version lido junto com o ETag
+    (http_cache.resposta_condicional). Ele passa a fazer parte das chaves do cliente.
+    """
+    db.info.setdefault(_INFO_VERSOES, {})[int(client_id)] = int(data_version or 0)
+
+
+def chave_cliente(db: Session, client_id: int, prefix: str, *args, **kwargs) -> str:
+    """
+    Chave de uma leitura do cliente: banco + gerações (banco e cliente) + argumentos.
+
+    As gerações só valem neste processo. Nas rotas com ETag, o data_version lido para
+    o ETag também entra na chave: se outro worker (ou uma conexão fora do ORM) alterou
+    os dados, o ETag novo nunca é servido com um corpo calculado na versão anterior.
+    """
+    token = _token_engine(db)
+    geracao_banco = cache_service.geracao(("engine", token))
+    geracao_cliente = cache_service.geracao(_namespace_cliente(client_id))
+    versao = (db.info.get(_INFO_VERSOES) or {}).get(client_id, "-")
+    return cache_service._generate_key(
+        f"client:{client_id}:{token}:{geracao_banco}.{geracao_cliente}:v{versao}:{prefix}", *args, **kwargs
     )
 
+
 def invalidate_client_cache(client_id: int):
     """Invalida cache de um cliente"""
-    cache_service.invalidate_prefix(f"client:{client_id}")
+    cache_service.invalidate_namespace(_namespace_cliente(client_id))
+
+
+def marcar_cliente_alterado(db: Session, client_id: Optional[int]):
+    """
+    Registra que a transação da sessão alterou dados do cliente (None = cliente
+    desconhecido: invalida o banco todo). O cache é invalidado no commit.
+    """
+    db.info.setdefault(_INFO_ALTERADOS, set()).add(client_id)
+
+
+def cliente_alterado_na_sessao(db: Session, client_id: int) -> bool:
+    alterados = db.info.get(_INFO_ALTERADOS)
+    return bool(alterados) and (client_id in alterados or None in alterados)
+
+
+def cache_por_cliente(namespace: str, ttl: Optional[int] = None):
+    """
+    Decorator de métodos de leitura `metodo(self, client_id, ...)` de serviços com self.db.
+
+    O resultado fica no cache por (banco, cliente, gerações, argumentos) até o TTL ou
+    até os dados do cliente mudarem. Sessões com alterações ainda não confirmadas
+    do cliente leem direto do banco.
+    """
+    def decorator(func):
+        assinatura = inspect.signature(func)
+        prefixo = f"{namespace}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not cache_service.enabled:
+                return func(self, *args, **kwargs)
+            try:
+                argumentos = assinatura.bind(self, *args, **kwargs)
+                argumentos.apply_defaults()
+                chamada = dict(argumentos.arguments)
+                chamada.pop("self")
+                client_id = int(chamada["client_id"])
+            except (TypeError, ValueError, KeyError):
+                return func(self, *args, **kwargs)
+            if cliente_alterado_na_sessao(self.db, client_id):
+                return func(self, *args, **kwargs)
+
+            # A chave (com as gerações) é calculada antes da consulta: se os dados
+            # mudarem durante o cálculo, o resultado fica numa geração já invalidada
+            key = chave_cliente(self.db, client_id, prefixo, chamada)
+            cached = cache_service.get(key)
+            if cached is not None:
+                return cached
+            value = func(self, *args, **kwargs)
+            cache_service.set(key, value, ttl)
+            return value
+
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_alteracoes_orm(session, flush_context, instances):
+    """Objetos do cliente alterados via ORM marcam o cliente (rede de segurança além do RollupService)"""
+    from .models import Atestado, Client, ClientLogo, Produtividade, Upload
+
+    upload_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Upload, Produtividade, ClientLogo)):
+            marcar_cliente_alterado(session, obj.client_id)
+        elif isinstance(obj, Client) and obj not in session.new:
+            marcar_cliente_alterado(session, obj.id)
+        elif isinstance(obj, Atestado):
+            upload = obj.__dict__.get("upload")
+            if upload is not None:
+                marcar_cliente_alterado(session, upload.client_id)
+            else:
+                upload_ids.add(obj.upload_id)
+
+    for upload_id in upload_ids:
+        upload = None
+        if upload_id is not None:
+            with session.no_autoflush:
+                upload = session.get(Upload, upload_id)
+        marcar_cliente_alterado(session, upload.client_id if upload is not None else None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _marcar_alteracoes_em_massa(orm_execute_state):
+    """query().update()/delete() em Upload/Atestado/Produtividade: cliente desconhecido, invalida o banco"""
+    from .models import Atestado, Produtividade, Upload
+
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Atestado, Produtividade, Upload):
+        marcar_cliente_alterado(orm_execute_state.session, None)
+
 
+@event.listens_for(Session, "before_commit")
+def _incrementar_data_version(session):
+    """Incrementa clients.data_version dos clientes alterados, na transação que está sendo confirmada"""
+    from .models import Client
 
+    if session.new or session.dirty or session.deleted:
+        # O flush final do commit acontece depois deste evento: antecipa para marcar os clientes
+        session.flush()
+    alterados = session.info.get(_INFO_ALTERADOS)
+    if not alterados:
+        return
+    clients = Client.__table__
+    # updated_at explícito: o onupdate da coluna não deve disparar por causa da versão
+    stmt = clients.update().values(data_version=clients.c.data_version + 1, updated_at=clients.c.updated_at)
+    if None not in alterados:
+        stmt = stmt.where(clients.c.id.in_(sorted(alterados)))
+    session.execute(stmt)
 
 
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_marcas_apos_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_INFO_ALTERADOS, None)
 
 
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_versoes(session, transaction):
+    """As versões lidas valem só para a transação (commit, rollback ou close)"""
+    if transaction.parent is None:
+        session.info.pop(_INFO_VERSOES, None)
 
 
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session):
+    alterados = session.info.pop(_INFO_ALTERADOS, None)
+    if not alterados:
+        return
+    if None in alterados:
+        cache_service.invalidate_namespace(("engine", _token_engine(session)))
+    for client_id in alterados:
+        if client_id is not None:
+            invalidate_client_cache(client_id)
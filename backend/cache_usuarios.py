@@ -0,0 +1,149 @@
+"""
+Cache do usuário autenticado (principal)
+
+Toda chamada de /api/* resolvia o usuário do token com uma consulta a users (no
+middleware de autenticação e de novo em get_current_user). Aqui o usuário vira um
+UsuarioAutenticado (id, username, flags de ativo/admin, client_id e dados do /me),
+guardado no cache_service por (banco, geração dos usuários, id + users.data_version,
+username) com TTL curto. O caminho quente lê só (id, data_version) pelo índice único
+de username; a linha completa só é lida quando a versão muda.
+
+Invalidação imediata: qualquer alteração ou exclusão de User pelo ORM (rotas
+/api/users/*, login, scripts) ou UPDATE/DELETE em massa em users marca a sessão; no
+commit, users.data_version sobe na mesma transação e a geração dos usuários daquele
+banco sobe neste processo. A versão está no banco, então a desativação, troca de
+senha ou de papel vale na requisição seguinte em qualquer worker, com qualquer
+backend do cache. O TTL (ABSENTEISMO_CACHE_USUARIO_TTL, padrão 30 s) cobre apenas
+alterações feitas fora do ORM (SQL direto no banco).
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import cache_service as cache_module
+from .models import User
+
+# Chave em Session.info com os tokens de banco cujos usuários mudaram na transação
+_INFO_USUARIOS_ALTERADOS = "cache_usuarios_alterados"
+# Chave em Session.info com os ids cujo data_version sobe no commit (None = todos)
+_INFO_USUARIOS_VERSAO = "cache_usuarios_versao"
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    return int(raw) if raw else default
+
+
+TTL_USUARIO = _env_int("ABSENTEISMO_CACHE_USUARIO_TTL", 30)
+
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    """Usuário do token, sem vínculo com sessão (mesmos atributos lidos de User pelas rotas)"""
+    id: int
+    username: str
+    email: Optional[str]
+    nome_completo: Optional[str]
+    is_active: bool
+    is_admin: bool
+    client_id: Optional[int]
+    last_login: Optional[datetime]
+
+    @classmethod
+    def de_usuario(cls, user: User) -> "UsuarioAutenticado":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            nome_completo=user.nome_completo,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            client_id=user.client_id,
+            last_login=user.last_login,
+        )
+
+
+def _namespace_usuarios(token: str):
+    return ("usuarios", token)
+
+
+def usuario_autenticado(db: Session, username: str) -> Optional[UsuarioAutenticado]:
+    """Usuário do token (cache ou banco); None se não existir"""
+    cache = cache_module.cache_service
+    token = cache_module._token_engine(db)
+    # Geração e versão lidas antes do usuário: alteração concorrente cai numa chave já invalidada
+    geracao = cache.geracao(_namespace_usuarios(token))
+    versao = db.query(User.id, User.data_version).filter(User.username == username).first()
+    if versao is None:
+        return None
+    user_id, data_version = versao
+    key = f"usuario:{token}:{geracao}:{user_id}.{data_version or 0}:{username}"
+    usuario = cache.get(key)
+    if usuario is not None:
+        return usuario
+    user = db.get(User, user_id)
+    if user is None:
+        return None
+    usuario = UsuarioAutenticado.de_usuario(user)
+    cache.set(key, usuario, TTL_USUARIO)
+    return usuario
+
+
+def _marcar_usuarios_alterados(session: Session, user_id: Optional[int] = None):
+    session.info.setdefault(_INFO_USUARIOS_ALTERADOS, set()).add(cache_module._token_engine(session))
+    session.info.setdefault(_INFO_USUARIOS_VERSAO, set()).add(user_id)
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_alteracoes_orm(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            if obj in session.new:
+                # Usuário novo: ainda sem entradas (a chave inclui o id)
+                session.info.setdefault(_INFO_USUARIOS_ALTERADOS, set()).add(cache_module._token_engine(session))
+            else:
+                _marcar_usuarios_alterados(session, obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _marcar_alteracoes_em_massa(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is User:
+        _marcar_usuarios_alterados(orm_execute_state.session)
+
+
+@event.listens_for(Session, "before_commit")
+def _incrementar_versao_usuarios(session):
+    """Incrementa users.data_version dos usuários alterados, na transação que está sendo confirmada"""
+    if session.new or session.dirty or session.deleted:
+        # O flush final do commit acontece depois deste evento: antecipa para marcar os usuários
+        session.flush()
+    alterados = session.info.pop(_INFO_USUARIOS_VERSAO, None)
+    if not alterados:
+        return
+    users = User.__table__
+    stmt = users.update().values(data_version=users.c.data_version + 1)
+    if None not in alterados:
+        stmt = stmt.where(users.c.id.in_(sorted(alterados)))
+    session.execute(stmt)
+    # O próprio UPDATE passa por do_orm_execute: não é uma nova alteração a versionar
+    session.info.pop(_INFO_USUARIOS_VERSAO, None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_marcas_apos_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_INFO_USUARIOS_ALTERADOS, None)
+        session.info.pop(_INFO_USUARIOS_VERSAO, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session):
+    for token in session.info.pop(_INFO_USUARIOS_ALTERADOS, ()):
+        cache_module.cache_service.invalidate_namespace(_namespace_usuarios(token))
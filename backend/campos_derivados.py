@@ -0,0 +1,170 @@
+"""
+Campos derivados de dados_originais (JSON da planilha).
+
+Coerência, data de admissão e ano/mês da planilha são extraídos uma vez,
+na gravação do atestado, para colunas tipadas em `atestados`. As análises
+filtram e agrupam nessas colunas em vez de fazer json.loads por registro.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+# Colunas de Atestado preenchidas por extrair_campos_derivados
+CAMPOS_DERIVADOS = ('coerencia', 'data_admissao', 'ano_planilha', 'mes_planilha')
+
+MESES_PT = {
+    'JANEIRO': 1, 'FEVEREIRO': 2, 'MARÇO': 3, 'MARCO': 3, 'ABRIL': 4, 'MAIO': 5, 'JUNHO': 6,
+    'JULHO': 7, 'AGOSTO': 8, 'SETEMBRO': 9, 'OUTUBRO': 10, 'NOVEMBRO': 11, 'DEZEMBRO': 12,
+}
+
+
+def _carregar(dados_originais) -> Optional[Dict[str, Any]]:
+    """Aceita o JSON (str) ou o dicionário já montado"""
+    if not dados_originais:
+        return None
+    if isinstance(dados_originais, dict):
+        return dados_originais
+    try:
+        dados = json.loads(dados_originais)
+    except (TypeError, ValueError):
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+def coerencia_dos_dados(dados: Optional[Dict[str, Any]]) -> Optional[bool]:
+    """
+    Coerência do atestado (tri-state): True = coerente, False = sem coerência,
+    None = planilha sem informação de coerência.
+    """
+    if not dados:
+        return None
+
+    # PRIORIDADE 1: coluna "coerente" (nome exato da coluna na planilha RODA DE OURO)
+    coerente_valor = dados.get('coerente') or dados.get('Coerente') or dados.get('COERENTE')
+    if coerente_valor:
+        valor_str = str(coerente_valor).upper().strip()
+        if valor_str == 'COERENTE':
+            return True
+        elif 'SEM COER' in valor_str or 'SEM_COER' in valor_str or 'SEMCOER' in valor_str:
+            return False
+        elif 'NÃO' in valor_str or 'NAO' in valor_str or 'N' in valor_str or 'FALSE' in valor_str or '0' in valor_str:
+            return False
+        else:
+            return True  # Se tem valor mas não é claramente negativo, assume coerente
+
+    # PRIORIDADE 2: "Parecer Médico" (pode conter "COERENTE" ou "SEM COERÊNCIA")
+    parecer = dados.get('Parecer Médico') or dados.get('Parecer Medico') or dados.get('PAREcer Médico')
+    if parecer:
+        parecer_str = str(parecer).upper()
+        if 'COERENTE' in parecer_str and 'SEM COER' not in parecer_str:
+            return True
+        elif 'SEM COER' in parecer_str:
+            return False
+
+    # PRIORIDADE 3: campos relacionados a coerência (fallback)
+    for key, value in dados.items():
+        key_upper = str(key).upper()
+        value_str = str(value).upper() if value else ''
+
+        # Campo "SEM COERÊNCIA" tem prioridade
+        if 'SEM COER' in key_upper or 'SEM_COER' in key_upper or 'SEMCOER' in key_upper:
+            if 'SIM' in value_str or 'S' in value_str or 'TRUE' in value_str or '1' in value_str:
+                return False
+            elif 'NÃO' in value_str or 'NAO' in value_str or 'N' in value_str or 'FALSE' in value_str or '0' in value_str:
+                return True
+
+        if 'COERENTE' in key_upper or 'COERENCIA' in key_upper:
+            if 'SIM' in value_str or 'S' in value_str or 'TRUE' in value_str or '1' in value_str:
+                return True
+            elif 'NÃO' in value_str or 'NAO' in value_str or 'N' in value_str or 'FALSE' in value_str or '0' in value_str:
+                return False
+
+    return None
+
+
+def data_admissao_dos_dados(dados: Optional[Dict[str, Any]]) -> Optional[date]:
+    """Coluna "Admissão" da planilha (DD/MM/YYYY, YYYY-MM-DD, DD-MM-YYYY ou só o ano)"""
+    if not dados:
+        return None
+    valor = dados.get('Admissão') or dados.get('admissão') or dados.get('ADMISSÃO') or dados.get('Admissao')
+    if not valor or not isinstance(valor, str):
+        return None
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    try:
+        return date(int(valor[:4]), 1, 1)
+    except ValueError:
+        return None
+
+
+def _inteiro(valor) -> Optional[int]:
+    try:
+        return int(float(str(valor).strip().replace(',', '.')))
+    except (TypeError, ValueError):
+        return None
+
+
+def ano_mes_dos_dados(dados: Optional[Dict[str, Any]]):
+    """Colunas "ano" e "mês" da planilha como inteiros (None quando ausentes/inválidas)"""
+    if not dados:
+        return None, None
+    ano_valor = dados.get('ano') or dados.get('Ano') or dados.get('ANO')
+    mes_valor = dados.get('mês') or dados.get('Mês') or dados.get('MÊS') or dados.get('mes')
+
+    ano = _inteiro(ano_valor) if ano_valor else None
+    mes = None
+    if mes_valor:
+        mes = _inteiro(mes_valor)
+        if mes is None:
+            mes = MESES_PT.get(str(mes_valor).strip().upper())
+        if mes is not None and not 1 <= mes <= 12:
+            mes = None
+    return ano, mes
+
+
+def extrair_campos_derivados(dados_originais) -> Dict[str, Any]:
+    """Valores das colunas derivadas para um registro (JSON ou dicionário)"""
+    dados = _carregar(dados_originais)
+    ano, mes = ano_mes_dos_dados(dados)
+    return {
+        'coerencia': coerencia_dos_dados(dados),
+        'data_admissao': data_admissao_dos_dados(dados),
+        'ano_planilha': ano,
+        'mes_planilha': mes,
+    }
+
+
+def backfill_campos_derivados(db, batch_size: int = 1000, client_id: Optional[int] = None) -> int:
+    """
+    Preenche as colunas derivadas dos atestados já gravados.
+    Processa em lotes por id e confirma a cada lote. Retorna o total atualizado.
+    """
+    from .models import Atestado, Upload
+
+    atualizados = 0
+    ultimo_id = 0
+    while True:
+        query = db.query(Atestado.id, Atestado.dados_originais).filter(
+            Atestado.id > ultimo_id,
+            Atestado.dados_originais.isnot(None)
+        )
+        if client_id is not None:
+            query = query.join(Upload).filter(Upload.client_id == client_id)
+        lote = query.order_by(Atestado.id).limit(batch_size).all()
+        if not lote:
+            break
+
+        mapeamentos = []
+        for atestado_id, dados_originais in lote:
+            valores = extrair_campos_derivados(dados_originais)
+            valores['id'] = atestado_id
+            mapeamentos.append(valores)
+        db.bulk_update_mappings(Atestado, mapeamentos)
+        db.commit()
+
+        atualizados += len(mapeamentos)
+        ultimo_id = lote[-1][0]
+    return atualizados
@@ -0,0 +1,233 @@
+"""
+Listagem de registros da Gestão de Dados (/api/dados/todos) em páginas.
+
+Ordem: data_afastamento decrescente (nulos no fim) e id crescente como desempate,
+paginada por cursor (keyset) em vez de OFFSET: cada página busca primeiro só
+(id, data_afastamento) — coberto pelo índice ix_atestados_upload_afastamento — e
+depois as colunas da listagem apenas dos ids da página, com o mês do upload no join.
+Os totais saem de agregados SQL sobre todo o filtro, não da soma das linhas lidas.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, desc, func, nullslast, or_
+from sqlalchemy.orm import Query, Session
+
+from .models import Atestado, Upload
+
+LOTE_PADRAO = 1000
+LIMITE_MAXIMO = 5000
+
+# Colunas do registro devolvido (sem created_at/campos derivados)
+_COLUNAS_REGISTRO = (
+    Atestado.id,
+    Atestado.upload_id,
+    Atestado.nomecompleto,
+    Atestado.descricao_atestad,
+    Atestado.dias_atestados,
+    Atestado.cid,
+    Atestado.diagnostico,
+    Atestado.centro_custo,
+    Atestado.setor,
+    Atestado.motivo_atestado,
+    Atestado.escala,
+    Atestado.horas_dia,
+    Atestado.horas_perdi,
+    Atestado.nome_funcionario,
+    Atestado.cpf,
+    Atestado.matricula,
+    Atestado.cargo,
+    Atestado.genero,
+    Atestado.data_afastamento,
+    Atestado.data_retorno,
+    Atestado.tipo_info_atestado,
+    Atestado.tipo_atestado,
+    Atestado.descricao_cid,
+    Atestado.numero_dias_atestado,
+    Atestado.numero_horas_atestado,
+    Atestado.dias_perdidos,
+    Atestado.horas_perdidas,
+    Atestado.dados_originais,
+    Upload.mes_referencia,
+)
+
+# Ordem padrão da planilha quando nenhum registro traz colunas originais
+COLUNAS_PADRAO = [
+    'nomecompleto',      # 1. NOMECOMPLETO
+    'descricao_atestad', # 2. DESCRIÇÃO ATESTAD
+    'dias_atestados',    # 3. DIAS ATESTADOS
+    'cid',               # 4. CID
+    'diagnostico',       # 5. DIAGNÓSTICO
+    'centro_custo',      # 6. CENTROCUST
+    'setor',             # 7. setor
+    'motivo_atestado',   # 8. motivo atestado
+    'escala',            # 9. escala
+    'horas_dia',         # 10. Horas/dia
+    'horas_perdi',       # 11. Horas perdi
+]
+
+Cursor = Tuple[Optional[date], int]
+
+
+def codificar_cursor(chave: Cursor) -> str:
+    """Cursor opaco (base64 url-safe) com a chave do último registro da página"""
+    data, atestado_id = chave
+    bruto = json.dumps([data.isoformat() if data else None, int(atestado_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Cursor:
+    """Chave (data_afastamento, id) do cursor; ValueError se não for um cursor desta API"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data, atestado_id = json.loads(bruto)
+        return (date.fromisoformat(data) if data is not None else None), int(atestado_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("cursor inválido") from e
+
+
+def _filtro(query: Query, client_id: int, upload_id: Optional[int]) -> Query:
+    query = query.filter(Upload.client_id == client_id)
+    if upload_id:
+        query = query.filter(Upload.id == upload_id)
+    return query
+
+
+def estatisticas(db: Session, client_id: int, upload_id: Optional[int] = None) -> Dict[str, Any]:
+    """Totais do filtro inteiro (independem da página)"""
+    total, dias = _filtro(
+        db.query(func.count(Atestado.id), func.coalesce(func.sum(Atestado.dias_atestados), 0))
+        .select_from(Atestado)
+        .join(Upload, Atestado.upload_id == Upload.id),
+        client_id,
+        upload_id,
+    ).one()
+    return {
+        'total_registros': total,
+        'total_atestados_dias': dias,  # Soma dos dias_atestados
+        'total_dias_perdidos': dias,  # Mesmo valor de total_atestados_dias
+    }
+
+
+def _chaves_pagina(
+    db: Session,
+    client_id: int,
+    upload_id: Optional[int],
+    apos: Optional[Cursor],
+    limite: int,
+) -> List[Cursor]:
+    query = _filtro(
+        db.query(Atestado.data_afastamento, Atestado.id)
+        .select_from(Atestado)
+        .join(Upload, Atestado.upload_id == Upload.id),
+        client_id,
+        upload_id,
+    )
+    if apos is not None:
+        data, ultimo_id = apos
+        if data is None:
+            query = query.filter(Atestado.data_afastamento.is_(None), Atestado.id > ultimo_id)
+        else:
+            query = query.filter(or_(
+                Atestado.data_afastamento < data,
+                and_(Atestado.data_afastamento == data, Atestado.id > ultimo_id),
+                Atestado.data_afastamento.is_(None),
+            ))
+    query = query.order_by(nullslast(desc(Atestado.data_afastamento)), Atestado.id)
+    return [(data, atestado_id) for data, atestado_id in query.limit(limite).all()]
+
+
+def iterar_paginas(
+    db: Session,
+    client_id: int,
+    upload_id: Optional[int] = None,
+    apos: Optional[Cursor] = None,
+    limite: Optional[int] = None,
+    lote: int = LOTE_PADRAO,
+) -> Iterator[Tuple[List[Any], Optional[Cursor]]]:
+    """
+    (linhas, chave da última) por lote, na ordem da listagem, até `limite` linhas
+    (None = todas). Cada lote é uma consulta independente: nada fica aberto entre lotes.
+    """
+    restante = limite
+    while restante is None or restante > 0:
+        tamanho = lote if restante is None else min(lote, restante)
+        chaves = _chaves_pagina(db, client_id, upload_id, apos, tamanho)
+        if not chaves:
+            return
+        ids = [atestado_id for _, atestado_id in chaves]
+        linhas = {
+            row.id: row
+            for row in db.query(*_COLUNAS_REGISTRO)
+            .select_from(Atestado)
+            .join(Upload, Atestado.upload_id == Upload.id)
+            .filter(Atestado.id.in_(ids))
+        }
+        apos = chaves[-1]
+        yield [linhas[i] for i in ids if i in linhas], apos
+        if restante is not None:
+            restante -= len(chaves)
+        if len(chaves) < tamanho:
+            return
+
+
+def montar_registro(a: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Registro da listagem: colunas originais da planilha primeiro (na ordem gravada),
+    depois os campos processados. Retorna também as colunas originais do registro.
+    """
+    # Parse dos dados originais (JSON); dict mantém a ordem da planilha
+    dados_originais: Dict[str, Any] = {}
+    if a.dados_originais:
+        try:
+            dados_originais = json.loads(a.dados_originais)
+        except Exception as e:
+            print(f"Erro ao parse JSON dados_originais: {e}")
+            dados_originais = {}
+    colunas = list(dados_originais.keys()) if isinstance(dados_originais, dict) else []
+
+    # Cria registro com os novos campos da planilha padronizada
+    registro = {
+        'id': a.id,
+        'upload_id': a.upload_id,
+        'mes_referencia': a.mes_referencia,
+        # Campos principais da planilha padronizada
+        'nomecompleto': a.nomecompleto or '',
+        'descricao_atestad': a.descricao_atestad or '',
+        'dias_atestados': float(a.dias_atestados) if a.dias_atestados else 0,
+        'cid': a.cid or '',
+        'diagnostico': a.diagnostico or '',
+        'centro_custo': a.centro_custo or '',
+        'setor': a.setor or '',
+        'motivo_atestado': a.motivo_atestado or '',
+        'escala': a.escala or '',
+        'horas_dia': float(a.horas_dia) if a.horas_dia else 0,
+        'horas_perdi': float(a.horas_perdi) if a.horas_perdi else 0,
+        # Campos legados (para compatibilidade)
+        'nome_funcionario': a.nome_funcionario or a.nomecompleto or '',
+        'cpf': a.cpf or '',
+        'matricula': a.matricula or '',
+        'cargo': a.cargo or '',
+        'genero': a.genero or '',
+        'data_afastamento': a.data_afastamento.isoformat() if a.data_afastamento else None,
+        'data_retorno': a.data_retorno.isoformat() if a.data_retorno else None,
+        'tipo_info_atestado': a.tipo_info_atestado,
+        'tipo_atestado': a.tipo_atestado or '',
+        'descricao_cid': a.descricao_cid or a.diagnostico or '',
+        'numero_dias_atestado': float(a.numero_dias_atestado) if a.numero_dias_atestado else (float(a.dias_atestados) if a.dias_atestados else 0),
+        'numero_horas_atestado': float(a.numero_horas_atestado) if a.numero_horas_atestado else (float(a.horas_dia) if a.horas_dia else 0),
+        'dias_perdidos': float(a.dias_perdidos) if a.dias_perdidos else (float(a.dias_atestados) if a.dias_atestados else 0),
+        'horas_perdidas': float(a.horas_perdidas) if a.horas_perdidas else (float(a.horas_perdi) if a.horas_perdi else 0),
+    }
+
+    # Colunas originais PRIMEIRO (ordem da planilha), depois campos processados
+    registro_final = dict(dados_originais) if colunas else {}
+    for key, valor in registro.items():
+        if key not in registro_final:
+            registro_final[key] = valor
+    return registro_final, colunas
@@ -0,0 +1,523 @@
+"""
+DashboardAggregator - Agregação do dashboard em uma única leitura
+
+Busca UMA vez o conjunto filtrado de atestados (cliente/período/funcionário),
+em formato colunar, e calcula todos os blocos do dashboard a partir dele.
+Substitui as ~15 consultas independentes de Analytics usadas por
+/api/dashboard, /api/apresentacao e buscar_dados_dashboard_completo.
+
+Os blocos reproduzem as regras de Analytics (filtros, ordenação, limites e
+arredondamentos); as reduções agrupadas trabalham sobre colunas + índices,
+de modo que podem ser trocadas por operações vetorizadas sem mudar a API.
+"""
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .analytics_helper import aplicar_filtro_funcionario
+from .cache_service import cache_por_cliente
+from .models import Atestado, Upload
+
+
+CIDS_GENERICOS = ('Z00.0', 'Z00.1', 'Z52.0', 'Z76.0', 'Z76.1')
+
+DIAGNOSTICOS_GENERICOS = (
+    'diagnóstico não especificado', 'não especificado', 'nao especificado',
+    'sem diagnóstico', 'sem diagnostico', 's/ diagnóstico', 's/ diagnostico',
+    'não informado', 'nao informado', 'diagnostico nao encontrado',
+    'diagnóstico não encontrado', '',
+)
+
+# Colunas lidas do banco (nome no bloco -> coluna SQL)
+COLUNAS = (
+    ('mes', Upload.mes_referencia),
+    ('nomecompleto', Atestado.nomecompleto),
+    ('nome_funcionario', Atestado.nome_funcionario),
+    ('setor', Atestado.setor),
+    ('genero', Atestado.genero),
+    ('cid', Atestado.cid),
+    ('diagnostico', Atestado.diagnostico),
+    ('descricao_cid', Atestado.descricao_cid),
+    ('dias', Atestado.dias_atestados),
+    ('horas', Atestado.horas_perdi),
+    ('escala', Atestado.escala),
+    ('motivo', Atestado.motivo_atestado),
+)
+
+
+class ColunasAtestados:
+    """Conjunto filtrado de atestados em formato colunar (uma tupla por coluna)"""
+
+    __slots__ = ('client_id', 'colunas', 'todos', 'base')
+
+    def __init__(self, client_id: int, linhas: List[tuple], setor=None):
+        self.client_id = client_id
+        nomes = [nome for nome, _ in COLUNAS]
+        transposta = list(zip(*linhas)) if linhas else [()] * len(nomes)
+        self.colunas = dict(zip(nomes, transposta))
+        # 'todos' ignora o filtro de setor (usado por centro de custo)
+        self.todos = list(range(len(linhas)))
+        self.base = self._filtrar_setor(setor)
+
+    def __getitem__(self, nome: str) -> tuple:
+        return self.colunas[nome]
+
+    def _filtrar_setor(self, setor) -> List[int]:
+        """Mesma semântica de analytics_helper.aplicar_filtro_setor"""
+        if isinstance(setor, list) and len(setor) > 0:
+            permitidos = set(setor)
+        elif isinstance(setor, str) and setor:
+            permitidos = {setor}
+        else:
+            return self.todos
+        setores = self.colunas['setor']
+        return [i for i in self.todos if setores[i] in permitidos]
+
+    def onde(self, indices: Iterable[int], *colunas: str) -> List[int]:
+        """Índices cujas colunas informadas estão preenchidas (nem NULL nem '')"""
+        valores = [self.colunas[c] for c in colunas]
+        return [i for i in indices if all(v[i] for v in valores)]
+
+
+def agrupar(chaves: tuple, dias: tuple, horas: tuple, indices: Iterable[int]) -> Dict[Any, List[float]]:
+    """
+    Redução agrupada: {chave: [quantidade, soma_dias, soma_horas]}.
+
+    Mantém a ordem de primeira ocorrência das chaves; valores NULL não somam
+    (mesmo comportamento de COUNT/SUM no SQL).
+    """
+    grupos: Dict[Any, List[float]] = {}
+    for i in indices:
+        acumulado = grupos.get(chaves[i])
+        if acumulado is None:
+            acumulado = grupos[chaves[i]] = [0, 0.0, 0.0]
+        acumulado[0] += 1
+        if dias[i] is not None:
+            acumulado[1] += dias[i]
+        if horas[i] is not None:
+            acumulado[2] += horas[i]
+    return grupos
+
+
+def normalizar_genero(genero_str) -> Optional[str]:
+    """Normaliza gênero para 'M'/'F' (mesma regra de Analytics)"""
+    if not genero_str:
+        return None
+    genero_str = str(genero_str).strip().upper()
+    if genero_str.startswith('M') or genero_str == 'MASCULINO' or genero_str == 'MALE':
+        return 'M'
+    if genero_str.startswith('F') or genero_str == 'FEMININO' or genero_str == 'FEMALE':
+        return 'F'
+    return None
+
+
+def _diagnostico_valido(texto: Optional[str]) -> Optional[str]:
+    if not texto:
+        return None
+    texto = texto.strip()
+    if texto and texto.lower() not in DIAGNOSTICOS_GENERICOS:
+        return texto
+    return None
+
+
+class DashboardAggregator:
+    """Calcula todos os blocos do dashboard a partir de uma única leitura"""
+
+    # Blocos e valores padrão (usados se o cálculo de um bloco falhar)
+    PADROES = {
+        'metricas': {
+            "total_atestados_dias": 0,
+            "total_dias_perdidos": 0,
+            "total_horas_perdidas": 0
+        },
+        'top_cids': [],
+        'top_cids_dias': [],
+        'top_setores': [],
+        'evolucao_mensal': [],
+        'distribuicao_genero': [],
+        'top_funcionarios': [],
+        'top_escalas': [],
+        'top_motivos': [],
+        'dias_centro_custo': [],
+        'distribuicao_dias': [],
+        'media_cid': [],
+        'evolucao_setor': {},
+        'comparativo_dias_horas': [],
+        'frequencia_atestados': [],
+        'dias_setor_genero': [],
+    }
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def carregar(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario=None, setor=None) -> ColunasAtestados:
+        """
+        Leitura única do conjunto filtrado.
+
+        Cliente, período e funcionário são filtrados no SQL; o filtro de setor
+        é aplicado sobre as colunas porque o bloco de centro de custo o ignora.
+        """
+        query = self.db.query(*[coluna for _, coluna in COLUNAS]).join(
+            Upload, Atestado.upload_id == Upload.id
+        ).filter(Upload.client_id == client_id)
+
+        if mes_inicio:
+            query = query.filter(Upload.mes_referencia >= mes_inicio)
+        if mes_fim:
+            query = query.filter(Upload.mes_referencia <= mes_fim)
+        query = aplicar_filtro_funcionario(query, funcionario)
+
+        linhas = query.order_by(Atestado.id).all()
+        return ColunasAtestados(client_id, linhas, setor)
+
+    @cache_por_cliente("dashboard")
+    def calcular(self, client_id: int, mes_inicio: str = None, mes_fim: str = None, funcionario=None, setor=None) -> Dict[str, Any]:
+        """Retorna todos os blocos do dashboard (mesmas chaves de PADROES)"""
+        try:
+            dados = self.carregar(client_id, mes_inicio, mes_fim, funcionario, setor)
+        except Exception as e:
+            print(f"Erro ao carregar dados do dashboard: {e}")
+            return {nome: padrao.copy() for nome, padrao in self.PADROES.items()}
+
+        calculos: List[Tuple[str, Callable[[ColunasAtestados], Any]]] = [
+            ('metricas', self.metricas_gerais),
+            ('top_cids', lambda d: self.top_cids(d, 10)),
+            ('top_cids_dias', lambda d: self.top_cids(d, 5)),
+            ('top_setores', lambda d: self.top_setores(d, 5)),
+            ('evolucao_mensal', lambda d: self.evolucao_mensal(d, 12)),
+            ('distribuicao_genero', self.distribuicao_genero),
+            ('top_funcionarios', lambda d: self.top_funcionarios(d, 10)),
+            ('top_escalas', lambda d: self.top_escalas(d, 10)),
+            ('top_motivos', lambda d: self.top_motivos(d, 10)),
+            ('dias_centro_custo', lambda d: self.dias_perdidos_por_centro_custo(d, 10)),
+            ('distribuicao_dias', self.distribuicao_dias_por_atestado),
+            ('media_cid', lambda d: self.media_dias_por_cid(d, 10)),
+            ('evolucao_setor', lambda d: self.evolucao_por_setor(d, 12)),
+            ('comparativo_dias_horas', self.comparativo_dias_horas),
+            ('frequencia_atestados', self.frequencia_atestados_por_funcionario),
+            ('dias_setor_genero', self.dias_perdidos_setor_genero),
+        ]
+
+        blocos = {}
+        for nome, calculo in calculos:
+            try:
+                blocos[nome] = calculo(dados)
+            except Exception as e:
+                print(f"Erro ao calcular {nome}: {e}")
+                blocos[nome] = self.PADROES[nome].copy()
+        return blocos
+
+    # ------------------------------------------------------------------
+    # Blocos (equivalentes aos métodos homônimos de Analytics)
+    # ------------------------------------------------------------------
+
+    def metricas_gerais(self, d: ColunasAtestados) -> Dict[str, Any]:
+        dias, horas, nomes = d['dias'], d['horas'], d['nomecompleto']
+        total_dias = math.fsum(dias[i] for i in d.base if dias[i] is not None)
+        total_horas = math.fsum(horas[i] for i in d.base if horas[i] is not None)
+        total_registros = len(d.base)
+        funcionarios_unicos = len({nomes[i] for i in d.base if nomes[i]})
+        return {
+            'total_atestados_dias': total_dias,
+            'total_dias_perdidos': total_dias,
+            'total_horas_perdidas': total_horas,
+            'total_atestados': total_registros,
+            'total_registros': total_registros,
+            'funcionarios_afetados': funcionarios_unicos
+        }
+
+    def top_cids(self, d: ColunasAtestados, limit: int = 5) -> List[Dict[str, Any]]:
+        """Agrupa por NOME da doença (diagnóstico > descrição do CID > CID)"""
+        cids, dias = d['cid'], d['dias']
+        diagnosticos, descricoes = d['diagnostico'], d['descricao_cid']
+
+        doencas: Dict[str, Dict[str, Any]] = {}
+        for i in d.onde(d.base, 'cid'):
+            cid = cids[i]
+            if cid in CIDS_GENERICOS:
+                continue
+            nome = (
+                _diagnostico_valido(diagnosticos[i])
+                or _diagnostico_valido(descricoes[i])
+                or cid
+            ).strip().upper()
+            grupo = doencas.get(nome)
+            if grupo is None:
+                grupo = doencas[nome] = {'cid': cid, 'cids': set(), 'quantidade': 0, 'dias_perdidos': 0.0}
+            grupo['quantidade'] += 1
+            grupo['dias_perdidos'] += float(dias[i] or 0)
+            grupo['cids'].add(cid)
+
+        resultado = []
+        for nome, grupo in doencas.items():
+            cids_lista = sorted(grupo['cids'])
+            cid_display = grupo['cid']
+            if len(cids_lista) > 1:
+                cid_display = f"{grupo['cid']} (+{len(cids_lista) - 1} outros)"
+            resultado.append({
+                'cid': cid_display,
+                'descricao': nome,
+                'diagnostico': nome,
+                'quantidade': grupo['quantidade'],
+                'dias_perdidos': round(grupo['dias_perdidos'], 2),
+                'cids_relacionados': cids_lista
+            })
+        resultado.sort(key=lambda x: x['quantidade'], reverse=True)
+        return resultado[:limit]
+
+    def top_setores(self, d: ColunasAtestados, limit: int = 5) -> List[Dict[str, Any]]:
+        grupos = agrupar(d['setor'], d['dias'], d['horas'], d.onde(d.base, 'setor'))
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][0], reverse=True)[:limit]
+        return [
+            {
+                'setor': setor,
+                'quantidade': qtd,
+                'dias_perdidos': round(dias, 2),
+                'horas_perdidas': round(horas, 2)
+            }
+            for setor, (qtd, dias, horas) in ordenados
+        ]
+
+    def top_funcionarios(self, d: ColunasAtestados, limit: int = 10) -> List[Dict[str, Any]]:
+        """Agrupa por nome e ordena por dias perdidos; setor/gênero vêm do primeiro registro"""
+        grupos = agrupar(d['nomecompleto'], d['dias'], d['horas'], self._com_nome(d))
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][1], reverse=True)[:limit]
+        ordenados = [(nome, valores) for nome, valores in ordenados if nome]
+
+        primeiros = self._primeiro_registro_funcionarios(d.client_id, [nome for nome, _ in ordenados])
+        resultado = []
+        for nome, (qtd, dias, horas) in ordenados:
+            setor, genero = primeiros.get(nome, (None, None))
+            resultado.append({
+                'nome': nome,
+                'setor': setor or 'Não informado',
+                'genero': genero or '-',
+                'quantidade': qtd,
+                'dias_perdidos': round(dias, 2),
+                'horas_perdidas': round(horas, 2)
+            })
+        return resultado
+
+    def evolucao_mensal(self, d: ColunasAtestados, meses: int = 12) -> List[Dict[str, Any]]:
+        grupos = agrupar(d['mes'], d['dias'], d['horas'], d.base)
+        recentes = sorted(grupos.items(), key=lambda g: g[0], reverse=True)[:meses]
+        return [
+            {
+                'mes': mes,
+                'quantidade': qtd,
+                'dias_perdidos': round(dias, 2),
+                'horas_perdidas': round(horas, 2)
+            }
+            for mes, (qtd, dias, horas) in reversed(recentes)
+        ]
+
+    def distribuicao_genero(self, d: ColunasAtestados) -> List[Dict[str, Any]]:
+        generos = d['genero']
+        normalizados = tuple(normalizar_genero(g) for g in generos)
+        grupos = agrupar(normalizados, d['dias'], d['horas'], d.onde(d.base, 'genero'))
+        return [
+            {
+                'genero': genero,
+                'quantidade': grupos[genero][0],
+                'dias_perdidos': round(grupos[genero][1], 2)
+            }
+            for genero in ('M', 'F')
+            if genero in grupos
+        ]
+
+    def top_escalas(self, d: ColunasAtestados, limit: int = 10) -> List[Dict[str, Any]]:
+        grupos = agrupar(d['escala'], d['dias'], d['horas'], d.onde(d.base, 'escala'))
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][0], reverse=True)[:limit]
+        return [
+            {
+                'escala': escala or 'Não informado',
+                'quantidade': qtd,
+                'dias_perdidos': round(dias, 2)
+            }
+            for escala, (qtd, dias, _) in ordenados
+        ]
+
+    def top_motivos(self, d: ColunasAtestados, limit: int = 10) -> List[Dict[str, Any]]:
+        indices = d.onde(d.base, 'motivo')
+        total = len(indices) or 1
+        grupos = agrupar(d['motivo'], d['dias'], d['horas'], indices)
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][0], reverse=True)[:limit]
+        return [
+            {
+                'motivo': motivo or 'Não informado',
+                'quantidade': qtd,
+                'percentual': round((qtd / total * 100), 2)
+            }
+            for motivo, (qtd, _, _) in ordenados
+        ]
+
+    def dias_perdidos_por_centro_custo(self, d: ColunasAtestados, limit: int = 10) -> List[Dict[str, Any]]:
+        """Centro de custo = setor; ignora o filtro de setor (mostra todos)"""
+        setores = d['setor']
+        indices = [i for i in d.todos if setores[i] is not None]
+        grupos = agrupar(setores, d['dias'], d['horas'], indices)
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][1], reverse=True)[:limit]
+        return [
+            {
+                'centro_custo': setor or 'Não informado',
+                'quantidade': qtd,
+                'dias_perdidos': round(dias, 2),
+                'horas_perdidas': round(horas, 2)
+            }
+            for setor, (qtd, dias, horas) in ordenados
+            if dias > 0
+        ]
+
+    def distribuicao_dias_por_atestado(self, d: ColunasAtestados) -> List[Dict[str, Any]]:
+        faixas = {
+            '1 dia': 0,
+            '2 dias': 0,
+            '3-5 dias': 0,
+            '6-10 dias': 0,
+            '11-15 dias': 0,
+            '16-30 dias': 0,
+            '31+ dias': 0
+        }
+        dias_col = d['dias']
+        for i in d.base:
+            dias = dias_col[i]
+            if not dias or dias <= 0:
+                continue
+            if dias == 1:
+                faixas['1 dia'] += 1
+            elif dias == 2:
+                faixas['2 dias'] += 1
+            elif 3 <= dias <= 5:
+                faixas['3-5 dias'] += 1
+            elif 6 <= dias <= 10:
+                faixas['6-10 dias'] += 1
+            elif 11 <= dias <= 15:
+                faixas['11-15 dias'] += 1
+            elif 16 <= dias <= 30:
+                faixas['16-30 dias'] += 1
+            else:
+                faixas['31+ dias'] += 1
+        return [
+            {'faixa': faixa, 'quantidade': quantidade}
+            for faixa, quantidade in faixas.items()
+            if quantidade > 0
+        ]
+
+    def media_dias_por_cid(self, d: ColunasAtestados, limit: int = 10) -> List[Dict[str, Any]]:
+        cids, dias_col = d['cid'], d['dias']
+        diagnosticos, descricoes = d['diagnostico'], d['descricao_cid']
+        indices = [i for i in d.onde(d.base, 'cid') if dias_col[i] is not None and dias_col[i] > 0]
+        chaves = tuple(zip(cids, diagnosticos, descricoes))
+        grupos = agrupar(chaves, dias_col, d['horas'], indices)
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][1] / g[1][0], reverse=True)[:limit]
+
+        resultado = []
+        for (cid, diagnostico, _), (qtd, total_dias, _) in ordenados:
+            descricao = _diagnostico_valido(diagnostico) or cid
+            resultado.append({
+                'cid': cid,
+                'diagnostico': descricao,
+                'descricao': descricao,
+                'quantidade': qtd,
+                'total_dias': round(total_dias, 2),
+                'media_dias': round(total_dias / qtd, 2)
+            })
+        return resultado
+
+    def evolucao_por_setor(self, d: ColunasAtestados, meses: int = 12) -> Dict[str, List[Dict[str, Any]]]:
+        setores_col, meses_col = d['setor'], d['mes']
+        indices = d.onde(d.base, 'setor')
+        setores = list(dict.fromkeys(setores_col[i] for i in indices))
+        grupos = agrupar(tuple(zip(meses_col, setores_col)), d['dias'], d['horas'], indices)
+
+        meses_unicos = sorted({meses_col[i] for i in indices})
+        evolucao = {setor: [] for setor in setores}
+        for mes in meses_unicos[-meses:]:
+            for setor in setores:
+                dias = grupos.get((mes, setor), (0, 0.0, 0.0))[1]
+                evolucao[setor].append({
+                    'mes': mes,
+                    'dias_perdidos': round(dias, 2)
+                })
+        return evolucao
+
+    def comparativo_dias_horas(self, d: ColunasAtestados) -> List[Dict[str, Any]]:
+        grupos = agrupar(d['setor'], d['dias'], d['horas'], d.onde(d.base, 'setor'))
+        ordenados = sorted(grupos.items(), key=lambda g: g[1][1], reverse=True)
+        return [
+            {
+                'setor': setor,
+                'dias_perdidos': round(dias, 2),
+                'horas_perdidas': round(horas, 2)
+            }
+            for setor, (_, dias, horas) in ordenados
+        ]
+
+    def frequencia_atestados_por_funcionario(self, d: ColunasAtestados) -> List[Dict[str, Any]]:
+        grupos = agrupar(d['nomecompleto'], d['dias'], d['horas'], self._com_nome(d))
+        frequencias = {
+            '1 atestado': 0,
+            '2 atestados': 0,
+            '3-5 atestados': 0,
+            '6-10 atestados': 0,
+            '11+ atestados': 0
+        }
+        for qtd, _, _ in grupos.values():
+            if qtd == 1:
+                frequencias['1 atestado'] += 1
+            elif qtd == 2:
+                frequencias['2 atestados'] += 1
+            elif 3 <= qtd <= 5:
+                frequencias['3-5 atestados'] += 1
+            elif 6 <= qtd <= 10:
+                frequencias['6-10 atestados'] += 1
+            else:
+                frequencias['11+ atestados'] += 1
+        return [
+            {'frequencia': freq, 'quantidade': qtd}
+            for freq, qtd in frequencias.items()
+            if qtd > 0
+        ]
+
+    def dias_perdidos_setor_genero(self, d: ColunasAtestados) -> List[Dict[str, Any]]:
+        setores, generos = d['setor'], d['genero']
+        indices = d.onde(d.base, 'setor', 'genero')
+        grupos = agrupar(tuple(zip(setores, generos)), d['dias'], d['horas'], indices)
+        return [
+            {
+                'setor': setor,
+                'genero': genero,
+                'genero_label': 'Masculino' if genero == 'M' else 'Feminino' if genero == 'F' else genero,
+                'quantidade': qtd,
+                'dias_perdidos': round(dias, 2)
+            }
+            for (setor, genero), (qtd, dias, _) in sorted(grupos.items())
+        ]
+
+    # ------------------------------------------------------------------
+    # Auxiliares
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _com_nome(d: ColunasAtestados) -> List[int]:
+        """Registros com nomecompleto ou nome_funcionario preenchido"""
+        nomes, legados = d['nomecompleto'], d['nome_funcionario']
+        return [i for i in d.base if nomes[i] or legados[i]]
+
+    def _primeiro_registro_funcionarios(self, client_id: int, nomes: List[str]) -> Dict[str, Tuple[Any, Any]]:
+        """Setor e gênero do primeiro registro (menor id) de cada funcionário, em uma consulta"""
+        if not nomes:
+            return {}
+        linhas = self.db.query(
+            Atestado.nomecompleto, Atestado.setor, Atestado.genero
+        ).join(Upload, Atestado.upload_id == Upload.id).filter(
+            Upload.client_id == client_id,
+            Atestado.nomecompleto.in_(nomes)
+        ).order_by(Atestado.id).all()
+
+        primeiros: Dict[str, Tuple[Any, Any]] = {}
+        for nome, setor, genero in linhas:
+            primeiros.setdefault(nome, (setor, genero))
+        return primeiros
+
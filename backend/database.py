@@ -1,7 +1,7 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import os
@@ -31,12 +31,95 @@ def _resolve_db_path() -> str:
 DB_PATH = _resolve_db_path()
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer, got {raw!r}")
+
+
+def _env_choice(name: str, default: str, choices) -> str:
+    raw = (os.environ.get(name) or "").strip().upper()
+    if not raw:
+        return default
+    if raw not in choices:
+        raise RuntimeError(f"{name} must be one of {', '.join(choices)}, got {raw!r}")
+    return raw
+
+
+def sqlite_pragmas() -> dict:
+    """
+    PRAGMAs applied to every new SQLite connection (overridable by environment).
+
+    WAL lets dashboard reads proceed while an upload holds the write lock;
+    synchronous=NORMAL is durable in WAL except for the last commits on power loss.
+    cache_size follows SQLite semantics: negative = KiB, positive = pages.
+    """
+    return {
+        "journal_mode": _env_choice(
+            "ABSENTEISMO_SQLITE_JOURNAL_MODE", "WAL", ("WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF")
+        ),
+        "synchronous": _env_choice("ABSENTEISMO_SQLITE_SYNCHRONOUS", "NORMAL", ("OFF", "NORMAL", "FULL", "EXTRA")),
+        "busy_timeout": _env_int("ABSENTEISMO_SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "cache_size": _env_int("ABSENTEISMO_SQLITE_CACHE_SIZE", -64000),
+        "mmap_size": _env_int("ABSENTEISMO_SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        "temp_store": _env_choice("ABSENTEISMO_SQLITE_TEMP_STORE", "MEMORY", ("DEFAULT", "FILE", "MEMORY")),
+    }
+
+
+def configure_sqlite_connection(dbapi_connection, pragmas: dict = None):
+    """Apply the PRAGMAs to a raw sqlite3 connection."""
+    pragmas = pragmas or sqlite_pragmas()
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def install_sqlite_pragmas(target_engine, pragmas: dict = None):
+    """Register a connect hook so every pooled connection gets the PRAGMAs."""
+    pragmas = pragmas or sqlite_pragmas()
+
+    @event.listens_for(target_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        configure_sqlite_connection(dbapi_connection, pragmas)
+
+    return target_engine
+
+
+def create_sqlite_engine(url: str = None, **kwargs):
+    """
+    SQLite engine with the PRAGMA hook and an explicit pool.
+
+    Pool (QueuePool) sizes come from ABSENTEISMO_DB_POOL_SIZE,
+    ABSENTEISMO_DB_MAX_OVERFLOW, ABSENTEISMO_DB_POOL_TIMEOUT and
+    ABSENTEISMO_DB_POOL_RECYCLE; extra kwargs go straight to create_engine.
+    """
+    url = url or SQLALCHEMY_DATABASE_URL
+    options = {
+        "connect_args": {"check_same_thread": False},
+        "echo": False,
+    }
+    if url.startswith("sqlite:///") and url != "sqlite:///:memory:":
+        options.update(
+            pool_size=_env_int("ABSENTEISMO_DB_POOL_SIZE", 10),
+            max_overflow=_env_int("ABSENTEISMO_DB_MAX_OVERFLOW", 20),
+            pool_timeout=_env_int("ABSENTEISMO_DB_POOL_TIMEOUT", 30),
+            pool_recycle=_env_int("ABSENTEISMO_DB_POOL_RECYCLE", 3600),
+            pool_pre_ping=True,
+        )
+    options.update(kwargs)
+    return install_sqlite_pragmas(create_engine(url, **options))
+
+
 # Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False
-)
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -56,17 +139,39 @@ def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
 
-def ensure_column(table_name: str, column_name: str, column_definition: str):
+def ensure_column(table_name: str, column_name: str, column_definition: str, bind=None):
     """Ensure a column exists in a table, adding it if missing (SQLite only)."""
-    with engine.connect() as connection:
+    with (bind or engine).connect() as connection:
         result = connection.execute(text(f"PRAGMA table_info({table_name})"))
         columns = [row[1] for row in result]
-        if column_name not in columns:
+        # Tabela inexistente: create_all a cria já com a coluna
+        if columns and column_name not in columns:
             connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}"))
 
-def run_migrations():
+def run_migrations(bind=None):
     """Apply lightweight schema adjustments not covered by Base metadata."""
-    ensure_column("clients", "logo_url", "VARCHAR(500)")
+    bind = bind or engine
+    ensure_column("clients", "logo_url", "VARCHAR(500)", bind=bind)
+    ensure_column("clients", "data_version", "INTEGER NOT NULL DEFAULT 0", bind=bind)
+    ensure_column("users", "data_version", "INTEGER NOT NULL DEFAULT 0", bind=bind)
+    # Campos derivados de dados_originais (preencher com scripts/backfill_campos_derivados.py)
+    ensure_column("atestados", "coerencia", "BOOLEAN", bind=bind)
+    ensure_column("atestados", "data_admissao", "DATE", bind=bind)
+    ensure_column("atestados", "ano_planilha", "INTEGER", bind=bind)
+    ensure_column("atestados", "mes_planilha", "INTEGER", bind=bind)
+    # monthly_rollups vem do create_all (preencher com scripts/backfill_rollups.py)
+    ensure_indexes(bind=bind)
+
+def ensure_indexes(bind=None):
+    """Create indexes declared on the models that are missing in an existing database."""
+    from . import models  # noqa: F401 - registra as tabelas em Base.metadata
+    bind = bind or engine
+    tables = set(inspect(bind).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
 def check_database_health(db: Session) -> dict:
     """
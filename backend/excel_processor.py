@@ -1,6 +1,7 @@
 """
 Excel processor - Lê e processa planilhas de atestados
 """
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Any, Tuple, Optional
@@ -9,6 +10,8 @@ import json
 from collections import OrderedDict
 from difflib import SequenceMatcher
 from .genero_detector import GeneroDetector
+from .campos_derivados import extrair_campos_derivados
+from .ingestion.streaming_reader import DEFAULT_BATCH_ROWS, StreamingSpreadsheetReader
 
 class ExcelProcessor:
     """Processador de planilhas Excel"""
@@ -45,6 +48,23 @@ class ExcelProcessor:
             print(f"Erro ao ler planilha: {e}")
             return False
     
+    def ler_planilha_em_lotes(self, tamanho_lote: int = DEFAULT_BATCH_ROWS):
+        """
+        Lê a planilha em DataFrames de até `tamanho_lote` linhas (openpyxl read_only),
+        sem carregar a planilha inteira. Juntos, os lotes equivalem ao ler_planilha().
+        """
+        lotes = StreamingSpreadsheetReader(tamanho_lote).iter_dataframes(self.file_path, filename=str(self.file_path))
+        try:
+            # A leitura da planilha inteira (para o disco) acontece antes do primeiro lote
+            primeiro = next(lotes, None)
+        except Exception as e:
+            print(f"Erro ao ler planilha: {e}")
+            return
+        if primeiro is None:
+            return
+        yield primeiro
+        yield from lotes
+    
     def padronizar_colunas(self):
         """Padroniza nomes das colunas da planilha padronizada"""
         # Mantém os nomes originais das colunas, apenas normaliza espaços
@@ -278,176 +298,225 @@ class ExcelProcessor:
             horas_avulsas = self.df.get('NUMERO_HORAS_ATESTADO', 0)
             self.df['HORAS_PERDIDAS'] = dias_em_horas + horas_avulsas
     
-    def processar(self) -> List[Dict[str, Any]]:
-        """Processa a planilha completa"""
-        if not self.ler_planilha():
-            return []
-        
-        # Guarda os nomes originais das colunas ANTES de qualquer processamento
-        # IMPORTANTE: mantém a ordem original
-        self.colunas_originais = list(self.df.columns)
-        
-        # Cria um mapeamento de colunas originais para normalizadas (para buscar valores)
-        # Guarda o DataFrame original ANTES de normalizar
-        self.df_original = self.df.copy()
-        
-        self.padronizar_colunas()
+    @staticmethod
+    def _valor_original(valor):
+        """Converte uma célula para tipo Python nativo (serializável em JSON)"""
+        if valor is None or (isinstance(valor, (int, float)) and pd.isna(valor)):
+            return None
+        elif isinstance(valor, pd.Timestamp):
+            return valor.strftime('%Y-%m-%d') if not pd.isna(valor) else None
+        elif isinstance(valor, (int, float)):
+            return float(valor)
+        else:
+            return str(valor)
+    
+    @staticmethod
+    def _dtype_comum_linha(df: pd.DataFrame):
+        """Tipo que uma linha do DataFrame assume (o pandas unifica os tipos das colunas na linha)"""
+        return df.iloc[0].dtype if len(df) else None
+    
+    def _dados_originais_por_linha(self) -> List[Dict[str, Any]]:
+        """
+        dados_originais de cada linha da planilha crua, com TODAS as colunas na ordem original.
+        Converte coluna a coluna com a mesma regra de _valor_original aplicada ao valor
+        que a célula tem dentro da linha, e monta os dicionários com um único to_dict('records').
+        """
+        dtype_linha = self._dtype_comum_linha(self.df)
+        converter_para_linha = isinstance(dtype_linha, np.dtype) and dtype_linha.kind in 'iufbM'
         
-        print(f"📊 Colunas após padronização: {list(self.df.columns)}")
+        colunas = {}
+        for col in self.colunas_originais:
+            serie = self.df[col]
+            if converter_para_linha:
+                serie = serie.astype(dtype_linha)
+            tipo = serie.dtype
+            if isinstance(tipo, np.dtype) and tipo.kind == 'f':
+                valores = serie.to_numpy()
+                colunas[col] = np.where(np.isnan(valores), None, valores.astype(object))
+            elif isinstance(tipo, np.dtype) and tipo.kind in 'iub':
+                # Inteiros/booleanos numpy não são int/float do Python: viram texto
+                colunas[col] = serie.astype(str).to_numpy(dtype=object)
+            elif isinstance(tipo, np.dtype) and tipo.kind == 'M':
+                formatadas = serie.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+                formatadas[serie.isna().to_numpy()] = 'NaT'
+                colunas[col] = formatadas
+            else:
+                colunas[col] = np.array([self._valor_original(v) for v in serie.to_numpy(dtype=object)], dtype=object)
         
-        # Após padronizar, cria mapeamento das colunas originais para normalizadas
-        mapeamento_colunas = {}
-        for col_original in self.colunas_originais:
-            # Encontra a coluna normalizada correspondente
-            col_normalizada = None
-            # Tenta encontrar pelo nome original (pode ter sido renomeada)
-            if col_original in self.df.columns:
-                col_normalizada = col_original
+        return pd.DataFrame(colunas, index=self.df.index, columns=self.colunas_originais, dtype=object).to_dict('records')
+    
+    def _valores_linha(self, col: str) -> np.ndarray:
+        """Valores da coluna como aparecem em cada linha do DataFrame (mesmo tipo de iterrows)"""
+        if col not in self._cache_linhas:
+            if isinstance(self._dtype_linha, np.dtype) and self._dtype_linha.kind in 'iufb':
+                valores = self.df[col].to_numpy(dtype=self._dtype_linha)
             else:
-                # Procura na lista de colunas normalizadas
-                for col_df in self.df.columns:
-                    # Compara sem case e sem espaços/underscores
-                    orig_clean = col_original.upper().strip().replace(' ', '_').replace('/', '_')
-                    df_clean = col_df.upper().strip().replace(' ', '_').replace('/', '_')
-                    if orig_clean == df_clean:
-                        col_normalizada = col_df
-                        break
-            mapeamento_colunas[col_original] = col_normalizada if col_normalizada else col_original
+                valores = self.df[col].astype(object).to_numpy()
+            texto = pd.Series(valores, dtype=object).map(str).str.strip()
+            validos = pd.notna(valores) & (texto != '').to_numpy()
+            self._cache_linhas[col] = (valores, validos)
+        return self._cache_linhas[col]
+    
+    def _colunas_candidatas(self, col_normalizada: str) -> List[str]:
+        """
+        Colunas onde um campo é procurado, em ordem de prioridade: nome exato,
+        nome sem espaços/underscores/hífens, variações de NOMECOMPLETO e fuzzy matching.
+        """
+        colunas = list(self.df.columns)
+        candidatas = [c for c in colunas if c.upper().strip() == col_normalizada.upper().strip()]
         
-        self.limpar_dados()
-        self.calcular_metricas()
+        col_upper_clean = col_normalizada.upper().replace(' ', '').replace('_', '').replace('-', '')
+        candidatas += [c for c in colunas if c.upper().replace(' ', '').replace('_', '').replace('-', '') == col_upper_clean]
         
-        # Converte para lista de dicionários
-        registros = []
+        if col_normalizada.upper() == 'NOMECOMPLETO':
+            variacoes = ['NOME COMPLETO', 'NOME_COMPLETO', 'NOMEFUNCIONARIO', 'NOME FUNCIONARIO', 'NOME_FUNCIONARIO', 'FUNCIONARIO', 'FUNCIONÁRIO']
+            for variacao in variacoes:
+                encontradas = [c for c in colunas if c.upper().strip() == variacao.upper().strip()]
+                if encontradas and not candidatas:
+                    print(f"  ✅ Encontrado '{encontradas[0]}' como variação de NOMECOMPLETO")
+                candidatas += encontradas
         
-        for idx, (_, row) in enumerate(self.df.iterrows()):
-            # Detecta gênero pelo nome se não tiver coluna GENERO
-            genero = ''
-            nome_para_genero = str(row.get('NOMECOMPLETO', '')) or str(row.get('NOME_FUNCIONARIO', ''))
-            if nome_para_genero:
-                genero = GeneroDetector.detectar(nome_para_genero)
-            
-            # Salva TODAS as colunas originais da planilha em um JSON
-            # MANTÉM A ORDEM ORIGINAL DAS COLUNAS
-            # Busca valores no DataFrame ORIGINAL (antes de normalizar)
-            dados_originais_dict = OrderedDict()  # Usa OrderedDict para manter ordem
-            for col_original in self.colunas_originais:
-                # Busca o valor no DataFrame original (pelo índice da linha)
+        melhor_match = self._encontrar_coluna_similar(col_normalizada, colunas, threshold=0.75)
+        if melhor_match:
+            candidatas.append(melhor_match[0])
+        
+        return list(OrderedDict.fromkeys(candidatas))
+    
+    def _coluna_campo(self, col_normalizada: str, default=''):
+        """Por linha, o primeiro valor preenchido entre as colunas candidatas (ou o default)"""
+        resultado = np.full(len(self.df), default, dtype=object)
+        pendentes = np.ones(len(self.df), dtype=bool)
+        for col in self._colunas_candidatas(col_normalizada):
+            valores, validos = self._valores_linha(col)
+            usar = pendentes & validos
+            resultado[usar] = valores[usar]
+            pendentes &= ~usar
+        return resultado
+    
+    @staticmethod
+    def _para_float(valores: np.ndarray, default=0) -> List[Any]:
+        def converter(val):
+            if val is not None and pd.notna(val):
                 try:
-                    # Pega o valor da linha original usando o índice
-                    row_original = self.df_original.iloc[idx]
-                    valor = row_original[col_original] if col_original in row_original.index else None
+                    return float(val)
                 except:
-                    # Se der erro, tenta buscar na coluna normalizada
-                    try:
-                        col_busca = mapeamento_colunas.get(col_original, col_original)
-                        if col_busca and col_busca in self.df.columns:
-                            valor = row.get(col_busca)
-                        else:
-                            valor = None
-                    except:
-                        valor = None
-                
-                # Converte valores para tipos Python nativos (serializável em JSON)
-                if valor is None or (isinstance(valor, (int, float)) and pd.isna(valor)):
-                    dados_originais_dict[col_original] = None
-                elif isinstance(valor, pd.Timestamp):
-                    dados_originais_dict[col_original] = valor.strftime('%Y-%m-%d') if not pd.isna(valor) else None
-                elif isinstance(valor, (int, float)):
-                    dados_originais_dict[col_original] = float(valor) if not pd.isna(valor) else None
-                else:
-                    dados_originais_dict[col_original] = str(valor) if valor is not None else None
-            
-            # Mapeia campos da planilha padronizada - busca valores nas colunas normalizadas
-            def get_valor(col_normalizada, default=''):
-                if not col_normalizada:
                     return default
-                
-                # Tenta match exato primeiro (case-insensitive)
-                for col_df in self.df.columns:
-                    if col_df.upper().strip() == col_normalizada.upper().strip():
-                        valor = row.get(col_df)
-                        if valor is not None and pd.notna(valor) and str(valor).strip():
-                            return valor
-                
-                # Se não encontrou, tenta variações do nome (sem espaços/underscores/hífens)
-                col_upper_clean = col_normalizada.upper().replace(' ', '').replace('_', '').replace('-', '')
-                for col_df in self.df.columns:
-                    col_df_clean = col_df.upper().replace(' ', '').replace('_', '').replace('-', '')
-                    if col_df_clean == col_upper_clean:
-                        valor = row.get(col_df)
-                        if valor is not None and pd.notna(valor) and str(valor).strip():
-                            return valor
-                
-                # Para NOMECOMPLETO, tenta variações específicas
-                if col_normalizada.upper() == 'NOMECOMPLETO':
-                    variacoes = ['NOME COMPLETO', 'NOME_COMPLETO', 'NOMEFUNCIONARIO', 'NOME FUNCIONARIO', 'NOME_FUNCIONARIO', 'FUNCIONARIO', 'FUNCIONÁRIO']
-                    for variacao in variacoes:
-                        for col_df in self.df.columns:
-                            if col_df.upper().strip() == variacao.upper().strip():
-                                valor = row.get(col_df)
-                                if valor is not None and pd.notna(valor) and str(valor).strip():
-                                    print(f"  ✅ Encontrado '{col_df}' como variação de NOMECOMPLETO")
-                                    return valor
-                
-                # Tenta fuzzy matching como último recurso
-                melhor_match = self._encontrar_coluna_similar(col_normalizada, list(self.df.columns), threshold=0.75)
-                if melhor_match:
-                    valor = row.get(melhor_match[0])
-                    if valor is not None and pd.notna(valor) and str(valor).strip():
-                        return valor
-                
-                return default
+            return default
+        return [converter(v) for v in valores]
+    
+    def processar(self) -> List[Dict[str, Any]]:
+        """Processa a planilha completa (coluna a coluna, sem iterar o DataFrame linha a linha)"""
+        return [registro for lote in self.processar_em_lotes() for registro in lote]
+    
+    def processar_em_lotes(self, tamanho_lote: int = DEFAULT_BATCH_ROWS):
+        """
+        Processa a planilha lote a lote e devolve (yield) a lista de registros de cada
+        lote; a memória fica limitada ao lote, qualquer que seja o tamanho da planilha.
+        
+        Os lotes têm os mesmos tipos de coluna da leitura inteira, então os registros
+        são os mesmos de processar(). Exceção: planilha sem nenhuma coluna de texto,
+        em que o tipo comum da linha (int/float) pode variar de um lote para outro.
+        """
+        colunas_padronizadas = None
+        primeiro_lote = True
+        for lote in self.ler_planilha_em_lotes(tamanho_lote):
+            self.df = lote
+            # Guarda os nomes originais das colunas ANTES de qualquer processamento
+            # IMPORTANTE: mantém a ordem original
+            self.colunas_originais = list(self.df.columns)
             
-            def get_valor_float(col_normalizada, default=0):
-                val = get_valor(col_normalizada, None)
-                if val is not None and pd.notna(val):
-                    try:
-                        return float(val)
-                    except:
-                        return default
-                return default
+            # dados_originais saem da planilha crua, antes de normalizar (dispensa copiar o DataFrame)
+            originais_por_indice = dict(zip(self.df.index, self._dados_originais_por_linha()))
             
-            if idx == 0:  # Apenas na primeira linha para não poluir logs
-                print(f"🔍 Verificando colunas disponíveis para primeira linha:")
-                print(f"   Colunas no DataFrame: {list(self.df.columns)}")
-                print(f"   Procurando por 'NOMECOMPLETO': {'NOMECOMPLETO' in self.df.columns}")
-                valor_nome = get_valor('NOMECOMPLETO', '')
-                print(f"   Valor encontrado para NOMECOMPLETO: '{valor_nome}'")
+            # Todos os lotes têm as mesmas colunas: padroniza (e loga) só no primeiro
+            if colunas_padronizadas is None:
+                self.padronizar_colunas()
+                colunas_padronizadas = list(self.df.columns)
+                print(f"📊 Colunas após padronização: {colunas_padronizadas}")
+            else:
+                self.df.columns = colunas_padronizadas
             
-            registro = {
-                # Campos principais da planilha padronizada
-                'nomecompleto': str(get_valor('NOMECOMPLETO', '')),
-                'descricao_atestad': str(get_valor('DESCRICAO_ATESTAD', '')),
-                'dias_atestados': get_valor_float('DIAS_ATESTADOS', 0),
-                'cid': str(get_valor('CID', '')),
-                'diagnostico': str(get_valor('DIAGNOSTICO', '')),
-                'centro_custo': str(get_valor('CENTRO_CUSTO', '')),
-                'setor': str(get_valor('SETOR', '')),
-                'motivo_atestado': str(get_valor('MOTIVO_ATESTADO', '')),
-                'escala': str(get_valor('ESCALA', '')),
-                'horas_dia': get_valor_float('HORAS_DIA', 0),
-                'horas_perdi': get_valor_float('HORAS_PERDI', 0),
-                
-                # Campos legados (para compatibilidade)
-                'nome_funcionario': str(get_valor('NOMECOMPLETO', '')),
-                'cpf': str(get_valor('CPF', '')),
-                'matricula': str(get_valor('MATRICULA', '')),
-                'cargo': str(get_valor('CARGO', '')),
-                'genero': genero,
-                'data_afastamento': get_valor('DATA_AFASTAMENTO', None),
-                'data_retorno': get_valor('DATA_RETORNO', None),
-                'tipo_info_atestado': int(get_valor_float('TIPO_INFO_ATESTADO', 0)) if get_valor('TIPO_INFO_ATESTADO', None) else None,
-                'tipo_atestado': str(get_valor('TIPO_ATESTADO', '')),
-                'descricao_cid': str(get_valor('DIAGNOSTICO', '')),
-                'numero_dias_atestado': get_valor_float('DIAS_ATESTADOS', 0),
-                'numero_horas_atestado': get_valor_float('HORAS_DIA', 0),
-                'dias_perdidos': get_valor_float('DIAS_ATESTADOS', 0),
-                'horas_perdidas': get_valor_float('HORAS_PERDI', 0),
-                
-                # Salva dados originais com TODAS as colunas na ordem original
-                'dados_originais': json.dumps(dados_originais_dict, ensure_ascii=False, default=str),
-            }
+            self.limpar_dados()
+            self.calcular_metricas()
+            
+            if self.df.empty:
+                continue
+            
+            yield self._registros_do_lote(originais_por_indice, detalhar=primeiro_lote)
+            primeiro_lote = False
+    
+    def _registros_do_lote(self, originais_por_indice: Dict[Any, Dict[str, Any]], detalhar: bool = True) -> List[Dict[str, Any]]:
+        """Monta os registros do DataFrame atual (já padronizado e limpo)"""
+        self._dtype_linha = self._dtype_comum_linha(self.df)
+        self._cache_linhas = {}
+        
+        campos_texto = {}
+        for campo in ('NOMECOMPLETO', 'DESCRICAO_ATESTAD', 'CID', 'DIAGNOSTICO', 'CENTRO_CUSTO', 'SETOR',
+                      'MOTIVO_ATESTADO', 'ESCALA', 'CPF', 'MATRICULA', 'CARGO', 'TIPO_ATESTADO'):
+            campos_texto[campo] = [str(v) for v in self._coluna_campo(campo, '')]
+        
+        campos_numero = {}
+        for campo in ('DIAS_ATESTADOS', 'HORAS_DIA', 'HORAS_PERDI'):
+            campos_numero[campo] = self._para_float(self._coluna_campo(campo, None), 0)
+        
+        tipo_info = self._coluna_campo('TIPO_INFO_ATESTADO', None)
+        tipo_info = [int(f) if v else None for v, f in zip(tipo_info, self._para_float(tipo_info, 0))]
+        
+        # Detecta gênero pelo nome (uma vez por nome distinto)
+        nomes = pd.Series([''] * len(self.df), dtype=object)
+        for col_nome in ('NOME_FUNCIONARIO', 'NOMECOMPLETO'):
+            if col_nome in self.df.columns:
+                texto = pd.Series([str(v) for v in self._valores_linha(col_nome)[0]], dtype=object)
+                nomes = texto.where(texto != '', nomes)
+        generos = nomes.map({nome: GeneroDetector.detectar(nome) if nome else '' for nome in nomes.unique()})
+        
+        if detalhar:
+            print(f"🔍 Verificando colunas disponíveis para primeira linha:")
+            print(f"   Colunas no DataFrame: {list(self.df.columns)}")
+            print(f"   Procurando por 'NOMECOMPLETO': {'NOMECOMPLETO' in self.df.columns}")
+            print(f"   Valor encontrado para NOMECOMPLETO: '{campos_texto['NOMECOMPLETO'][0]}'")
+        
+        colunas_registro = OrderedDict([
+            # Campos principais da planilha padronizada
+            ('nomecompleto', campos_texto['NOMECOMPLETO']),
+            ('descricao_atestad', campos_texto['DESCRICAO_ATESTAD']),
+            ('dias_atestados', campos_numero['DIAS_ATESTADOS']),
+            ('cid', campos_texto['CID']),
+            ('diagnostico', campos_texto['DIAGNOSTICO']),
+            ('centro_custo', campos_texto['CENTRO_CUSTO']),
+            ('setor', campos_texto['SETOR']),
+            ('motivo_atestado', campos_texto['MOTIVO_ATESTADO']),
+            ('escala', campos_texto['ESCALA']),
+            ('horas_dia', campos_numero['HORAS_DIA']),
+            ('horas_perdi', campos_numero['HORAS_PERDI']),
+            
+            # Campos legados (para compatibilidade)
+            ('nome_funcionario', campos_texto['NOMECOMPLETO']),
+            ('cpf', campos_texto['CPF']),
+            ('matricula', campos_texto['MATRICULA']),
+            ('cargo', campos_texto['CARGO']),
+            ('genero', generos.tolist()),
+            ('data_afastamento', list(self._coluna_campo('DATA_AFASTAMENTO', None))),
+            ('data_retorno', list(self._coluna_campo('DATA_RETORNO', None))),
+            ('tipo_info_atestado', tipo_info),
+            ('tipo_atestado', campos_texto['TIPO_ATESTADO']),
+            ('descricao_cid', campos_texto['DIAGNOSTICO']),
+            ('numero_dias_atestado', campos_numero['DIAS_ATESTADOS']),
+            ('numero_horas_atestado', campos_numero['HORAS_DIA']),
+            ('dias_perdidos', campos_numero['DIAS_ATESTADOS']),
+            ('horas_perdidas', campos_numero['HORAS_PERDI']),
+        ])
+        chaves = list(colunas_registro.keys())
+        
+        # Converte para lista de dicionários
+        registros = []
+        for indice, valores in zip(self.df.index, zip(*colunas_registro.values())):
+            registro = dict(zip(chaves, valores))
+            dados_originais_dict = originais_por_indice[indice]
+            # Salva dados originais com TODAS as colunas na ordem original
+            registro['dados_originais'] = json.dumps(dados_originais_dict, ensure_ascii=False, default=str)
+            # Coerência, admissão e ano/mês da planilha extraídos uma vez para colunas tipadas
+            registro.update(extrair_campos_derivados(dados_originais_dict))
             registros.append(registro)
         
         return registros
@@ -34,7 +34,11 @@ from backend.performance.effectiveness_service import _delta
 from backend.performance.performance_service import PerformanceService
 from backend.performance.schemas import ActionCounts, Conditionant
 from backend.services.data_quality_service import DataQualityService
-from backend.services.metric_service import MetricService
+from backend.services.metric_service import (
+    MetricasParciais,
+    MetricService,
+    validate_period_range,
+)
 from backend.services.shadow_compare import assert_no_pii_in_payload
 
 
@@ -162,8 +166,13 @@ class ExecutiveAggregateService:
         base_fim = _month_add(periodo_inicio, -1)
         base_inicio = _month_add(base_fim, -(span - 1))
 
-        cur = self.metrics.compute(
+        # Uma leitura (mês a mês) cobre baseline + janela atual; atual, baseline e
+        # série são mesclas dessas parciais, sem nova consulta por janela/mês.
+        validate_period_range(periodo_inicio, periodo_fim)
+        parciais = self.metrics.compute_monthly_partials(client_id, base_inicio, periodo_fim)
+        cur = self.metrics.compute_from_partials(
             client_id,
+            parciais,
             periodo_inicio,
             periodo_fim,
             efetivo_trabalhadores=efetivo_trabalhadores,
@@ -171,8 +180,9 @@ class ExecutiveAggregateService:
             small_group_threshold=SMALL_GROUP_THRESHOLD,
         )
         try:
-            base = self.metrics.compute(
+            base = self.metrics.compute_from_partials(
                 client_id,
+                parciais,
                 base_inicio,
                 base_fim,
                 efetivo_trabalhadores=efetivo_trabalhadores,
@@ -187,7 +197,7 @@ class ExecutiveAggregateService:
 
         cur_dict = _metrics_to_dict(cur, client_id, periodo_inicio, periodo_fim)
         cur_dict["serie_temporal"] = self._build_temporal_series(
-            client_id, periodo_inicio, periodo_fim, efetivo_trabalhadores
+            client_id, periodo_inicio, periodo_fim, efetivo_trabalhadores, parciais
         )
 
         # Staging-only demo enrichment (never production). Explicit env gate.
@@ -833,14 +843,16 @@ class ExecutiveAggregateService:
         periodo_inicio: str,
         periodo_fim: str,
         efetivo_trabalhadores: int | None,
+        parciais: dict[Optional[str], MetricasParciais],
     ) -> list[dict]:
-        """Month-by-month events/days via MetricService (no JS formulas)."""
+        """Month-by-month events/days via MetricService partials (no JS formulas)."""
         out = []
         cur = periodo_inicio
         while cur <= periodo_fim:
             try:
-                m = self.metrics.compute(
+                m = self.metrics.compute_from_partials(
                     client_id,
+                    parciais,
                     cur,
                     cur,
                     efetivo_trabalhadores=efetivo_trabalhadores,
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 
@@ -20,7 +20,8 @@ from backend.executive import (
 )
 from backend.executive.aggregate_service import ExecutiveAggregateService
 from backend.executive.questions import QUESTIONS
-from backend.models import User
+from backend.http_cache import resposta_condicional
+from backend.models import Client, User
 from backend.tenant import resolve_authorized_client
 
 
@@ -36,6 +37,16 @@ def _resolve_client_id(
         raise HTTPException(status_code=403, detail=str(exc)) from exc
 
 
+def _not_modified(
+    request: Request, response: Response, db: Session, client_id: int
+) -> Optional[Response]:
+    """ETag from the client's data_version; 304 when If-None-Match still matches."""
+    client = db.get(Client, client_id)  # already loaded by resolve_authorized_client
+    if client is None:
+        return None
+    return resposta_condicional(request, response, client)
+
+
 def register_executive_routes(app, frontend_dir: str) -> None:
     """Register /executive page + /api/executive/* only when flag is on."""
     if not is_executive_ui_enabled():
@@ -75,6 +86,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/command-center")
     def command_center(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -83,6 +96,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         try:
             return ExecutiveAggregateService(db).build_command_center(
                 client_id=cid,
@@ -99,6 +115,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/analytics")
     def analytics(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -107,6 +125,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         payload = ExecutiveAggregateService(db).build_command_center(
             client_id=cid,
             periodo_inicio=periodo_inicio,
@@ -128,6 +149,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/cost")
     def cost(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -136,6 +159,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         payload = ExecutiveAggregateService(db).build_command_center(
             client_id=cid,
             periodo_inicio=periodo_inicio,
@@ -157,6 +183,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/questions/{qid}")
     def question_answer(
+        request: Request,
+        response: Response,
         qid: str,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
@@ -166,6 +194,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         return ExecutiveAggregateService(db).answer_executive_question(
             qid,
             client_id=cid,
@@ -176,6 +207,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/analyze/{analysis_id}")
     def analyze(
+        request: Request,
+        response: Response,
         analysis_id: str,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
@@ -185,6 +218,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         return ExecutiveAggregateService(db).analyze(
             analysis_id,
             client_id=cid,
@@ -195,6 +231,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/presentation")
     def presentation_api(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -208,6 +246,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
                 detail=f"{PRESENTATION_FLAG_ENV} desabilitada",
             )
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         return ExecutiveAggregateService(db).build_presentation(
             client_id=cid,
             periodo_inicio=periodo_inicio,
@@ -217,6 +258,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/intelligence")
     def intelligence(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -225,6 +268,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         payload = ExecutiveAggregateService(db).build_command_center(
             client_id=cid,
             periodo_inicio=periodo_inicio,
@@ -241,6 +287,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/action-plan")
     def action_plan(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -249,6 +297,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         payload = ExecutiveAggregateService(db).build_command_center(
             client_id=cid,
             periodo_inicio=periodo_inicio,
@@ -274,6 +325,8 @@ def register_executive_routes(app, frontend_dir: str) -> None:
 
     @router.get("/performance")
     def performance(
+        request: Request,
+        response: Response,
         periodo_inicio: Optional[str] = Query(None),
         periodo_fim: Optional[str] = Query(None),
         client_id: Optional[int] = Query(None),
@@ -282,6 +335,9 @@ def register_executive_routes(app, frontend_dir: str) -> None:
         current_user: User = Depends(get_current_active_user),
     ):
         cid = _resolve_client_id(db, current_user, client_id)
+        not_modified = _not_modified(request, response, db, cid)
+        if not_modified is not None:
+            return not_modified
         payload = ExecutiveAggregateService(db).build_command_center(
             client_id=cid,
             periodo_inicio=periodo_inicio,
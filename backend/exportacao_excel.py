@@ -0,0 +1,84 @@
+"""
+Linhas da aba "Dados Completos" do /api/export/excel.
+
+Consulta projetada (só as colunas da planilha, sem dados_originais) lida em lotes
+com yield_per: o cursor do banco entrega as linhas aos poucos e nenhum Atestado
+entra na sessão. O gerador produz um dict por linha para o ReportGenerator, que
+escreve cada uma direto na planilha write_only — a memória não cresce com o
+número de registros exportados.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from .models import Atestado, Upload
+
+LOTE_PADRAO = 2000
+
+_COLUNAS_EXPORT = (
+    Atestado.id,
+    Atestado.nomecompleto,
+    Atestado.nome_funcionario,
+    Atestado.setor,
+    Atestado.cid,
+    Atestado.diagnostico,
+    Atestado.descricao_cid,
+    Atestado.dias_atestados,
+    Atestado.horas_perdi,
+    Atestado.motivo_atestado,
+    Atestado.escala,
+)
+
+
+def consulta_export(
+    db: Session,
+    client_id: int,
+    upload_id: Optional[int] = None,
+    mes: Optional[str] = None,
+    mes_inicio: Optional[str] = None,
+    mes_fim: Optional[str] = None,
+    funcionario: Optional[List[str]] = None,
+    setor: Optional[List[str]] = None,
+) -> Query:
+    """Consulta projetada com os mesmos filtros do export (upload > mês > intervalo)"""
+    query = (
+        db.query(*_COLUNAS_EXPORT)
+        .select_from(Atestado)
+        .join(Upload, Atestado.upload_id == Upload.id)
+        .filter(Upload.client_id == client_id)
+    )
+    if upload_id:
+        query = query.filter(Upload.id == upload_id)
+    elif mes:
+        query = query.filter(Upload.mes_referencia == mes)
+    elif mes_inicio and mes_fim:
+        query = query.filter(Upload.mes_referencia >= mes_inicio, Upload.mes_referencia <= mes_fim)
+
+    # Aplica filtros de funcionário e setor se fornecidos
+    if funcionario:
+        query = query.filter(Atestado.nomecompleto.in_(funcionario))
+    if setor:
+        query = query.filter(Atestado.setor.in_(setor))
+    return query.order_by(Atestado.id)
+
+
+def tem_linhas(query: Query) -> bool:
+    """Há ao menos um registro no filtro (sem ler o resto)"""
+    return query.limit(1).first() is not None
+
+
+def iterar_linhas(query: Query, lote: int = LOTE_PADRAO) -> Iterator[Dict[str, Any]]:
+    """Uma linha da aba "Dados Completos" por registro, lida em lotes de `lote`"""
+    for a in query.yield_per(lote):
+        yield {
+            'Nome': a.nomecompleto or a.nome_funcionario,
+            'Setor': a.setor,
+            'CID': a.cid,
+            'Diagnóstico': a.diagnostico or a.descricao_cid,
+            'Dias Atestados': a.dias_atestados or 0,
+            'Horas Perdidas': a.horas_perdi or 0,
+            'Motivo': a.motivo_atestado,
+            'Escala': a.escala,
+        }
@@ -0,0 +1,264 @@
+"""
+Gráficos nativos do PowerPoint (python-pptx) a partir das estruturas de dados_relatorio.
+
+Alternativa aos PNGs do matplotlib na apresentação: o gráfico vai como objeto de
+gráfico do Office, com os dados na planilha embutida — não há renderização raster,
+o arquivo fica menor e o cliente pode editar o gráfico.
+
+Cada método _gerar_grafico_* do ReportGenerator tem aqui um extrator com a mesma
+leitura dos dados (mesmos campos, mesmos cortes de TOP N, mesmas cores do cliente).
+Método sem extrator, ou dados que não se encaixam, devolvem None e a apresentação
+usa a imagem do matplotlib para aquele gráfico.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pptx.chart.data import CategoryChartData
+from pptx.dml.color import RGBColor
+from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+
+_TIPOS = {
+    'colunas': XL_CHART_TYPE.COLUMN_CLUSTERED,
+    'colunas_agrupadas': XL_CHART_TYPE.COLUMN_CLUSTERED,
+    'barras': XL_CHART_TYPE.BAR_CLUSTERED,
+    'linhas': XL_CHART_TYPE.LINE_MARKERS,
+    'pizza': XL_CHART_TYPE.PIE,
+    'rosca': XL_CHART_TYPE.DOUGHNUT,
+}
+_CIRCULARES = ('pizza', 'rosca')
+
+
+@dataclass
+class GraficoNativo:
+    """Gráfico de categorias pronto para o python-pptx"""
+    tipo: str
+    categorias: List[str]
+    series: List[Tuple[str, List[float]]]
+    # Uma cor por série (várias séries) ou uma por categoria (série única: barras/fatias)
+    cores_series: List[str] = field(default_factory=list)
+    cores_pontos: List[str] = field(default_factory=list)
+    formato_numero: str = '0'
+
+
+def _numero(valor: Any) -> float:
+    return float(valor or 0)
+
+
+def _alternadas(n: int, cor_par: str, cor_impar: str) -> List[str]:
+    return [cor_par if i % 2 == 0 else cor_impar for i in range(n)]
+
+
+def _ciclo(paleta: Sequence[str], n: int) -> List[str]:
+    return [paleta[i % len(paleta)] for i in range(n)] if paleta else []
+
+
+def _serie_unica(tipo: str, itens: List[Dict], rotulo: Callable[[Dict], str], campo: str,
+                 nome: str, cores_pontos: List[str], formato_numero: str = '0') -> GraficoNativo:
+    return GraficoNativo(
+        tipo=tipo,
+        categorias=[rotulo(item) for item in itens],
+        series=[(nome, [_numero(item.get(campo, 0)) for item in itens])],
+        cores_pontos=cores_pontos,
+        formato_numero=formato_numero,
+    )
+
+
+def _cids(dados, cores, paleta):
+    top10 = dados[:10]
+    return _serie_unica('barras', top10, lambda c: f"{c.get('cid', 'N/A')}", 'quantidade', 'Quantidade de Atestados',
+                        _alternadas(len(top10), cores['primary'], cores['secondary']))
+
+
+def _funcionarios(dados, cores, paleta):
+    top10 = dados[:10]
+    return _serie_unica('colunas', top10, lambda f: f.get('nome', 'N/A')[:20], 'dias_perdidos', 'Dias Perdidos',
+                        _alternadas(len(top10), cores['primary'], cores['secondary']))
+
+
+def _setores(dados, cores, paleta):
+    top10 = dados[:10]
+    return _serie_unica('colunas', top10, lambda s: s.get('setor', 'N/A')[:20], 'dias_perdidos', 'Dias Perdidos',
+                        _alternadas(len(top10), cores['primary'], cores['secondary']))
+
+
+def _evolucao(dados, cores, paleta):
+    meses = [e.get('mes', 'N/A')[-5:] if len(e.get('mes', '')) >= 5 else e.get('mes', 'N/A') for e in dados]
+    return GraficoNativo(
+        tipo='linhas',
+        categorias=meses,
+        series=[
+            ('Dias Perdidos', [_numero(e.get('dias_perdidos', 0)) for e in dados]),
+            ('Quantidade de Atestados', [_numero(e.get('quantidade', 0)) for e in dados]),
+        ],
+        cores_series=[cores['primary'], cores['secondary']],
+    )
+
+
+def _genero(dados, cores, paleta):
+    # Masculino primeiro, depois Feminino (mesma ordem do gráfico em imagem)
+    ordem = {'M': 0, 'F': 1}
+    itens = sorted(dados, key=lambda item: ordem.get(item.get('genero', ''), 2))
+    nomes = {'M': 'Masculino', 'F': 'Feminino'}
+    cor = {'M': cores['masculino'], 'F': cores['feminino']}
+    return GraficoNativo(
+        tipo='rosca',
+        categorias=[nomes.get(item.get('genero', ''), item.get('genero', '')) for item in itens],
+        series=[('Quantidade', [_numero(item.get('quantidade', 0)) for item in itens])],
+        cores_pontos=[cor.get(item.get('genero', ''), cores.get('primary', '#1a237e')) for item in itens],
+    )
+
+
+def _dias_doenca(dados, cores, paleta):
+    top5 = dados[:5]
+    return _serie_unica('colunas', top5, lambda d: d.get('descricao', d.get('cid', 'N/A'))[:30], 'dias_perdidos',
+                        'Dias Perdidos', _alternadas(len(top5), cores['secondary'], cores['secondaryLight']))
+
+
+def _escalas(dados, cores, paleta):
+    top10 = dados[:10]
+    return _serie_unica('barras', top10, lambda e: e.get('escala', 'N/A')[:25], 'quantidade', 'Quantidade de Atestados',
+                        _ciclo(paleta, len(top10)))
+
+
+def _motivos(dados, cores, paleta):
+    top10 = dados[:10]
+    return _serie_unica('pizza', top10, lambda m: m.get('motivo', 'N/A'), 'quantidade', 'Quantidade',
+                        _ciclo(paleta, len(top10)))
+
+
+def _distribuicao_dias(dados, cores, paleta):
+    return _serie_unica('colunas', dados, lambda d: str(d.get('faixa', d.get('dias', 'N/A'))), 'quantidade',
+                        'Quantidade de Atestados', _alternadas(len(dados), cores['primaryLight'], cores['secondary']))
+
+
+def _media_cid(dados, cores, paleta):
+    top10 = dados[:10]
+    return _serie_unica('barras', top10,
+                        lambda m: f"{m.get('cid', 'N/A')} - {m.get('diagnostico', m.get('descricao', ''))[:20]}",
+                        'media_dias', 'Média de Dias', _alternadas(len(top10), cores['primary'], cores['secondary']),
+                        formato_numero='0.0')
+
+
+def _setor_genero(dados, cores, paleta):
+    setores_map: Dict[str, Dict[str, float]] = {}
+    for item in dados:
+        por_genero = setores_map.setdefault(item.get('setor', 'N/A'), {'M': 0.0, 'F': 0.0})
+        genero = item.get('genero', '')
+        if genero in por_genero:
+            por_genero[genero] += _numero(item.get('dias_perdidos', 0))
+    # Ordena por total de dias e pega top 10
+    top10 = sorted(setores_map.items(), key=lambda x: x[1]['M'] + x[1]['F'], reverse=True)[:10]
+    return GraficoNativo(
+        tipo='colunas_agrupadas',
+        categorias=[setor[:25] for setor, _ in top10],
+        series=[('Masculino', [g['M'] for _, g in top10]), ('Feminino', [g['F'] for _, g in top10])],
+        cores_series=[cores.get('masculino', '#1a237e'), cores.get('feminino', '#556B2F')],
+    )
+
+
+def _dias_ano_coerencia(dados, cores, paleta):
+    anos = dados.get('anos', [])
+    return GraficoNativo(
+        tipo='colunas_agrupadas',
+        categorias=[str(ano) for ano in anos],
+        series=[
+            ('Coerente', [_numero(v) for v in dados.get('coerente', [])]),
+            ('Sem Coerência', [_numero(v) for v in dados.get('sem_coerencia', [])]),
+        ],
+        cores_series=[cores.get('primary', '#1a237e'), cores.get('secondary', '#808080')],
+    )
+
+
+def _analise_coerencia(dados, cores, paleta):
+    valores = [_numero(dados.get('coerente', 0)), _numero(dados.get('sem_coerencia', 0))]
+    if not any(valores):
+        return None
+    return GraficoNativo(
+        tipo='rosca',
+        categorias=['Coerente', 'Sem Coerência'],
+        series=[('Dias', valores)],
+        cores_pontos=[cores.get('primary', '#1a237e'), cores.get('secondary', '#808080')],
+    )
+
+
+# Método do ReportGenerator -> extrator
+_EXTRATORES: Dict[str, Callable[[Any, Dict[str, str], Sequence[str]], Optional[GraficoNativo]]] = {
+    '_gerar_grafico_cids': _cids,
+    '_gerar_grafico_funcionarios': _funcionarios,
+    '_gerar_grafico_setores': _setores,
+    '_gerar_grafico_evolucao': _evolucao,
+    '_gerar_grafico_genero': _genero,
+    '_gerar_grafico_dias_doenca': _dias_doenca,
+    '_gerar_grafico_escalas': _escalas,
+    '_gerar_grafico_motivos': _motivos,
+    '_gerar_grafico_distribuicao_dias': _distribuicao_dias,
+    '_gerar_grafico_media_cid': _media_cid,
+    '_gerar_grafico_setor_genero': _setor_genero,
+    '_gerar_grafico_dias_ano_coerencia': _dias_ano_coerencia,
+    '_gerar_grafico_analise_coerencia': _analise_coerencia,
+}
+
+
+def grafico_nativo(metodo: str, dados: Any, cores: Dict[str, str], paleta: Sequence[str]) -> Optional[GraficoNativo]:
+    """Versão nativa do gráfico do método, ou None (sem extrator / dados fora do formato)"""
+    extrator = _EXTRATORES.get(metodo)
+    if extrator is None or not dados:
+        return None
+    try:
+        grafico = extrator(dados, cores, paleta)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        print(f"[PPTX] Dados de {metodo} fora do formato do gráfico nativo: {e}")
+        return None
+    if grafico is None or not grafico.categorias:
+        return None
+    return grafico
+
+
+def _rgb(cor: str) -> RGBColor:
+    return RGBColor.from_string(cor.lstrip('#').upper())
+
+
+def adicionar_grafico_nativo(slide, grafico: GraficoNativo, x, y, cx, cy):
+    """Insere o gráfico no slide (dados na planilha embutida, cores do cliente)"""
+    dados = CategoryChartData(number_format=grafico.formato_numero)
+    dados.categories = grafico.categorias
+    for nome, valores in grafico.series:
+        dados.add_series(nome, valores)
+
+    chart = slide.shapes.add_chart(_TIPOS[grafico.tipo], x, y, cx, cy, dados).chart
+    chart.has_title = False  # o título fica no slide
+    circular = grafico.tipo in _CIRCULARES
+    chart.has_legend = circular or len(grafico.series) > 1
+    if chart.has_legend:
+        chart.legend.position = XL_LEGEND_POSITION.RIGHT if circular else XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+
+    plot = chart.plots[0]
+    plot.has_data_labels = True
+    rotulos = plot.data_labels
+    if circular:
+        rotulos.show_value = False
+        rotulos.show_percentage = True
+        rotulos.number_format = '0.0%'
+        rotulos.number_format_is_linked = False
+    else:
+        rotulos.number_format = grafico.formato_numero
+        rotulos.number_format_is_linked = False
+    if grafico.tipo == 'colunas_agrupadas':
+        plot.gap_width = 80
+
+    for serie, cor in zip(plot.series, grafico.cores_series):
+        if grafico.tipo == 'linhas':
+            serie.format.line.color.rgb = _rgb(cor)
+            serie.marker.format.fill.solid()
+            serie.marker.format.fill.fore_color.rgb = _rgb(cor)
+        else:
+            serie.format.fill.solid()
+            serie.format.fill.fore_color.rgb = _rgb(cor)
+    if grafico.cores_pontos:
+        serie = plot.series[0]
+        for i, cor in enumerate(grafico.cores_pontos):
+            ponto = serie.points[i]
+            ponto.format.fill.solid()
+            ponto.format.fill.fore_color.rgb = _rgb(cor)
+    return chart
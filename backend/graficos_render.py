@@ -0,0 +1,236 @@
+"""
+Renderização dos gráficos matplotlib dos relatórios (PDF, Excel e PowerPoint).
+
+Cada gráfico é independente (figura própria, savefig em PNG), então o lote de um
+relatório é distribuído num pool de processos — matplotlib não é seguro entre
+threads e o trabalho é de CPU. Com ABSENTEISMO_GRAFICOS_PROCESSOS <= 1 (ou uma CPU
+só) os gráficos são gerados em sequência no próprio processo, como antes.
+
+Os PNGs ficam num cache em disco endereçado pelo conteúdo: sha256 de (método do
+gráfico, dados em JSON canônico, cores/paleta/cliente, revisão do renderizador).
+A revisão (conteúdo de report_generator.py e deste módulo + versão do matplotlib)
+faz um deploy que muda o desenho dos gráficos deixar de servir PNGs antigos. Relatórios agendados e
+exportações repetidas com os mesmos dados reaproveitam a imagem; o arquivo pedido
+pelo relatório é sempre uma cópia, então o chamador continua livre para apagá-lo.
+A gravação no cache é atômica (os.replace), segura entre workers do gunicorn.
+
+Cada renderização devolve o tempo gasto por gráfico (ms e se veio do cache).
+"""
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# (chave no relatório, nome do método _gerar_grafico_*, dados, caminho de saída)
+PedidoGrafico = Tuple[str, str, Any, str]
+
+CACHE_MAX_ARQUIVOS = 500
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    return int(raw) if raw else default
+
+
+@functools.lru_cache(maxsize=1)
+def _revisao_renderizador() -> str:
+    """Resumo do código que desenha os gráficos e da versão do matplotlib"""
+    from importlib import metadata
+
+    h = hashlib.sha256()
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    for nome in ("report_generator.py", "graficos_render.py"):
+        with open(os.path.join(raiz, nome), "rb") as f:
+            h.update(f.read())
+    try:
+        h.update(metadata.version("matplotlib").encode())
+    except metadata.PackageNotFoundError:
+        pass
+    return h.hexdigest()[:16]
+
+
+def chave_cache(metodo: str, dados: Any, cores: Dict[str, str], paleta: Sequence[str], client_id: Optional[int]) -> str:
+    """Endereço do PNG: mesmo método + mesmos dados + mesmas cores + mesmo renderizador = mesma imagem"""
+    bruto = json.dumps(
+        [metodo, dados, cores, list(paleta), client_id, _revisao_renderizador()],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def _renderizar_no_processo(
+    metodo: str,
+    dados: Any,
+    caminho: str,
+    cores: Dict[str, str],
+    paleta: List[str],
+    client_id: Optional[int],
+) -> Tuple[Optional[str], float]:
+    """Executado no processo do pool (ou em sequência): gera um gráfico e mede o tempo"""
+    from .report_generator import ReportGenerator
+
+    inicio = time.perf_counter()
+    gerador = ReportGenerator.para_graficos(cores, paleta, client_id)
+    resultado = getattr(gerador, metodo)(dados, caminho)
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+class RenderizadorGraficos:
+    """Gera lotes de gráficos em paralelo, com cache de PNG por conteúdo"""
+
+    def __init__(self, processos: int = 0, cache_dir: Optional[str] = None, cache_max: int = CACHE_MAX_ARQUIVOS):
+        self.processos = processos
+        self.cache_dir = cache_dir
+        self.cache_max = cache_max
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def paralelo(self) -> bool:
+        return self.processos > 1
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: não copia o processo do servidor (threads, conexões abertas)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _caminho_cache(self, chave: str) -> Optional[str]:
+        if not self.cache_dir or self.cache_max <= 0:
+            return None
+        return os.path.join(self.cache_dir, f"{chave}.png")
+
+    def _guardar(self, origem: str, destino: str) -> None:
+        """Copia o PNG gerado para o cache (gravação atômica) e poda os mais antigos"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(suffix=".png", dir=self.cache_dir)
+            os.close(fd)
+            shutil.copyfile(origem, temporario)
+            os.replace(temporario, destino)
+            self._podar()
+        except OSError as e:
+            print(f"[GRAFICOS] Falha ao gravar no cache: {e}")
+
+    def _podar(self) -> None:
+        arquivos = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".png")]
+        excesso = len(arquivos) - self.cache_max
+        if excesso <= 0:
+            return
+        for entrada in sorted(arquivos, key=lambda e: e.stat().st_mtime)[:excesso]:
+            try:
+                os.remove(entrada.path)
+            except OSError:
+                pass
+
+    def renderizar(
+        self,
+        pedidos: Sequence[PedidoGrafico],
+        cores: Dict[str, str],
+        paleta: Sequence[str],
+        client_id: Optional[int],
+    ) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        """
+        Gera os gráficos pedidos. Retorna {chave: caminho} só dos que foram gerados
+        e o tempo de cada um ({'grafico', 'metodo', 'ms', 'cache', 'ok'}).
+        """
+        cores = dict(cores)
+        paleta = list(paleta)
+        gerados: Dict[str, str] = {}
+        tempos: List[Dict[str, Any]] = []
+        pendentes = []
+
+        for chave, metodo, dados, caminho in pedidos:
+            em_cache = self._caminho_cache(chave_cache(metodo, dados, cores, paleta, client_id))
+            if em_cache and os.path.exists(em_cache):
+                inicio = time.perf_counter()
+                try:
+                    shutil.copyfile(em_cache, caminho)
+                    os.utime(em_cache)  # mais recente para a poda
+                    gerados[chave] = caminho
+                    tempos.append({'grafico': chave, 'metodo': metodo, 'cache': True, 'ok': True,
+                                   'ms': round((time.perf_counter() - inicio) * 1000, 1)})
+                    continue
+                except OSError:
+                    pass
+            pendentes.append((chave, metodo, dados, caminho, em_cache))
+
+        if self.paralelo and len(pendentes) > 1:
+            executor = self._executor()
+            futuros = [
+                executor.submit(_renderizar_no_processo, metodo, dados, caminho, cores, paleta, client_id)
+                for _, metodo, dados, caminho, _ in pendentes
+            ]
+            resultados = []
+            for futuro in futuros:
+                try:
+                    resultados.append(futuro.result())
+                except Exception as e:
+                    print(f"[GRAFICOS] Erro no processo de renderização: {e}")
+                    resultados.append((None, 0.0))
+        else:
+            resultados = [
+                _renderizar_no_processo(metodo, dados, caminho, cores, paleta, client_id)
+                for _, metodo, dados, caminho, _ in pendentes
+            ]
+
+        for (chave, metodo, _, caminho, em_cache), (resultado, ms) in zip(pendentes, resultados):
+            ok = bool(resultado) and os.path.exists(caminho)
+            if ok:
+                gerados[chave] = caminho
+                if em_cache:
+                    self._guardar(caminho, em_cache)
+            tempos.append({'grafico': chave, 'metodo': metodo, 'cache': False, 'ok': ok, 'ms': round(ms, 1)})
+        return gerados, tempos
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+renderizador_graficos: Optional[RenderizadorGraficos] = None
+
+
+def get_renderizador_graficos() -> RenderizadorGraficos:
+    """
+    Renderizador do processo (criado na primeira chamada).
+
+    ABSENTEISMO_GRAFICOS_PROCESSOS: processos do pool (padrão: min(4, CPUs); <= 1 = sequencial).
+    ABSENTEISMO_GRAFICOS_CACHE: diretório do cache de PNG (padrão: cache_graficos ao lado do banco).
+    ABSENTEISMO_GRAFICOS_CACHE_MAX: máximo de PNGs no cache (0 desliga o cache).
+    """
+    global renderizador_graficos
+    if renderizador_graficos is None:
+        from .database import DB_PATH
+
+        cache_dir = (os.environ.get("ABSENTEISMO_GRAFICOS_CACHE") or "").strip() or os.path.join(
+            os.path.dirname(DB_PATH), "cache_graficos"
+        )
+        renderizador_graficos = RenderizadorGraficos(
+            processos=_env_int("ABSENTEISMO_GRAFICOS_PROCESSOS", min(4, os.cpu_count() or 1)),
+            cache_dir=cache_dir,
+            cache_max=_env_int("ABSENTEISMO_GRAFICOS_CACHE_MAX", CACHE_MAX_ARQUIVOS),
+        )
+    return renderizador_graficos
+
+
+def stop_renderizador_graficos() -> None:
+    global renderizador_graficos
+    if renderizador_graficos is not None:
+        renderizador_graficos.shutdown()
+        renderizador_graficos = None
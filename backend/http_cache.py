@@ -0,0 +1,94 @@
+"""
+ETags por cliente para as leituras de dashboard/apresentação/executivo.
+
+O ETag é derivado de (cliente, rota + filtros da query string, clients.data_version,
+data corrente, revisão do código). data_version sobe na mesma transação de qualquer
+alteração dos dados do cliente (ver cache_service._incrementar_data_version), então
+um If-None-Match igual ao ETag atual é respondido com 304 sem rodar as análises.
+O data_version lido para o ETag é registrado na sessão e entra na chave do cache
+das análises (cache_service.chave_cliente): o corpo servido é sempre o da versão do
+ETag, mesmo quando outro worker alterou os dados.
+
+- A data entra porque algumas análises dependem do dia (tempo de serviço, período padrão).
+- A revisão do código entra para que um deploy não sirva JSON antigo a um frontend novo.
+- ETag fraco (W/): o corpo pode variar de codificação (GZip) sem mudar o conteúdo.
+
+As respostas de /api continuam no-store (security_headers_middleware): quem guarda
+a última resposta e reenvia o ETag é o fetch de auth.js, em memória da aba.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+from datetime import date
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import object_session
+
+from .cache_service import registrar_versao_cliente
+from .models import Client
+
+
+@functools.lru_cache(maxsize=1)
+def _revisao_codigo() -> str:
+    """Resumo (caminho, mtime, tamanho) dos módulos do backend; muda a cada deploy"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    for pasta, subpastas, arquivos in os.walk(raiz):
+        subpastas[:] = sorted(d for d in subpastas if d != "__pycache__")
+        for nome in sorted(arquivos):
+            if nome.endswith(".py"):
+                st = os.stat(os.path.join(pasta, nome))
+                h.update(f"{os.path.relpath(os.path.join(pasta, nome), raiz)}:{st.st_mtime_ns}:{st.st_size};".encode())
+    return h.hexdigest()[:12]
+
+
+def etag_cliente(request: Request, client: Client) -> str:
+    """ETag da leitura `request` sobre os dados atuais do cliente"""
+    versao = int(client.data_version or 0)
+    partes = [
+        client.id,
+        versao,
+        client.created_at.isoformat() if client.created_at else None,  # ids reaproveitados
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        date.today().isoformat(),
+        _revisao_codigo(),
+    ]
+    resumo = hashlib.sha1(json.dumps(partes, default=str).encode()).hexdigest()[:16]
+    return f'W/"c{client.id}-v{versao}-{resumo}"'
+
+
+def etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca de If-None-Match (lista separada por vírgulas ou *)"""
+    if not if_none_match:
+        return False
+    alvo = etag[2:] if etag.startswith("W/") else etag
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*":
+            return True
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == alvo:
+            return True
+    return False
+
+
+def resposta_condicional(request: Request, response: Response, client: Client) -> Optional[Response]:
+    """
+    Coloca o ETag em `response`. Se o If-None-Match da requisição
+    corresponder, retorna a resposta 304 que o endpoint deve devolver em vez dos dados.
+    """
+    etag = etag_cliente(request, client)
+    db = object_session(client)
+    if db is not None:
+        # Corpo calculado no cache da mesma versão do ETag (não da geração local)
+        registrar_versao_cliente(db, client.id, client.data_version)
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
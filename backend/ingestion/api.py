@@ -160,9 +160,14 @@ async def import_preview(
     competencia: str = Form(...),
     token: str = Form(...),
     content_hash: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
 ) -> dict[str, Any]:
     try:
         ctx = _resolve_tenant(request, client_id)
+        # Re-sent file → full-file import (streamed); otherwise the stored preview rows
+        file_data = await file.read() if file is not None else None
+        if file_data is not None and len(file_data) > MAX_FILE_BYTES:
+            raise HTTPException(status_code=413, detail="file too large")
         with ingestion_repository_session() as repo:
             preview_svc = PreviewService(repo.conn, require_flag=True)
             imp = ImportService(repo.conn, preview_svc)
@@ -172,6 +177,7 @@ async def import_preview(
                 client_id=ctx.client_id,
                 competencia=competencia,
                 expected_content_hash=content_hash,
+                file_data=file_data,
             )
             return result.to_public_dict()
     except HTTPException:
@@ -7,7 +7,7 @@ import json
 import sqlite3
 import uuid
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Iterator
 
 from backend.ingestion import PIPELINE_VERSION, is_intelligent_ingestion_enabled
 from backend.ingestion.exceptions import (
@@ -17,9 +17,10 @@ from backend.ingestion.exceptions import (
     ReuploadBlockedError,
 )
 from backend.ingestion.file_fingerprint_service import FileFingerprintService
-from backend.ingestion.logging_utils import new_correlation_id, timed_step
+from backend.ingestion.logging_utils import new_correlation_id, safe_log, timed_step
 from backend.ingestion.preview_service import PreviewService
 from backend.ingestion.schemas import ImportResult, ReuploadClass
+from backend.ingestion.streaming_reader import DEFAULT_BATCH_ROWS, MemoryTracker, StreamingSpreadsheetReader
 
 
 class ImportService:
@@ -27,12 +28,23 @@ class ImportService:
     Import confirmed preview into ingestion_canonical_rows inside one transaction.
     Does NOT write to legacy atestados / uploads tables in this epic.
     Does NOT delete or replace prior competência data.
+
+    With ``file_data`` the whole file is streamed in batches of ``batch_rows``
+    (same sheet, header row and mapping as the preview); without it only the
+    rows stored with the preview (at most MAX_PREVIEW_ROWS) are imported.
     """
 
-    def __init__(self, conn: sqlite3.Connection, preview_service: PreviewService | None = None) -> None:
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        preview_service: PreviewService | None = None,
+        *,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+    ) -> None:
         self.conn = conn
         self.previews = preview_service or PreviewService(conn, require_flag=True)
         self.fp = FileFingerprintService()
+        self.batch_rows = batch_rows
 
     def import_preview(
         self,
@@ -43,6 +55,7 @@ class ImportService:
         competencia: str,
         expected_content_hash: str | None = None,
         expected_sha_partial: str | None = None,
+        file_data: bytes | None = None,
     ) -> ImportResult:
         if not is_intelligent_ingestion_enabled():
             raise FeatureDisabledError("ENABLE_INTELLIGENT_INGESTION is false")
@@ -68,6 +81,8 @@ class ImportService:
             raise ConfirmationError("content hash mismatch")
         if expected_sha_partial and not summary["sha256_raw_partial"].startswith(expected_sha_partial[:8]):
             raise ConfirmationError("file hash mismatch")
+        if file_data is not None and hashlib.sha256(file_data).hexdigest() != data["sha256_raw"]:
+            raise ConfirmationError("file differs from previewed file")
 
         reup = summary.get("reupload") or {}
         blocked = {
@@ -180,12 +195,14 @@ class ImportService:
                     (exec_uuid,),
                 ).fetchone()[0]
 
+                memory = MemoryTracker() if file_data is not None else None
                 inserted = 0
                 ignored = 0
                 errors = 0
-                for idx, (row, fp) in enumerate(
-                    zip(data["normalized_rows"], data["fingerprints"]), start=1
-                ):
+                alerts = 0
+                total = 0
+                for idx, (row, fp) in enumerate(self._canonical_rows(data, file_data, memory), start=1):
+                    total = idx
                     # Skip invalid required
                     def nv(field: str) -> Any:
                         v = row.get(field)
@@ -205,6 +222,8 @@ class ImportService:
                         )
                         ignored += 1
                         continue
+                    if any(isinstance(v, dict) and v.get("alert") for v in row.values()):
+                        alerts += 1
 
                     # Canonical payload without raw CPF plaintext
                     safe_payload = {}
@@ -246,16 +265,18 @@ class ImportService:
                 self.conn.execute(
                     """
                     UPDATE ingestion_executions
-                    SET finished_at = ?, status = 'succeeded', inserted_rows = ?, ignored_rows = ?,
-                        error_rows = ?, alert_rows = ?, safe_message = ?
+                    SET finished_at = ?, status = 'succeeded', total_rows = ?, valid_rows = ?,
+                        inserted_rows = ?, ignored_rows = ?, error_rows = ?, alert_rows = ?, safe_message = ?
                     WHERE id = ?
                     """,
                     (
                         finished,
+                        total,
+                        total - errors,
                         inserted,
                         ignored,
                         errors,
-                        summary["alert_rows"],
+                        alerts,
                         "import_succeeded",
                         eid,
                     ),
@@ -265,16 +286,20 @@ class ImportService:
                 self.previews._store_preview(data, preview_id=preview_id)
                 self.conn.commit()
 
+                report = memory.report().to_dict() if memory is not None else None
+                if report is not None:
+                    safe_log("import_memory", correlation_id=correlation_id, client_id=client_id, **report)
                 return ImportResult(
                     execution_id=exec_uuid,
                     status="succeeded",
                     inserted=inserted,
                     ignored=ignored,
-                    alerts=summary["alert_rows"],
+                    alerts=alerts,
                     errors=errors,
                     idempotent=False,
                     message="import committed",
                     correlation_id=correlation_id,
+                    memory=report,
                 )
         except Exception as exc:
             self.conn.rollback()
@@ -293,6 +318,34 @@ class ImportService:
                 pass
             raise
 
+    def _canonical_rows(
+        self,
+        preview: dict[str, Any],
+        file_data: bytes | None,
+        memory: MemoryTracker | None,
+    ) -> Iterator[tuple[dict[str, Any], str]]:
+        """(normalized row, line fingerprint) pairs: the whole file when given, else the preview rows."""
+        if file_data is None:
+            yield from zip(preview["normalized_rows"], preview["fingerprints"])
+            return
+
+        summary = preview["summary"]
+        fields = [m.get("campo_canonico") for m in summary["mapping"]]
+        reader = StreamingSpreadsheetReader(self.batch_rows)
+        batches = reader.iter_row_batches(
+            file_data,
+            filename=summary["file_name"],
+            sheet=summary["aba"],
+            start_row=summary["header_row"] + 1,
+        )
+        for batch in memory.track(batches) if memory is not None else batches:
+            for raw in batch:
+                norm_row = self.previews.normalize_data_row(raw, fields, summary["competencia"])
+                if norm_row is None:
+                    continue
+                row = {k: v.to_dict() for k, v in norm_row.items()}
+                yield row, self.fp.line_fingerprint(row)
+
     def get_execution(self, execution_id: str, *, client_id: int) -> dict[str, Any]:
         row = self.conn.execute(
             """
@@ -26,7 +26,7 @@ from backend.ingestion.normalization_service import NormalizationService
 from backend.ingestion.pii_mask import mask_row
 from backend.ingestion.raw_file_service import RawFileService
 from backend.ingestion.reupload_detection_service import ReuploadDetectionService
-from backend.ingestion.schemas import PreviewSummary
+from backend.ingestion.schemas import NormalizedValue, PreviewSummary
 from backend.ingestion.spreadsheet_reader import SpreadsheetReader
 
 
@@ -137,16 +137,11 @@ class PreviewService:
         with_id = 0
         with_hours = 0
 
+        fields = [m.campo_canonico for m in mappings]
         for row in data_rows:
-            if not any(c is not None and str(c).strip() for c in row):
+            norm_row = self.normalize_data_row(row, fields, competencia)
+            if norm_row is None:
                 continue
-            mapped: dict[str, Any] = {}
-            for i, m in enumerate(mappings):
-                if m.campo_canonico and i < len(row):
-                    mapped[m.campo_canonico] = row[i]
-            if "mes_referencia" not in mapped:
-                mapped["mes_referencia"] = competencia
-            norm_row = self.norm.normalize_row(mapped)
             # classify
             has_alert = any(nv.alert for nv in norm_row.values())
             required_ok = all(
@@ -267,6 +262,23 @@ class PreviewService:
         self._store_preview(payload)
         return summary
 
+    def normalize_data_row(
+        self,
+        row: list[Any],
+        fields: list[str | None],
+        competencia: str,
+    ) -> dict[str, NormalizedValue] | None:
+        """Canonical row for one data row (``fields[i]`` maps column i); None when blank."""
+        if not any(c is not None and str(c).strip() for c in row):
+            return None
+        mapped: dict[str, Any] = {}
+        for i, field_name in enumerate(fields):
+            if field_name and i < len(row):
+                mapped[field_name] = row[i]
+        if "mes_referencia" not in mapped:
+            mapped["mes_referencia"] = competencia
+        return self.norm.normalize_row(mapped)
+
     def get_preview(self, preview_id: str) -> dict[str, Any]:
         data = self._load_preview(preview_id)
         if not data:
@@ -161,6 +161,7 @@ class ImportResult:
     idempotent: bool
     message: str
     correlation_id: str
+    memory: dict[str, Any] | None = None  # MemoryReport of a full-file import
 
     def to_public_dict(self) -> dict[str, Any]:
         return asdict(self)
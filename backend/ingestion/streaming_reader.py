@@ -0,0 +1,391 @@
+"""Streaming spreadsheet / CSV reading — bounded memory, batches of rows.
+
+``SpreadsheetReader`` stops at ``MAX_PREVIEW_ROWS``; this reader walks the whole
+file with openpyxl ``read_only`` (or ``csv.reader`` over a lazy text stream) and
+yields fixed-size batches, so the caller never holds the full sheet.
+
+Two flavours:
+
+* ``iter_row_batches`` — raw cell values, formula-like cells rejected exactly as
+  in the preview path. Used by ``ImportService`` for full-file imports.
+* ``iter_dataframes`` — ``pandas.DataFrame`` batches equivalent to slicing
+  ``pd.read_excel(path, sheet_name=0)``: same columns, same values and the same
+  dtype in every batch. Used by the legacy ``ExcelProcessor``.
+
+``MemoryTracker`` samples the process RSS at batch boundaries so each upload can
+report its own memory profile.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import pickle
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TypeVar, Union
+
+from backend.ingestion.exceptions import (
+    AmbiguousStructureError,
+    EmptyFileError,
+    LimitExceededError,
+    UnsupportedFormatError,
+)
+from backend.ingestion.limits import MAX_SHEETS
+from backend.ingestion.spreadsheet_reader import _detect_delimiter, _detect_encoding, _sanitize_grid
+
+DEFAULT_BATCH_ROWS = 1000
+
+Source = Union[str, "os.PathLike[str]", bytes]
+T = TypeVar("T")
+
+_CONFLICT = object()
+
+_MB = 1024 * 1024
+
+
+def current_rss_bytes() -> int | None:
+    """Resident set size of this process (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(value: int | None) -> float | None:
+    return round(value / _MB, 1) if value is not None else None
+
+
+@dataclass
+class MemoryReport:
+    rss_start_mb: float | None
+    rss_peak_mb: float | None
+    rss_end_mb: float | None
+    rows: int
+    batches: int
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class MemoryTracker:
+    """Track RSS of one upload; sampled whenever a batch goes through ``track``."""
+
+    def __init__(self) -> None:
+        self.start = current_rss_bytes()
+        self.peak = self.start
+        self.rows = 0
+        self.batches = 0
+
+    def sample(self) -> int | None:
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return rss
+
+    def track(self, batches: Iterable[T]) -> Iterator[T]:
+        for batch in batches:
+            self.sample()
+            self.rows += len(batch)  # type: ignore[arg-type]
+            self.batches += 1
+            yield batch
+
+    def report(self) -> MemoryReport:
+        end = self.sample()
+        return MemoryReport(
+            rss_start_mb=_mb(self.start),
+            rss_peak_mb=_mb(self.peak),
+            rss_end_mb=_mb(end),
+            rows=self.rows,
+            batches=self.batches,
+        )
+
+
+def _format_for(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".xlsx"):
+        return "xlsx"
+    raise UnsupportedFormatError("unsupported spreadsheet format")
+
+
+def _pandas_cell(cell: Any) -> Any:
+    """Same conversion as pandas' openpyxl reader (``OpenpyxlReader._convert_cell``)."""
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return float("nan")
+    if cell.data_type == TYPE_NUMERIC:
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+
+def _common_dtype(a: Any, b: Any) -> Any:
+    """
+    Dtype of a column whose batches parsed as ``a`` and ``b`` (None = all-NA so far).
+    Returns ``_CONFLICT`` when only a parse of the whole column can tell.
+    """
+    import numpy as np
+
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    if isinstance(a, np.dtype) and isinstance(b, np.dtype) and {a.kind, b.kind} <= {"i", "u", "f"}:
+        return np.dtype("float64")
+    return _CONFLICT
+
+
+def _final_dtype(dtype: Any, has_na: bool) -> Any:
+    """Dtype the parser infers for the whole column, given the combined batch dtype."""
+    import numpy as np
+
+    if dtype is None:
+        return np.dtype("float64")
+    if isinstance(dtype, np.dtype) and has_na and dtype.kind in "iub":
+        # Integers and booleans next to a blank cell are parsed as float (True -> 1.0)
+        return np.dtype("float64")
+    return dtype
+
+
+class StreamingSpreadsheetReader:
+    """Read .xlsx / .csv in batches of ``batch_rows`` rows without loading the whole sheet."""
+
+    def __init__(self, batch_rows: int = DEFAULT_BATCH_ROWS) -> None:
+        if batch_rows < 1:
+            raise ValueError("batch_rows must be >= 1")
+        self.batch_rows = batch_rows
+
+    # -- raw rows (ingestion pipeline) ---------------------------------------
+
+    def iter_row_batches(
+        self,
+        source: Source,
+        *,
+        filename: str,
+        sheet: str | int | None = None,
+        start_row: int = 0,
+    ) -> Iterator[list[list[Any]]]:
+        """Batches of raw rows from ``start_row`` on, sanitized like the preview grid."""
+        fmt = _format_for(filename)
+        rows = self._xlsx_values(source, sheet) if fmt == "xlsx" else self._csv_rows(source)
+        batch: list[list[Any]] = []
+        for i, row in enumerate(rows):
+            if i < start_row:
+                continue
+            batch.append(row)
+            if len(batch) >= self.batch_rows:
+                yield _sanitize_grid(batch)
+                batch = []
+        if batch:
+            yield _sanitize_grid(batch)
+
+    def _xlsx_values(self, source: Source, sheet: str | int | None) -> Iterator[list[Any]]:
+        # data_only=False — formulas come back as strings and are rejected by _sanitize_grid
+        wb = self._open_workbook(source, data_only=False)
+        try:
+            if len(wb.sheetnames) > MAX_SHEETS:
+                raise LimitExceededError(f"sheet limit {MAX_SHEETS} exceeded")
+            ws = self._worksheet(wb, sheet)
+            for row in ws.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            wb.close()
+
+    def _csv_rows(self, source: Source) -> Iterator[list[str]]:
+        data = source if isinstance(source, bytes) else Path(source).read_bytes()
+        encoding, _ = _detect_encoding(data)
+        head = data[:64 * 1024].decode(encoding, errors="replace").splitlines()
+        if not head or all(not ln.strip() for ln in head):
+            raise EmptyFileError("CSV is empty")
+        delimiter, _ = _detect_delimiter(head[:50])
+        text = io.TextIOWrapper(io.BytesIO(data), encoding=encoding, errors="replace", newline="")
+        for row in csv.reader(text, delimiter=delimiter):
+            yield list(row)
+
+    # -- pandas batches (legacy ExcelProcessor) ------------------------------
+
+    def iter_dataframes(
+        self,
+        source: Source,
+        *,
+        filename: str,
+        sheet: str | int | None = 0,
+    ) -> Iterator["pd.DataFrame"]:  # noqa: F821
+        """
+        DataFrame batches equivalent to ``pd.read_excel(source, sheet_name=sheet)``.
+
+        Cells are converted like pandas' openpyxl reader and spooled to a temporary
+        file in batches. A first pass over the spool infers each column's dtype
+        for the whole file; the second re-parses every batch with that dtype, so
+        concatenating the batches gives the same frame as the single read.
+        Blank rows inside the sheet are kept (trailing ones dropped), as in pandas.
+        """
+        fmt = _format_for(filename)
+        rows = self._xlsx_pandas_rows(source, sheet) if fmt == "xlsx" else self._csv_rows(source)
+        with tempfile.TemporaryFile(prefix="absenteismo_stream_") as spool:
+            header, width, batches = self._spool(rows, spool)
+            if header is None:
+                return
+            header = header + [""] * (width - len(header))
+            if not batches:
+                yield self._parse([header], width)
+                return
+            dtypes, parse_as, resolved = self._infer_dtypes(spool, header, width, batches)
+            spool.seek(0)
+            offset = 0
+            for _ in range(batches):
+                frame = self._parse([header] + pickle.load(spool), width, parse_as)
+                for col, dtype in dtypes.items():
+                    if col in resolved:
+                        frame[col] = resolved[col].iloc[offset:offset + len(frame)].set_axis(frame.index)
+                    elif frame[col].dtype != dtype:
+                        frame[col] = frame[col].astype(dtype)
+                offset += len(frame)
+                yield frame
+
+    def _xlsx_pandas_rows(self, source: Source, sheet: str | int | None) -> Iterator[list[Any]]:
+        # Same options pandas uses: cached values, no external links
+        wb = self._open_workbook(source, data_only=True)
+        try:
+            ws = self._worksheet(wb, sheet)
+            ws.reset_dimensions()
+            for row in ws.rows:
+                yield [_pandas_cell(cell) for cell in row]
+        finally:
+            wb.close()
+
+    def _spool(self, rows: Iterable[list[Any]], spool: Any) -> tuple[list[Any] | None, int, int]:
+        """Pickle batches of trimmed data rows; trailing empty rows are dropped."""
+        header: list[Any] | None = None
+        width = 0
+        batches = 0
+        batch: list[list[Any]] = []
+        blank_run: list[list[Any]] = []
+        for row in rows:
+            while row and row[-1] == "":
+                row.pop()
+            if header is None:
+                header = row
+                width = len(row)
+                continue
+            if not row:
+                blank_run.append(row)
+                continue
+            width = max(width, len(row))
+            batch.extend(blank_run)
+            blank_run = []
+            batch.append(row)
+            if len(batch) >= self.batch_rows:
+                pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                batches += 1
+                batch = []
+        if batch:
+            pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+            batches += 1
+        return header, width, batches
+
+    def _infer_dtypes(
+        self, spool: Any, header: list[Any], width: int, batches: int
+    ) -> tuple[dict[Any, Any], dict[Any, Any], dict[Any, "pd.Series"]]:  # noqa: F821
+        """
+        Whole-file dtype per column, the parser dtype for object/text columns and,
+        for columns whose batches disagree (e.g. "16" in one batch, "x" in another),
+        the column parsed in full — a single column, never the whole sheet.
+        """
+        import numpy as np
+
+        spool.seek(0)
+        dtypes: dict[Any, Any] = {}
+        has_na: dict[Any, bool] = {}
+        for _ in range(batches):
+            frame = self._parse([header] + pickle.load(spool), width)
+            for col in frame.columns:
+                na = frame[col].isna()
+                has_na[col] = has_na.get(col, False) or bool(na.any())
+                if dtypes.get(col) is _CONFLICT:
+                    continue
+                if na.all():
+                    dtypes.setdefault(col, None)
+                else:
+                    dtypes[col] = _common_dtype(dtypes.get(col), frame[col].dtype)
+
+        columns = list(dtypes)
+        conflicts = [j for j, col in enumerate(columns) if dtypes[col] is _CONFLICT]
+        resolved: dict[Any, Any] = {}
+        if conflicts:
+            spool.seek(0)
+            values: dict[int, list[list[Any]]] = {j: [[header[j]]] for j in conflicts}
+            for _ in range(batches):
+                for row in pickle.load(spool):
+                    for j in conflicts:
+                        values[j].append([row[j]] if j < len(row) else [])
+            for j in conflicts:
+                resolved[columns[j]] = self._parse(values.pop(j), 1).iloc[:, 0]
+
+        final = {
+            col: resolved[col].dtype if col in resolved else _final_dtype(dtype, has_na[col])
+            for col, dtype in dtypes.items()
+        }
+        # Object/text columns are parsed as such so values are not re-inferred per batch
+        parse_as = {
+            col: (object if dtype == np.dtype(object) or col in resolved else str)
+            for col, dtype in final.items()
+            if col in resolved or not isinstance(dtype, np.dtype) or dtype == np.dtype(object)
+        }
+        return final, parse_as, resolved
+
+    @staticmethod
+    def _parse(rows: list[list[Any]], width: int, parse_as: dict[Any, Any] | None = None) -> "pd.DataFrame":  # noqa: F821
+        from pandas.io.parsers import TextParser
+
+        padded = [r + [""] * (width - len(r)) if len(r) < width else r for r in rows]
+        # skip_blank_lines=False — same as pd.read_excel (GH 39808)
+        parser = TextParser(
+            padded,
+            header=0,
+            dtype=parse_as or None,
+            skip_blank_lines=False,
+        )
+        try:
+            return parser.read()
+        finally:
+            parser.close()
+
+    # -- shared ---------------------------------------------------------------
+
+    @staticmethod
+    def _open_workbook(source: Source, *, data_only: bool) -> Any:
+        try:
+            from openpyxl import load_workbook
+        except ImportError as exc:  # pragma: no cover
+            raise UnsupportedFormatError("openpyxl not available") from exc
+        target = io.BytesIO(source) if isinstance(source, bytes) else source
+        return load_workbook(filename=target, read_only=True, data_only=data_only, keep_links=False)
+
+    @staticmethod
+    def _worksheet(wb: Any, sheet: str | int | None) -> Any:
+        if sheet is None:
+            sheet = 0
+        if isinstance(sheet, int):
+            if sheet >= len(wb.worksheets):
+                raise AmbiguousStructureError("requested sheet not found")
+            return wb.worksheets[sheet]
+        if sheet not in wb.sheetnames:
+            raise AmbiguousStructureError("requested sheet not found")
+        return wb[sheet]
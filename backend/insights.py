@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Dict, Any
 from .models import Atestado, Upload
+from .cache_service import cache_por_cliente
 import json
 
 class InsightsEngine:
@@ -66,6 +67,7 @@ class InsightsEngine:
             print(f"[INSIGHTS] Erro ao verificar coluna original: {e}")
             return False
     
+    @cache_por_cliente("insights")
     def gerar_insights(self, client_id: int) -> List[Dict[str, Any]]:
         """Gera insights automáticos baseados nos campos disponíveis"""
         insights = []
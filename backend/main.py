@@ -3,7 +3,7 @@ FastAPI Main Application - AbsenteismoController v2.0
 """
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query, Form, Request, status
 from typing import List
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from .cors_config import cors_allowed_origins, cors_allow_credentials
@@ -23,9 +23,21 @@ from collections import defaultdict
 
 from .database import get_db, init_db, run_migrations, check_database_health
 from . import database as database_module
-from .models import Client, Upload, Atestado, User, Config, ClientColumnMapping, Produtividade, ClientLogo, SavedFilter
+from .models import Client, Upload, Atestado, User, Config, ClientColumnMapping, Produtividade, ClientLogo, SavedFilter, UploadJob
 from .excel_processor import ExcelProcessor
 from .analytics import Analytics
+from .dashboard_aggregator import DashboardAggregator
+from .rollup_service import RollupService, backfill_rollups
+from .pools_rotas import POOL_CONSULTAS, POOL_EXPORTACAO, no_pool
+from .http_cache import resposta_condicional
+from . import dados_listagem
+from . import exportacao_excel
+from .graficos_render import stop_renderizador_graficos
+from .upload_ingest import UploadIngestService, relatorio_memoria_upload
+from . import upload_jobs
+from .upload_jobs import UploadJobService, resumo_job
+from .ingestion.streaming_reader import MemoryTracker
+from .campos_derivados import extrair_campos_derivados
 from .insights import InsightsEngine
 from .authz import (
     api_docs_enabled,
@@ -64,6 +76,7 @@ from .auth import (
     SECRET_KEY, ALGORITHM,
 )
 from .tenant import resolve_authorized_client, require_admin_user
+from .cache_usuarios import usuario_autenticado
 from .email_service import EmailService
 from datetime import timedelta
 import requests
@@ -173,7 +186,7 @@ async def api_auth_middleware(request: Request, call_next):
                 db = next(db_gen)
             else:
                 db = database_module.SessionLocal()
-            user = db.query(User).filter(User.username == username).first()
+            user = usuario_autenticado(db, username)
             if user is None or not user.is_active:
                 return JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -540,6 +553,41 @@ async def startup_event():
     finally:
         db.close()
 
+    # Agregados mensais de clientes com dados anteriores à tabela monthly_rollups
+    db = next(get_db())
+    try:
+        linhas = backfill_rollups(db, somente_sem_agregados=True)
+        if linhas:
+            print(f"📊 Agregados mensais construídos: {linhas} linhas")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Agregados mensais não construídos no startup: {e}")
+    finally:
+        db.close()
+
+    # Workers da fila de uploads (jobs órfãos de um reinício voltam para a fila)
+    try:
+        upload_jobs.init_upload_job_pool()
+    except Exception as e:
+        print(f"⚠️ Fila de uploads não iniciada: {e}")
+
+    # Agendador de relatórios/alertas em threads próprias (fora do event loop)
+    try:
+        from .background_tasks import init_background_tasks
+        init_background_tasks()
+    except Exception as e:
+        print(f"⚠️ Agendador não iniciado: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    upload_jobs.stop_upload_job_pool()
+    stop_renderizador_graficos()
+    try:
+        from .background_tasks import stop_background_tasks
+        stop_background_tasks()
+    except Exception as e:
+        print(f"⚠️ Agendador não encerrado: {e}")
+
 # ==================== ROUTES - FRONTEND ====================
 
 @app.get("/landing", response_class=HTMLResponse)
@@ -901,7 +949,8 @@ async def list_backups(current_user: User = Depends(get_current_admin_user)):
             return {
                 "success": True,
                 "backups": backups,
-                "count": len(backups)
+                "count": len(backups),
+                "execucoes": list(backup_service.historico)
             }
         else:
             return {
@@ -917,8 +966,9 @@ async def list_backups(current_user: User = Depends(get_current_admin_user)):
         }
 
 @app.post("/api/backup/create")
-async def create_backup_manual(current_user: User = Depends(get_current_admin_user)):
-    """Cria backup manual do banco (apenas admin)"""
+@no_pool(POOL_EXPORTACAO)
+def create_backup_manual(current_user: User = Depends(get_current_admin_user)):
+    """Cria backup manual do banco (apenas admin; cópia, compressão e verificação fora do event loop)"""
     try:
         from .backup_service import backup_service
         from .database import DB_PATH
@@ -955,7 +1005,8 @@ async def create_backup_manual(current_user: User = Depends(get_current_admin_us
             return {
                 "success": True,
                 "message": "Backup criado com sucesso",
-                "backup_path": backup_path
+                "backup_path": backup_path,
+                "metricas": backup_service.ultimo_backup
             }
         else:
             return {
@@ -1470,14 +1521,20 @@ async def desativar_user(
     return {"message": "Usuário desativado com sucesso"}
 
 @app.post("/api/upload")
-async def upload_file(
+@no_pool(POOL_CONSULTAS)
+def upload_file(
     file: UploadFile = File(...),
     client_id: int = Form(...),  # Obrigatório, sem valor padrão
     mes_referencia: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Upload de planilha (auth + tenant guard — S01-A)"""
+    """
+    Upload de planilha (auth + tenant guard — S01-A).
+
+    Só salva o arquivo e enfileira o processamento (upload_jobs.py); o
+    andamento é consultado em GET /api/jobs/{job_id}.
+    """
     try:
         # Resolve tenant autorizado (não confia só no Form)
         client = resolve_authorized_client(db, current_user, client_id)
@@ -1491,6 +1548,18 @@ async def upload_file(
         if not file.filename.lower().endswith(('.xlsx', '.xls')):
             raise HTTPException(status_code=400, detail="Formato de arquivo inválido. Use .xlsx ou .xls")
         
+        # Valida formato do mês de referência (YYYY-MM); sem ele, o mês é detectado no processamento
+        if mes_referencia:
+            erro_mes = HTTPException(status_code=400, detail="Formato de mês de referência inválido. Use YYYY-MM (ex: 2025-10)")
+            if len(mes_referencia) != 7 or mes_referencia[4] != '-':
+                raise erro_mes
+            try:
+                ano, mes = mes_referencia.split('-')
+                if not (2020 <= int(ano) <= 2100 and 1 <= int(mes) <= 12):
+                    raise erro_mes
+            except ValueError:
+                raise erro_mes
+        
         # Salva arquivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         saved_filename = f"{timestamp}_{file.filename}"
@@ -1501,179 +1570,19 @@ async def upload_file(
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Busca mapeamento customizado do cliente (se existir)
-        custom_mapping = None
-        mapping_obj = db.query(ClientColumnMapping).filter(ClientColumnMapping.client_id == client_id).first()
-        if mapping_obj and mapping_obj.column_mapping:
-            try:
-                mapping_data = json.loads(mapping_obj.column_mapping)
-                # O mapeamento pode estar dentro de um objeto com 'column_mapping' ou ser o próprio dicionário
-                if isinstance(mapping_data, dict) and 'column_mapping' in mapping_data:
-                    custom_mapping = mapping_data['column_mapping']
-                elif isinstance(mapping_data, dict):
-                    custom_mapping = mapping_data
-                else:
-                    custom_mapping = None
-                
-                print(f"📋 Mapeamento carregado para cliente {client_id}: {custom_mapping}")
-            except Exception as e:
-                print(f"❌ Erro ao carregar mapeamento: {e}")
-                custom_mapping = None
-        
-        # Processa Excel
-        try:
-            processor = ExcelProcessor(file_path, custom_mapping=custom_mapping)
-            registros = processor.processar()
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=400, detail=f"Erro ao processar planilha Excel: {str(e)}")
-        
-        if not registros:
-            raise HTTPException(status_code=400, detail="Erro ao processar planilha. A planilha não contém dados válidos ou está vazia.")
-        
-        # Usa o mês de referência fornecido pelo usuário, ou tenta detectar automaticamente
-        mes_ref = None
-        
-        if mes_referencia:
-            # Valida formato do mês de referência (YYYY-MM)
-            try:
-                # Valida se está no formato correto
-                if len(mes_referencia) == 7 and mes_referencia[4] == '-':
-                    ano, mes = mes_referencia.split('-')
-                    if int(ano) >= 2020 and int(ano) <= 2100 and int(mes) >= 1 and int(mes) <= 12:
-                        mes_ref = mes_referencia
-                    else:
-                        raise HTTPException(status_code=400, detail="Formato de mês de referência inválido. Use YYYY-MM (ex: 2025-10)")
-                else:
-                    raise HTTPException(status_code=400, detail="Formato de mês de referência inválido. Use YYYY-MM (ex: 2025-10)")
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Formato de mês de referência inválido. Use YYYY-MM (ex: 2025-10)")
-        
-        # Se não foi fornecido, tenta detectar automaticamente (fallback)
-        if not mes_ref:
-            campos_data = ['data_afastamento', 'data_retorno', 'DATA_AFASTAMENTO', 'DATA_RETORNO']
-            
-            for reg in registros[:10]:  # Verifica os primeiros 10 registros
-                for campo in campos_data:
-                    if campo in reg and reg[campo]:
-                        data = reg[campo]
-                        if isinstance(data, datetime):
-                            mes_ref = data.strftime("%Y-%m")
-                            break
-                        elif isinstance(data, str):
-                            try:
-                                data_obj = datetime.strptime(data[:10], "%Y-%m-%d")
-                                mes_ref = data_obj.strftime("%Y-%m")
-                                break
-                            except:
-                                pass
-                if mes_ref:
-                    break
-            
-            # Se não encontrou, usa o mês atual
-            if not mes_ref:
-                mes_ref = datetime.now().strftime("%Y-%m")
-        
-        # Cria registro de upload
-        upload = Upload(
-            client_id=client_id,
-            filename=saved_filename,
-            mes_referencia=mes_ref,
-            total_registros=len(registros)
+        job = UploadJobService(db).enfileirar(
+            client_id, saved_filename, file_path, mes_referencia or None, user_id=current_user.id
         )
-        db.add(upload)
-        db.flush()
-        
-        # Salva atestados - filtra apenas campos válidos do modelo
-        campos_validos = {
-            'nomecompleto', 'descricao_atestad', 'dias_atestados', 'cid', 'diagnostico',
-            'centro_custo', 'setor', 'motivo_atestado', 'escala', 'horas_dia', 'horas_perdi',
-            'nome_funcionario', 'cpf', 'matricula', 'cargo', 'genero', 'data_afastamento',
-            'data_retorno', 'tipo_info_atestado', 'tipo_atestado', 'descricao_cid',
-            'numero_dias_atestado', 'numero_horas_atestado', 'dias_perdidos', 'horas_perdidas',
-            'dados_originais'
-        }
-        
-        for idx, reg in enumerate(registros):
-            try:
-                # Filtra apenas campos válidos do modelo
-                reg_filtrado = {k: v for k, v in reg.items() if k in campos_validos}
-                
-                # Converte tipos de dados para evitar erros
-                # Converte datas de string/datetime para date se necessário
-                from datetime import date as date_type
-                
-                if 'data_afastamento' in reg_filtrado and reg_filtrado['data_afastamento']:
-                    try:
-                        if isinstance(reg_filtrado['data_afastamento'], str):
-                            dt = datetime.strptime(reg_filtrado['data_afastamento'][:10], "%Y-%m-%d")
-                            reg_filtrado['data_afastamento'] = dt.date()
-                        elif isinstance(reg_filtrado['data_afastamento'], datetime):
-                            reg_filtrado['data_afastamento'] = reg_filtrado['data_afastamento'].date()
-                        elif isinstance(reg_filtrado['data_afastamento'], date_type):
-                            pass  # Já é date
-                        else:
-                            reg_filtrado['data_afastamento'] = None
-                    except:
-                        reg_filtrado['data_afastamento'] = None
-                else:
-                    reg_filtrado['data_afastamento'] = None
-                
-                if 'data_retorno' in reg_filtrado and reg_filtrado['data_retorno']:
-                    try:
-                        if isinstance(reg_filtrado['data_retorno'], str):
-                            dt = datetime.strptime(reg_filtrado['data_retorno'][:10], "%Y-%m-%d")
-                            reg_filtrado['data_retorno'] = dt.date()
-                        elif isinstance(reg_filtrado['data_retorno'], datetime):
-                            reg_filtrado['data_retorno'] = reg_filtrado['data_retorno'].date()
-                        elif isinstance(reg_filtrado['data_retorno'], date_type):
-                            pass  # Já é date
-                        else:
-                            reg_filtrado['data_retorno'] = None
-                    except:
-                        reg_filtrado['data_retorno'] = None
-                else:
-                    reg_filtrado['data_retorno'] = None
-                
-                # Garante que valores numéricos são float ou None
-                for campo_num in ['dias_atestados', 'horas_dia', 'horas_perdi', 'numero_dias_atestado', 
-                                 'numero_horas_atestado', 'dias_perdidos', 'horas_perdidas']:
-                    if campo_num in reg_filtrado:
-                        if reg_filtrado[campo_num] is None:
-                            reg_filtrado[campo_num] = 0.0
-                        else:
-                            try:
-                                reg_filtrado[campo_num] = float(reg_filtrado[campo_num])
-                            except:
-                                reg_filtrado[campo_num] = 0.0
-                
-                # Garante que tipo_info_atestado é int ou None
-                if 'tipo_info_atestado' in reg_filtrado and reg_filtrado['tipo_info_atestado'] is not None:
-                    try:
-                        reg_filtrado['tipo_info_atestado'] = int(reg_filtrado['tipo_info_atestado'])
-                    except:
-                        reg_filtrado['tipo_info_atestado'] = None
-                
-                atestado = Atestado(
-                    upload_id=upload.id,
-                    **reg_filtrado
-                )
-                db.add(atestado)
-            except Exception as e:
-                # Log do erro mas continua processando outros registros
-                print(f"Erro ao processar registro {idx + 1}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
         db.commit()
         
+        if upload_jobs.upload_job_pool is not None:
+            upload_jobs.upload_job_pool.notificar()
+        
         return {
             "success": True,
-            "upload_id": upload.id,
-            "total_registros": len(registros),
-            "mes_referencia": mes_ref
+            "job_id": job.id,
+            "status": job.status,
+            "mes_referencia": job.mes_referencia,
         }
     
     except HTTPException:
@@ -1686,6 +1595,42 @@ async def upload_file(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erro ao processar upload: {error_detail}")
 
+def _job_do_cliente(db: Session, current_user: User, job_id: str, client_id: int) -> UploadJob:
+    """Job de upload do cliente autorizado (404 se não existir ou for de outro cliente)"""
+    client = resolve_authorized_client(db, current_user, client_id)
+    job = db.query(UploadJob).filter(UploadJob.id == job_id, UploadJob.client_id == client.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou não pertence ao cliente")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+@no_pool(POOL_CONSULTAS)
+def get_upload_job(
+    job_id: str,
+    client_id: int = Query(..., description="ID do cliente (obrigatório)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Fase, linhas processadas, vazão e erro de um job de upload"""
+    return resumo_job(_job_do_cliente(db, current_user, job_id, client_id))
+
+@app.post("/api/jobs/{job_id}/cancel")
+@no_pool(POOL_CONSULTAS)
+def cancel_upload_job(
+    job_id: str,
+    client_id: int = Query(..., description="ID do cliente (obrigatório)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Cancela um job de upload na fila ou ainda em leitura"""
+    job = _job_do_cliente(db, current_user, job_id, client_id)
+    if not UploadJobService(db).solicitar_cancelamento(job):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job não pode mais ser cancelado (status {job.status}, fase {job.fase})",
+        )
+    return resumo_job(job)
+
 @app.get("/api/uploads")
 async def list_uploads(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
@@ -1711,7 +1656,10 @@ async def list_uploads(
     ]
 
 @app.get("/api/dashboard")
-async def dashboard(
+@no_pool(POOL_CONSULTAS)
+def dashboard(
+    request: Request,
+    response: Response,
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes_inicio: Optional[str] = None,
     mes_fim: Optional[str] = None,
@@ -1723,106 +1671,34 @@ async def dashboard(
     """Dashboard principal"""
     try:
         # Valida client_id e permissão de acesso
-        validar_client_id(db, client_id)
+        client = validar_client_id(db, client_id)
         validar_acesso_client_id(current_user, client_id)
+
+        # Dados do cliente inalterados desde a última leitura: 304 sem recalcular
+        nao_modificado = resposta_condicional(request, response, client)
+        if nao_modificado is not None:
+            return nao_modificado
         
         analytics = Analytics(db)
         insights_engine = InsightsEngine(db)
         
-        # Trata cada métrica individualmente para não quebrar tudo se uma falhar
-        try:
-            metricas = analytics.metricas_gerais(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular métricas gerais: {e}")
-            metricas = {
-                "total_atestados_dias": 0,
-                "total_dias_perdidos": 0,
-                "total_horas_perdidas": 0
-            }
-        
-        try:
-            top_cids = analytics.top_cids(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top CIDs: {e}")
-            top_cids = []
-        
-        try:
-            top_setores = analytics.top_setores(client_id, 5, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top setores: {e}")
-            top_setores = []
-        
-        try:
-            evolucao = analytics.evolucao_mensal(client_id, 12, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular evolução mensal: {e}")
-            evolucao = []
-        
-        try:
-            distribuicao_genero = analytics.distribuicao_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular distribuição de gênero: {e}")
-            distribuicao_genero = []
-        
-        try:
-            top_funcionarios = analytics.top_funcionarios(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top funcionários: {e}")
-            top_funcionarios = []
-        
-        try:
-            top_escalas = analytics.top_escalas(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top escalas: {e}")
-            top_escalas = []
-        
-        try:
-            top_motivos = analytics.top_motivos(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top motivos: {e}")
-            top_motivos = []
-        
-        try:
-            dias_centro_custo = analytics.dias_perdidos_por_centro_custo(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular dias por centro de custo: {e}")
-            dias_centro_custo = []
-        
-        try:
-            distribuicao_dias = analytics.distribuicao_dias_por_atestado(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular distribuição de dias: {e}")
-            distribuicao_dias = []
-        
-        try:
-            media_cid = analytics.media_dias_por_cid(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular média por CID: {e}")
-            media_cid = []
-        
-        try:
-            evolucao_setor = analytics.evolucao_por_setor(client_id, 12, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular evolução por setor: {e}")
-            evolucao_setor = {}
-        
-        try:
-            comparativo_dias_horas = analytics.comparativo_dias_horas(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular comparativo dias/horas: {e}")
-            comparativo_dias_horas = []
-        
-        try:
-            frequencia_atestados = analytics.frequencia_atestados_por_funcionario(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular frequência de atestados: {e}")
-            frequencia_atestados = []
-        
-        try:
-            dias_setor_genero = analytics.dias_perdidos_setor_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular dias por setor e gênero: {e}")
-            dias_setor_genero = []
+        # Blocos principais em uma única leitura; cada bloco trata suas próprias falhas
+        blocos = DashboardAggregator(db).calcular(client_id, mes_inicio, mes_fim, funcionario, setor)
+        metricas = blocos['metricas']
+        top_cids = blocos['top_cids']
+        top_setores = blocos['top_setores']
+        evolucao = blocos['evolucao_mensal']
+        distribuicao_genero = blocos['distribuicao_genero']
+        top_funcionarios = blocos['top_funcionarios']
+        top_escalas = blocos['top_escalas']
+        top_motivos = blocos['top_motivos']
+        dias_centro_custo = blocos['dias_centro_custo']
+        distribuicao_dias = blocos['distribuicao_dias']
+        media_cid = blocos['media_cid']
+        evolucao_setor = blocos['evolucao_setor']
+        comparativo_dias_horas = blocos['comparativo_dias_horas']
+        frequencia_atestados = blocos['frequencia_atestados']
+        dias_setor_genero = blocos['dias_setor_genero']
         
         try:
             insights = insights_engine.gerar_insights(client_id)
@@ -2089,7 +1965,10 @@ async def dashboard(
         raise HTTPException(status_code=500, detail=f"Erro ao carregar dashboard: {error_detail}")
 
 @app.get("/api/filtros")
-async def obter_filtros(
+@no_pool(POOL_CONSULTAS)
+def obter_filtros(
+    request: Request,
+    response: Response,
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
@@ -2097,8 +1976,12 @@ async def obter_filtros(
     """Retorna lista de funcionários e setores para preencher os filtros"""
     try:
         # Valida client_id + tenant
-        validar_client_id(db, client_id)
+        client = validar_client_id(db, client_id)
         validar_acesso_client_id(current_user, client_id)
+
+        nao_modificado = resposta_condicional(request, response, client)
+        if nao_modificado is not None:
+            return nao_modificado
         
         # Busca funcionários únicos
         funcionarios = db.query(Atestado.nomecompleto).join(Upload).filter(
@@ -2486,12 +2369,17 @@ async def clonar_dados_cliente(
                     numero_horas_atestado=atestado.numero_horas_atestado,
                     dias_perdidos=atestado.dias_perdidos,
                     horas_perdidas=atestado.horas_perdidas,
-                    dados_originais=atestado.dados_originais
+                    dados_originais=atestado.dados_originais,
+                    coerencia=atestado.coerencia,
+                    data_admissao=atestado.data_admissao,
+                    ano_planilha=atestado.ano_planilha,
+                    mes_planilha=atestado.mes_planilha
                 )
                 db.add(novo_atestado)
                 total_atestados += 1
 
         destino.updated_at = datetime.now()
+        RollupService(db).recalcular_cliente(destino.id)
         db.commit()
         db.refresh(destino)
 
@@ -2934,6 +2822,12 @@ async def deletar_cliente(
             from .models import ClientColumnMapping
             db.query(ClientColumnMapping).filter(ClientColumnMapping.client_id == cliente_id).delete()
         
+        # Agregados mensais do cliente
+        RollupService(db).remover_cliente(cliente_id)
+        
+        # Histórico da fila de uploads do cliente
+        db.query(UploadJob).filter(UploadJob.client_id == cliente_id).delete()
+        
         # Deleta o cliente
         db.delete(cliente)
         db.commit()
@@ -3390,7 +3284,10 @@ async def pagina_apresentacao():
     return FileResponse(file_path)
 
 @app.get("/api/apresentacao")
-async def dados_apresentacao(
+@no_pool(POOL_CONSULTAS)
+def dados_apresentacao(
+    request: Request,
+    response: Response,
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes_inicio: Optional[str] = None,
     mes_fim: Optional[str] = None,
@@ -3409,92 +3306,29 @@ async def dados_apresentacao(
         client = validar_client_id(db, client_id)
         validar_acesso_client_id(current_user, client_id)
         print(f"[APRESENTACAO] Cliente validado: {client.nome} - Usuário: {current_user.username} (client_id: {current_user.client_id})")
+
+        nao_modificado = resposta_condicional(request, response, client)
+        if nao_modificado is not None:
+            return nao_modificado
         
         analytics = Analytics(db)
         insights_engine = InsightsEngine(db)
         
-        # Busca todas as métricas e dados (igual ao dashboard)
-        try:
-            metricas = analytics.metricas_gerais(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular métricas gerais: {e}")
-            metricas = {
-                "total_atestados_dias": 0,
-                "total_dias_perdidos": 0,
-                "total_horas_perdidas": 0
-            }
-        
-        try:
-            top_cids = analytics.top_cids(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top CIDs: {e}")
-            top_cids = []
-        
-        try:
-            top_setores = analytics.top_setores(client_id, 5, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top setores: {e}")
-            top_setores = []
-        
-        try:
-            evolucao = analytics.evolucao_mensal(client_id, 12, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular evolução mensal: {e}")
-            evolucao = []
-        
-        try:
-            distribuicao_genero = analytics.distribuicao_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular distribuição de gênero: {e}")
-            distribuicao_genero = []
-        
-        try:
-            top_funcionarios = analytics.top_funcionarios(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top funcionários: {e}")
-            top_funcionarios = []
-        
-        try:
-            top_escalas = analytics.top_escalas(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top escalas: {e}")
-            top_escalas = []
-        
-        try:
-            top_motivos = analytics.top_motivos(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top motivos: {e}")
-            top_motivos = []
-        
-        try:
-            dias_centro_custo = analytics.dias_perdidos_por_centro_custo(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular dias por centro de custo: {e}")
-            dias_centro_custo = []
-        
-        try:
-            distribuicao_dias = analytics.distribuicao_dias_por_atestado(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular distribuição de dias: {e}")
-            distribuicao_dias = []
-        
-        try:
-            media_cid = analytics.media_dias_por_cid(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular média por CID: {e}")
-            media_cid = []
-        
-        try:
-            top_cids_dias = analytics.top_cids(client_id, 5, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular top CIDs para dias: {e}")
-            top_cids_dias = []
-        
-        try:
-            dias_setor_genero = analytics.dias_perdidos_setor_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
-        except Exception as e:
-            print(f"Erro ao calcular dias por setor e gênero: {e}")
-            dias_setor_genero = []
+        # Busca todas as métricas e dados (mesmo DashboardAggregator do dashboard)
+        blocos = DashboardAggregator(db).calcular(client_id, mes_inicio, mes_fim, funcionario, setor)
+        metricas = blocos['metricas']
+        top_cids = blocos['top_cids']
+        top_setores = blocos['top_setores']
+        evolucao = blocos['evolucao_mensal']
+        distribuicao_genero = blocos['distribuicao_genero']
+        top_funcionarios = blocos['top_funcionarios']
+        top_escalas = blocos['top_escalas']
+        top_motivos = blocos['top_motivos']
+        dias_centro_custo = blocos['dias_centro_custo']
+        distribuicao_dias = blocos['distribuicao_dias']
+        media_cid = blocos['media_cid']
+        top_cids_dias = blocos['top_cids_dias']
+        dias_setor_genero = blocos['dias_setor_genero']
         
         # Gera análises IA para cada gráfico - ISOLADO POR EMPRESA
         slides = []
@@ -3775,7 +3609,7 @@ async def dados_apresentacao(
             
             # Slide 14: Evolução por Setor
             try:
-                evolucao_setor = analytics.evolucao_por_setor(client_id, 12, mes_inicio, mes_fim, funcionario, setor)
+                evolucao_setor = blocos['evolucao_setor']
                 # evolucao_setor é um dicionário {setor: [{mes, dias_perdidos}, ...]}
                 if evolucao_setor and isinstance(evolucao_setor, dict) and len(evolucao_setor) > 0:
                     # Verifica se há pelo menos um setor com dados
@@ -4000,7 +3834,7 @@ Esta visualização permite identificar padrões temporais e por setor, facilita
             
             # Slide 19: Comparativo Dias vs Horas
             try:
-                comparativo_dias_horas = analytics.comparativo_dias_horas(client_id, mes_inicio, mes_fim, funcionario, setor)
+                comparativo_dias_horas = blocos['comparativo_dias_horas']
                 if comparativo_dias_horas and len(comparativo_dias_horas) > 0:
                     try:
                         analise_comp_dh = insights_engine.gerar_analise_grafico('comparativo_dias_horas', comparativo_dias_horas, metricas)
@@ -4021,7 +3855,7 @@ Esta visualização permite identificar padrões temporais e por setor, facilita
             
             # Slide 20: Frequência de Atestados por Funcionário
             try:
-                frequencia_atestados = analytics.frequencia_atestados_por_funcionario(client_id, mes_inicio, mes_fim, funcionario, setor)
+                frequencia_atestados = blocos['frequencia_atestados']
                 if frequencia_atestados and len(frequencia_atestados) > 0:
                     try:
                         analise_freq = insights_engine.gerar_analise_grafico('frequencia_atestados', frequencia_atestados, metricas)
@@ -4572,7 +4406,8 @@ Esta visualização permite identificar padrões sazonais e setores que demandam
         raise HTTPException(status_code=500, detail=f"Erro ao gerar apresentação: {str(e)}")
 
 @app.get("/api/preview/{upload_id}")
-async def preview_data(
+@no_pool(POOL_CONSULTAS)
+def preview_data(
     upload_id: int,
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório para validação
     page: int = 1,
@@ -4624,7 +4459,8 @@ async def preview_data(
     }
 
 @app.get("/api/analises/funcionarios")
-async def analise_funcionarios(
+@no_pool(POOL_CONSULTAS)
+def analise_funcionarios(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes_inicio: Optional[str] = None,
     mes_fim: Optional[str] = None,
@@ -4640,7 +4476,8 @@ async def analise_funcionarios(
     return analytics.top_funcionarios(client_id, 1000, mes_inicio, mes_fim)
 
 @app.get("/api/analises/setores")
-async def analise_setores(
+@no_pool(POOL_CONSULTAS)
+def analise_setores(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes_inicio: Optional[str] = None,
     mes_fim: Optional[str] = None,
@@ -4656,7 +4493,8 @@ async def analise_setores(
     return analytics.top_setores(client_id, 20, mes_inicio, mes_fim)
 
 @app.get("/api/analises/cids")
-async def analise_cids(
+@no_pool(POOL_CONSULTAS)
+def analise_cids(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes_inicio: Optional[str] = None,
     mes_fim: Optional[str] = None,
@@ -4672,15 +4510,22 @@ async def analise_cids(
     return analytics.top_cids(client_id, 20, mes_inicio, mes_fim)
 
 @app.get("/api/tendencias")
-async def tendencias(
+@no_pool(POOL_CONSULTAS)
+def tendencias(
+    request: Request,
+    response: Response,
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """Análise de tendências"""
     # Valida client_id + tenant
-    validar_client_id(db, client_id)
+    client = validar_client_id(db, client_id)
     validar_acesso_client_id(current_user, client_id)
+
+    nao_modificado = resposta_condicional(request, response, client)
+    if nao_modificado is not None:
+        return nao_modificado
     
     analytics = Analytics(db)
     evolucao = analytics.evolucao_mensal(client_id, 12)
@@ -4726,7 +4571,9 @@ async def delete_upload(
         if not upload:
             raise HTTPException(status_code=404, detail="Upload não encontrado ou não pertence ao cliente")
         
+        mes_referencia = upload.mes_referencia
         db.delete(upload)
+        RollupService(db).recalcular_meses(client_id, [mes_referencia])
         db.commit()
         
         return {"success": True, "message": "Upload deletado com sucesso"}
@@ -4751,88 +4598,21 @@ def buscar_dados_dashboard_completo(
     analytics = Analytics(db)
     insights_engine = InsightsEngine(db)
     
-    # REPLICA EXATAMENTE A LÓGICA DO DASHBOARD
-    try:
-        metricas = analytics.metricas_gerais(client_id, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular métricas gerais: {e}")
-        metricas = {
-            "total_atestados_dias": 0,
-            "total_dias_perdidos": 0,
-            "total_horas_perdidas": 0
-        }
-    
-    try:
-        top_cids = analytics.top_cids(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular top CIDs: {e}")
-        top_cids = []
-    
-    try:
-        top_setores = analytics.top_setores(client_id, 5, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular top setores: {e}")
-        top_setores = []
-    
-    try:
-        evolucao = analytics.evolucao_mensal(client_id, 12, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular evolução mensal: {e}")
-        evolucao = []
-    
-    try:
-        distribuicao_genero = analytics.distribuicao_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular distribuição de gênero: {e}")
-        distribuicao_genero = []
-    
-    try:
-        top_funcionarios = analytics.top_funcionarios(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular top funcionários: {e}")
-        top_funcionarios = []
-    
-    try:
-        top_escalas = analytics.top_escalas(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular top escalas: {e}")
-        top_escalas = []
-    
-    try:
-        top_motivos = analytics.top_motivos(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular top motivos: {e}")
-        top_motivos = []
-    
-    try:
-        dias_centro_custo = analytics.dias_perdidos_por_centro_custo(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular dias por centro de custo: {e}")
-        dias_centro_custo = []
-    
-    try:
-        distribuicao_dias = analytics.distribuicao_dias_por_atestado(client_id, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular distribuição de dias: {e}")
-        distribuicao_dias = []
-    
-    try:
-        media_cid = analytics.media_dias_por_cid(client_id, 10, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular média por CID: {e}")
-        media_cid = []
-    
-    try:
-        top_cids_dias = analytics.top_cids(client_id, 5, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular top CIDs para dias: {e}")
-        top_cids_dias = []
-    
-    try:
-        dias_setor_genero = analytics.dias_perdidos_setor_genero(client_id, mes_inicio, mes_fim, funcionario, setor)
-    except Exception as e:
-        print(f"Erro ao calcular dias por setor e gênero: {e}")
-        dias_setor_genero = []
+    # Mesmo DashboardAggregator do /api/dashboard (números idênticos)
+    blocos = DashboardAggregator(db).calcular(client_id, mes_inicio, mes_fim, funcionario, setor)
+    metricas = blocos['metricas']
+    top_cids = blocos['top_cids']
+    top_setores = blocos['top_setores']
+    evolucao = blocos['evolucao_mensal']
+    distribuicao_genero = blocos['distribuicao_genero']
+    top_funcionarios = blocos['top_funcionarios']
+    top_escalas = blocos['top_escalas']
+    top_motivos = blocos['top_motivos']
+    dias_centro_custo = blocos['dias_centro_custo']
+    distribuicao_dias = blocos['distribuicao_dias']
+    media_cid = blocos['media_cid']
+    top_cids_dias = blocos['top_cids_dias']
+    dias_setor_genero = blocos['dias_setor_genero']
     
     # Busca insights gerais
     insights = []
@@ -5025,7 +4805,8 @@ def buscar_dados_dashboard_completo(
     }
 
 @app.get("/api/export/excel")
-async def export_excel(
+@no_pool(POOL_EXPORTACAO)
+def export_excel(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes: Optional[str] = None,
     mes_inicio: Optional[str] = None,
@@ -5044,6 +4825,13 @@ async def export_excel(
         client_id = client.id
         print(f"[EXPORT EXCEL] Cliente encontrado: {client.nome} (ID: {client.id})")
         
+        # Linhas da aba "Dados Completos": consulta projetada, lida em lotes durante a escrita
+        consulta = exportacao_excel.consulta_export(
+            db, client_id, upload_id, mes, mes_inicio, mes_fim, funcionario, setor
+        )
+        if not exportacao_excel.tem_linhas(consulta):
+            raise HTTPException(status_code=404, detail="Nenhum dado encontrado")
+        
         # USA DADOS EXATOS DO DASHBOARD
         print(f"[EXPORT EXCEL] Buscando dados do dashboard para replicar nos relatórios...")
         dados_completos = buscar_dados_dashboard_completo(
@@ -5058,40 +4846,6 @@ async def export_excel(
             raise HTTPException(status_code=500, detail="ReportGenerator não disponível")
         report_gen = ReportGenerator(db=db, client_id=client_id)
         
-        # Busca dados completos para Excel (todos os atestados)
-        query = db.query(Atestado).join(Upload).filter(Upload.client_id == client_id)
-        if upload_id:
-            query = query.filter(Upload.id == upload_id)
-        elif mes:
-            query = query.filter(Upload.mes_referencia == mes)
-        elif mes_inicio and mes_fim:
-            query = query.filter(Upload.mes_referencia >= mes_inicio, Upload.mes_referencia <= mes_fim)
-        
-        # Aplica filtros de funcionário e setor se fornecidos
-        if funcionario:
-            query = query.filter(Atestado.nomecompleto.in_(funcionario))
-        if setor:
-            query = query.filter(Atestado.setor.in_(setor))
-        
-        atestados = query.all()
-        
-        if not atestados:
-            raise HTTPException(status_code=404, detail="Nenhum dado encontrado")
-        
-        # Converter para lista de dicionários
-        dados = []
-        for a in atestados:
-            dados.append({
-                'Nome': a.nomecompleto or a.nome_funcionario,
-                'Setor': a.setor,
-                'CID': a.cid,
-                'Diagnóstico': a.diagnostico or a.descricao_cid,
-                'Dias Atestados': a.dias_atestados or 0,
-                'Horas Perdidas': a.horas_perdi or 0,
-                'Motivo': a.motivo_atestado,
-                'Escala': a.escala,
-            })
-        
         # Gerar arquivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"relatorio_absenteismo_{timestamp}.xlsx"
@@ -5101,7 +4855,7 @@ async def export_excel(
         
         # Usar gerador de relatórios
         periodo = f"{mes_inicio} a {mes_fim}" if mes_inicio and mes_fim else (mes or "Todos os períodos")
-        success = report_gen.generate_excel_report(filepath, dados, metricas_gerais, dados_relatorio, periodo, client_id=client_id)
+        success = report_gen.generate_excel_report(filepath, exportacao_excel.iterar_linhas(consulta), metricas_gerais, dados_relatorio, periodo, client_id=client_id)
         
         if not success:
             raise HTTPException(status_code=500, detail="Erro ao gerar relatório Excel")
@@ -5121,7 +4875,8 @@ async def export_excel(
 # Rota de exportação PDF REMOVIDA
 
 @app.get("/api/export/pptx")
-async def export_pptx(
+@no_pool(POOL_EXPORTACAO)
+def export_pptx(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     mes: Optional[str] = None,
     mes_inicio: Optional[str] = None,
@@ -5129,6 +4884,7 @@ async def export_pptx(
     upload_id: Optional[int] = None,
     funcionario: Optional[List[str]] = Query(None),
     setor: Optional[List[str]] = Query(None),
+    graficos: str = Query("nativos", pattern="^(nativos|imagem)$", description="nativos: gráficos editáveis do PowerPoint; imagem: PNGs do matplotlib"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -5167,7 +4923,10 @@ async def export_pptx(
         periodo = f"{mes_inicio} a {mes_fim}" if mes_inicio and mes_fim else (mes or "Todos os períodos")
         
         # Gerar PowerPoint com gráficos e insights
-        success = report_gen.generate_powerpoint_report(filepath, dados_relatorio, metricas_gerais, insights, periodo, insights_engine, client_id=client_id)
+        success = report_gen.generate_powerpoint_report(
+            filepath, dados_relatorio, metricas_gerais, insights, periodo, insights_engine,
+            client_id=client_id, graficos_nativos=graficos == "nativos"
+        )
         
         if not success:
             raise HTTPException(status_code=500, detail="Erro ao gerar relatório PowerPoint")
@@ -5187,7 +4946,8 @@ async def export_pptx(
 # ==================== ROUTES - COMPARATIVOS ====================
 
 @app.get("/api/relatorios/comparativo")
-async def comparativo_periodos(
+@no_pool(POOL_CONSULTAS)
+def comparativo_periodos(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     periodo1_inicio: str = Query(...),
     periodo1_fim: str = Query(...),
@@ -5277,7 +5037,8 @@ async def perfil_funcionario_page():
         return HTMLResponse(content=f.read())
 
 @app.get("/api/funcionario/perfil")
-async def perfil_funcionario(
+@no_pool(POOL_CONSULTAS)
+def perfil_funcionario(
     nome: str = Query(...),
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório - sem valor padrão
     db: Session = Depends(get_db),
@@ -5383,144 +5144,115 @@ async def perfil_funcionario(
 # ==================== ROUTES - GESTÃO DE DADOS ====================
 
 @app.get("/api/dados/todos")
-async def listar_todos_dados(
+@no_pool(POOL_CONSULTAS)
+def listar_todos_dados(
     client_id: int = Query(..., description="ID do cliente (obrigatório)"),  # Obrigatório
     upload_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=dados_listagem.LIMITE_MAXIMO, description="Tamanho da página (sem limit: todos os registros)"),
+    cursor: Optional[str] = Query(None, description="proximo_cursor da página anterior"),
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="ndjson: um registro por linha, enviado em lotes"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Lista todos os dados com filtros (auth + tenant — S01-A)"""
+    """
+    Lista os dados com filtros (auth + tenant — S01-A).
+
+    Ordem: data_afastamento desc (nulos no fim), id asc. Com limit, devolve uma página e
+    proximo_cursor (None quando a página veio incompleta, ou seja, acabou; com exatamente
+    limit restantes a página seguinte vem vazia); colunas_originais são as da página. estatisticas
+    sempre cobrem o filtro inteiro. formato=ndjson transmite linhas
+    {"tipo": "estatisticas"|"colunas"|"registro"|"fim", ...} à medida que os lotes são lidos.
+    """
     try:
         client = resolve_authorized_client(db, current_user, client_id)
         client_id = client.id
-        
-        query = db.query(Atestado).join(Upload).filter(Upload.client_id == client_id)
-        
-        if upload_id:
-            query = query.filter(Upload.id == upload_id)
-        
-        # Ordena por data_afastamento, mas trata caso seja None
-        try:
-            # Usa nullslast para colocar None no final
-            atestados = query.order_by(nullslast(desc(Atestado.data_afastamento))).all()
-        except Exception as e:
-            print(f"Erro na ordenação, tentando sem ordenação: {e}")
-            # Se houver erro na ordenação, tenta sem ordenação
-            atestados = query.all()
-        
-        # Estatísticas - usa os novos campos da planilha padronizada
-        estatisticas = {
-            'total_registros': len(atestados),
-            'total_atestados_dias': sum((a.dias_atestados or 0) for a in atestados),  # Soma dos dias_atestados
-            'total_dias_perdidos': sum((a.dias_atestados or 0) for a in atestados)  # Mesmo valor de total_atestados_dias
-        }
-        
+
+        apos = None
+        if cursor:
+            try:
+                apos = dados_listagem.decodificar_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="cursor inválido")
+
+        estatisticas = dados_listagem.estatisticas(db, client_id, upload_id)
+
+        if formato == "ndjson":
+            # O corpo é lido depois que a sessão da requisição (get_db) já foi fechada:
+            # o gerador abre a sua, no mesmo banco, e fecha só ela
+            bind = db.get_bind()
+
+            def _linhas():
+                colunas_vistas = set()
+                colunas = []
+                ultima = None
+                lidos = 0
+                sessao = database_module.SessionLocal(bind=bind)
+                try:
+                    yield json.dumps({'tipo': 'estatisticas', 'estatisticas': estatisticas}, ensure_ascii=False) + "\n"
+                    paginas = dados_listagem.iterar_paginas(sessao, client_id, upload_id, apos=apos, limite=limit)
+                    for linhas, ultima in paginas:
+                        bloco = []
+                        for a in linhas:
+                            try:
+                                registro, colunas_registro = dados_listagem.montar_registro(a)
+                            except Exception as e:
+                                print(f"Erro ao processar registro {a.id}: {e}")
+                                continue
+                            novas = [c for c in colunas_registro if c not in colunas_vistas]
+                            if novas:
+                                colunas_vistas.update(novas)
+                                colunas.extend(novas)
+                                bloco.append(json.dumps({'tipo': 'colunas', 'colunas': novas}, ensure_ascii=False))
+                            bloco.append(json.dumps({'tipo': 'registro', 'registro': corrigir_encoding_json(registro)}, ensure_ascii=False, default=str))
+                        lidos += len(linhas)
+                        if bloco:
+                            yield "\n".join(bloco) + "\n"
+                    proximo = dados_listagem.codificar_cursor(ultima) if limit and ultima and lidos >= limit else None
+                    yield json.dumps({
+                        'tipo': 'fim',
+                        'colunas_originais': colunas or dados_listagem.COLUNAS_PADRAO,
+                        'proximo_cursor': proximo,
+                    }, ensure_ascii=False) + "\n"
+                finally:
+                    sessao.close()
+
+            return StreamingResponse(_linhas(), media_type="application/x-ndjson")
+
+        paginas = dados_listagem.iterar_paginas(db, client_id, upload_id, apos=apos, limite=limit)
+
         # Dados - inclui todas as colunas originais da planilha
         dados = []
         todas_colunas_ordenadas = []  # Lista ordenada para manter ordem
         todas_colunas_set = set()  # Set para verificar se já adicionou
-        
-        for a in atestados:
-            try:
-                # Parse dos dados originais (JSON)
-                # Usa object_pairs_hook para manter ordem
-                dados_originais = {}
-                if a.dados_originais:
-                    try:
-                        # Parse JSON mantendo ordem (Python 3.7+ mantém ordem, mas garantimos)
-                        dados_originais = json.loads(a.dados_originais, object_pairs_hook=OrderedDict)
-                        if isinstance(dados_originais, dict):
-                            # Adiciona colunas na ordem que aparecem no dict (ordem original da planilha)
-                            for col in dados_originais.keys():
-                                if col not in todas_colunas_set:
-                                    todas_colunas_ordenadas.append(col)
-                                    todas_colunas_set.add(col)
-                    except Exception as e:
-                        print(f"Erro ao parse JSON dados_originais: {e}")
-                        dados_originais = {}
-                
-                # Busca o upload para pegar mes_referencia
-                upload = db.query(Upload).filter(Upload.id == a.upload_id).first()
-                
-                # Cria registro com os novos campos da planilha padronizada
-                registro = {
-                    'id': a.id,
-                    'upload_id': a.upload_id,
-                    'mes_referencia': upload.mes_referencia if upload else None,
-                    # Campos principais da planilha padronizada
-                    'nomecompleto': a.nomecompleto or '',
-                    'descricao_atestad': a.descricao_atestad or '',
-                    'dias_atestados': float(a.dias_atestados) if a.dias_atestados else 0,
-                    'cid': a.cid or '',
-                    'diagnostico': a.diagnostico or '',
-                    'centro_custo': a.centro_custo or '',
-                    'setor': a.setor or '',
-                    'motivo_atestado': a.motivo_atestado or '',
-                    'escala': a.escala or '',
-                    'horas_dia': float(a.horas_dia) if a.horas_dia else 0,
-                    'horas_perdi': float(a.horas_perdi) if a.horas_perdi else 0,
-                    # Campos legados (para compatibilidade)
-                    'nome_funcionario': a.nome_funcionario or a.nomecompleto or '',
-                    'cpf': a.cpf or '',
-                    'matricula': a.matricula or '',
-                    'cargo': a.cargo or '',
-                    'genero': a.genero or '',
-                    'data_afastamento': a.data_afastamento.isoformat() if a.data_afastamento else None,
-                    'data_retorno': a.data_retorno.isoformat() if a.data_retorno else None,
-                    'tipo_info_atestado': a.tipo_info_atestado,
-                    'tipo_atestado': a.tipo_atestado or '',
-                    'descricao_cid': a.descricao_cid or a.diagnostico or '',
-                    'numero_dias_atestado': float(a.numero_dias_atestado) if a.numero_dias_atestado else (float(a.dias_atestados) if a.dias_atestados else 0),
-                    'numero_horas_atestado': float(a.numero_horas_atestado) if a.numero_horas_atestado else (float(a.horas_dia) if a.horas_dia else 0),
-                    'dias_perdidos': float(a.dias_perdidos) if a.dias_perdidos else (float(a.dias_atestados) if a.dias_atestados else 0),
-                    'horas_perdidas': float(a.horas_perdidas) if a.horas_perdidas else (float(a.horas_perdi) if a.horas_perdi else 0),
-                }
-                
-                # Adiciona TODAS as colunas originais da planilha na ordem original
-                # Usa OrderedDict para garantir ordem
-                registro_final = OrderedDict()
-                
-                # Adiciona colunas originais PRIMEIRO na ordem que aparecem (ordem da planilha)
-                for col_original in dados_originais.keys():
-                    registro_final[col_original] = dados_originais[col_original]
-                
-                # Depois adiciona campos processados (para compatibilidade)
-                for key in registro.keys():
-                    if key != 'dados_originais' and key not in registro_final:
-                        registro_final[key] = registro[key]
-                
-                dados.append(dict(registro_final))  # Converte para dict normal
-            except Exception as e:
-                print(f"Erro ao processar registro {a.id}: {e}")
-                continue
-        
-        # ORDEM EXATA DA PLANILHA - usa a ordem que veio dos dados originais
-        # Se não tiver colunas originais, usa a ordem padrão
-        if todas_colunas_ordenadas:
-            # Usa a ordem que veio dos dados originais (primeira ocorrência)
-            todas_colunas_list = todas_colunas_ordenadas
-        else:
-            # Fallback para ordem padrão
-            todas_colunas_list = [
-                'nomecompleto',      # 1. NOMECOMPLETO
-                'descricao_atestad', # 2. DESCRIÇÃO ATESTAD
-                'dias_atestados',    # 3. DIAS ATESTADOS
-                'cid',               # 4. CID
-                'diagnostico',       # 5. DIAGNÓSTICO
-                'centro_custo',      # 6. CENTROCUST
-                'setor',             # 7. setor
-                'motivo_atestado',   # 8. motivo atestado
-                'escala',            # 9. escala
-                'horas_dia',         # 10. Horas/dia
-                'horas_perdi'        # 11. Horas perdi
-            ]
-        
+        ultima = None
+        lidos = 0
+
+        for linhas, ultima in paginas:
+            lidos += len(linhas)
+            for a in linhas:
+                try:
+                    registro, colunas_registro = dados_listagem.montar_registro(a)
+                except Exception as e:
+                    print(f"Erro ao processar registro {a.id}: {e}")
+                    continue
+                # Colunas na ordem em que aparecem (ordem original da planilha)
+                for col in colunas_registro:
+                    if col not in todas_colunas_set:
+                        todas_colunas_ordenadas.append(col)
+                        todas_colunas_set.add(col)
+                dados.append(registro)
+
         resultado = {
             'dados': dados,
             'estatisticas': estatisticas,
-            'colunas_originais': todas_colunas_list  # Lista de todas as colunas da planilha
+            # ORDEM EXATA DA PLANILHA; sem colunas originais, a ordem padrão
+            'colunas_originais': todas_colunas_ordenadas or dados_listagem.COLUNAS_PADRAO,
         }
-        
+        if limit:
+            resultado['proximo_cursor'] = (
+                dados_listagem.codificar_cursor(ultima) if ultima and lidos >= limit else None
+            )
+
         return corrigir_encoding_json(resultado)
         
     except HTTPException:
@@ -5589,7 +5321,11 @@ async def criar_dado(
         validar_acesso_client_id(current_user, int(upload.client_id))
 
         novo = Atestado(**atestado)
+        if novo.dados_originais:
+            for campo, valor in extrair_campos_derivados(novo.dados_originais).items():
+                setattr(novo, campo, valor)
         db.add(novo)
+        RollupService(db).recalcular_meses(upload.client_id, [upload.mes_referencia])
         db.commit()
         db.refresh(novo)
         
@@ -5625,7 +5361,17 @@ async def atualizar_dado(
         for key, value in dados.items():
             if hasattr(atestado, key):
                 setattr(atestado, key, value)
-        
+        if 'dados_originais' in dados:
+            for campo, valor in extrair_campos_derivados(atestado.dados_originais).items():
+                setattr(atestado, campo, valor)
+        
+        rollups = RollupService(db)
+        rollups.recalcular_meses(resolved_client_id, [upload.mes_referencia])
+        if atestado.upload_id != upload.id:
+            # Registro movido para outro upload: o mês de destino também muda
+            destino = db.query(Upload).filter(Upload.id == atestado.upload_id).first()
+            if destino:
+                rollups.recalcular_meses(destino.client_id, [destino.mes_referencia])
         db.commit()
         return {"success": True}
     except HTTPException:
@@ -5992,6 +5738,7 @@ async def excluir_dado(
     
     try:
         db.delete(atestado)
+        RollupService(db).recalcular_meses(resolved_client_id, [upload.mes_referencia])
         db.commit()
         return {"success": True}
     except HTTPException:
@@ -6032,6 +5779,7 @@ async def atualizar_funcionario(
             if setor is not None:
                 atestado.setor = setor
         
+        RollupService(db).recalcular_atestados([a.id for a in atestados])
         db.commit()
         return {
             "success": True,
@@ -6066,6 +5814,7 @@ async def atualizar_funcionarios_massa(
         
         total_registros_atualizados = 0
         funcionarios_atualizados = 0
+        ids_atualizados = []
         
         for nome in nomes:
             # Busca todos os atestados do funcionário
@@ -6081,8 +5830,10 @@ async def atualizar_funcionarios_massa(
                         atestado.genero = genero.upper()[:1] if genero else None
                     if setor is not None:
                         atestado.setor = setor
+                    ids_atualizados.append(atestado.id)
                     total_registros_atualizados += 1
         
+        RollupService(db).recalcular_atestados(ids_atualizados)
         db.commit()
         return {
             "success": True,
@@ -6165,47 +5916,39 @@ async def process_file_with_config(
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Processa com configurações
+        # Processa com configurações, lote a lote
+        memoria = MemoryTracker()
         processor = ExcelProcessor(file_path)
-        registros = processor.processar()
+        lotes = memoria.track(processor.processar_em_lotes())
+        primeiro_lote = next(lotes, None)
         
-        if not registros:
+        if not primeiro_lote:
             raise HTTPException(status_code=400, detail="Erro ao processar planilha")
         
         # Detecta mês de referência
         mes_ref = None
-        if registros:
-            primeiro_registro = registros[0]
-            if 'data_afastamento' in primeiro_registro and primeiro_registro['data_afastamento']:
-                mes_ref = primeiro_registro['data_afastamento'].strftime('%Y-%m')
+        primeiro_registro = primeiro_lote[0]
+        if 'data_afastamento' in primeiro_registro and primeiro_registro['data_afastamento']:
+            mes_ref = primeiro_registro['data_afastamento'].strftime('%Y-%m')
         
-        # Cria upload
-        upload = Upload(
-            client_id=client_id,
-            filename=filename,
-            mes_referencia=mes_ref,
-            total_registros=len(registros),
-            data_upload=datetime.now()
+        def _todos_os_lotes():
+            yield primeiro_lote
+            yield from lotes
+        
+        # Cria upload e salva registros lote a lote (mesma transação)
+        resultado = UploadIngestService(db).ingerir_lotes(
+            client_id, filename, mes_ref, _todos_os_lotes(), data_upload=datetime.now()
         )
-        db.add(upload)
         db.commit()
-        db.refresh(upload)
-        
-        # Salva registros
-        for dados in registros:
-            atestado = Atestado(
-                upload_id=upload.id,
-                **dados
-            )
-            db.add(atestado)
         
-        db.commit()
+        uso_memoria = relatorio_memoria_upload(resultado['upload_id'], memoria)
         
         return {
             "success": True,
-            "upload_id": upload.id,
-            "total_records": len(registros),
-            "message": "Dados processados com sucesso!"
+            "upload_id": resultado["upload_id"],
+            "total_records": resultado["total_registros"],
+            "message": "Dados processados com sucesso!",
+            "memoria": uso_memoria,
         }
         
     except HTTPException:
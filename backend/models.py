@@ -1,7 +1,7 @@
 """
 Database models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Date, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Date, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -30,6 +30,8 @@ class Client(Base):
     atividade_principal = Column(String(500), nullable=True)
     logo_url = Column(String(500), nullable=True)
     cores_personalizadas = Column(Text, nullable=True)  # JSON com paleta de cores personalizada
+    # Sobe a cada alteração dos dados do cliente, no commit da própria alteração (ETags, caches)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     
@@ -40,6 +42,10 @@ class Client(Base):
 class Upload(Base):
     """Upload de planilha mensal"""
     __tablename__ = "uploads"
+    __table_args__ = (
+        # Filtro de tenant + período de todas as análises (cobre o id para o join)
+        Index("ix_uploads_client_mes", "client_id", "mes_referencia"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
@@ -55,6 +61,14 @@ class Upload(Base):
 class Atestado(Base):
     """Registro de atestado"""
     __tablename__ = "atestados"
+    __table_args__ = (
+        # Atestados são sempre lidos via upload (tenant); filtros/agrupamentos mais comuns
+        Index("ix_atestados_upload_setor", "upload_id", "setor"),
+        Index("ix_atestados_upload_nome", "upload_id", "nomecompleto"),
+        Index("ix_atestados_upload_cid", "upload_id", "cid"),
+        # Listagem paginada por (data_afastamento, id) — ver dados_listagem.py
+        Index("ix_atestados_upload_afastamento", "upload_id", "data_afastamento"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     upload_id = Column(Integer, ForeignKey("uploads.id"), nullable=False)
@@ -91,12 +105,67 @@ class Atestado(Base):
     # Dados originais da planilha (JSON com todas as colunas)
     dados_originais = Column(Text, nullable=True)  # JSON com todas as colunas originais
     
+    # Campos derivados de dados_originais na gravação (ver campos_derivados.py)
+    coerencia = Column(Boolean, nullable=True, index=True)  # True coerente, False sem coerência, NULL sem informação
+    data_admissao = Column(Date, nullable=True, index=True)  # Coluna "Admissão"
+    ano_planilha = Column(Integer, nullable=True)  # Coluna "ano"
+    mes_planilha = Column(Integer, nullable=True)  # Coluna "mês" (1-12)
+    
     # Metadata
     created_at = Column(DateTime, default=datetime.now)
     
     # Relationships
     upload = relationship("Upload", back_populates="atestados")
 
+class MonthlyRollup(Base):
+    """Agregado mensal materializado de atestados (por cliente, mês e dimensão)"""
+    __tablename__ = "monthly_rollups"
+    __table_args__ = (
+        UniqueConstraint("client_id", "mes_referencia", "dimensao", "valor", name="uq_monthly_rollup"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    mes_referencia = Column(String(7), nullable=False)  # YYYY-MM
+    dimensao = Column(String(20), nullable=False)  # total, setor, cid, genero, escala, motivo
+    valor = Column(String(200), nullable=True)  # valor bruto da dimensão (NULL no total e quando não informado)
+    quantidade = Column(Integer, default=0)
+    dias = Column(Float, default=0)
+    horas = Column(Float, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class UploadJob(Base):
+    """Job da fila de processamento de uploads (ver upload_jobs.py)"""
+    __tablename__ = "upload_jobs"
+    __table_args__ = (
+        # Reivindicação do próximo job e recuperação de jobs órfãos
+        Index("ix_upload_jobs_status_criado", "status", "created_at"),
+        Index("ix_upload_jobs_client", "client_id", "created_at"),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    filename = Column(String(255), nullable=False)  # nome salvo em UPLOADS_DIR
+    caminho_arquivo = Column(String(500), nullable=False)
+    mes_referencia = Column(String(7), nullable=True)  # informado pelo usuário ou detectado no processamento
+
+    status = Column(String(20), nullable=False, default="na_fila")  # na_fila, processando, concluido, erro, cancelado
+    fase = Column(String(20), nullable=False, default="na_fila")  # na_fila, leitura, gravacao + status final
+    linhas_lidas = Column(Integer, default=0)
+    linhas_gravadas = Column(Integer, default=0)
+    erro = Column(Text, nullable=True)
+    cancelamento_solicitado = Column(Boolean, default=False)
+    tentativas = Column(Integer, default=0)
+    worker = Column(String(100), nullable=True)  # quem reivindicou o job (host:pid:thread:token)
+    upload_id = Column(Integer, ForeignKey("uploads.id"), nullable=True)
+    resultado = Column(Text, nullable=True)  # JSON (uso de memória etc.)
+
+    created_at = Column(DateTime, default=datetime.now)
+    iniciado_em = Column(DateTime, nullable=True)
+    heartbeat_em = Column(DateTime, nullable=True)
+    finalizado_em = Column(DateTime, nullable=True)
+
 class User(Base):
     """Usuário do sistema"""
     __tablename__ = "users"
@@ -111,6 +180,8 @@ class User(Base):
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)  # Empresa associada ao usuário
     created_at = Column(DateTime, default=datetime.now)
     last_login = Column(DateTime, nullable=True)
+    # Sobe a cada alteração do usuário pelo ORM (ver cache_usuarios)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     client = relationship("Client")
@@ -1,8 +1,12 @@
 """
 Serviço de Notificações
 Notifica eventos importantes: erros, backup, espaço em disco, etc.
+
+Com o cache compartilhado ativo (ABSENTEISMO_CACHE_BACKEND=sqlite) a lista fica nele
+e todos os workers do gunicorn veem as mesmas notificações; senão, fica no processo.
 """
-from typing import List, Dict, Any, Optional
+import threading
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -21,12 +25,43 @@ class NotificationLevel(Enum):
     ERROR = "error"
     CRITICAL = "critical"
 
+NOTIFICACOES_CHAVE = "notifications:lista"
+NOTIFICACOES_TTL = 30 * 24 * 3600
+
+
 class NotificationService:
     """Serviço de notificações"""
     
     def __init__(self):
         self.notifications: List[Dict[str, Any]] = []
         self.max_notifications = 100  # Mantém últimas 100
+        self._lock = threading.Lock()
+
+    def _cache_compartilhado(self):
+        from . import cache_service as cache_module
+        cache = cache_module.cache_service
+        return cache if getattr(cache, "compartilhado", False) else None
+
+    def _lista(self) -> List[Dict[str, Any]]:
+        cache = self._cache_compartilhado()
+        if cache is not None:
+            return cache.get(NOTIFICACOES_CHAVE) or []
+        with self._lock:
+            return [dict(n) for n in self.notifications]
+
+    def _alterar(self, func: Callable[[List[Dict[str, Any]]], None]) -> List[Dict[str, Any]]:
+        """Aplica func à lista (atômico entre workers no cache compartilhado); retorna a lista nova"""
+        def _aplicar(atual):
+            lista = list(atual or [])
+            func(lista)
+            return lista[-self.max_notifications:]
+
+        cache = self._cache_compartilhado()
+        if cache is not None:
+            return cache.update(NOTIFICACOES_CHAVE, _aplicar, NOTIFICACOES_TTL)
+        with self._lock:
+            self.notifications = _aplicar(self.notifications)
+            return self.notifications
     
     def notify(
         self,
@@ -47,7 +82,6 @@ class NotificationService:
             user: Usuário relacionado
         """
         notification = {
-            "id": len(self.notifications) + 1,
             "level": level.value,
             "title": title,
             "message": message,
@@ -56,12 +90,13 @@ class NotificationService:
             "timestamp": datetime.now().isoformat(),
             "read": False
         }
-        
-        self.notifications.append(notification)
-        
-        # Mantém apenas últimas N
-        if len(self.notifications) > self.max_notifications:
-            self.notifications = self.notifications[-self.max_notifications:]
+
+        def _acrescentar(lista):
+            # id sequencial mesmo depois de descartar as mais antigas (mantém apenas últimas N)
+            notification["id"] = max((n["id"] for n in lista), default=0) + 1
+            lista.append(notification)
+
+        self._alterar(_acrescentar)
         
         # Loga notificação crítica
         if level == NotificationLevel.CRITICAL:
@@ -139,7 +174,7 @@ class NotificationService:
         limit: int = 50
     ) -> List[Dict[str, Any]]:
         """Retorna notificações"""
-        notifications = self.notifications.copy()
+        notifications = self._lista()
         
         # Filtra por nível
         if level:
@@ -157,15 +192,20 @@ class NotificationService:
     
     def mark_as_read(self, notification_id: int) -> bool:
         """Marca notificação como lida"""
-        for notification in self.notifications:
-            if notification["id"] == notification_id:
-                notification["read"] = True
-                return True
-        return False
+        encontrada = []
+
+        def _marcar(lista):
+            for notification in lista:
+                if notification["id"] == notification_id:
+                    notification["read"] = True
+                    encontrada.append(notification_id)
+
+        self._alterar(_marcar)
+        return bool(encontrada)
     
     def get_unread_count(self) -> int:
         """Retorna contagem de não lidas"""
-        return sum(1 for n in self.notifications if not n["read"])
+        return sum(1 for n in self._lista() if not n["read"])
 
 # Instância global
 notification_service = NotificationService()
@@ -0,0 +1,75 @@
+"""
+Pools de threads das rotas pesadas.
+
+As rotas de dashboard, apresentação, exportação, listagem e upload fazem trabalho
+síncrono (SQLAlchemy, pandas, openpyxl, matplotlib, cópia de arquivo). Declaradas
+como `async def`, esse trabalho rodava na thread do event loop e uma exportação lenta
+segurava todas as outras requisições do worker.
+
+Com @no_pool(...), a rota é escrita como função síncrona e cada chamada roda numa
+thread, limitada pelo pool escolhido:
+
+- POOL_EXPORTACAO: geração de arquivos (CPU: pandas/matplotlib/openpyxl/python-pptx),
+  ABSENTEISMO_THREADS_EXPORTACAO (padrão 2)
+- POOL_CONSULTAS: consultas e respostas JSON (I/O no banco),
+  ABSENTEISMO_THREADS_CONSULTAS (padrão 8)
+
+Requisições além do limite esperam a vez sem ocupar o event loop. Os limitadores são
+por event loop (anyio RunVar), como o limitador padrão do Starlette.
+"""
+import functools
+import os
+from typing import Callable, Dict
+
+import anyio
+from anyio.lowlevel import RunVar
+
+POOL_EXPORTACAO = "exportacao"
+POOL_CONSULTAS = "consultas"
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    return int(raw) if raw else default
+
+
+TAMANHOS: Dict[str, int] = {
+    POOL_EXPORTACAO: max(1, _env_int("ABSENTEISMO_THREADS_EXPORTACAO", 2)),
+    POOL_CONSULTAS: max(1, _env_int("ABSENTEISMO_THREADS_CONSULTAS", 8)),
+}
+
+_limitadores: RunVar = RunVar("limitadores_rotas")
+
+
+def limitador(pool: str) -> anyio.CapacityLimiter:
+    """CapacityLimiter do pool no event loop atual"""
+    try:
+        por_pool = _limitadores.get()
+    except LookupError:
+        por_pool = {}
+        _limitadores.set(por_pool)
+    if pool not in por_pool:
+        por_pool[pool] = anyio.CapacityLimiter(TAMANHOS[pool])
+    return por_pool[pool]
+
+
+def no_pool(pool: str) -> Callable:
+    """
+    Decorador de rota: a função síncrona roda numa thread do pool.
+
+    A assinatura (parâmetros, Depends) continua visível ao FastAPI via functools.wraps;
+    as dependências são resolvidas antes, como em qualquer rota.
+    """
+    if pool not in TAMANHOS:
+        raise ValueError(f"Pool desconhecido: {pool}")
+
+    def decorador(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def rota(*args, **kwargs):
+            return await anyio.to_thread.run_sync(
+                functools.partial(func, *args, **kwargs), limiter=limitador(pool)
+            )
+        return rota
+
+    return decorador
+
@@ -11,7 +11,7 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from datetime import datetime
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 import os
 import io
 import matplotlib
@@ -20,9 +20,14 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib import font_manager
 import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.drawing.image import Image as ExcelImage
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
+from .graficos_render import get_renderizador_graficos
+
 class ReportGenerator:
     """Gerador de relatórios"""
     
@@ -30,6 +35,8 @@ class ReportGenerator:
         self.styles = getSampleStyleSheet()
         self.db = db
         self.client_id = client_id
+        # Tempo de cada gráfico da última renderização (ver graficos_render)
+        self.tempos_graficos: List[Dict[str, Any]] = []
         # Carrega cores primeiro (antes de configurar estilos)
         self._load_client_colors()
         self._setup_custom_styles()
@@ -108,6 +115,33 @@ class ReportGenerator:
                 '#DAA520'   # Dourado escuro (apenas como acento)
             ]
     
+    @classmethod
+    def para_graficos(cls, cores: Dict[str, str], paleta: List[str], client_id: Optional[int]) -> "ReportGenerator":
+        """Instância só com o que os métodos _gerar_grafico_* usam (processos de renderização)"""
+        gerador = cls.__new__(cls)
+        gerador.db = None
+        gerador.client_id = client_id
+        gerador.cores = dict(cores)
+        gerador.paleta = list(paleta)
+        return gerador
+
+    def _renderizar_graficos(self, graficos_config, dados: Dict[str, Any], temp_dir: str, sufixo: str) -> Dict[str, str]:
+        """Gera de uma vez os gráficos com dados (pool de processos + cache); retorna {chave: png}"""
+        pedidos = [
+            (chave, funcao_grafico.__name__, dados[chave], os.path.join(temp_dir, f"{chave}_{sufixo}.png"))
+            for chave, _, funcao_grafico in graficos_config
+            if chave in dados and dados[chave]
+        ]
+        gerados, self.tempos_graficos = get_renderizador_graficos().renderizar(
+            pedidos, self.cores, self.paleta, self.client_id
+        )
+        if self.tempos_graficos:
+            total = sum(t['ms'] for t in self.tempos_graficos)
+            em_cache = sum(1 for t in self.tempos_graficos if t['cache'])
+            print(f"[GRAFICOS] {len(gerados)}/{len(pedidos)} gráficos, {em_cache} do cache, "
+                  f"{total:.0f} ms somados: " + ", ".join(f"{t['grafico']}={t['ms']:.0f}ms" for t in self.tempos_graficos))
+        return gerados
+
     def _setup_custom_styles(self):
         """Configura estilos customizados - usa cores do cliente"""
         # Define cor primária (será atualizada após carregar cores)
@@ -877,7 +911,6 @@ class ReportGenerator:
             # Gera gráficos temporários
             temp_dir = os.path.dirname(output_path)
             timestamp_unique = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-            graficos_temp = []
             
             # Define lista de gráficos a serem gerados (na ordem desejada)
             graficos_config = [
@@ -912,7 +945,16 @@ class ReportGenerator:
                     ('analise_detalhada_genero', 'Análise Detalhada por Gênero', self._gerar_grafico_genero),  # Replica apresentação
                 ])
             
-            # Gera cada gráfico com título e insight
+            # Gera os gráficos de uma vez (os de dados inválidos são descartados no laço abaixo)
+            graficos_gerados = self._renderizar_graficos(
+                graficos_config,
+                {k: v for k, v in dados.items() if isinstance(v, (list, dict))},
+                temp_dir,
+                timestamp_unique,
+            )
+            graficos_temp = list(graficos_gerados.values())
+            
+            # Monta cada gráfico com título e insight
             for chave_dados, titulo, funcao_grafico in graficos_config:
                 if chave_dados in dados and dados[chave_dados]:
                     try:
@@ -948,12 +990,9 @@ class ReportGenerator:
                             print(f"⚠️ Lista vazia para {chave_dados}, pulando...")
                             continue
                         
-                        grafico_path = os.path.join(temp_dir, f"{chave_dados}_{timestamp_unique}.png")
-                        resultado_grafico = funcao_grafico(dados_grafico, grafico_path)
+                        grafico_path = graficos_gerados.get(chave_dados, '')
                         
-                        if resultado_grafico and os.path.exists(grafico_path) and os.path.getsize(grafico_path) > 0:
-                            graficos_temp.append(grafico_path)
-                            
+                        if grafico_path and os.path.exists(grafico_path) and os.path.getsize(grafico_path) > 0:
                             # Busca insight correspondente - tenta múltiplas estratégias
                             insight = None
                             if insights:
@@ -1409,19 +1448,104 @@ class ReportGenerator:
                     pass
             return False
     
+    # Larguras fixas da aba "Dados Completos": as linhas chegam em fluxo e a
+    # largura não pode ser medida pelo conteúdo como nas abas de resumo
+    _LARGURAS_DADOS_EXCEL = {
+        'Nome': 40,
+        'Setor': 25,
+        'CID': 10,
+        'Diagnóstico': 45,
+        'Dias Atestados': 15,
+        'Horas Perdidas': 15,
+        'Motivo': 30,
+        'Escala': 20,
+    }
+
+    def _estilos_excel(self) -> List[NamedStyle]:
+        """Estilos nomeados do Excel: registrados uma vez no workbook e referenciados por nome nas células"""
+        cor_primaria = self.cores.get('primary', '#1a237e').lstrip('#').upper()
+        borda = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
+        cabecalho = NamedStyle(name='cabecalho')
+        cabecalho.fill = PatternFill(start_color=cor_primaria, end_color=cor_primaria, fill_type='solid')
+        cabecalho.font = Font(bold=True, color='FFFFFF', size=11)
+        cabecalho.alignment = Alignment(horizontal='center', vertical='center')
+        cabecalho.border = borda
+        celula = NamedStyle(name='celula')
+        celula.border = borda
+        return [cabecalho, celula]
+
+    @staticmethod
+    def _valor_excel(valor: Any) -> Any:
+        """Valor aceito pelo openpyxl (tipos numpy, NaN vazio, listas como texto)"""
+        if isinstance(valor, np.generic):
+            valor = valor.item()
+        if isinstance(valor, float) and valor != valor:
+            return None
+        if isinstance(valor, (list, tuple, dict, set)):
+            return str(valor)
+        return valor
+
+    def _celulas_excel(self, ws, valores, estilo: Optional[str]) -> List[Any]:
+        """Linha de células write-only; o estilo nomeado vai só nas células preenchidas"""
+        celulas = []
+        for valor in valores:
+            celula = WriteOnlyCell(ws, value=self._valor_excel(valor))
+            if estilo and celula.value not in (None, ''):
+                celula.style = estilo
+            celulas.append(celula)
+        return celulas
+
+    def _aba_resumo_excel(self, wb, nome_aba: str, df: pd.DataFrame, img_path: Optional[str] = None) -> None:
+        """Aba pequena (métricas/rankings): largura pelo conteúdo, bordas e gráfico abaixo dos dados"""
+        ws = wb.create_sheet(title=nome_aba)
+        colunas = [str(c) for c in df.columns]
+        linhas = [list(linha) for linha in df.itertuples(index=False, name=None)]
+
+        # Ajusta largura das colunas (precisa vir antes da primeira linha no modo write_only)
+        for i, coluna in enumerate(colunas, start=1):
+            maior = max([len(coluna)] + [len(str(linha[i - 1])) for linha in linhas])
+            ws.column_dimensions[get_column_letter(i)].width = min(maior + 2, 50)
+
+        ws.append(self._celulas_excel(ws, colunas, 'cabecalho'))
+        for linha in linhas:
+            ws.append(self._celulas_excel(ws, linha, 'celula'))
+
+        # Adiciona gráfico se disponível, após os dados (coluna A)
+        if img_path and os.path.exists(img_path):
+            try:
+                img = ExcelImage(img_path)
+                # Redimensiona para caber melhor no Excel
+                if img.width > 0:
+                    img.height = int(img.height * (600 / img.width))
+                img.width = 600
+                ws.add_image(img, f'A{max(5, len(linhas) + 1 + 3)}')
+            except Exception as e:
+                print(f"Erro ao adicionar gráfico {nome_aba}: {e}")
+
     def generate_excel_report(self,
                              output_path: str,
-                             dados: List[Dict[str, Any]],
+                             dados: Iterable[Dict[str, Any]],
                              metricas: Dict[str, Any],
                              dados_relatorio: Optional[Dict[str, Any]] = None,
                              periodo: Optional[str] = None,
                              client_id: Optional[int] = None) -> bool:
-        """Gera relatório Excel completo com gráficos"""
+        """
+        Gera relatório Excel completo com gráficos.
+
+        Workbook write_only: `dados` pode ser um gerador (ver exportacao_excel) e cada
+        linha vai direto para o arquivo, sem montar a planilha em memória. Cabeçalhos e
+        bordas usam estilos nomeados registrados uma vez no workbook.
+        """
+        graficos_temp = {}
         try:
             # Gera gráficos temporários primeiro
             temp_dir = os.path.dirname(output_path)
             timestamp_unique = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-            graficos_temp = {}
             
             dados_graficos = dados_relatorio if dados_relatorio else {}
             
@@ -1459,167 +1583,90 @@ class ReportGenerator:
                 ])
             
             # Gera todos os gráficos
-            for chave, nome_aba, funcao_grafico in graficos_config:
+            graficos_temp = self._renderizar_graficos(graficos_config, dados_graficos, temp_dir, timestamp_unique)
+            
+            # Cria o Excel (write_only: linhas vão para o arquivo à medida que são escritas)
+            wb = Workbook(write_only=True)
+            for estilo in self._estilos_excel():
+                wb.add_named_style(estilo)
+
+            # Aba 1: Dados Completos (criada na primeira linha; sem dados, não há aba)
+            ws_dados = None
+            for registro in dados:
+                if ws_dados is None:
+                    ws_dados = wb.create_sheet(title='Dados Completos')
+                    for i, coluna in enumerate(registro, start=1):
+                        ws_dados.column_dimensions[get_column_letter(i)].width = self._LARGURAS_DADOS_EXCEL.get(coluna, 20)
+                    ws_dados.append(self._celulas_excel(ws_dados, list(registro), 'cabecalho'))
+                ws_dados.append([self._valor_excel(v) for v in registro.values()])
+            
+            # Aba 2: Métricas
+            df_metricas = pd.DataFrame([
+                {'Métrica': 'Total de Atestados', 'Valor': metricas.get('total_atestados', 0)},
+                {'Métrica': 'Dias Perdidos', 'Valor': metricas.get('total_dias_perdidos', 0)},
+                {'Métrica': 'Horas Perdidas', 'Valor': metricas.get('total_horas_perdidas', 0)},
+                {'Métrica': 'Atestados (Dias)', 'Valor': metricas.get('total_atestados_dias', 0)},
+            ])
+            self._aba_resumo_excel(wb, 'Métricas', df_metricas)
+            
+            # Abas com dados e gráficos
+            mapeamento_abas = {
+                'top_cids': 'TOP CIDs',
+                'top_funcionarios': 'TOP Funcionários',
+                'top_setores': 'TOP Setores',
+                'evolucao_mensal': 'Evolução Mensal',
+                'distribuicao_genero': 'Distribuição Gênero',
+                'top_cids_dias': 'Dias por Doença',
+                'top_escalas': 'Escalas',
+                'top_motivos': 'Motivos',
+                'dias_centro_custo': 'Centro de Custo',
+                'distribuicao_dias': 'Distribuição Dias',
+                'media_cid': 'Média por CID',
+                'dias_setor_genero': 'Setor e Gênero',
+            }
+            
+            # Adiciona abas específicas da Roda de Ouro - REPLICA APRESENTAÇÃO
+            if client_id == 4:
+                mapeamento_abas.update({
+                    'classificacao_funcionarios_ro': 'Classificação Funcionários',
+                    'classificacao_setores_ro': 'Classificação Setores',
+                    'classificacao_doencas_ro': 'Classificação Doenças',
+                    'dias_ano_coerencia': 'Dias por Ano',  # Replica apresentação
+                    'analise_coerencia': 'Análise Coerência',  # Replica apresentação
+                    'tempo_servico_atestados': 'Tempo Serviço',  # Replica apresentação
+                    'horas_perdidas_genero': 'Horas por Gênero',
+                    'horas_perdidas_setor': 'Horas por Setor',
+                    'evolucao_mensal_horas': 'Evolução Horas',
+                    'comparativo_dias_horas_genero': 'Comparativo Dias/Horas',
+                    'horas_perdidas_setor_genero': 'Horas Setor/Gênero',
+                    'analise_detalhada_genero': 'Análise Detalhada Gênero',  # Replica apresentação
+                })
+            
+            for chave, nome_aba in mapeamento_abas.items():
                 if chave in dados_graficos and dados_graficos[chave]:
-                    grafico_path = os.path.join(temp_dir, f"{chave}_{timestamp_unique}.png")
-                    if funcao_grafico(dados_graficos[chave], grafico_path):
-                        graficos_temp[chave] = grafico_path
-            
-            # Cria o Excel
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                # Aba 1: Dados Completos
-                if dados:
-                    df_dados = pd.DataFrame(dados)
-                    df_dados.to_excel(writer, sheet_name='Dados Completos', index=False)
-                
-                # Aba 2: Métricas
-                df_metricas = pd.DataFrame([
-                    {'Métrica': 'Total de Atestados', 'Valor': metricas.get('total_atestados', 0)},
-                    {'Métrica': 'Dias Perdidos', 'Valor': metricas.get('total_dias_perdidos', 0)},
-                    {'Métrica': 'Horas Perdidas', 'Valor': metricas.get('total_horas_perdidas', 0)},
-                    {'Métrica': 'Atestados (Dias)', 'Valor': metricas.get('total_atestados_dias', 0)},
-                ])
-                df_metricas.to_excel(writer, sheet_name='Métricas', index=False)
-                
-                # Abas com dados e gráficos
-                mapeamento_abas = {
-                    'top_cids': 'TOP CIDs',
-                    'top_funcionarios': 'TOP Funcionários',
-                    'top_setores': 'TOP Setores',
-                    'evolucao_mensal': 'Evolução Mensal',
-                    'distribuicao_genero': 'Distribuição Gênero',
-                    'top_cids_dias': 'Dias por Doença',
-                    'top_escalas': 'Escalas',
-                    'top_motivos': 'Motivos',
-                    'dias_centro_custo': 'Centro de Custo',
-                    'distribuicao_dias': 'Distribuição Dias',
-                    'media_cid': 'Média por CID',
-                    'dias_setor_genero': 'Setor e Gênero',
-                }
-                
-                # Adiciona abas específicas da Roda de Ouro - REPLICA APRESENTAÇÃO
-                if client_id == 4:
-                    mapeamento_abas.update({
-                        'classificacao_funcionarios_ro': 'Classificação Funcionários',
-                        'classificacao_setores_ro': 'Classificação Setores',
-                        'classificacao_doencas_ro': 'Classificação Doenças',
-                        'dias_ano_coerencia': 'Dias por Ano',  # Replica apresentação
-                        'analise_coerencia': 'Análise Coerência',  # Replica apresentação
-                        'tempo_servico_atestados': 'Tempo Serviço',  # Replica apresentação
-                        'horas_perdidas_genero': 'Horas por Gênero',
-                        'horas_perdidas_setor': 'Horas por Setor',
-                        'evolucao_mensal_horas': 'Evolução Horas',
-                        'comparativo_dias_horas_genero': 'Comparativo Dias/Horas',
-                        'horas_perdidas_setor_genero': 'Horas Setor/Gênero',
-                        'analise_detalhada_genero': 'Análise Detalhada Gênero',  # Replica apresentação
-                    })
-                
-                for chave, nome_aba in mapeamento_abas.items():
-                    if chave in dados_graficos and dados_graficos[chave]:
-                        try:
-                            df = pd.DataFrame(dados_graficos[chave])
-                            df.to_excel(writer, sheet_name=nome_aba, index=False)
-                        except Exception as e:
-                            print(f"Erro ao criar aba {nome_aba}: {e}")
-                            continue
+                    try:
+                        # O DataFrame é montado antes de criar a aba: uma falha não deixa aba pela metade
+                        df = pd.DataFrame(dados_graficos[chave])
+                    except Exception as e:
+                        print(f"Erro ao criar aba {nome_aba}: {e}")
+                        continue
+                    self._aba_resumo_excel(wb, nome_aba, df, graficos_temp.get(chave))
             
-            # Adiciona gráficos às abas e formatação
-            try:
-                from openpyxl import load_workbook
-                from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                from openpyxl.utils import get_column_letter
-                
-                wb = load_workbook(output_path)
-                
-                # Define cores do cliente
-                cor_primaria_hex = self.cores.get('primary', '#1a237e')
-                cor_secundaria_hex = self.cores.get('secondary', '#556B2F')
-                
-                # Converte hex para RGB
-                def hex_to_rgb(hex_color):
-                    hex_color = hex_color.lstrip('#')
-                    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-                
-                cor_primaria_rgb = hex_to_rgb(cor_primaria_hex)
-                cor_secundaria_rgb = hex_to_rgb(cor_secundaria_hex)
-                
-                # Estilos
-                header_fill = PatternFill(start_color=''.join(f'{c:02X}' for c in cor_primaria_rgb), 
-                                         end_color=''.join(f'{c:02X}' for c in cor_primaria_rgb), 
-                                         fill_type='solid')
-                header_font = Font(bold=True, color='FFFFFF', size=11)
-                border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-                
-                for chave, nome_aba in mapeamento_abas.items():
-                    if nome_aba in wb.sheetnames:
-                        try:
-                            ws = wb[nome_aba]
-                            
-                            # Formata cabeçalho
-                            if ws.max_row > 0:
-                                for cell in ws[1]:
-                                    cell.fill = header_fill
-                                    cell.font = header_font
-                                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                                    cell.border = border
-                                
-                                # Ajusta largura das colunas
-                                for col in ws.columns:
-                                    max_length = 0
-                                    col_letter = get_column_letter(col[0].column)
-                                    for cell in col:
-                                        try:
-                                            if len(str(cell.value)) > max_length:
-                                                max_length = len(str(cell.value))
-                                        except:
-                                            pass
-                                    adjusted_width = min(max_length + 2, 50)
-                                    ws.column_dimensions[col_letter].width = adjusted_width
-                                
-                                # Aplica bordas nas células com dados
-                                for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-                                    for cell in row:
-                                        if cell.value:
-                                            cell.border = border
-                            
-                            # Adiciona gráfico se disponível
-                            if chave in graficos_temp:
-                                try:
-                                    img_path = graficos_temp[chave]
-                                    if os.path.exists(img_path):
-                                        img = ExcelImage(img_path)
-                                        # Redimensiona para caber melhor no Excel
-                                        img.width = 600
-                                        img.height = int(img.height * (600 / img.width)) if img.width > 0 else 400
-                                        
-                                        # Posiciona após os dados (coluna A, após última linha)
-                                        max_row = ws.max_row
-                                        img_row = max(5, max_row + 3)
-                                        img_cell = f'A{img_row}'
-                                        ws.add_image(img, img_cell)
-                                        
-                                        # Ajusta altura da linha para acomodar a imagem
-                                        ws.row_dimensions[img_row].height = img.height * 0.75
-                                except Exception as e:
-                                    print(f"Erro ao adicionar gráfico {nome_aba}: {e}")
-                                    continue
-                            
-                        except Exception as e:
-                            print(f"Erro ao formatar aba {nome_aba}: {e}")
-                            continue
-                
-                wb.save(output_path)
-                wb.close()
-            except Exception as e:
-                print(f"Erro ao adicionar gráficos ao Excel: {e}")
-                import traceback
-                traceback.print_exc()
+            wb.save(output_path)
+            return True
             
+        except Exception as e:
+            print(f"Erro ao gerar Excel: {e}")
+            import traceback
+            traceback.print_exc()
+            # Remove arquivo corrompido se existir
+            if os.path.exists(output_path):
+                try:
+                    os.remove(output_path)
+                except:
+                    pass
+            return False
+        finally:
             # Remove arquivos temporários
             for img_path in graficos_temp.values():
                 try:
@@ -1627,19 +1674,17 @@ class ReportGenerator:
                         os.remove(img_path)
                 except:
                     pass
-            
-            return True
-            
-        except Exception as e:
-            print(f"Erro ao gerar Excel: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
     
     def generate_powerpoint_report(self, output_path: str, dados_relatorio: Dict[str, Any], 
                                    metricas: Dict[str, Any], insights: List[Dict[str, Any]], 
-                                   periodo: str = None, insights_engine=None, client_id: Optional[int] = None) -> bool:
-        """Gera relatório em formato PowerPoint com gráficos e análises"""
+                                   periodo: str = None, insights_engine=None, client_id: Optional[int] = None,
+                                   graficos_nativos: bool = False) -> bool:
+        """
+        Gera relatório em formato PowerPoint com gráficos e análises.
+
+        graficos_nativos: gráficos como objetos editáveis do PowerPoint (ver graficos_pptx);
+        os que não têm versão nativa, ou cuja inserção falha, saem como imagem do matplotlib.
+        """
         try:
             from pptx import Presentation
             from pptx.util import Inches, Pt
@@ -1829,12 +1874,25 @@ class ReportGenerator:
             
             # Gera slides para cada gráfico
             timestamp_unique = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            nativos = {}
+            if graficos_nativos:
+                from .graficos_pptx import adicionar_grafico_nativo, grafico_nativo
+                for chave, _, funcao_grafico in graficos_config:
+                    if chave in dados_graficos and dados_graficos[chave]:
+                        grafico = grafico_nativo(funcao_grafico.__name__, dados_graficos[chave], self.cores, self.paleta)
+                        if grafico:
+                            nativos[chave] = grafico
+            
+            # Só os gráficos sem versão nativa passam pelo matplotlib
+            graficos_gerados = self._renderizar_graficos(
+                [config for config in graficos_config if config[0] not in nativos],
+                dados_graficos, temp_dir, timestamp_unique
+            )
             
             for chave, titulo, funcao_grafico in graficos_config:
                 if chave in dados_graficos and dados_graficos[chave]:
-                    # Gera gráfico
-                    grafico_path = os.path.join(temp_dir, f"{chave}_{timestamp_unique}.png")
-                    if funcao_grafico(dados_graficos[chave], grafico_path):
+                    grafico_path = graficos_gerados.get(chave)
+                    if chave in nativos or grafico_path:
                         # Cria slide
                         slide = prs.slides.add_slide(prs.slide_layouts[5])  # Title Only
                         
@@ -1845,11 +1903,20 @@ class ReportGenerator:
                         title_shape.text_frame.paragraphs[0].font.color.rgb = cor_primaria
                         title_shape.text_frame.paragraphs[0].font.bold = True
                         
-                        # Adiciona gráfico
-                        try:
-                            slide.shapes.add_picture(grafico_path, Inches(0.5), Inches(1.5), width=Inches(9), height=Inches(4))
-                        except Exception as e:
-                            print(f"Erro ao adicionar gráfico {chave}: {e}")
+                        # Adiciona gráfico (nativo; se falhar, volta para a imagem)
+                        if chave in nativos:
+                            try:
+                                adicionar_grafico_nativo(slide, nativos[chave], Inches(0.5), Inches(1.5), Inches(9), Inches(4))
+                            except Exception as e:
+                                print(f"Erro ao adicionar gráfico nativo {chave}, usando imagem: {e}")
+                                grafico_path = self._renderizar_graficos(
+                                    [(chave, titulo, funcao_grafico)], dados_graficos, temp_dir, timestamp_unique
+                                ).get(chave)
+                        if grafico_path:
+                            try:
+                                slide.shapes.add_picture(grafico_path, Inches(0.5), Inches(1.5), width=Inches(9), height=Inches(4))
+                            except Exception as e:
+                                print(f"Erro ao adicionar gráfico {chave}: {e}")
                         
                         # Busca insight
                         insight_grafico = self._buscar_insight_grafico(chave, insights)
@@ -1869,7 +1936,7 @@ class ReportGenerator:
                         
                         # Remove arquivo temporário
                         try:
-                            if os.path.exists(grafico_path):
+                            if grafico_path and os.path.exists(grafico_path):
                                 os.remove(grafico_path)
                         except:
                             pass
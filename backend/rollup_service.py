@@ -0,0 +1,273 @@
+"""
+Agregados mensais materializados (tabela monthly_rollups).
+
+Para cada cliente e mês de referência guarda contagem, dias e horas por
+dimensão (total, setor, cid, genero, escala, motivo). Os endpoints que
+gravam atestados chamam recalcular_meses antes do commit, na mesma
+transação (o que também invalida o cache de leituras do cliente no commit);
+as séries por período/setor leem daqui em O(meses).
+
+Leituras não gravam: cliente sem agregados (dados anteriores à tabela) é
+respondido com a agregação direta dos atestados. Os agregados desses clientes
+são construídos no startup (backfill_rollups com somente_sem_agregados) ou na
+primeira escrita, que materializa todos os meses do cliente, não só os
+informados. scripts/backfill_rollups.py refaz tudo (corrige agregados defasados).
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .cache_service import marcar_cliente_alterado
+from .models import Atestado, MonthlyRollup, Upload
+
+# Dimensão -> coluna de Atestado (None = total do mês)
+DIMENSOES = {
+    'total': None,
+    'setor': Atestado.setor,
+    'cid': Atestado.cid,
+    'genero': Atestado.genero,
+    'escala': Atestado.escala,
+    'motivo': Atestado.motivo_atestado,
+}
+
+
+def _lista_setores(setor) -> List[str]:
+    """Mesma semântica de aplicar_filtro_setor: string ou lista, vazio = sem filtro"""
+    if not setor:
+        return []
+    if isinstance(setor, str):
+        return [setor]
+    return list(setor)
+
+
+class RollupService:
+    """Mantém e consulta os agregados mensais por cliente"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def recalcular_meses(self, client_id: int, meses: Iterable[Optional[str]]) -> int:
+        """
+        Refaz os agregados dos meses informados a partir dos atestados.
+        Não faz commit: o chamador confirma junto com a alteração dos dados.
+        Retorna o número de linhas gravadas.
+        """
+        meses = sorted({m for m in meses if m})
+        if client_id:
+            # Leituras em cache do cliente são invalidadas no commit
+            marcar_cliente_alterado(self.db, client_id)
+        if not client_id or not meses:
+            return 0
+
+        # Sessões com autoflush=False: garante que as alterações pendentes entram na conta
+        self.db.flush()
+        if not self._tem_agregados(client_id):
+            # Primeira escrita de um cliente com dados anteriores à tabela: materializa
+            # todos os meses (senão as leituras passariam a ver só os meses informados)
+            meses = sorted({m for m in meses} | set(self._meses_do_cliente(client_id)))
+        self.db.query(MonthlyRollup).filter(
+            MonthlyRollup.client_id == client_id,
+            MonthlyRollup.mes_referencia.in_(meses)
+        ).delete(synchronize_session=False)
+
+        linhas = self._agregar(client_id, meses=meses)
+        if linhas:
+            self.db.bulk_insert_mappings(MonthlyRollup, linhas)
+        return len(linhas)
+
+    def recalcular_cliente(self, client_id: int) -> int:
+        """Refaz todos os meses do cliente (remove meses que não têm mais upload)"""
+        self.db.flush()
+        self.db.query(MonthlyRollup).filter(
+            MonthlyRollup.client_id == client_id
+        ).delete(synchronize_session=False)
+        return self.recalcular_meses(client_id, self._meses_do_cliente(client_id))
+
+    def remover_cliente(self, client_id: int) -> None:
+        """Remove os agregados do cliente (usado na exclusão do cliente)"""
+        marcar_cliente_alterado(self.db, client_id)
+        self.db.query(MonthlyRollup).filter(
+            MonthlyRollup.client_id == client_id
+        ).delete(synchronize_session=False)
+
+    def recalcular_atestados(self, ids: Iterable[int]) -> int:
+        """Refaz os meses (de cada cliente) que contêm os atestados informados"""
+        ids = list(ids)
+        if not ids:
+            return 0
+        afetados: Dict[int, set] = {}
+        rows = self.db.query(Upload.client_id, Upload.mes_referencia).join(
+            Atestado, Atestado.upload_id == Upload.id
+        ).filter(Atestado.id.in_(ids)).distinct().all()
+        for client_id, mes in rows:
+            afetados.setdefault(client_id, set()).add(mes)
+        return sum(self.recalcular_meses(client_id, meses) for client_id, meses in afetados.items())
+
+    def _agregar(self, client_id: int, meses: Optional[List[str]] = None, dimensoes: Iterable[str] = DIMENSOES,
+                 mes_inicio: str = None, mes_fim: str = None) -> List[Dict[str, Any]]:
+        """Linhas do agregado calculadas direto dos atestados (sem gravar)"""
+        linhas = []
+        for dimensao in dimensoes:
+            coluna = DIMENSOES[dimensao]
+            colunas = [Upload.mes_referencia]
+            if coluna is not None:
+                colunas.append(coluna)
+            query = self.db.query(
+                *colunas,
+                func.count(Atestado.id),
+                func.coalesce(func.sum(Atestado.dias_atestados), 0),
+                func.coalesce(func.sum(Atestado.horas_perdi), 0)
+            ).join(Upload).filter(Upload.client_id == client_id)
+            if meses is not None:
+                query = query.filter(Upload.mes_referencia.in_(meses))
+            if mes_inicio:
+                query = query.filter(Upload.mes_referencia >= mes_inicio)
+            if mes_fim:
+                query = query.filter(Upload.mes_referencia <= mes_fim)
+
+            for r in query.group_by(*colunas).all():
+                linhas.append({
+                    'client_id': client_id,
+                    'mes_referencia': r[0],
+                    'dimensao': dimensao,
+                    'valor': r[1] if coluna is not None else None,
+                    'quantidade': r[-3],
+                    'dias': float(r[-2]),
+                    'horas': float(r[-1]),
+                })
+        return linhas
+
+    def _meses_do_cliente(self, client_id: int) -> List[str]:
+        return [
+            m for (m,) in self.db.query(Upload.mes_referencia).filter(
+                Upload.client_id == client_id,
+                Upload.mes_referencia.isnot(None)
+            ).distinct().all()
+        ]
+
+    def _tem_agregados(self, client_id: int) -> bool:
+        return self.db.query(MonthlyRollup.id).filter(
+            MonthlyRollup.client_id == client_id
+        ).first() is not None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def serie_mensal(self, client_id: int, meses: Optional[int] = None, mes_inicio: str = None,
+                     mes_fim: str = None, setor=None) -> List[Dict[str, Any]]:
+        """Quantidade, dias e horas por mês (mais recente primeiro, limitado a `meses`)"""
+        setores = _lista_setores(setor)
+        if not self._tem_agregados(client_id):
+            return self._serie_mensal_direta(client_id, meses, mes_inicio, mes_fim, setores)
+
+        query = self.db.query(
+            MonthlyRollup.mes_referencia,
+            func.sum(MonthlyRollup.quantidade).label('quantidade'),
+            func.sum(MonthlyRollup.dias).label('dias'),
+            func.sum(MonthlyRollup.horas).label('horas')
+        ).filter(MonthlyRollup.client_id == client_id)
+
+        if setores:
+            query = query.filter(
+                MonthlyRollup.dimensao == 'setor',
+                MonthlyRollup.valor.in_(setores)
+            )
+        else:
+            query = query.filter(MonthlyRollup.dimensao == 'total')
+        if mes_inicio:
+            query = query.filter(MonthlyRollup.mes_referencia >= mes_inicio)
+        if mes_fim:
+            query = query.filter(MonthlyRollup.mes_referencia <= mes_fim)
+
+        query = query.group_by(MonthlyRollup.mes_referencia).order_by(
+            MonthlyRollup.mes_referencia.desc()
+        ).limit(meses)
+
+        return [
+            {
+                'mes': r.mes_referencia,
+                'quantidade': int(r.quantidade or 0),
+                'dias': r.dias or 0,
+                'horas': r.horas or 0,
+            }
+            for r in query.all()
+        ]
+
+    def por_dimensao(self, client_id: int, dimensao: str, mes_inicio: str = None,
+                     mes_fim: str = None) -> List[Dict[str, Any]]:
+        """Linhas (mes, valor, quantidade, dias, horas) de uma dimensão"""
+        if not self._tem_agregados(client_id):
+            linhas = self._agregar(client_id, dimensoes=[dimensao], mes_inicio=mes_inicio, mes_fim=mes_fim)
+            return [
+                {
+                    'mes': r['mes_referencia'],
+                    'valor': r['valor'],
+                    'quantidade': r['quantidade'],
+                    'dias': r['dias'],
+                    'horas': r['horas'],
+                }
+                for r in sorted(linhas, key=lambda r: r['mes_referencia'])
+            ]
+        query = self.db.query(MonthlyRollup).filter(
+            MonthlyRollup.client_id == client_id,
+            MonthlyRollup.dimensao == dimensao
+        )
+        if mes_inicio:
+            query = query.filter(MonthlyRollup.mes_referencia >= mes_inicio)
+        if mes_fim:
+            query = query.filter(MonthlyRollup.mes_referencia <= mes_fim)
+
+        return [
+            {
+                'mes': r.mes_referencia,
+                'valor': r.valor,
+                'quantidade': r.quantidade,
+                'dias': r.dias or 0,
+                'horas': r.horas or 0,
+            }
+            for r in query.order_by(MonthlyRollup.mes_referencia, MonthlyRollup.id).all()
+        ]
+
+    def _serie_mensal_direta(self, client_id: int, meses: Optional[int], mes_inicio: str,
+                             mes_fim: str, setores: List[str]) -> List[Dict[str, Any]]:
+        """serie_mensal calculada dos atestados (cliente ainda sem agregados)"""
+        linhas = self._agregar(client_id, dimensoes=['setor' if setores else 'total'],
+                               mes_inicio=mes_inicio, mes_fim=mes_fim)
+        por_mes: Dict[str, Dict[str, Any]] = {}
+        for r in linhas:
+            if setores and r['valor'] not in setores:
+                continue
+            mes = por_mes.setdefault(r['mes_referencia'], {
+                'mes': r['mes_referencia'], 'quantidade': 0, 'dias': 0, 'horas': 0,
+            })
+            mes['quantidade'] += int(r['quantidade'] or 0)
+            mes['dias'] += r['dias']
+            mes['horas'] += r['horas']
+        return sorted(por_mes.values(), key=lambda m: m['mes'], reverse=True)[:meses]
+
+
+def backfill_rollups(db: Session, client_id: Optional[int] = None, somente_sem_agregados: bool = False) -> int:
+    """
+    Refaz os agregados mensais de todos os clientes com uploads (ou só de
+    `client_id`), confirmando por cliente. Constrói os de clientes com dados
+    anteriores à tabela e corrige agregados defasados. Com somente_sem_agregados
+    (startup), só os clientes que ainda não têm nenhum. Retorna o total de linhas.
+    """
+    query = db.query(Upload.client_id).filter(Upload.client_id.isnot(None)).distinct()
+    if client_id is not None:
+        query = query.filter(Upload.client_id == client_id)
+    if somente_sem_agregados:
+        query = query.filter(~db.query(MonthlyRollup.id).filter(
+            MonthlyRollup.client_id == Upload.client_id
+        ).exists())
+    total = 0
+    for (cid,) in query.order_by(Upload.client_id).all():
+        total += RollupService(db).recalcular_cliente(cid)
+        db.commit()
+    return total
@@ -79,6 +79,8 @@ KNOWN_API_PATHS: FrozenSet[str] = frozenset(
         "/api/funcionarios/atualizar-massa",
         "/api/health",
         "/api/health/integrity",
+        "/api/jobs/{job_id}",
+        "/api/jobs/{job_id}/cancel",
         "/api/notifications",
         "/api/notifications/{notification_id}/read",
         "/api/preview/{upload_id}",
@@ -14,7 +14,8 @@ from dataclasses import asdict, dataclass, field
 from datetime import date, datetime
 from typing import Any, Dict, List, Optional, Set, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
 
 from backend.models import Atestado, Upload
 from backend.services.metric_service import (
@@ -49,6 +50,27 @@ _DEFAULT_DURACAO_EXCEPCIONAL_DIAS = 30.0
 _HORAS_DIVERGENCIA_TOLERANCIA = 0.5
 _ACRONYM_RE = re.compile(r"^[A-Z0-9]{2,6}$")
 
+_LOTE_LINHAS = 2000
+
+# Colunas lidas na passada por evento (sem dados_originais/descrições)
+_COLUNAS_ANALISE = (
+    Atestado.upload_id,
+    Atestado.setor,
+    Atestado.centro_custo,
+    Atestado.cid,
+    Atestado.matricula,
+    Atestado.cpf,
+    Atestado.nomecompleto,
+    Atestado.nome_funcionario,
+    Atestado.dias_atestados,
+    Atestado.horas_perdi,
+    Atestado.horas_dia,
+    Atestado.data_afastamento,
+    Atestado.data_retorno,
+    Upload.mes_referencia,
+    Upload.client_id.label("upload_client_id"),
+)
+
 _MULTIPLOS_UPLOADS_MSG = (
     "A presença de mais de um upload na mesma competência exige revisão, "
     "mas não comprova duplicidade sem hash ou assinatura do conteúdo."
@@ -379,6 +401,22 @@ class DataQualityService:
             "sem_cliente": orphan_uploads,
         }
 
+    def _window_rows(self, client_id: int, upload_ids: Optional[Set[int]]) -> Query:
+        """
+        Eventos do cliente em lotes (yield_per), só com as colunas da análise.
+        upload_ids: uploads válidos da janela (já resolvida na auditoria de uploads);
+        None = todos os uploads do cliente.
+        """
+        q = (
+            self.db.query(*_COLUNAS_ANALISE)
+            .select_from(Atestado)
+            .join(Upload, Atestado.upload_id == Upload.id)
+            .filter(Upload.client_id == client_id)
+        )
+        if upload_ids is not None:
+            q = q.filter(Atestado.upload_id.in_(sorted(upload_ids)))
+        return q.yield_per(_LOTE_LINHAS)
+
     def analyze(
         self,
         client_id: int,
@@ -411,29 +449,20 @@ class DataQualityService:
             ]
         valid_upload_ids = {u.id for u in valid_uploads}
 
-        all_client_rows: List[Atestado] = (
-            self.db.query(Atestado)
-            .join(Upload)
-            .filter(Upload.client_id == cid)
-            .all()
-        )
-        rows: List[Atestado] = []
+        # Eventos de uploads com período ausente/malformado: só a contagem, na SQL.
+        # Período válido fora da janela: não entra e não conta como inválido.
+        invalid_upload_ids = [u.id for u in upload_audit["excluidos_periodo_invalido"]]
         excluded_invalid_period = 0
-        for row in all_client_rows:
-            mes = row.upload.mes_referencia if row.upload else None
-            if row.upload_id in valid_upload_ids:
-                rows.append(row)
-            elif not self._mes_valido(mes):
-                excluded_invalid_period += 1
-            # período válido fora da janela: não entra e não conta como inválido
-
-        n = len(rows)
+        if invalid_upload_ids:
+            excluded_invalid_period = (
+                self.db.query(func.count(Atestado.id))
+                .filter(Atestado.upload_id.in_(invalid_upload_ids))
+                .scalar()
+            ) or 0
 
         # Contagens de eventos por upload (inclui zero)
         eventos_por_upload: Dict[int, int] = {u.id: 0 for u in valid_uploads}
-        for row in rows:
-            eventos_por_upload[row.upload_id] = eventos_por_upload.get(row.upload_id, 0) + 1
-        uploads_zero = sum(1 for _uid, c in eventos_por_upload.items() if c == 0)
+        n = 0
 
         # --- contadores de qualidade nos eventos válidos da janela ---
         sem_setor = sem_cc = sem_cid = sem_jornada = 0
@@ -466,13 +495,18 @@ class DataQualityService:
         worker_intervals: Dict[str, List[Tuple[date, date, int]]] = {}
         registros_com_sobreposicao: Set[int] = set()
 
-        for idx, row in enumerate(rows):
-            upload = row.upload
-            mes = upload.mes_referencia if upload else None
+        # Passada única em lotes: as linhas não ficam todas em memória
+        linhas = self._window_rows(cid, valid_upload_ids if has_window else None)
+        for idx, row in enumerate(linhas):
+            if row.upload_id not in valid_upload_ids:
+                continue
+            n += 1
+            eventos_por_upload[row.upload_id] = eventos_por_upload.get(row.upload_id, 0) + 1
+            mes = row.mes_referencia
 
-            if not upload or not row.upload_id:
+            if not row.upload_id:
                 sem_upload += 1
-            if upload is not None and upload.client_id != cid:
+            if row.upload_client_id != cid:
                 sem_cliente += 1
             if not mes or not str(mes).strip():
                 sem_periodo += 1
@@ -586,6 +620,8 @@ class DataQualityService:
                             overlapped = True
                     intervals.append((d0, end, idx))
 
+        uploads_zero = sum(1 for _uid, c in eventos_por_upload.items() if c == 0)
+
         def pct(part: int, whole: int = n) -> float:
             if whole <= 0:
                 return 0.0
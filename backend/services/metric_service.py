@@ -8,10 +8,12 @@ from __future__ import annotations
 
 import re
 from dataclasses import asdict, dataclass, field
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Query, Session
 
+from ..cache_service import cache_por_cliente
 from ..models import Atestado, Upload
 
 
@@ -30,6 +32,22 @@ WORKER_IDENTITY_METHOD = (
 _PERIOD_RE = re.compile(r"^(\d{4})-(0[1-9]|1[0-2])$")
 _MES_REF_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
 
+# Colunas lidas por compute(): a consulta projeta só estas (mais o mês do upload
+# via join) e devolve Rows leves em vez de objetos Atestado no identity map.
+_COLUNAS_METRICAS = (
+    Atestado.matricula,
+    Atestado.cpf,
+    Atestado.nomecompleto,
+    Atestado.nome_funcionario,
+    Atestado.dias_atestados,
+    Atestado.horas_perdi,
+    Atestado.horas_dia,
+    Atestado.setor,
+    Atestado.centro_custo,
+    Atestado.cid,
+    Upload.mes_referencia,
+)
+
 
 def _norm_text(value: Optional[str]) -> Optional[str]:
     if value is None:
@@ -261,6 +279,182 @@ class CanonicalMetricsResult:
         return asdict(self)
 
 
+# ---------------------------------------------------------------------------
+# Acumuladores parciais (mescláveis)
+# ---------------------------------------------------------------------------
+
+_CAMPOS_SOMA = (
+    "eventos_brutos",
+    "eventos_validos_para_dias",
+    "eventos_com_dias_invalidos",
+    "eventos_com_horas_invalidas",
+    "eventos_sem_identidade",
+    "dias_sum",
+    "horas_reg_sum",
+    "horas_est_sum",
+    "dias_valid_for_avg",
+    "dias_valid_sum",
+    "horas_reg_events",
+    "horas_est_events",
+    "eventos_sem_horas",
+    "por_matricula",
+    "por_cpf",
+    "somente_por_nome",
+    "sem_identificador",
+)
+_MAPAS_DISTRIBUICAO = ("setor_map", "cc_map", "cid_map")
+
+
+def _novo_grupo() -> Dict[str, Any]:
+    return {"eventos": 0.0, "dias_perdidos": 0.0, "trabalhadores": set()}
+
+
+@dataclass
+class MetricasParciais:
+    """
+    Acumuladores brutos de um recorte de eventos (ex.: uma competência).
+
+    Recortes disjuntos se combinam com mesclar() — somas somam, conjuntos de
+    trabalhadores se unem — e MetricService.compute_from_partials gera o
+    resultado canônico. Guarda chaves internas de trabalhador: nunca serializar.
+    """
+
+    eventos_brutos: int = 0
+    eventos_validos_para_dias: int = 0
+    eventos_com_dias_invalidos: int = 0
+    eventos_com_horas_invalidas: int = 0
+    eventos_sem_identidade: int = 0
+    dias_sum: float = 0.0
+    horas_reg_sum: float = 0.0
+    horas_est_sum: float = 0.0
+    dias_valid_for_avg: int = 0
+    dias_valid_sum: float = 0.0
+    horas_reg_events: int = 0
+    horas_est_events: int = 0
+    eventos_sem_horas: int = 0
+    por_matricula: int = 0
+    por_cpf: int = 0
+    somente_por_nome: int = 0
+    sem_identificador: int = 0
+    worker_keys: Set[str] = field(default_factory=set)
+    # Detecção de fragmentação: mesmo nome → múltiplas chaves (sem unificar)
+    nome_para_chaves: Dict[str, Set[str]] = field(default_factory=dict)
+    setor_map: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    cc_map: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    cid_map: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def adicionar(self, row: Any) -> None:
+        self.eventos_brutos += 1
+        kind, key = worker_identity_parts(row)
+        if kind == "matricula":
+            self.por_matricula += 1
+        elif kind == "cpf":
+            self.por_cpf += 1
+        elif kind == "nome":
+            self.somente_por_nome += 1
+        else:
+            self.sem_identificador += 1
+            self.eventos_sem_identidade += 1
+
+        if key:
+            self.worker_keys.add(key)
+
+        nome_ref = _norm_text(getattr(row, "nomecompleto", None)) or _norm_text(
+            getattr(row, "nome_funcionario", None)
+        )
+        if nome_ref and key:
+            self.nome_para_chaves.setdefault(nome_ref.upper(), set()).add(key)
+
+        # --- dias ---
+        raw_dias = row.dias_atestados
+        dias = _safe_float(raw_dias)
+        if dias is None or dias < 0:
+            # nulo, não-numérico ou negativo → inválido; não entra no total
+            self.eventos_com_dias_invalidos += 1
+            dias_contrib = 0.0
+        else:
+            # zero é válido
+            self.eventos_validos_para_dias += 1
+            dias_contrib = dias
+            self.dias_sum += dias
+            if dias > 0:
+                self.dias_valid_for_avg += 1
+                self.dias_valid_sum += dias
+
+        # --- horas ---
+        raw_horas = row.horas_perdi
+        horas = _safe_float(raw_horas)
+        horas_invalidas = False
+        if raw_horas is not None and horas is None:
+            # texto não numérico
+            horas_invalidas = True
+        elif horas is not None and horas < 0:
+            horas_invalidas = True
+
+        if horas_invalidas:
+            self.eventos_com_horas_invalidas += 1
+            horas = 0.0
+        elif horas is None:
+            horas = 0.0
+
+        if horas > 0:
+            self.horas_reg_sum += horas
+            self.horas_reg_events += 1
+        else:
+            horas_dia = _safe_float(row.horas_dia)
+            if (
+                not horas_invalidas
+                and dias_contrib > 0
+                and horas_dia is not None
+                and horas_dia > 0
+            ):
+                est = dias_contrib * horas_dia
+                self.horas_est_sum += est
+                self.horas_est_events += 1
+            else:
+                self.eventos_sem_horas += 1
+
+        setor_label = _norm_text(row.setor) or "SEM_SETOR"
+        bucket = self.setor_map.setdefault(setor_label, _novo_grupo())
+        bucket["eventos"] += 1
+        bucket["dias_perdidos"] += dias_contrib
+        if key:
+            bucket["trabalhadores"].add(key)
+
+        cc_label = _norm_text(row.centro_custo) or "SEM_CENTRO_CUSTO"
+        ccb = self.cc_map.setdefault(cc_label, _novo_grupo())
+        ccb["eventos"] += 1
+        ccb["dias_perdidos"] += dias_contrib
+        if key:
+            ccb["trabalhadores"].add(key)
+
+        letra = cid_letra_inicial(row.cid)
+        cb = self.cid_map.setdefault(letra, _novo_grupo())
+        cb["eventos"] += 1
+        cb["dias_perdidos"] += dias_contrib
+        if key:
+            cb["trabalhadores"].add(key)
+
+    @classmethod
+    def mesclar(cls, parciais: Iterable["MetricasParciais"]) -> "MetricasParciais":
+        """Nova parcial com a soma/união das parciais (as de entrada não são alteradas)."""
+        total = cls()
+        for parcial in parciais:
+            for nome in _CAMPOS_SOMA:
+                setattr(total, nome, getattr(total, nome) + getattr(parcial, nome))
+            total.worker_keys |= parcial.worker_keys
+            for nome, chaves in parcial.nome_para_chaves.items():
+                total.nome_para_chaves.setdefault(nome, set()).update(chaves)
+            for mapa in _MAPAS_DISTRIBUICAO:
+                destino = getattr(total, mapa)
+                for label, data in getattr(parcial, mapa).items():
+                    grupo = destino.setdefault(label, _novo_grupo())
+                    grupo["eventos"] += data["eventos"]
+                    grupo["dias_perdidos"] += data["dias_perdidos"]
+                    grupo["trabalhadores"] |= data["trabalhadores"]
+        return total
+
+
 # ---------------------------------------------------------------------------
 # Serviço
 # ---------------------------------------------------------------------------
@@ -302,8 +496,9 @@ class MetricService:
         centro_custo: Optional[str] = None,
     ) -> Query:
         q = (
-            self.db.query(Atestado)
-            .join(Upload)
+            self.db.query(*_COLUNAS_METRICAS)
+            .select_from(Atestado)
+            .join(Upload, Atestado.upload_id == Upload.id)
             .filter(Upload.client_id == client_id)
         )
         if periodo_inicio is not None or periodo_fim is not None:
@@ -326,7 +521,10 @@ class MetricService:
             return False
         return bool(_MES_REF_RE.fullmatch(str(mes).strip()))
 
-    def _mes_referencia_of(self, row: Atestado) -> Optional[str]:
+    def _mes_referencia_of(self, row: Any) -> Optional[str]:
+        if isinstance(row, Row):
+            # Linha projetada: mes_referencia já veio no join
+            return row.mes_referencia
         if getattr(row, "upload", None) is not None:
             return row.upload.mes_referencia
         return (
@@ -335,6 +533,34 @@ class MetricService:
             .scalar()
         )
 
+    def _rows(
+        self,
+        client_id: int,
+        periodo_inicio: Optional[str],
+        periodo_fim: Optional[str],
+        setor: Optional[str],
+        centro_custo: Optional[str],
+    ) -> List[Any]:
+        rows_raw: List[Row] = self._base_query(
+            client_id, periodo_inicio, periodo_fim, setor, centro_custo
+        ).all()
+        if periodo_inicio is None and periodo_fim is None:
+            return rows_raw
+
+        # Pós-filtro rigoroso: referência nula/malformada não entra no intervalo.
+        rows = []
+        for r in rows_raw:
+            mes = self._mes_referencia_of(r)
+            if not self._row_mes_valido(mes):
+                continue
+            if periodo_inicio is not None and mes < periodo_inicio:
+                continue
+            if periodo_fim is not None and mes > periodo_fim:
+                continue
+            rows.append(r)
+        return rows
+
+    @cache_por_cliente("metric_service")
     def compute(
         self,
         client_id: int,
@@ -356,25 +582,97 @@ class MetricService:
         periodo_inicio, periodo_fim = validate_period_range(periodo_inicio, periodo_fim)
         threshold = self._validate_threshold(small_group_threshold)
 
-        rows_raw: List[Atestado] = self._base_query(
-            cid, periodo_inicio, periodo_fim, setor, centro_custo
-        ).all()
+        parcial = MetricasParciais()
+        for row in self._rows(cid, periodo_inicio, periodo_fim, setor, centro_custo):
+            parcial.adicionar(row)
+        return self._finalize(
+            cid,
+            periodo_inicio,
+            periodo_fim,
+            parcial,
+            efetivo_trabalhadores=efetivo_trabalhadores,
+            suppress_small_groups=suppress_small_groups,
+            threshold=threshold,
+        )
 
-        # Pós-filtro rigoroso: referência nula/malformada não entra no intervalo.
-        if periodo_inicio is not None or periodo_fim is not None:
-            rows = []
-            for r in rows_raw:
-                mes = self._mes_referencia_of(r)
-                if not self._row_mes_valido(mes):
-                    continue
-                if periodo_inicio is not None and mes < periodo_inicio:
-                    continue
-                if periodo_fim is not None and mes > periodo_fim:
-                    continue
-                rows.append(r)
-        else:
-            rows = rows_raw
+    def compute_monthly_partials(
+        self,
+        client_id: int,
+        periodo_inicio: Optional[str] = None,
+        periodo_fim: Optional[str] = None,
+        setor: Optional[str] = None,
+        centro_custo: Optional[str] = None,
+    ) -> Dict[Optional[str], MetricasParciais]:
+        """
+        Uma única consulta; parciais por Upload.mes_referencia (valor como gravado,
+        o mesmo comparado no pós-filtro de compute). Janelas e séries dentro do
+        intervalo saem de compute_from_partials sem nova consulta.
+
+        Sem cache: as parciais guardam chaves de trabalhador (CPF, matrícula, nome).
+        Só o resultado finalizado (compute) vai para o cache.
+        """
+        cid = self._validate_client_id(client_id)
+        periodo_inicio, periodo_fim = validate_period_range(periodo_inicio, periodo_fim)
+
+        parciais: Dict[Optional[str], MetricasParciais] = {}
+        for row in self._rows(cid, periodo_inicio, periodo_fim, setor, centro_custo):
+            mes = self._mes_referencia_of(row)
+            parcial = parciais.get(mes)
+            if parcial is None:
+                parcial = parciais[mes] = MetricasParciais()
+            parcial.adicionar(row)
+        return parciais
+
+    def compute_from_partials(
+        self,
+        client_id: int,
+        parciais: Dict[Optional[str], MetricasParciais],
+        periodo_inicio: Optional[str] = None,
+        periodo_fim: Optional[str] = None,
+        *,
+        efetivo_trabalhadores: Optional[int] = None,
+        suppress_small_groups: bool = False,
+        small_group_threshold: int = 5,
+    ) -> CanonicalMetricsResult:
+        """
+        Mesmo resultado de compute() na janela, mesclando as parciais mensais de
+        compute_monthly_partials (que precisam cobrir a janela). Não consulta o banco.
+        """
+        cid = self._validate_client_id(client_id)
+        periodo_inicio, periodo_fim = validate_period_range(periodo_inicio, periodo_fim)
+        threshold = self._validate_threshold(small_group_threshold)
 
+        com_janela = periodo_inicio is not None or periodo_fim is not None
+        selecionadas = []
+        for mes in sorted(parciais, key=lambda m: (m is None, m or "")):
+            if com_janela and (
+                not self._row_mes_valido(mes)
+                or (periodo_inicio is not None and mes < periodo_inicio)
+                or (periodo_fim is not None and mes > periodo_fim)
+            ):
+                continue
+            selecionadas.append(parciais[mes])
+        return self._finalize(
+            cid,
+            periodo_inicio,
+            periodo_fim,
+            MetricasParciais.mesclar(selecionadas),
+            efetivo_trabalhadores=efetivo_trabalhadores,
+            suppress_small_groups=suppress_small_groups,
+            threshold=threshold,
+        )
+
+    def _finalize(
+        self,
+        cid: int,
+        periodo_inicio: Optional[str],
+        periodo_fim: Optional[str],
+        p: MetricasParciais,
+        *,
+        efetivo_trabalhadores: Optional[int],
+        suppress_small_groups: bool,
+        threshold: int,
+    ) -> CanonicalMetricsResult:
         limitacoes: List[str] = [
             "Sem deduplicação: reuploads/linhas duplicadas permanecem visíveis e somam.",
             WORKER_IDENTITY_METHOD,
@@ -382,133 +680,8 @@ class MetricService:
         ]
         qualidade_notas: List[str] = []
 
-        eventos_brutos = 0
-        eventos_validos_para_dias = 0
-        eventos_com_dias_invalidos = 0
-        eventos_com_horas_invalidas = 0
-        eventos_sem_identidade = 0
-        dias_sum = 0.0
-        horas_reg_sum = 0.0
-        horas_est_sum = 0.0
-        dias_valid_for_avg = 0
-        dias_valid_sum = 0.0
-        horas_reg_events = 0
-        horas_est_events = 0
-        eventos_sem_horas = 0
-        worker_keys: Set[str] = set()
-
-        por_matricula = 0
-        por_cpf = 0
-        somente_por_nome = 0
-        sem_identificador = 0
-
-        # Detecção de fragmentação: mesmo nome → múltiplas chaves (sem unificar)
-        nome_para_chaves: Dict[str, Set[str]] = {}
-
-        setor_map: Dict[str, Dict[str, Any]] = {}
-        cc_map: Dict[str, Dict[str, Any]] = {}
-        cid_map: Dict[str, Dict[str, Any]] = {}
-
-        for row in rows:
-            eventos_brutos += 1
-            kind, key = worker_identity_parts(row)
-            if kind == "matricula":
-                por_matricula += 1
-            elif kind == "cpf":
-                por_cpf += 1
-            elif kind == "nome":
-                somente_por_nome += 1
-            else:
-                sem_identificador += 1
-                eventos_sem_identidade += 1
-
-            if key:
-                worker_keys.add(key)
-
-            nome_ref = _norm_text(getattr(row, "nomecompleto", None)) or _norm_text(
-                getattr(row, "nome_funcionario", None)
-            )
-            if nome_ref and key:
-                nome_para_chaves.setdefault(nome_ref.upper(), set()).add(key)
-
-            # --- dias ---
-            raw_dias = row.dias_atestados
-            dias = _safe_float(raw_dias)
-            if dias is None or dias < 0:
-                # nulo, não-numérico ou negativo → inválido; não entra no total
-                eventos_com_dias_invalidos += 1
-                dias_contrib = 0.0
-            else:
-                # zero é válido
-                eventos_validos_para_dias += 1
-                dias_contrib = dias
-                dias_sum += dias
-                if dias > 0:
-                    dias_valid_for_avg += 1
-                    dias_valid_sum += dias
-
-            # --- horas ---
-            raw_horas = row.horas_perdi
-            horas = _safe_float(raw_horas)
-            horas_invalidas = False
-            if raw_horas is not None and horas is None:
-                # texto não numérico
-                horas_invalidas = True
-            elif horas is not None and horas < 0:
-                horas_invalidas = True
-
-            if horas_invalidas:
-                eventos_com_horas_invalidas += 1
-                horas = 0.0
-            elif horas is None:
-                horas = 0.0
-
-            if horas > 0:
-                horas_reg_sum += horas
-                horas_reg_events += 1
-            else:
-                horas_dia = _safe_float(row.horas_dia)
-                if (
-                    not horas_invalidas
-                    and dias_contrib > 0
-                    and horas_dia is not None
-                    and horas_dia > 0
-                ):
-                    est = dias_contrib * horas_dia
-                    horas_est_sum += est
-                    horas_est_events += 1
-                else:
-                    eventos_sem_horas += 1
-
-            setor_label = _norm_text(row.setor) or "SEM_SETOR"
-            bucket = setor_map.setdefault(
-                setor_label, {"eventos": 0.0, "dias_perdidos": 0.0, "trabalhadores": set()}
-            )
-            bucket["eventos"] += 1
-            bucket["dias_perdidos"] += dias_contrib
-            if key:
-                bucket["trabalhadores"].add(key)
-
-            cc_label = _norm_text(row.centro_custo) or "SEM_CENTRO_CUSTO"
-            ccb = cc_map.setdefault(
-                cc_label, {"eventos": 0.0, "dias_perdidos": 0.0, "trabalhadores": set()}
-            )
-            ccb["eventos"] += 1
-            ccb["dias_perdidos"] += dias_contrib
-            if key:
-                ccb["trabalhadores"].add(key)
-
-            letra = cid_letra_inicial(row.cid)
-            cb = cid_map.setdefault(
-                letra, {"eventos": 0.0, "dias_perdidos": 0.0, "trabalhadores": set()}
-            )
-            cb["eventos"] += 1
-            cb["dias_perdidos"] += dias_contrib
-            if key:
-                cb["trabalhadores"].add(key)
-
         # Fragmentação por nome compartilhado com chaves distintas
-        fragmentados = sum(1 for keys in nome_para_chaves.values() if len(keys) > 1)
+        fragmentados = sum(1 for keys in p.nome_para_chaves.values() if len(keys) > 1)
         if fragmentados:
             limitacoes.append(
                 f"Possível fragmentação de identidade: {fragmentados} nome(s) "
@@ -519,15 +692,15 @@ class MetricService:
                 f"nomes_com_chaves_distintas={fragmentados}"
             )
 
-        trabalhadores = len(worker_keys)
+        trabalhadores = len(p.worker_keys)
         duracao_media = (
-            round(dias_valid_sum / dias_valid_for_avg, 4) if dias_valid_for_avg else None
+            round(p.dias_valid_sum / p.dias_valid_for_avg, 4) if p.dias_valid_for_avg else None
         )
         horas_reg_media = (
-            round(horas_reg_sum / horas_reg_events, 4) if horas_reg_events else None
+            round(p.horas_reg_sum / p.horas_reg_events, 4) if p.horas_reg_events else None
         )
         horas_est_media = (
-            round(horas_est_sum / horas_est_events, 4) if horas_est_events else None
+            round(p.horas_est_sum / p.horas_est_events, 4) if p.horas_est_events else None
         )
 
         eventos_por_100 = None
@@ -537,7 +710,7 @@ class MetricService:
             except (TypeError, ValueError):
                 efetivo = 0
             if efetivo > 0:
-                eventos_por_100 = round(100.0 * eventos_brutos / efetivo, 4)
+                eventos_por_100 = round(100.0 * p.eventos_brutos / efetivo, 4)
                 denom_status = "valido"
             else:
                 denom_status = "incompleto"
@@ -549,28 +722,28 @@ class MetricService:
             )
 
         dias_por_trab = (
-            round(dias_sum / trabalhadores, 4) if trabalhadores > 0 else None
+            round(p.dias_sum / trabalhadores, 4) if trabalhadores > 0 else None
         )
 
-        if horas_reg_sum > 0 and horas_est_sum > 0:
+        if p.horas_reg_sum > 0 and p.horas_est_sum > 0:
             horas_qualidade = "mista"
-        elif horas_reg_sum > 0:
+        elif p.horas_reg_sum > 0:
             horas_qualidade = "registrada"
-        elif horas_est_sum > 0:
+        elif p.horas_est_sum > 0:
             horas_qualidade = "estimada"
         else:
             horas_qualidade = "indisponivel"
 
-        if eventos_com_dias_invalidos:
+        if p.eventos_com_dias_invalidos:
             qualidade_notas.append(
-                f"eventos_com_dias_invalidos={eventos_com_dias_invalidos}"
+                f"eventos_com_dias_invalidos={p.eventos_com_dias_invalidos}"
             )
-        if eventos_com_horas_invalidas:
+        if p.eventos_com_horas_invalidas:
             qualidade_notas.append(
-                f"eventos_com_horas_invalidas={eventos_com_horas_invalidas}"
+                f"eventos_com_horas_invalidas={p.eventos_com_horas_invalidas}"
             )
-        if eventos_sem_horas:
-            qualidade_notas.append(f"eventos_sem_horas={eventos_sem_horas}")
+        if p.eventos_sem_horas:
+            qualidade_notas.append(f"eventos_sem_horas={p.eventos_sem_horas}")
 
         def _dist(
             mapa: Dict[str, Dict[str, Any]],
@@ -620,34 +793,34 @@ class MetricService:
             )
             return out, grupos_suprimidos
 
-        dist_setor, sup_setor = _dist(setor_map, "setor")
-        dist_cc, sup_cc = _dist(cc_map, "centro_custo")
-        dist_cid, sup_cid = _dist(cid_map, "grupo_alfabetico_cid")
+        dist_setor, sup_setor = _dist(p.setor_map, "setor")
+        dist_cc, sup_cc = _dist(p.cc_map, "centro_custo")
+        dist_cid, sup_cid = _dist(p.cid_map, "grupo_alfabetico_cid")
 
         conf = _identity_reliability(
-            por_matricula, por_cpf, somente_por_nome, sem_identificador
+            p.por_matricula, p.por_cpf, p.somente_por_nome, p.sem_identificador
         )
 
         return CanonicalMetricsResult(
             client_id=cid,
             periodo=PeriodoCanonico(inicio=periodo_inicio, fim=periodo_fim),
             metricas=MetricasCanonicas(
-                eventos_brutos=eventos_brutos,
-                eventos=eventos_brutos,
-                eventos_validos_para_dias=eventos_validos_para_dias,
-                eventos_com_dias_invalidos=eventos_com_dias_invalidos,
-                eventos_com_horas_invalidas=eventos_com_horas_invalidas,
-                eventos_sem_identidade=eventos_sem_identidade,
+                eventos_brutos=p.eventos_brutos,
+                eventos=p.eventos_brutos,
+                eventos_validos_para_dias=p.eventos_validos_para_dias,
+                eventos_com_dias_invalidos=p.eventos_com_dias_invalidos,
+                eventos_com_horas_invalidas=p.eventos_com_horas_invalidas,
+                eventos_sem_identidade=p.eventos_sem_identidade,
                 trabalhadores_unicos=trabalhadores,
-                dias_perdidos=round(dias_sum, 4),
-                horas_perdidas_registradas=round(horas_reg_sum, 4),
-                horas_perdidas_estimadas=round(horas_est_sum, 4),
+                dias_perdidos=round(p.dias_sum, 4),
+                horas_perdidas_registradas=round(p.horas_reg_sum, 4),
+                horas_perdidas_estimadas=round(p.horas_est_sum, 4),
                 duracao_media_dias=duracao_media,
                 horas_registradas_media_por_evento=horas_reg_media,
-                eventos_com_horas_registradas=horas_reg_events,
+                eventos_com_horas_registradas=p.horas_reg_events,
                 horas_estimadas_media_por_evento=horas_est_media,
-                eventos_com_horas_estimadas=horas_est_events,
-                eventos_sem_horas=eventos_sem_horas,
+                eventos_com_horas_estimadas=p.horas_est_events,
+                eventos_sem_horas=p.eventos_sem_horas,
                 eventos_por_100_trabalhadores=eventos_por_100,
                 dias_perdidos_por_trabalhador=dias_por_trab,
             ),
@@ -661,10 +834,10 @@ class MetricService:
             ),
             qualidade_identidade=QualidadeIdentidade(
                 metodo="aproximado",
-                por_matricula=por_matricula,
-                por_cpf=por_cpf,
-                somente_por_nome=somente_por_nome,
-                sem_identificador=sem_identificador,
+                por_matricula=p.por_matricula,
+                por_cpf=p.por_cpf,
+                somente_por_nome=p.somente_por_nome,
+                sem_identificador=p.sem_identificador,
                 confiabilidade=conf,
             ),
             distribuicao_setor=dist_setor,
@@ -0,0 +1,230 @@
+"""
+Ingestão em massa dos uploads legados (/api/upload e /api/upload/process).
+
+Os registros de ExcelProcessor.processar() (ou de processar_em_lotes(), lote a
+lote) são normalizados e gravados com INSERT em lote (executemany) por blocos,
+sem criar um objeto ORM por linha.
+Tudo acontece na transação da sessão: o chamador faz commit (ou rollback)
+uma única vez no final.
+"""
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .models import Atestado, Upload
+from .rollup_service import RollupService
+
+# Campos de Atestado aceitos a partir da planilha
+CAMPOS_VALIDOS = (
+    'nomecompleto', 'descricao_atestad', 'dias_atestados', 'cid', 'diagnostico',
+    'centro_custo', 'setor', 'motivo_atestado', 'escala', 'horas_dia', 'horas_perdi',
+    'nome_funcionario', 'cpf', 'matricula', 'cargo', 'genero', 'data_afastamento',
+    'data_retorno', 'tipo_info_atestado', 'tipo_atestado', 'descricao_cid',
+    'numero_dias_atestado', 'numero_horas_atestado', 'dias_perdidos', 'horas_perdidas',
+    'dados_originais', 'coerencia', 'data_admissao', 'ano_planilha', 'mes_planilha'
+)
+
+CAMPOS_NUMERICOS = (
+    'dias_atestados', 'horas_dia', 'horas_perdi', 'numero_dias_atestado',
+    'numero_horas_atestado', 'dias_perdidos', 'horas_perdidas'
+)
+
+TAMANHO_BLOCO = 1000
+
+# (inseridos até agora, total de registros)
+ProgressoCallback = Callable[[int, int], None]
+
+
+def _para_date(valor) -> Optional[date]:
+    """String YYYY-MM-DD..., datetime ou date -> date (None se inválido)"""
+    if not valor:
+        return None
+    try:
+        if isinstance(valor, str):
+            return datetime.strptime(valor[:10], "%Y-%m-%d").date()
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+    except Exception:
+        return None
+    return None
+
+
+def normalizar_registro(reg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Filtra os campos do modelo e converte os tipos (datas, números e
+    tipo_info_atestado) como o upload sempre fez.
+    """
+    reg_filtrado = {k: v for k, v in reg.items() if k in CAMPOS_VALIDOS}
+
+    reg_filtrado['data_afastamento'] = _para_date(reg_filtrado.get('data_afastamento'))
+    reg_filtrado['data_retorno'] = _para_date(reg_filtrado.get('data_retorno'))
+
+    # Garante que valores numéricos são float (0.0 quando vazios ou inválidos)
+    for campo_num in CAMPOS_NUMERICOS:
+        if campo_num in reg_filtrado:
+            try:
+                reg_filtrado[campo_num] = float(reg_filtrado[campo_num]) if reg_filtrado[campo_num] is not None else 0.0
+            except Exception:
+                reg_filtrado[campo_num] = 0.0
+
+    if reg_filtrado.get('tipo_info_atestado') is not None:
+        try:
+            reg_filtrado['tipo_info_atestado'] = int(reg_filtrado['tipo_info_atestado'])
+        except Exception:
+            reg_filtrado['tipo_info_atestado'] = None
+
+    return reg_filtrado
+
+
+def _valores_padrao() -> Dict[str, Any]:
+    """Default escalar de cada coluna (o executemany exige as mesmas chaves em todas as linhas)"""
+    padroes = {}
+    for nome in CAMPOS_VALIDOS:
+        default = Atestado.__table__.c[nome].default
+        padroes[nome] = default.arg if default is not None and default.is_scalar else None
+    return padroes
+
+
+class UploadIngestService:
+    """Grava um upload legado e seus atestados em lote"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ingerir(
+        self,
+        client_id: int,
+        filename: str,
+        mes_referencia: Optional[str],
+        registros: List[Dict[str, Any]],
+        progresso: Optional[ProgressoCallback] = None,
+        tamanho_bloco: int = TAMANHO_BLOCO,
+        data_upload: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Cria o Upload, insere os atestados em blocos de `tamanho_bloco` e
+        recalcula o agregado do mês. Não faz commit.
+
+        `progresso(inseridos, total)` é chamado após cada bloco; uma exceção
+        levantada pelo callback interrompe a ingestão (o chamador faz rollback).
+        Retorna upload_id, total_registros (linhas da planilha) e inseridos.
+        """
+        upload = Upload(
+            client_id=client_id,
+            filename=filename,
+            mes_referencia=mes_referencia,
+            total_registros=len(registros),
+        )
+        if data_upload is not None:
+            upload.data_upload = data_upload
+        self.db.add(upload)
+        self.db.flush()
+
+        inseridos = self.inserir_atestados(upload.id, registros, progresso, tamanho_bloco)
+        RollupService(self.db).recalcular_meses(client_id, [mes_referencia])
+
+        return {
+            "upload_id": upload.id,
+            "total_registros": len(registros),
+            "inseridos": inseridos,
+        }
+
+    def ingerir_lotes(
+        self,
+        client_id: int,
+        filename: str,
+        mes_referencia: Optional[str],
+        lotes: Iterable[List[Dict[str, Any]]],
+        progresso: Optional[ProgressoCallback] = None,
+        tamanho_bloco: int = TAMANHO_BLOCO,
+        data_upload: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Como ingerir(), mas consome os registros lote a lote (ExcelProcessor.processar_em_lotes),
+        sem juntar a planilha inteira em memória. total_registros é gravado ao final.
+
+        `progresso(inseridos, lidos)` é chamado após cada lote (o total só é conhecido no fim).
+        """
+        upload = Upload(
+            client_id=client_id,
+            filename=filename,
+            mes_referencia=mes_referencia,
+            total_registros=0,
+        )
+        if data_upload is not None:
+            upload.data_upload = data_upload
+        self.db.add(upload)
+        self.db.flush()
+
+        lidos = 0
+        inseridos = 0
+        for lote in lotes:
+            lidos += len(lote)
+            inseridos += self.inserir_atestados(upload.id, lote, tamanho_bloco=tamanho_bloco)
+            if progresso:
+                progresso(inseridos, lidos)
+
+        upload.total_registros = lidos
+        self.db.flush()
+        RollupService(self.db).recalcular_meses(client_id, [mes_referencia])
+
+        return {
+            "upload_id": upload.id,
+            "total_registros": lidos,
+            "inseridos": inseridos,
+        }
+
+    def inserir_atestados(
+        self,
+        upload_id: int,
+        registros: Iterable[Dict[str, Any]],
+        progresso: Optional[ProgressoCallback] = None,
+        tamanho_bloco: int = TAMANHO_BLOCO,
+    ) -> int:
+        """INSERT em lote dos registros normalizados; linhas inválidas são ignoradas"""
+        registros = list(registros)
+        total = len(registros)
+        padroes = _valores_padrao()
+        statement = Atestado.__table__.insert()
+
+        inseridos = 0
+        bloco = []
+        for idx, reg in enumerate(registros):
+            try:
+                linha = dict(padroes)
+                linha.update(normalizar_registro(reg))
+                linha['upload_id'] = upload_id
+                bloco.append(linha)
+            except Exception as e:
+                # Log do erro mas continua processando outros registros
+                print(f"Erro ao processar registro {idx + 1}: {str(e)}")
+                continue
+
+            if len(bloco) >= tamanho_bloco:
+                inseridos += self._gravar_bloco(statement, bloco)
+                bloco = []
+                if progresso:
+                    progresso(inseridos, total)
+
+        if bloco:
+            inseridos += self._gravar_bloco(statement, bloco)
+        if progresso and (bloco or not inseridos):
+            progresso(inseridos, total)
+        return inseridos
+
+    def _gravar_bloco(self, statement, bloco: List[Dict[str, Any]]) -> int:
+        self.db.execute(statement, bloco)
+        return len(bloco)
+
+
+def relatorio_memoria_upload(upload_id: int, memoria) -> Dict[str, Any]:
+    """Loga e devolve o uso de memória (RSS, via MemoryTracker) do processamento de um upload"""
+    relatorio = memoria.report()
+    print(
+        f"🧮 Upload {upload_id}: {relatorio.rows} registros em {relatorio.batches} lotes — "
+        f"RSS inicial {relatorio.rss_start_mb} MB, pico {relatorio.rss_peak_mb} MB, final {relatorio.rss_end_mb} MB"
+    )
+    return relatorio.to_dict()
@@ -0,0 +1,553 @@
+"""
+Fila durável de processamento dos uploads legados (/api/upload).
+
+A requisição só salva o arquivo e cria um UploadJob (tabela upload_jobs); um
+pool de threads (UploadJobWorkerPool) reivindica os jobs e processa a planilha
+fora da requisição, sem esbarrar no timeout do worker do gunicorn.
+
+Fases de um job em processamento:
+- leitura: ExcelProcessor.processar_em_lotes; cada lote vai para um arquivo
+  temporário e o progresso (linhas lidas + heartbeat) é gravado a cada lote.
+  O cancelamento é verificado entre lotes.
+- gravacao: UploadIngestService.ingerir_lotes relê o arquivo temporário e grava
+  upload, atestados, agregados e o próprio job numa única transação. Nessa fase
+  o job não pode mais ser cancelado.
+
+O estado fica no SQLite, então os jobs sobrevivem a um reinício: um job
+"processando" sem heartbeat há mais de JOB_EXPIRA_SEGUNDOS volta para a fila
+(até MAX_TENTATIVAS). Como a gravação é uma transação só, um processo que
+morre no meio do job não deixa atestados pela metade.
+
+Durante a gravação o heartbeat não anda (a transação segura a escrita do
+SQLite; outra conexão não conseguiria gravá-lo). Por isso um job em gravação
+só é recuperado quando o worker dono não está mais vivo: thread deste processo
+ainda processando, ou processo do mesmo host ainda em execução.
+"""
+import json
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .excel_processor import ExcelProcessor
+from .ingestion.streaming_reader import MemoryTracker
+from .models import ClientColumnMapping, UploadJob
+from .upload_ingest import UploadIngestService, relatorio_memoria_upload
+
+STATUS_NA_FILA = "na_fila"
+STATUS_PROCESSANDO = "processando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+STATUS_CANCELADO = "cancelado"
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_ERRO, STATUS_CANCELADO)
+
+FASE_LEITURA = "leitura"
+FASE_GRAVACAO = "gravacao"
+
+# Sem heartbeat por mais que isso, o job "processando" é considerado órfão
+JOB_EXPIRA_SEGUNDOS = 300
+MAX_TENTATIVAS = 3
+
+
+# Tokens dos workers com job em processamento neste processo
+_workers_ativos = set()
+_workers_ativos_lock = threading.Lock()
+
+
+class JobCancelado(Exception):
+    """Cancelamento solicitado durante a leitura"""
+
+
+class JobPerdido(Exception):
+    """O job foi recuperado por outro worker (heartbeat expirado)"""
+
+
+def detectar_mes_referencia(registros: List[Dict[str, Any]]) -> str:
+    """Mês (YYYY-MM) da primeira data de afastamento/retorno encontrada; senão o mês atual"""
+    campos_data = ['data_afastamento', 'data_retorno', 'DATA_AFASTAMENTO', 'DATA_RETORNO']
+
+    for reg in registros[:10]:  # Verifica os primeiros 10 registros
+        for campo in campos_data:
+            if campo in reg and reg[campo]:
+                data = reg[campo]
+                if isinstance(data, datetime):
+                    return data.strftime("%Y-%m")
+                elif isinstance(data, str):
+                    try:
+                        return datetime.strptime(data[:10], "%Y-%m-%d").strftime("%Y-%m")
+                    except Exception:
+                        pass
+
+    return datetime.now().strftime("%Y-%m")
+
+
+def worker_vivo(worker: Optional[str]) -> bool:
+    """
+    O dono do job ainda está em execução? Thread deste processo com o job em
+    andamento, ou outro processo do mesmo host (token host:pid:...) ainda vivo.
+    De outro host não há como saber: vale só o heartbeat.
+    """
+    if not worker:
+        return False
+    with _workers_ativos_lock:
+        if worker in _workers_ativos:
+            return True
+    partes = worker.split(":")
+    if len(partes) < 3 or partes[0] != socket.gethostname():
+        return False
+    try:
+        pid = int(partes[1])
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        # Deste processo: só o registro acima indica job em andamento
+        return False
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def carregar_mapeamento_cliente(db: Session, client_id: int) -> Optional[Dict[str, str]]:
+    """Mapeamento customizado de colunas do cliente (None se não houver ou for inválido)"""
+    mapping_obj = db.query(ClientColumnMapping).filter(ClientColumnMapping.client_id == client_id).first()
+    if not mapping_obj or not mapping_obj.column_mapping:
+        return None
+    try:
+        mapping_data = json.loads(mapping_obj.column_mapping)
+    except Exception as e:
+        print(f"❌ Erro ao carregar mapeamento: {e}")
+        return None
+    # O mapeamento pode estar dentro de um objeto com 'column_mapping' ou ser o próprio dicionário
+    if isinstance(mapping_data, dict) and 'column_mapping' in mapping_data:
+        return mapping_data['column_mapping']
+    if isinstance(mapping_data, dict):
+        return mapping_data
+    return None
+
+
+def resumo_job(job: UploadJob, agora: Optional[datetime] = None) -> Dict[str, Any]:
+    """Estado do job para a API (GET /api/jobs/{id})"""
+    agora = agora or datetime.now()
+    linhas_por_segundo = None
+    if job.iniciado_em:
+        decorrido = ((job.finalizado_em or agora) - job.iniciado_em).total_seconds()
+        if decorrido > 0:
+            linhas_por_segundo = round((job.linhas_lidas or 0) / decorrido, 1)
+
+    resultado = json.loads(job.resultado) if job.resultado else {}
+    return {
+        "job_id": job.id,
+        "client_id": job.client_id,
+        "filename": job.filename,
+        "status": job.status,
+        "fase": job.fase,
+        "mes_referencia": job.mes_referencia,
+        "linhas_lidas": job.linhas_lidas or 0,
+        "linhas_gravadas": job.linhas_gravadas or 0,
+        "linhas_por_segundo": linhas_por_segundo,
+        "tentativas": job.tentativas or 0,
+        "cancelamento_solicitado": bool(job.cancelamento_solicitado),
+        "erro": job.erro,
+        "upload_id": job.upload_id,
+        "total_registros": resultado.get("total_registros"),
+        "memoria": resultado.get("memoria"),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "iniciado_em": job.iniciado_em.isoformat() if job.iniciado_em else None,
+        "finalizado_em": job.finalizado_em.isoformat() if job.finalizado_em else None,
+    }
+
+
+def _lotes_do_arquivo(arquivo) -> Iterator[List[Dict[str, Any]]]:
+    """Relê os lotes gravados com pickle.dump no arquivo temporário"""
+    arquivo.seek(0)
+    while True:
+        try:
+            yield pickle.load(arquivo)
+        except EOFError:
+            return
+
+
+class UploadJobService:
+    """Enfileira, reivindica, processa e cancela jobs de upload"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enfileirar(
+        self,
+        client_id: int,
+        filename: str,
+        caminho_arquivo: str,
+        mes_referencia: Optional[str] = None,
+        user_id: Optional[int] = None,
+    ) -> UploadJob:
+        """Cria o job na fila. Não faz commit."""
+        job = UploadJob(
+            id=uuid.uuid4().hex,
+            client_id=client_id,
+            user_id=user_id,
+            filename=filename,
+            caminho_arquivo=caminho_arquivo,
+            mes_referencia=mes_referencia,
+            status=STATUS_NA_FILA,
+            fase=STATUS_NA_FILA,
+            linhas_lidas=0,
+            linhas_gravadas=0,
+            tentativas=0,
+            cancelamento_solicitado=False,
+            created_at=datetime.now(),
+        )
+        self.db.add(job)
+        self.db.flush()
+        return job
+
+    def reivindicar(self, worker: str) -> Optional[str]:
+        """
+        Passa o job mais antigo da fila para "processando" em nome de `worker`
+        (token único por reivindicação) e devolve o id, ou None se a fila estiver vazia.
+
+        O UPDATE condicionado a status='na_fila' é atômico no SQLite: dois workers
+        (threads ou processos) nunca reivindicam o mesmo job.
+        """
+        agora = datetime.now()
+        proximo = (
+            select(UploadJob.id)
+            .where(UploadJob.status == STATUS_NA_FILA)
+            .order_by(UploadJob.created_at, UploadJob.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        resultado = self.db.execute(
+            update(UploadJob)
+            .where(UploadJob.id == proximo, UploadJob.status == STATUS_NA_FILA)
+            .values(
+                status=STATUS_PROCESSANDO,
+                fase=FASE_LEITURA,
+                worker=worker,
+                tentativas=UploadJob.tentativas + 1,
+                linhas_lidas=0,
+                linhas_gravadas=0,
+                erro=None,
+                iniciado_em=agora,
+                heartbeat_em=agora,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        if not resultado.rowcount:
+            return None
+        return self.db.execute(
+            select(UploadJob.id).where(UploadJob.worker == worker, UploadJob.status == STATUS_PROCESSANDO)
+        ).scalar()
+
+    def recuperar_orfaos(self, expira_segundos: int = JOB_EXPIRA_SEGUNDOS, max_tentativas: int = MAX_TENTATIVAS) -> int:
+        """
+        Jobs "processando" sem heartbeat há `expira_segundos` (processo reiniciado ou morto):
+        voltam para a fila, ou terminam em erro após `max_tentativas` (cancelados se pedido).
+        Jobs em gravação cujo worker ainda está vivo ficam de fora (transação longa).
+        Retorna quantos jobs foram recuperados.
+        """
+        limite = datetime.now() - timedelta(seconds=expira_segundos)
+        orfaos = self.db.query(UploadJob).filter(
+            UploadJob.status == STATUS_PROCESSANDO,
+            UploadJob.heartbeat_em < limite,
+        ).all()
+
+        recuperados = 0
+        for job in orfaos:
+            if job.fase == FASE_GRAVACAO and worker_vivo(job.worker):
+                continue
+            if job.cancelamento_solicitado:
+                valores = {"status": STATUS_CANCELADO, "fase": STATUS_CANCELADO, "finalizado_em": datetime.now()}
+            elif (job.tentativas or 0) >= max_tentativas:
+                valores = {
+                    "status": STATUS_ERRO,
+                    "fase": STATUS_ERRO,
+                    "finalizado_em": datetime.now(),
+                    "erro": f"Processamento interrompido {job.tentativas} vezes (sem resposta do worker)",
+                }
+            else:
+                valores = {"status": STATUS_NA_FILA, "fase": STATUS_NA_FILA, "worker": None}
+            # Condicionado ao mesmo heartbeat: se o worker voltou a responder, não mexe
+            resultado = self.db.execute(
+                update(UploadJob)
+                .where(
+                    UploadJob.id == job.id,
+                    UploadJob.status == STATUS_PROCESSANDO,
+                    UploadJob.heartbeat_em == job.heartbeat_em,
+                )
+                .values(**valores)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount:
+                recuperados += 1
+                print(f"♻️ Job de upload {job.id} órfão: {valores['status']}")
+        self.db.commit()
+        return recuperados
+
+    def solicitar_cancelamento(self, job: UploadJob) -> bool:
+        """
+        Cancela um job na fila (na hora) ou em leitura (o worker para no próximo lote).
+        Retorna False se o job já terminou ou já está gravando. Faz commit.
+        """
+        if job.status == STATUS_NA_FILA:
+            consulta = update(UploadJob).where(UploadJob.id == job.id, UploadJob.status == STATUS_NA_FILA).values(
+                status=STATUS_CANCELADO,
+                fase=STATUS_CANCELADO,
+                cancelamento_solicitado=True,
+                finalizado_em=datetime.now(),
+            )
+        elif job.status == STATUS_PROCESSANDO and job.fase == FASE_LEITURA:
+            consulta = update(UploadJob).where(
+                UploadJob.id == job.id,
+                UploadJob.status == STATUS_PROCESSANDO,
+                UploadJob.fase == FASE_LEITURA,
+            ).values(cancelamento_solicitado=True)
+        else:
+            return False
+
+        resultado = self.db.execute(consulta.execution_options(synchronize_session=False))
+        self.db.commit()
+        self.db.refresh(job)
+        return bool(resultado.rowcount)
+
+    def processar(self, job_id: str) -> Optional[UploadJob]:
+        """
+        Processa um job já reivindicado (status "processando"): leitura em lotes para
+        um arquivo temporário e gravação numa única transação. Erros e cancelamento
+        ficam registrados no job; não levanta exceção.
+        """
+        job = self.db.get(UploadJob, job_id)
+        if job is None or job.status != STATUS_PROCESSANDO:
+            return job
+        worker = job.worker
+        memoria = MemoryTracker()
+        with _workers_ativos_lock:
+            _workers_ativos.add(worker)
+
+        try:
+            with tempfile.TemporaryFile() as arquivo:
+                amostra = self._ler_planilha(job, worker, arquivo, memoria)
+                mes_ref = job.mes_referencia or detectar_mes_referencia(amostra)
+                self._iniciar_gravacao(job_id)
+
+                # Upload, atestados, agregados e estado final do job: uma transação
+                resultado = UploadIngestService(self.db).ingerir_lotes(
+                    job.client_id, job.filename, mes_ref, _lotes_do_arquivo(arquivo),
+                    progresso=lambda inseridos, lidos: memoria.sample(),
+                )
+            uso_memoria = relatorio_memoria_upload(resultado["upload_id"], memoria)
+            finalizado = self.db.execute(
+                update(UploadJob)
+                .where(UploadJob.id == job_id, UploadJob.worker == worker, UploadJob.status == STATUS_PROCESSANDO)
+                .values(
+                    status=STATUS_CONCLUIDO,
+                    fase=STATUS_CONCLUIDO,
+                    mes_referencia=mes_ref,
+                    upload_id=resultado["upload_id"],
+                    linhas_gravadas=resultado["inseridos"],
+                    resultado=json.dumps({"total_registros": resultado["total_registros"], "memoria": uso_memoria}),
+                    heartbeat_em=datetime.now(),
+                    finalizado_em=datetime.now(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if not finalizado.rowcount:
+                raise JobPerdido()
+            self.db.commit()
+            print(f"✅ Job de upload {job_id}: {resultado['total_registros']} registros (upload {resultado['upload_id']})")
+        except JobCancelado:
+            self.db.rollback()
+            self._finalizar(job_id, worker, STATUS_CANCELADO)
+            print(f"🛑 Job de upload {job_id} cancelado")
+        except JobPerdido:
+            self.db.rollback()
+            print(f"⚠️ Job de upload {job_id} assumido por outro worker; resultado descartado")
+        except Exception as e:
+            self.db.rollback()
+            traceback.print_exc()
+            self._finalizar(job_id, worker, STATUS_ERRO, f"Erro ao processar planilha: {str(e)}")
+        finally:
+            with _workers_ativos_lock:
+                _workers_ativos.discard(worker)
+
+        self.db.expire_all()
+        return self.db.get(UploadJob, job_id)
+
+    def _ler_planilha(self, job: UploadJob, worker: str, arquivo, memoria: MemoryTracker) -> List[Dict[str, Any]]:
+        """Fase de leitura: grava os lotes em `arquivo` e devolve os 10 primeiros registros"""
+        processor = ExcelProcessor(job.caminho_arquivo, custom_mapping=carregar_mapeamento_cliente(self.db, job.client_id))
+        lidos = 0
+        amostra: List[Dict[str, Any]] = []
+        for lote in memoria.track(processor.processar_em_lotes()):
+            pickle.dump(lote, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+            lidos += len(lote)
+            if len(amostra) < 10:
+                amostra.extend(lote[:10 - len(amostra)])
+            self._registrar_progresso(job, worker, lidos)
+
+        if not lidos:
+            raise ValueError("A planilha não contém dados válidos ou está vazia.")
+        return amostra
+
+    def _registrar_progresso(self, job: UploadJob, worker: str, lidos: int) -> None:
+        """Grava linhas lidas + heartbeat e verifica cancelamento (o commit expira o job e ele é relido)"""
+        job.linhas_lidas = lidos
+        job.heartbeat_em = datetime.now()
+        self.db.commit()
+        if job.status != STATUS_PROCESSANDO or job.worker != worker:
+            raise JobPerdido()
+        if job.cancelamento_solicitado:
+            raise JobCancelado()
+
+    def _iniciar_gravacao(self, job_id: str) -> None:
+        """Passa para a fase de gravação, a menos que o cancelamento tenha chegado antes"""
+        resultado = self.db.execute(
+            update(UploadJob)
+            .where(UploadJob.id == job_id, UploadJob.cancelamento_solicitado.isnot(True))
+            .values(fase=FASE_GRAVACAO, heartbeat_em=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        if not resultado.rowcount:
+            raise JobCancelado()
+
+    def _finalizar(self, job_id: str, worker: str, status: str, erro: Optional[str] = None) -> None:
+        self.db.execute(
+            update(UploadJob)
+            .where(UploadJob.id == job_id, UploadJob.worker == worker, UploadJob.status == STATUS_PROCESSANDO)
+            .values(status=status, fase=status, erro=erro, finalizado_em=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+
+class UploadJobWorkerPool:
+    """Threads que consomem a fila upload_jobs (uma sessão por job)"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        workers: int = 2,
+        intervalo: float = 2.0,
+        expira_segundos: int = JOB_EXPIRA_SEGUNDOS,
+        max_tentativas: int = MAX_TENTATIVAS,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.intervalo = intervalo
+        self.expira_segundos = expira_segundos
+        self.max_tentativas = max_tentativas
+        self.threads: List[threading.Thread] = []
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+
+    def start(self) -> None:
+        """Recupera jobs órfãos (reinício) e inicia as threads"""
+        if self.threads:
+            return
+        self._parar.clear()
+        self.recuperar_orfaos()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"upload-job-{i + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"📥 Fila de uploads iniciada ({self.workers} workers)")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Para de reivindicar jobs; um job em andamento termina (ou é recuperado no próximo start)"""
+        self._parar.set()
+        self._acordar.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def notificar(self) -> None:
+        """Acorda os workers (job novo na fila) sem esperar o intervalo de polling"""
+        self._acordar.set()
+
+    def recuperar_orfaos(self) -> int:
+        db = self.session_factory()
+        try:
+            return UploadJobService(db).recuperar_orfaos(self.expira_segundos, self.max_tentativas)
+        finally:
+            db.close()
+
+    def executar_proximo(self) -> Optional[str]:
+        """Reivindica e processa um job; devolve o id (None se a fila estiver vazia)"""
+        worker = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}:{uuid.uuid4().hex[:8]}"
+        db = self.session_factory()
+        try:
+            service = UploadJobService(db)
+            job_id = service.reivindicar(worker[:100])
+            if job_id:
+                service.processar(job_id)
+            return job_id
+        finally:
+            db.close()
+
+    def executar_pendentes(self) -> int:
+        """Processa a fila até esvaziar, na thread atual (scripts e testes)"""
+        processados = 0
+        while self.executar_proximo():
+            processados += 1
+        return processados
+
+    def _loop(self) -> None:
+        ultima_recuperacao = time.monotonic()
+        while not self._parar.is_set():
+            try:
+                if time.monotonic() - ultima_recuperacao >= self.expira_segundos:
+                    self.recuperar_orfaos()
+                    ultima_recuperacao = time.monotonic()
+                if self.executar_proximo():
+                    continue
+            except Exception as e:
+                print(f"❌ Erro no worker da fila de uploads: {e}")
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+
+# Instância global (inicializada no startup)
+upload_job_pool: Optional[UploadJobWorkerPool] = None
+
+
+def init_upload_job_pool() -> Optional[UploadJobWorkerPool]:
+    """
+    Inicia o pool de workers da fila de uploads.
+
+    ABSENTEISMO_UPLOAD_WORKERS define o número de threads (padrão 2; 0 desliga,
+    os jobs ficam na fila para outro processo) e ABSENTEISMO_UPLOAD_JOB_EXPIRA
+    os segundos sem heartbeat para um job ser considerado órfão.
+    """
+    global upload_job_pool
+    if upload_job_pool is not None:
+        return upload_job_pool
+    workers = int((os.environ.get("ABSENTEISMO_UPLOAD_WORKERS") or "2").strip())
+    expira = int((os.environ.get("ABSENTEISMO_UPLOAD_JOB_EXPIRA") or str(JOB_EXPIRA_SEGUNDOS)).strip())
+    if workers <= 0:
+        return None
+    upload_job_pool = UploadJobWorkerPool(workers=workers, expira_segundos=expira)
+    upload_job_pool.start()
+    return upload_job_pool
+
+
+def stop_upload_job_pool() -> None:
+    global upload_job_pool
+    if upload_job_pool is not None:
+        upload_job_pool.stop(timeout=5)
+        upload_job_pool = None
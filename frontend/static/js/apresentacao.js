@@ -136,8 +136,7 @@ async function carregarApresentacao(forceClientId = null) {
         
         console.log('Carregando apresentação para cliente ID:', clientId);
         
-        // Adiciona timestamp para evitar cache
-        const timestamp = new Date().getTime();
+        // Sem timestamp na URL: a API é no-store e o ETag (auth.js) evita recalcular dados iguais
         
         // Cria um AbortController para timeout
         const controller = new AbortController();
@@ -145,7 +144,7 @@ async function carregarApresentacao(forceClientId = null) {
         
         let response;
         try {
-            response = await fetch(`/api/apresentacao?client_id=${clientId}&_t=${timestamp}`, {
+            response = await fetch(`/api/apresentacao?client_id=${clientId}`, {
                 signal: controller.signal
             });
             clearTimeout(timeoutId);
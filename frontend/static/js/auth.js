@@ -228,6 +228,34 @@ function checkAdmin() {
     return true;
 }
 
+// Última resposta GET com ETag por URL (dashboard, apresentação, filtros...), só em memória:
+// a API é no-store, então a revalidação com If-None-Match é feita aqui e o 304 reaproveita a cópia
+const ETAG_CACHE_MAX = 30;
+const etagCache = new Map();
+
+function setRequestHeader(options, name, value) {
+    options.headers = options.headers || {};
+    // Preserve Headers instance or plain object
+    if (typeof Headers !== 'undefined' && options.headers instanceof Headers) {
+        options.headers.set(name, value);
+    } else {
+        options.headers[name] = value;
+    }
+}
+
+function guardarRespostaComEtag(urlStr, response) {
+    const etag = response.headers.get('ETag');
+    if (!etag) return;
+    const headers = { 'Content-Type': response.headers.get('Content-Type') || 'application/json', 'ETag': etag };
+    response.clone().text().then((body) => {
+        etagCache.delete(urlStr);
+        etagCache.set(urlStr, { etag, body, headers });
+        if (etagCache.size > ETAG_CACHE_MAX) {
+            etagCache.delete(etagCache.keys().next().value);
+        }
+    }).catch(() => { /* ignore */ });
+}
+
 // Intercepta fetch para Bearer + semântica HTTP (FIT-04)
 const originalFetch = window.fetch;
 window.fetch = function(url, options = {}) {
@@ -240,20 +268,30 @@ window.fetch = function(url, options = {}) {
     if (!isPublicApi && urlStr.includes('/api/')) {
         const token = getAccessToken();
         if (token) {
-            options.headers = options.headers || {};
-            // Preserve Headers instance or plain object
-            if (typeof Headers !== 'undefined' && options.headers instanceof Headers) {
-                options.headers.set('Authorization', `Bearer ${token}`);
-            } else {
-                options.headers['Authorization'] = `Bearer ${token}`;
-            }
+            setRequestHeader(options, 'Authorization', `Bearer ${token}`);
         }
     }
 
+    const revalida = typeof url === 'string' && urlStr.includes('/api/') && !isPublicApi &&
+        (options.method || 'GET').toUpperCase() === 'GET';
+    const guardada = revalida ? etagCache.get(urlStr) : null;
+    if (guardada) {
+        setRequestHeader(options, 'If-None-Match', guardada.etag);
+    }
+
     return originalFetch.call(this, url, options).then(async (response) => {
         if (!urlStr.includes('/api/')) {
             return response;
         }
+        if (revalida) {
+            // 304: dados do cliente inalterados desde a última leitura
+            if (response.status === 304 && guardada) {
+                return new Response(guardada.body, { status: 200, headers: guardada.headers });
+            }
+            if (response.ok) {
+                guardarRespostaComEtag(urlStr, response);
+            }
+        }
         // 401: sessão inválida/expirada → login (exceto login/health)
         if (response.status === 401 && !isPublicApi) {
             try {
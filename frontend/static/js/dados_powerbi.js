@@ -41,14 +41,14 @@ function renderEmptyTable() {
     }
 }
 
-// Carregar dados
+// Carregar dados (NDJSON: a tabela é desenhada à medida que os lotes chegam)
 async function loadData(clientId) {
     try {
         // Verifica se há upload_id na URL
         const urlParams = new URLSearchParams(window.location.search);
         const uploadId = urlParams.get('upload_id');
         
-        let url = `/api/dados/todos?client_id=${clientId}`;
+        let url = `/api/dados/todos?client_id=${clientId}&formato=ndjson`;
         if (uploadId) {
             url += `&upload_id=${uploadId}`;
         }
@@ -61,42 +61,83 @@ async function loadData(clientId) {
             throw new Error(`Erro ${response.status}: ${errorText}`);
         }
         
-        const data = await response.json();
-        
-        allData = data.dados || [];
-        filteredData = [...allData];
-        
-        // Detecta todas as colunas dinamicamente a partir dos dados
-        // PRIORIDADE: usa a ordem que veio do backend (colunas_originais)
-        if (data.colunas_originais && data.colunas_originais.length > 0) {
-            // Usa as colunas originais da planilha EXATAMENTE na ordem que veio
-            todasColunas = data.colunas_originais;
-        } else if (allData.length > 0) {
-            // Se não vier do backend, detecta a partir dos dados
-            todasColunas = Object.keys(allData[0]);
-            // Remove campos internos do sistema
-            todasColunas = todasColunas.filter(col => 
-                !['id', 'upload_id', 'dados_originais'].includes(col.toLowerCase())
-            );
-        } else {
-            // Fallback para colunas padrão da planilha padronizada (ORDEM EXATA)
-            todasColunas = [
-                'nomecompleto',      // 1. NOMECOMPLETO
-                'descricao_atestad', // 2. DESCRIÇÃO ATESTAD
-                'dias_atestados',    // 3. DIAS ATESTADOS
-                'cid',               // 4. CID
-                'diagnostico',       // 5. DIAGNÓSTICO
-                'centro_custo',      // 6. CENTROCUST
-                'setor',             // 7. setor
-                'motivo_atestado',   // 8. motivo atestado
-                'escala',            // 9. escala
-                'horas_dia',         // 10. Horas/dia
-                'horas_perdi'        // 11. Horas perdi
-            ];
-        }
+        const dados = [];
+        let colunasOriginais = [];
+        let ultimoRender = 0;
+        await lerNdjson(response, (linha) => {
+            if (linha.tipo === 'registro') {
+                dados.push(linha.registro);
+            } else if (linha.tipo === 'colunas') {
+                colunasOriginais = colunasOriginais.concat(linha.colunas);
+            } else if (linha.tipo === 'fim') {
+                colunasOriginais = linha.colunas_originais || colunasOriginais;
+            }
+        }, () => {
+            // Redesenha no máximo a cada 300 ms enquanto chegam lotes
+            const agora = Date.now();
+            if (dados.length && agora - ultimoRender > 300) {
+                ultimoRender = agora;
+                aplicarDados({ dados, colunas_originais: colunasOriginais });
+            }
+        });
+        aplicarDados({ dados, colunas_originais: colunasOriginais }, true);
         
-        // Ordena colunas EXATAMENTE na ordem da planilha padronizada
-        const colunasPrincipais = [
+    } catch (error) {
+        console.error('Erro ao carregar dados:', error);
+        showError('Erro ao carregar dados');
+    }
+}
+
+// Lê uma resposta NDJSON linha a linha; aoFimDoPedaco roda a cada pedaço recebido
+async function lerNdjson(response, aoLer, aoFimDoPedaco) {
+    if (!response.body || typeof response.body.getReader !== 'function' || typeof TextDecoder === 'undefined') {
+        (await response.text()).split('\n').forEach((l) => { if (l.trim()) aoLer(JSON.parse(l)); });
+        return;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let resto = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        resto += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const linhas = resto.split('\n');
+        resto = linhas.pop();
+        linhas.forEach((l) => { if (l.trim()) aoLer(JSON.parse(l)); });
+        if (done) break;
+        if (aoFimDoPedaco) aoFimDoPedaco();
+    }
+    if (resto.trim()) aoLer(JSON.parse(resto));
+}
+
+// Aplica dados carregados ({dados, colunas_originais}) e redesenha.
+// Lotes intermediários só acrescentam os registros novos (passando pelos filtros e
+// ordenação ativos); os seletores de ordenação e ano são refeitos no lote final.
+function aplicarDados(data, final = false) {
+    const dados = data.dados || [];
+    if (dados.length < allData.length) {
+        allData = [];
+        filteredData = [];
+    }
+    // allData só cresce aqui: buscas/filtros feitos entre lotes não duplicam registros
+    const novos = dados.slice(allData.length);
+    allData = allData.concat(novos);
+    filteredData = filteredData.concat(novos.filter(passaNosFiltrosAtivos));
+    
+    // Detecta todas as colunas dinamicamente a partir dos dados
+    // PRIORIDADE: usa a ordem que veio do backend (colunas_originais)
+    if (data.colunas_originais && data.colunas_originais.length > 0) {
+        // Usa as colunas originais da planilha EXATAMENTE na ordem que veio
+        todasColunas = data.colunas_originais;
+    } else if (allData.length > 0) {
+        // Se não vier do backend, detecta a partir dos dados
+        todasColunas = Object.keys(allData[0]);
+        // Remove campos internos do sistema
+        todasColunas = todasColunas.filter(col => 
+            !['id', 'upload_id', 'dados_originais'].includes(col.toLowerCase())
+        );
+    } else {
+        // Fallback para colunas padrão da planilha padronizada (ORDEM EXATA)
+        todasColunas = [
             'nomecompleto',      // 1. NOMECOMPLETO
             'descricao_atestad', // 2. DESCRIÇÃO ATESTAD
             'dias_atestados',    // 3. DIAS ATESTADOS
@@ -109,43 +150,85 @@ async function loadData(clientId) {
             'horas_dia',         // 10. Horas/dia
             'horas_perdi'        // 11. Horas perdi
         ];
-        const colunasOrdenadas = [];
+    }
+    
+    // Ordena colunas EXATAMENTE na ordem da planilha padronizada
+    const colunasPrincipais = [
+        'nomecompleto',      // 1. NOMECOMPLETO
+        'descricao_atestad', // 2. DESCRIÇÃO ATESTAD
+        'dias_atestados',    // 3. DIAS ATESTADOS
+        'cid',               // 4. CID
+        'diagnostico',       // 5. DIAGNÓSTICO
+        'centro_custo',      // 6. CENTROCUST
+        'setor',             // 7. setor
+        'motivo_atestado',   // 8. motivo atestado
+        'escala',            // 9. escala
+        'horas_dia',         // 10. Horas/dia
+        'horas_perdi'        // 11. Horas perdi
+    ];
+    const colunasOrdenadas = [];
+    
+    // Se veio do backend com colunas_originais, usa EXATAMENTE essa ordem
+    // Não tenta reordenar - usa a ordem que veio da planilha
+    if (data.colunas_originais && data.colunas_originais.length > 0) {
+        // Já está na ordem correta, não precisa fazer nada
+        // todasColunas já foi definido acima
+    } else {
+        // Se não veio do backend, ordena usando a ordem padrão
+        const ordemFinal = [];
         
-        // Se veio do backend com colunas_originais, usa EXATAMENTE essa ordem
-        // Não tenta reordenar - usa a ordem que veio da planilha
-        if (data.colunas_originais && data.colunas_originais.length > 0) {
-            // Já está na ordem correta, não precisa fazer nada
-            // todasColunas já foi definido acima
-        } else {
-            // Se não veio do backend, ordena usando a ordem padrão
-            const ordemFinal = [];
-            
-            // Adiciona colunas principais na ordem exata
-            colunasPrincipais.forEach(col => {
-                if (todasColunas.includes(col)) {
-                    ordemFinal.push(col);
-                }
-            });
-            
-            // Adiciona as demais colunas que não estão na lista principal (se houver)
-            todasColunas.forEach(col => {
-                if (!ordemFinal.includes(col)) {
-                    ordemFinal.push(col);
-                }
-            });
-            
-            todasColunas = ordemFinal.length > 0 ? ordemFinal : colunasPrincipais;
-        }
+        // Adiciona colunas principais na ordem exata
+        colunasPrincipais.forEach(col => {
+            if (todasColunas.includes(col)) {
+                ordemFinal.push(col);
+            }
+        });
         
-        updateStats();
+        // Adiciona as demais colunas que não estão na lista principal (se houver)
+        todasColunas.forEach(col => {
+            if (!ordemFinal.includes(col)) {
+                ordemFinal.push(col);
+            }
+        });
+        
+        todasColunas = ordemFinal.length > 0 ? ordemFinal : colunasPrincipais;
+    }
+    
+    if (final) {
         popularSeletorOrdenacao();
-        renderTable();
         carregarAnosDisponiveis();
-        
-    } catch (error) {
-        console.error('Erro ao carregar dados:', error);
-        showError('Erro ao carregar dados');
     }
+    if (ordenacaoCampo) {
+        aplicarOrdenacao();
+    } else {
+        updateStats();
+        renderTable();
+    }
+}
+
+// Registro passa na busca, no período e nos filtros por coluna ativos?
+function passaNosFiltrosAtivos(reg) {
+    const searchBox = document.getElementById('searchBox');
+    const termo = searchBox ? searchBox.value.toLowerCase() : '';
+    if (termo && !Object.values(reg).some(val =>
+        val !== null && val !== undefined && String(val).toLowerCase().includes(termo))) {
+        return false;
+    }
+    
+    if (anoSelecionado || mesSelecionado) {
+        if (!reg.mes_referencia) return false;
+        const [ano, mes] = reg.mes_referencia.split('-');
+        if (anoSelecionado && ano !== anoSelecionado) return false;
+        if (mesSelecionado && mes !== mesSelecionado) return false;
+    }
+    
+    for (let [field, values] of Object.entries(activeFilters)) {
+        if (values.length === 0) continue;
+        let rowVal = reg[field];
+        rowVal = (rowVal === null || rowVal === undefined || rowVal === '') ? '(Vazio)' : String(rowVal);
+        if (!values.includes(rowVal)) return false;
+    }
+    return true;
 }
 
 // Carregar anos disponíveis nos dados
@@ -160,6 +243,7 @@ function carregarAnosDisponiveis() {
     
     const anoSelect = document.getElementById('anoSelect');
     if (!anoSelect) return;
+    const selecionado = anoSelect.value;
     
     // Limpa opções existentes (exceto "Todos os anos")
     while (anoSelect.children.length > 1) {
@@ -173,6 +257,8 @@ function carregarAnosDisponiveis() {
         option.textContent = ano;
         anoSelect.appendChild(option);
     });
+    // Mantém o ano já escolhido (seletor refeito no fim da carga)
+    if (selecionado && anos.has(selecionado)) anoSelect.value = selecionado;
 }
 
 // Selecionar mês via aba
@@ -599,6 +685,7 @@ function setupEventListeners() {
 function popularSeletorOrdenacao() {
     const select = document.getElementById('ordenacaoCampo');
     if (!select || todasColunas.length === 0) return;
+    const selecionado = select.value;
     
     // Limpa opções existentes (exceto "Ordenar por...")
     while (select.children.length > 1) {
@@ -612,6 +699,8 @@ function popularSeletorOrdenacao() {
         option.textContent = formatColumnName(col);
         select.appendChild(option);
     });
+    // Mantém a ordenação já escolhida
+    if (selecionado && todasColunas.includes(selecionado)) select.value = selecionado;
 }
 
 // Aplicar ordenação
@@ -235,7 +235,12 @@ async function uploadFile() {
         clearInterval(interval);
         
         if (response.ok) {
-            const result = await response.json();
+            const enfileirado = await response.json();
+            
+            // O processamento roda em background: acompanha o job até terminar
+            document.getElementById('progressFill').style.width = '50%';
+            document.getElementById('progressText').textContent = 'Arquivo enviado. Aguardando processamento...';
+            const result = await acompanharJobUpload(enfileirado.job_id, headers);
             
             document.getElementById('progressFill').style.width = '100%';
             document.getElementById('progressText').textContent = `Sucesso! ${result.total_registros} registros processados`;
@@ -350,6 +355,42 @@ async function uploadFile() {
     }
 }
 
+const FASES_JOB_UPLOAD = {
+    na_fila: 'Na fila de processamento',
+    leitura: 'Lendo planilha',
+    gravacao: 'Gravando registros'
+};
+
+async function acompanharJobUpload(jobId, headers) {
+    // Consulta GET /api/jobs/{id} até o job terminar; devolve o job concluído
+    const url = `/api/jobs/${jobId}?client_id=${currentClient.id}`;
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch(url, { headers: headers });
+        if (!response.ok) {
+            throw new Error(`Erro ao consultar processamento (${response.status})`);
+        }
+        const job = await response.json();
+        
+        if (job.status === 'concluido') {
+            return job;
+        }
+        if (job.status === 'erro') {
+            throw new Error(job.erro || 'Erro ao processar planilha');
+        }
+        if (job.status === 'cancelado') {
+            throw new Error('Processamento cancelado');
+        }
+        
+        const fase = FASES_JOB_UPLOAD[job.fase] || 'Processando';
+        const vazao = job.linhas_por_segundo ? ` (${Math.round(job.linhas_por_segundo)} linhas/s)` : '';
+        document.getElementById('progressText').textContent = job.linhas_lidas
+            ? `${fase}... ${job.linhas_lidas} linhas${vazao}`
+            : `${fase}...`;
+        document.getElementById('progressFill').style.width = job.fase === 'gravacao' ? '90%' : '70%';
+    }
+}
+
 async function mostrarMensagemSucesso(mensagem) {
     // Remove mensagens anteriores
     const mensagensExistentes = document.querySelectorAll('.mensagem-upload-sucesso');
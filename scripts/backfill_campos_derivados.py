@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Backfill das colunas derivadas de dados_originais em `atestados`
+(coerencia, data_admissao, ano_planilha, mes_planilha).
+
+Necessário uma vez para registros gravados antes da extração na ingestão.
+Idempotente: pode ser executado novamente sem efeito colateral.
+
+Uso:
+  PYTHONPATH=. python3 scripts/backfill_campos_derivados.py --db-path /caminho/arquivo.db
+  PYTHONPATH=. python3 scripts/backfill_campos_derivados.py --db-path /caminho/arquivo.db \\
+      --client-id 4 --batch-size 2000
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Preenche coerência, admissão e ano/mês da planilha a partir de dados_originais."
+    )
+    p.add_argument("--db-path", type=str, required=True, help="Caminho explícito para o SQLite")
+    p.add_argument("--client-id", type=int, default=None, help="Restringe a um cliente")
+    p.add_argument("--batch-size", type=int, default=1000)
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    if not Path(args.db_path).exists():
+        print(f"Erro: banco não encontrado: {args.db_path}", file=sys.stderr)
+        return 2
+
+    from sqlalchemy.orm import sessionmaker
+
+    from backend.campos_derivados import backfill_campos_derivados
+    from backend.database import create_sqlite_engine, run_migrations
+
+    engine = create_sqlite_engine(f"sqlite:///{args.db_path}")
+    run_migrations(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        inicio = time.perf_counter()
+        total = backfill_campos_derivados(db, batch_size=args.batch_size, client_id=args.client_id)
+        print(f"✅ {total} atestado(s) atualizados em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        db.close()
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Backfill dos agregados mensais (`monthly_rollups`).
+
+Necessário uma vez para clientes com atestados gravados antes da tabela e
+sempre que dados forem alterados fora das rotas/ingestão (SQL direto), pois
+refaz todos os meses de cada cliente a partir dos atestados.
+Idempotente: pode ser executado novamente sem efeito colateral.
+
+Uso:
+  PYTHONPATH=. python3 scripts/backfill_rollups.py --db-path /caminho/arquivo.db
+  PYTHONPATH=. python3 scripts/backfill_rollups.py --db-path /caminho/arquivo.db --client-id 4
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Refaz os agregados mensais (monthly_rollups) a partir dos atestados."
+    )
+    p.add_argument("--db-path", type=str, required=True, help="Caminho explícito para o SQLite")
+    p.add_argument("--client-id", type=int, default=None, help="Restringe a um cliente")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    if not Path(args.db_path).exists():
+        print(f"Erro: banco não encontrado: {args.db_path}", file=sys.stderr)
+        return 2
+
+    from sqlalchemy.orm import sessionmaker
+
+    from backend.database import Base, create_sqlite_engine, run_migrations
+    from backend.models import MonthlyRollup
+    from backend.rollup_service import backfill_rollups
+
+    engine = create_sqlite_engine(f"sqlite:///{args.db_path}")
+    Base.metadata.create_all(bind=engine, tables=[MonthlyRollup.__table__])
+    run_migrations(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        inicio = time.perf_counter()
+        total = backfill_rollups(db, client_id=args.client_id)
+        print(f"✅ {total} linha(s) de agregado gravadas em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        db.close()
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark do ExcelProcessor.processar em planilhas sintéticas.
+
+Gera pastas de trabalho com 1k, 10k e 100k linhas (dados fictícios) e
+informa linhas/segundo do processamento completo e só da etapa após a
+leitura do arquivo.
+
+Uso:
+  PYTHONPATH=. python3 scripts/benchmark_excel_processor.py
+  PYTHONPATH=. python3 scripts/benchmark_excel_processor.py --linhas 1000 10000
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NOMES = ("MARIA SILVA", "JOAO PEREIRA", "ANA SOUZA", "CARLOS LIMA", "BRUNA COSTA", "PAULO ROCHA")
+SETORES = ("PRODUCAO", "ADMIN", "LOGISTICA", "MANUTENCAO")
+CIDS = ("M54", "J11", "A09", "F32", None)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Mede linhas/s do ExcelProcessor.processar.")
+    p.add_argument("--linhas", type=int, nargs="+", default=[1000, 10000, 100000])
+    return p
+
+
+def gerar_planilha(caminho: Path, linhas: int) -> Path:
+    """Planilha no layout padrão (openpyxl write_only para gerar 100k linhas rápido)"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["NOMECOMPLETO", "setor", "CID", "DIAS ATESTADOS", "Horas/dia", "Horas perdi",
+               "DATA_AFASTAMENTO", "coerente", "ano", "mês", "Admissão"])
+    inicio = datetime(2025, 1, 1)
+    for i in range(linhas):
+        dias = (i % 5) + 1
+        ws.append([
+            f"{NOMES[i % len(NOMES)]} {i % 997}",
+            SETORES[i % len(SETORES)],
+            CIDS[i % len(CIDS)],
+            dias,
+            8,
+            dias * 8.0,
+            inicio + timedelta(days=i % 365),
+            "COERENTE" if i % 4 else "SEM COERÊNCIA",
+            2025,
+            (i % 12) + 1,
+            "01/02/2020",
+        ])
+    wb.save(caminho)
+    return caminho
+
+
+def medir(caminho: Path) -> dict:
+    import pandas as pd
+
+    from backend.excel_processor import ExcelProcessor
+
+    inicio = time.perf_counter()
+    pd.read_excel(caminho, sheet_name=0, engine="openpyxl")
+    leitura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        registros = ExcelProcessor(str(caminho)).processar()
+    total = time.perf_counter() - inicio
+    return {"registros": len(registros), "total": total, "leitura": leitura}
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    print(f"{'linhas':>8} {'total (s)':>10} {'linhas/s':>10} {'sem leitura (s)':>16} {'linhas/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for linhas in args.linhas:
+            caminho = gerar_planilha(Path(tmp) / f"bench_{linhas}.xlsx", linhas)
+            r = medir(caminho)
+            processamento = max(r["total"] - r["leitura"], 1e-9)
+            print(
+                f"{r['registros']:>8} {r['total']:>10.2f} {r['registros'] / r['total']:>10.0f} "
+                f"{processamento:>16.2f} {r['registros'] / processamento:>10.0f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
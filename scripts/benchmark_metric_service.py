@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark do MetricService.compute: carga ORM completa x consulta projetada.
+
+Parte da fixture de performance (tests/fixtures/performance) e acrescenta N
+atestados fictícios ao cliente 2, distribuídos em 12 uploads mensais. Mede
+linhas/segundo do compute() com a consulta antiga (objetos Atestado + mês via
+relacionamento) e com a atual (colunas + Upload.mes_referencia no join), sem cache.
+
+Uso:
+  PYTHONPATH=. python3 scripts/benchmark_metric_service.py
+  PYTHONPATH=. python3 scripts/benchmark_metric_service.py --linhas 10000 --repeticoes 5
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NOMES = ("MARIA SILVA", "JOAO PEREIRA", "ANA SOUZA", "CARLOS LIMA", "BRUNA COSTA", "PAULO ROCHA")
+SETORES = ("PRODUCAO", "ADMIN", "LOGISTICA", "MANUTENCAO")
+CIDS = ("M54.5", "J11", "A09", "F32", None)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Mede linhas/s do MetricService.compute (antes/depois).")
+    p.add_argument("--linhas", type=int, nargs="+", default=[1000, 10000, 50000])
+    p.add_argument("--repeticoes", type=int, default=3)
+    return p
+
+
+def popular(db, linhas: int) -> None:
+    from sqlalchemy import insert
+
+    from backend.models import Atestado
+    from tests.fixtures.canonical_metrics import add_upload
+    from tests.fixtures.performance.canonical_db import seed_performance_adapter_fixture
+
+    seed_performance_adapter_fixture(db)
+    uploads = [add_upload(db, client_id=2, mes_referencia=f"2024-{m:02d}") for m in range(1, 13)]
+    db.flush()
+    registros = []
+    for i in range(linhas):
+        dias = float((i % 5) + 1)
+        registros.append({
+            "upload_id": uploads[i % 12].id,
+            "nomecompleto": f"{NOMES[i % len(NOMES)]} {i % 997}",
+            "matricula": f"M{i % 997}" if i % 3 else None,
+            "setor": SETORES[i % len(SETORES)],
+            "centro_custo": f"CC-{i % 7:02d}",
+            "cid": CIDS[i % len(CIDS)],
+            "dias_atestados": dias,
+            "horas_dia": 8.0,
+            "horas_perdi": dias * 8.0 if i % 2 else 0.0,
+        })
+    db.execute(insert(Atestado), registros)
+    db.commit()
+
+
+def _servico_orm(db):
+    """MetricService com a consulta anterior: entidades Atestado completas"""
+    from backend.models import Atestado, Upload
+    from backend.services.metric_service import MetricService
+
+    class MetricServiceOrm(MetricService):
+        def _base_query(self, client_id, periodo_inicio, periodo_fim, setor=None, centro_custo=None):
+            q = self.db.query(Atestado).join(Upload).filter(Upload.client_id == client_id)
+            if periodo_inicio is not None or periodo_fim is not None:
+                q = q.filter(Upload.mes_referencia.isnot(None), Upload.mes_referencia != "")
+            if periodo_inicio is not None:
+                q = q.filter(Upload.mes_referencia >= periodo_inicio)
+            if periodo_fim is not None:
+                q = q.filter(Upload.mes_referencia <= periodo_fim)
+            return q
+
+    return MetricServiceOrm(db)
+
+
+def medir(sessao, criar_servico, repeticoes: int):
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        db = sessao()
+        try:
+            inicio = time.perf_counter()
+            resultado = criar_servico(db).compute(client_id=2, periodo_inicio="2024-01", periodo_fim="2024-12")
+            tempo = time.perf_counter() - inicio
+        finally:
+            db.close()
+        melhor = tempo if melhor is None else min(melhor, tempo)
+    return melhor, resultado
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+
+    import backend.cache_service as cache_module
+    from backend.cache_service import CacheService
+    from backend.database import Base, create_sqlite_engine
+    from backend.services.metric_service import MetricService
+    from sqlalchemy.orm import sessionmaker
+
+    cache_module.cache_service = CacheService(max_entries=0)  # mede o cálculo, não o cache
+
+    print(f"{'linhas':>8} {'ORM (s)':>9} {'linhas/s':>10} {'projetada (s)':>14} {'linhas/s':>10} {'ganho':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for linhas in args.linhas:
+            engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / f'bench_{linhas}.db'}")
+            Base.metadata.create_all(bind=engine)
+            sessao = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+            with sessao() as db:
+                popular(db, linhas)
+
+            antes, r_antes = medir(sessao, _servico_orm, args.repeticoes)
+            depois, r_depois = medir(sessao, MetricService, args.repeticoes)
+            if r_antes.to_dict() != r_depois.to_dict():
+                print(f"resultado divergente para {linhas} linhas", file=sys.stderr)
+                return 1
+            eventos = r_depois.metricas.eventos_brutos
+            print(
+                f"{eventos:>8} {antes:>9.3f} {eventos / antes:>10.0f} "
+                f"{depois:>14.3f} {eventos / depois:>10.0f} {antes / depois:>5.1f}x"
+            )
+            engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Restauração do banco a partir de um backup do BackupService
+(completo .db.gz, incremental .delta.gz + completo base, ou cópia .db antiga).
+
+O backup é reconstruído num arquivo temporário ao lado do banco e verificado com
+PRAGMA quick_check; só então substitui o banco (os.replace). Antes da troca, o
+banco atual vira um backup "pre_restauracao" (desligue com --sem-backup-atual) e
+os arquivos -wal/-shm dele são removidos, para não serem aplicados ao banco
+restaurado. Pare o servidor antes de restaurar.
+
+Uso:
+  PYTHONPATH=. python3 scripts/restore_backup.py --db-path database/absenteismo.db --listar
+  PYTHONPATH=. python3 scripts/restore_backup.py --db-path database/absenteismo.db \\
+      manual_absenteismo_backup_20261018_082604.db.gz
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Restaura o banco SQLite a partir de um backup (completo ou incremental)."
+    )
+    p.add_argument("backup", nargs="?", help="Arquivo do backup (caminho ou nome dentro de --backup-dir)")
+    p.add_argument("--db-path", type=str, required=True, help="Caminho explícito do banco a substituir")
+    p.add_argument("--backup-dir", type=str, default=None,
+                   help="Diretório dos backups (padrão: ABSENTEISMO_BACKUP_DIR ou backups)")
+    p.add_argument("--listar", action="store_true", help="Lista os backups disponíveis e sai")
+    p.add_argument("--sem-backup-atual", action="store_true",
+                   help="Não guarda o banco atual antes de substituí-lo")
+    return p
+
+
+def _quick_check(caminho: str) -> bool:
+    conn = sqlite3.connect(f"{Path(caminho).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        resultado = conn.execute("PRAGMA quick_check").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return bool(resultado) and resultado[0] == "ok"
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+
+    from backend.backup_service import BackupService
+
+    service = BackupService(args.db_path, backup_dir=args.backup_dir)
+    if args.listar:
+        for backup in service.get_backup_list():
+            print(f"{backup['created']}  {backup['tipo']:<11}  {backup['size_mb']:>8.2f} MB  {backup['filename']}")
+        return 0
+    if not args.backup:
+        print("Erro: informe o backup a restaurar (ou --listar)", file=sys.stderr)
+        return 2
+    if not os.path.exists(args.backup) and not os.path.exists(os.path.join(service.backup_dir, args.backup)):
+        print(f"Erro: backup não encontrado: {args.backup}", file=sys.stderr)
+        return 2
+
+    destino = os.path.abspath(args.db_path)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = os.path.join(os.path.dirname(destino), f".restauracao_{uuid.uuid4().hex[:8]}.db")
+    try:
+        inicio = time.perf_counter()
+        service.restaurar_backup(args.backup, temporario)
+        if not _quick_check(temporario):
+            print(f"Erro: backup falhou no quick_check; banco atual mantido: {args.backup}", file=sys.stderr)
+            return 1
+
+        if os.path.exists(destino) and not args.sem_backup_atual:
+            anterior = service.create_backup(prefix="pre_restauracao")
+            if not anterior:
+                print("Erro: não foi possível guardar o banco atual; restauração cancelada", file=sys.stderr)
+                return 1
+            print(f"💾 Banco atual guardado em {anterior}")
+        for sufixo in ("-wal", "-shm"):
+            if os.path.exists(destino + sufixo):
+                os.remove(destino + sufixo)
+        os.replace(temporario, destino)
+        print(f"✅ Banco restaurado de {args.backup} em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -19,6 +19,9 @@ if not _path or _path == _prod:
 else:
     Path(_path).parent.mkdir(parents=True, exist_ok=True)
 
+# Backups do startup (init_backup_service) fora do diretório backups/ do repositório
+os.environ.setdefault("ABSENTEISMO_BACKUP_DIR", tempfile.mkdtemp(prefix="abs-pytest-backups-"))
+
 os.environ.setdefault("ENVIRONMENT", "test")
 os.environ.setdefault("ENABLE_INTELLIGENT_INGESTION", "false")
 os.environ.setdefault("ENABLE_BIOMED_PERFORMANCE_ENGINE", "false")
@@ -0,0 +1,69 @@
+"""
+Fixtures sintéticas para os blocos do dashboard (Analytics / DashboardAggregator).
+
+Somente dados fictícios. Contagens e somas distintas por grupo, para que a
+ordenação TOP-N seja determinística (sem empates).
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+from sqlalchemy.orm import Session
+
+from backend.models import Atestado
+from tests.fixtures.canonical_metrics import add_upload, seed_clients
+
+# (mes, nome, setor, genero, cid, diagnostico, dias, horas, escala, motivo)
+DASHBOARD_ROWS: Sequence[tuple] = (
+    ("2025-11", "ANA", "PRODUCAO", "F", "J06.9", "Infecção aguda vias aéreas", 1.0, 8.0, "12x36", "Doença"),
+    ("2025-11", "BRUNO", "PRODUCAO", "M", "M54.5", "Dor lombar", 3.0, 24.0, "6x1", "Doença"),
+    ("2025-11", "CARLA", "ADMIN", "Feminino", "Z00.0", "", 1.0, 8.0, "5x2", "Consulta"),
+    ("2025-12", "BRUNO", "PRODUCAO", "M", "M54.5", "Dor lombar", 7.0, 56.0, "6x1", "Doença"),
+    ("2025-12", "DIEGO", "LOGISTICA", "M", "A09", "não informado", 2.0, 16.0, "6x1", "Acidente"),
+    ("2025-12", "ANA", "PRODUCAO", "F", "J06.9", "Infecção aguda vias aéreas", 0.5, 4.0, "12x36", "Doença"),
+    ("2026-01", "ELISA", "ADMIN", "F", "F32.1", "Episódio depressivo", 15.0, 120.0, "5x2", "Doença"),
+    ("2026-01", "BRUNO", "PRODUCAO", "masculino", "M54.4", "Dor lombar", 4.0, 32.0, "6x1", "Doença"),
+    ("2026-01", "FABIO", "LOGISTICA", None, "S93.4", None, 40.0, 320.0, None, "Acidente"),
+    ("2026-01", "", "PRODUCAO", "M", None, None, 0.0, 0.0, "6x1", None),
+    ("2026-02", "ANA", "PRODUCAO", "F", "J06.9", "Infecção aguda vias aéreas", 2.0, 16.0, "12x36", "Doença"),
+    ("2026-02", "GUSTAVO", None, "M", "K29.7", "Gastrite", 11.0, 88.0, "6x1", "Doença"),
+    ("2026-02", "DIEGO", "LOGISTICA", "M", "A09", "não informado", 6.0, 48.0, "6x1", "Doença"),
+)
+
+# Cliente 4: não deve vazar para o cliente 2
+OTHER_TENANT_ROWS: Sequence[tuple] = (
+    ("2026-01", "ZECA", "PRODUCAO", "M", "J06.9", "Resfriado", 30.0, 240.0, "6x1", "Doença"),
+)
+
+
+def _add_rows(db: Session, client_id: int, rows: Sequence[tuple]) -> None:
+    uploads = {}
+    for mes, nome, setor, genero, cid, diagnostico, dias, horas, escala, motivo in rows:
+        if mes not in uploads:
+            uploads[mes] = add_upload(db, client_id=client_id, mes_referencia=mes)
+        db.add(
+            Atestado(
+                upload_id=uploads[mes].id,
+                nomecompleto=nome,
+                setor=setor,
+                genero=genero,
+                cid=cid,
+                diagnostico=diagnostico,
+                dias_atestados=dias,
+                horas_perdi=horas,
+                escala=escala,
+                motivo_atestado=motivo,
+            )
+        )
+    db.flush()
+
+
+def seed_dashboard_fixture(db: Session) -> None:
+    """Cliente 2 com 13 atestados em 4 meses; cliente 4 com 1 atestado."""
+    seed_clients(db, (2, 4))
+    _add_rows(db, 2, DASHBOARD_ROWS)
+    _add_rows(db, 4, OTHER_TENANT_ROWS)
+    db.commit()
+
+
+__all__ = ["DASHBOARD_ROWS", "OTHER_TENANT_ROWS", "seed_dashboard_fixture"]
@@ -0,0 +1,182 @@
+"""
+PERF-01 — DashboardAggregator: leitura única, mesmos números de Analytics.
+
+Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import json
+
+import pytest
+from sqlalchemy import event
+
+from backend.analytics import Analytics
+from backend.dashboard_aggregator import DashboardAggregator
+from tests.fixtures.canonical_metrics import make_test_session
+from tests.fixtures.dashboard import seed_dashboard_fixture
+
+FILTROS = [
+    {},
+    {"mes_inicio": "2025-12", "mes_fim": "2026-01"},
+    {"setor": ["PRODUCAO", "ADMIN"]},
+    {"setor": "LOGISTICA"},
+    {"funcionario": ["BRUNO", "ANA"]},
+    {"funcionario": "DIEGO", "mes_inicio": "2026-01"},
+]
+
+
+@pytest.fixture()
+def db():
+    session = make_test_session()
+    seed_dashboard_fixture(session)
+    yield session
+    session.close()
+
+
+def _referencia(db, filtros):
+    a = Analytics(db)
+    kw = {
+        "mes_inicio": filtros.get("mes_inicio"),
+        "mes_fim": filtros.get("mes_fim"),
+        "funcionario": filtros.get("funcionario"),
+        "setor": filtros.get("setor"),
+    }
+    return {
+        "metricas": a.metricas_gerais(2, **kw),
+        "top_cids": a.top_cids(2, 10, **kw),
+        "top_cids_dias": a.top_cids(2, 5, **kw),
+        "top_setores": a.top_setores(2, 5, **kw),
+        "evolucao_mensal": a.evolucao_mensal(2, 12, **kw),
+        "distribuicao_genero": a.distribuicao_genero(2, **kw),
+        "top_funcionarios": a.top_funcionarios(2, 10, **kw),
+        "top_escalas": a.top_escalas(2, 10, **kw),
+        "top_motivos": a.top_motivos(2, 10, **kw),
+        "dias_centro_custo": a.dias_perdidos_por_centro_custo(2, 10, **kw),
+        "distribuicao_dias": a.distribuicao_dias_por_atestado(2, **kw),
+        "media_cid": a.media_dias_por_cid(2, 10, **kw),
+        "evolucao_setor": a.evolucao_por_setor(2, 12, **kw),
+        "comparativo_dias_horas": a.comparativo_dias_horas(2, **kw),
+        "frequencia_atestados": a.frequencia_atestados_por_funcionario(2, **kw),
+        "dias_setor_genero": a.dias_perdidos_setor_genero(2, **kw),
+    }
+
+
+def _canon(valor):
+    """Empates no ORDER BY do SQL não têm ordem definida: compara como multiconjunto."""
+    if isinstance(valor, list):
+        return sorted(json.dumps(v, sort_keys=True, ensure_ascii=False) for v in valor)
+    return valor
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_blocos_iguais_a_analytics(db, filtros):
+    esperado = _referencia(db, filtros)
+    blocos = DashboardAggregator(db).calcular(2, **filtros)
+
+    assert set(blocos) == set(esperado)
+    metricas = blocos["metricas"]
+    for chave, valor in esperado["metricas"].items():
+        assert metricas[chave] == pytest.approx(valor)
+    for nome in esperado:
+        if nome in ("metricas", "top_cids_dias"):
+            continue
+        assert _canon(blocos[nome]) == _canon(esperado[nome]), nome
+    # TOP 5: só a contagem é determinística quando há empate no corte
+    assert [c["quantidade"] for c in blocos["top_cids_dias"]] == [
+        c["quantidade"] for c in esperado["top_cids_dias"]
+    ]
+
+
+def test_ordem_dos_rankings(db):
+    blocos = DashboardAggregator(db).calcular(2)
+    assert [s["setor"] for s in blocos["top_setores"]] == ["PRODUCAO", "LOGISTICA", "ADMIN"]
+    assert [f["nome"] for f in blocos["top_funcionarios"]][:3] == ["FABIO", "ELISA", "BRUNO"]
+    assert [m["mes"] for m in blocos["evolucao_mensal"]] == ["2025-11", "2025-12", "2026-01", "2026-02"]
+    bruno = next(f for f in blocos["top_funcionarios"] if f["nome"] == "BRUNO")
+    assert (bruno["setor"], bruno["genero"]) == ("PRODUCAO", "M")
+
+
+def test_isolamento_de_cliente(db):
+    blocos = DashboardAggregator(db).calcular(2)
+    nomes = {f["nome"] for f in blocos["top_funcionarios"]}
+    assert "ZECA" not in nomes
+    assert blocos["metricas"]["total_registros"] == 13
+
+
+def test_uma_leitura_por_dashboard(db):
+    statements = []
+
+    def _conta(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _conta)
+    try:
+        DashboardAggregator(db).calcular(2, mes_inicio="2025-11", setor=["PRODUCAO"])
+    finally:
+        event.remove(engine, "before_cursor_execute", _conta)
+
+    # 1 leitura colunar + 1 busca em lote de setor/gênero do TOP funcionários
+    assert len(statements) == 2
+
+
+def test_falha_de_leitura_retorna_padroes(db, monkeypatch):
+    agg = DashboardAggregator(db)
+
+    def _falha(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(agg, "carregar", _falha)
+    blocos = agg.calcular(2)
+    assert blocos["metricas"]["total_dias_perdidos"] == 0
+    assert blocos["top_cids"] == []
+    assert blocos["evolucao_setor"] == {}
+
+
+def test_dashboard_e_export_usam_os_mesmos_numeros():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from backend.auth import create_access_token, get_password_hash
+    from backend.database import Base, get_db
+    from backend.main import app, buscar_dados_dashboard_completo
+    from backend.models import User
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_dashboard_fixture(session)
+    session.add(
+        User(
+            username="perf01",
+            email="perf01@test.local",
+            password_hash=get_password_hash("p"),
+            is_active=True,
+            is_admin=False,
+            client_id=2,
+        )
+    )
+    session.commit()
+
+    def _override():
+        yield session
+
+    app.dependency_overrides[get_db] = _override
+    try:
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'perf01'})}"}
+        body = client.get(
+            "/api/dashboard", params={"client_id": 2, "setor": ["PRODUCAO"]}, headers=headers
+        ).json()
+        completo = buscar_dados_dashboard_completo(2, None, None, None, ["PRODUCAO"], db=session)
+        dados = completo["dados_relatorio"]
+        assert body["metricas"] == completo["metricas"]
+        for chave in ("top_cids", "top_setores", "top_funcionarios", "top_motivos", "media_cid"):
+            assert body[chave] == dados[chave], chave
+        assert body["evolucao_mensal"] == dados["evolucao_mensal"]
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+        engine.dispose()
@@ -0,0 +1,95 @@
+"""
+PERF-02 — Analytics.top_funcionarios sem N+1.
+
+Setor/gênero vêm do primeiro registro (menor id) do funcionário no cliente,
+resolvidos na mesma consulta agrupada. Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+
+from backend.analytics import Analytics
+from backend.dashboard_aggregator import DashboardAggregator
+from backend.models import Atestado
+from tests.fixtures.canonical_metrics import add_upload, make_test_session
+from tests.fixtures.dashboard import seed_dashboard_fixture
+
+
+@pytest.fixture()
+def db():
+    session = make_test_session()
+    seed_dashboard_fixture(session)
+    yield session
+    session.close()
+
+
+def _conta_statements(db, fn):
+    statements = []
+
+    def _conta(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _conta)
+    try:
+        resultado = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _conta)
+    return resultado, statements
+
+
+@pytest.mark.parametrize("limit", [1, 10, 1000])
+def test_uma_consulta_independente_do_limite(db, limit):
+    resultado, statements = _conta_statements(
+        db, lambda: Analytics(db).top_funcionarios(2, limit)
+    )
+    assert len(statements) == 1
+    assert len(resultado) == min(limit, 7)
+
+
+def test_setor_e_genero_do_primeiro_registro(db):
+    # Novo registro do BRUNO em outro setor/gênero não muda o "primeiro registro"
+    upload = add_upload(db, client_id=2, mes_referencia="2026-03")
+    db.add(
+        Atestado(
+            upload_id=upload.id,
+            nomecompleto="BRUNO",
+            setor="EXPEDICAO",
+            genero="F",
+            dias_atestados=1.0,
+            horas_perdi=8.0,
+        )
+    )
+    db.commit()
+
+    por_nome = {f["nome"]: f for f in Analytics(db).top_funcionarios(2, 10)}
+    assert (por_nome["BRUNO"]["setor"], por_nome["BRUNO"]["genero"]) == ("PRODUCAO", "M")
+    assert por_nome["BRUNO"]["dias_perdidos"] == 15.0
+    assert por_nome["BRUNO"]["quantidade"] == 4
+    # Sem gênero no primeiro registro -> '-'; sem setor -> 'Não informado'
+    assert por_nome["FABIO"]["genero"] == "-"
+    assert por_nome["GUSTAVO"]["setor"] == "Não informado"
+
+
+def test_primeiro_registro_ignora_filtro_de_periodo(db):
+    # Primeiro registro do BRUNO é de 2025-11; o filtro de período não o altera
+    resultado = Analytics(db).top_funcionarios(2, 10, mes_inicio="2026-01")
+    bruno = next(f for f in resultado if f["nome"] == "BRUNO")
+    assert bruno["setor"] == "PRODUCAO"
+    assert bruno["dias_perdidos"] == 4.0
+
+
+def test_primeiro_registro_isolado_por_cliente(db):
+    # Mesmo nome em outro cliente não interfere no setor/gênero
+    upload = add_upload(db, client_id=4, mes_referencia="2020-01")
+    db.add(Atestado(upload_id=upload.id, nomecompleto="ANA", setor="OUTRA", genero="M", dias_atestados=1.0))
+    db.commit()
+    ana = next(f for f in Analytics(db).top_funcionarios(2, 10) if f["nome"] == "ANA")
+    assert (ana["setor"], ana["genero"]) == ("PRODUCAO", "F")
+
+
+def test_mesmo_resultado_do_dashboard_aggregator(db):
+    esperado = Analytics(db).top_funcionarios(2, 10, setor=["PRODUCAO", "LOGISTICA"])
+    blocos = DashboardAggregator(db).calcular(2, setor=["PRODUCAO", "LOGISTICA"])
+    assert blocos["top_funcionarios"] == esperado
@@ -0,0 +1,250 @@
+"""
+PERF-03 — Agregados mensais materializados (monthly_rollups).
+
+Séries por período/setor lidas do agregado devem bater com a agregação
+direta dos atestados, e as rotas de escrita refazem os meses afetados.
+Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.analytics import Analytics
+from backend.dashboard_aggregator import DashboardAggregator
+from backend.database import Base
+from backend.models import Atestado, MonthlyRollup, Upload
+from backend.rollup_service import RollupService, backfill_rollups
+from tests.fixtures.dashboard import seed_dashboard_fixture
+
+FILTROS = [
+    {},
+    {"mes_inicio": "2025-12", "mes_fim": "2026-01"},
+    {"setor": ["PRODUCAO", "ADMIN"]},
+    {"setor": "LOGISTICA", "mes_fim": "2026-01"},
+]
+
+
+@pytest.fixture()
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_dashboard_fixture(session)
+    yield session
+    session.close()
+
+
+def _snapshot(db, client_id=2):
+    rows = db.query(MonthlyRollup).filter(MonthlyRollup.client_id == client_id).all()
+    return sorted(
+        (r.mes_referencia, r.dimensao, r.valor or "", r.quantidade, round(r.dias, 6), round(r.horas, 6))
+        for r in rows
+    )
+
+
+def _rollup_do_zero(db, client_id=2):
+    """Agregado recalculado do zero, sem persistir"""
+    RollupService(db).recalcular_cliente(client_id)
+    esperado = _snapshot(db, client_id)
+    db.rollback()
+    return esperado
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_evolucao_mensal_igual_a_agregacao_direta(db, filtros):
+    esperado = DashboardAggregator(db).calcular(2, **filtros)["evolucao_mensal"]
+    assert Analytics(db).evolucao_mensal(2, 12, **filtros) == esperado
+
+
+def test_limite_de_meses(db):
+    serie = Analytics(db).evolucao_mensal(2, 2)
+    assert [m["mes"] for m in serie] == ["2026-01", "2026-02"]
+
+
+def test_heatmap_igual_a_agregacao_direta(db):
+    a = Analytics(db)
+    heatmap = a.heatmap_setores_meses(2, mes_inicio="2025-12")
+    bruto = {}
+    for setor, mes, dias in a._heatmap_setores_meses_bruto(2, mes_inicio="2025-12"):
+        chave = setor or "Não informado"
+        bruto.setdefault(chave, {})
+        bruto[chave][mes] = bruto[chave].get(mes, 0) + float(dias or 0)
+    assert heatmap["setores"] == sorted(bruto)
+    assert heatmap["total_meses"] == 3
+    for setor, linha in zip(heatmap["setores"], heatmap["dados"]):
+        assert sum(linha) == pytest.approx(sum(bruto[setor].values()))
+
+
+def test_sazonalidade_usa_serie_completa(db):
+    sazonal = Analytics(db).analise_sazonalidade(2)
+    por_mes = {s["mes"]: s for s in sazonal}
+    assert por_mes["01"]["total_quantidade"] == 4
+    assert por_mes["01"]["total_dias"] == 59.0
+    assert sum(s["total_quantidade"] for s in sazonal) == 13
+
+
+def test_leitura_sem_agregados_nao_grava(db):
+    esperado = [DashboardAggregator(db).calcular(2, **f)["evolucao_mensal"] for f in FILTROS]
+    heatmap = Analytics(db).heatmap_setores_meses(2, mes_inicio="2025-12")
+
+    RollupService(db).recalcular_cliente(2)
+    db.commit()
+    assert Analytics(db).heatmap_setores_meses(2, mes_inicio="2025-12") == heatmap
+    db.query(MonthlyRollup).delete()
+    db.commit()
+
+    commits = []
+    registrar = commits.append
+    event.listen(db, "after_commit", registrar)
+    try:
+        for filtros, serie in zip(FILTROS, esperado):
+            assert Analytics(db).evolucao_mensal(2, 12, **filtros) == serie
+        assert Analytics(db).evolucao_mensal(2, 2) == esperado[0][-2:]
+    finally:
+        event.remove(db, "after_commit", registrar)
+    assert commits == [] and not db.new and not db.dirty
+    assert _snapshot(db) == []
+
+
+def test_backfill_refaz_agregados_e_leitura_em_o_meses(db):
+    RollupService(db).recalcular_cliente(2)
+    db.commit()
+    # Atestado gravado fora das rotas: agregado do mês fica defasado até o backfill
+    upload = db.query(Upload).filter(Upload.client_id == 2, Upload.mes_referencia == "2026-01").first()
+    db.add(Atestado(upload_id=upload.id, nomecompleto="IRENE", setor="PRODUCAO", dias_atestados=2.0, horas_perdi=16.0))
+    db.commit()
+    assert _snapshot(db) != _rollup_do_zero(db)
+
+    assert backfill_rollups(db) == len(_rollup_do_zero(db)) + len(_rollup_do_zero(db, 4))
+    assert _snapshot(db) == _rollup_do_zero(db)
+    assert _snapshot(db, 4) == _rollup_do_zero(db, 4)
+
+    statements = []
+
+    def _conta(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _conta)
+    try:
+        Analytics(db).evolucao_mensal(2, setor=["PRODUCAO"])
+    finally:
+        event.remove(engine, "before_cursor_execute", _conta)
+    # 1 verificação de existência + 1 leitura do agregado; nenhuma sobre atestados
+    assert len(statements) == 2
+    assert all("atestados" not in s for s in statements)
+
+
+def test_isolamento_de_cliente(db):
+    RollupService(db).recalcular_cliente(4)
+    db.commit()
+    assert {r.client_id for r in db.query(MonthlyRollup).all()} == {4}
+    serie = Analytics(db).evolucao_mensal(2)
+    assert sum(m["quantidade"] for m in serie) == 13
+    assert Analytics(db).evolucao_mensal(4)[0]["dias_perdidos"] == 30.0
+
+
+def test_recalcular_meses_so_toca_os_meses_informados(db):
+    RollupService(db).recalcular_cliente(2)
+    db.commit()
+    upload = db.query(Upload).filter(Upload.client_id == 2, Upload.mes_referencia == "2026-02").first()
+    db.add(Atestado(upload_id=upload.id, nomecompleto="HELENA", setor="ADMIN", dias_atestados=3.0, horas_perdi=24.0))
+    RollupService(db).recalcular_meses(2, ["2026-02"])
+    db.commit()
+
+    assert _snapshot(db) == _rollup_do_zero(db)
+    fev = Analytics(db).evolucao_mensal(2, setor="ADMIN", mes_inicio="2026-02")
+    assert fev == [{"mes": "2026-02", "quantidade": 1, "dias_perdidos": 3.0, "horas_perdidas": 24.0}]
+
+
+def test_primeira_escrita_sem_agregados_materializa_todos_os_meses(db):
+    serie = Analytics(db).evolucao_mensal(2)
+    upload = Upload(client_id=2, filename="mar.xlsx", mes_referencia="2026-03")
+    db.add(upload)
+    db.flush()
+    db.add(Atestado(upload_id=upload.id, nomecompleto="HELENA", setor="ADMIN", dias_atestados=3.0, horas_perdi=24.0))
+    RollupService(db).recalcular_meses(2, ["2026-03"])
+    db.commit()
+
+    assert _snapshot(db) == _rollup_do_zero(db)
+    meses = [m["mes"] for m in Analytics(db).evolucao_mensal(2)]
+    assert meses == [m["mes"] for m in serie] + ["2026-03"]
+
+
+def test_backfill_somente_sem_agregados(db):
+    RollupService(db).recalcular_cliente(4)
+    db.commit()
+    antes = _snapshot(db, 4)
+    assert backfill_rollups(db, somente_sem_agregados=True) == len(_rollup_do_zero(db))
+    assert _snapshot(db) == _rollup_do_zero(db)
+    assert _snapshot(db, 4) == antes
+    assert backfill_rollups(db, somente_sem_agregados=True) == 0
+
+
+def test_rotas_de_escrita_refazem_os_meses(engine, db):
+    from fastapi.testclient import TestClient
+
+    from backend.auth import create_access_token, get_password_hash
+    from backend.database import get_db
+    from backend.main import app
+    from backend.models import User
+
+    db.add(
+        User(
+            username="perf03",
+            email="perf03@test.local",
+            password_hash=get_password_hash("p"),
+            is_active=True,
+            is_admin=False,
+            client_id=2,
+        )
+    )
+    db.commit()
+    RollupService(db).recalcular_cliente(2)
+    db.commit()
+
+    def _override():
+        yield db
+
+    app.dependency_overrides[get_db] = _override
+    try:
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'perf03'})}"}
+        uploads = {u.mes_referencia: u.id for u in db.query(Upload).filter(Upload.client_id == 2)}
+
+        r = client.post(
+            "/api/dados",
+            json={"upload_id": uploads["2025-11"], "nomecompleto": "IARA", "setor": "ADMIN", "dias_atestados": 9.0},
+            headers=headers,
+        )
+        assert r.status_code == 200
+        novo_id = r.json()["id"]
+        assert _snapshot(db) == _rollup_do_zero(db)
+
+        r = client.put(f"/api/dados/{novo_id}", json={"setor": "LOGISTICA", "upload_id": uploads["2026-01"]}, headers=headers)
+        assert r.status_code == 200
+        assert _snapshot(db) == _rollup_do_zero(db)
+
+        r = client.put("/api/funcionario/atualizar", params={"nome": "BRUNO", "client_id": 2, "setor": "ADMIN"}, headers=headers)
+        assert r.status_code == 200
+        assert _snapshot(db) == _rollup_do_zero(db)
+
+        r = client.delete(f"/api/dados/{novo_id}", headers=headers)
+        assert r.status_code == 200
+        assert _snapshot(db) == _rollup_do_zero(db)
+
+        r = client.delete(f"/api/uploads/{uploads['2025-12']}", params={"client_id": 2}, headers=headers)
+        assert r.status_code == 200
+        assert _snapshot(db) == _rollup_do_zero(db)
+        assert "2025-12" not in {m["mes"] for m in Analytics(db).evolucao_mensal(2)}
+    finally:
+        app.dependency_overrides.clear()
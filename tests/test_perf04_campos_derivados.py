@@ -0,0 +1,172 @@
+"""
+PERF-04 — Campos de dados_originais promovidos a colunas tipadas.
+
+Coerência (tri-state), data de admissão e ano/mês da planilha são extraídos
+na gravação; as análises agrupam nessas colunas sem json.loads por registro.
+Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from backend.analytics import Analytics
+from backend.campos_derivados import backfill_campos_derivados, extrair_campos_derivados
+from backend.excel_processor import ExcelProcessor
+from backend.models import Atestado
+from tests.fixtures.canonical_metrics import add_upload, make_test_session, seed_clients
+
+HOJE = date.today()
+
+
+def _admissao(dias_atras: int) -> str:
+    return (HOJE - timedelta(days=dias_atras)).strftime("%d/%m/%Y")
+
+
+# (mes_referencia, dados_originais, dias, horas_perdi, horas_dia, data_afastamento)
+ROWS = (
+    ("2025-01", {"ano": "2024", "mês": "12", "coerente": "COERENTE", "Admissão": _admissao(100)}, 2.0, 16.0, 8.0, None),
+    ("2025-01", {"ano": 2025.0, "mês": 1.0, "coerente": "SEM COERÊNCIA", "Admissão": _admissao(800)}, 3.0, 0.0, 8.0, None),
+    ("2025-01", {"Parecer Médico": "Atestado coerente", "Admissão": "2010-05-01"}, 5.0, 40.0, 8.0, date(2025, 1, 10)),
+    ("2025-02", {"Parecer Médico": "SEM COERÊNCIA"}, 1.0, 8.0, 8.0, None),
+    ("2025-02", {"Observação": "x"}, 4.0, 0.0, 0.0, None),
+    ("2025-02", {"ano": "2025", "coerente": "Coerente ", "Admissão": _admissao(365)}, 6.0, 48.0, 8.0, None),
+    ("2025-03", None, 7.0, 56.0, 8.0, date(2025, 2, 27)),
+)
+
+
+@pytest.fixture()
+def db():
+    session = make_test_session()
+    seed_clients(session, (2, 4))
+    uploads = {}
+    for mes, dados, dias, horas, horas_dia, afastamento in ROWS:
+        if mes not in uploads:
+            uploads[mes] = add_upload(session, client_id=2, mes_referencia=mes)
+        session.add(
+            Atestado(
+                upload_id=uploads[mes].id,
+                nomecompleto="FULANO",
+                dias_atestados=dias,
+                horas_perdi=horas,
+                horas_dia=horas_dia,
+                data_afastamento=afastamento,
+                dados_originais=json.dumps(dados, ensure_ascii=False) if dados else None,
+            )
+        )
+    outro = add_upload(session, client_id=4, mes_referencia="2025-01")
+    session.add(
+        Atestado(
+            upload_id=outro.id,
+            dias_atestados=30.0,
+            dados_originais=json.dumps({"ano": "2025", "mês": "1", "coerente": "COERENTE"}),
+        )
+    )
+    session.commit()
+    assert backfill_campos_derivados(session, batch_size=2) == 7
+    yield session
+    session.close()
+
+
+def test_extracao_tri_state():
+    assert extrair_campos_derivados({"coerente": "COERENTE"})["coerencia"] is True
+    assert extrair_campos_derivados({"coerente": "Sem coerência"})["coerencia"] is False
+    assert extrair_campos_derivados({"Parecer Médico": "coerente"})["coerencia"] is True
+    assert extrair_campos_derivados({"Outra": "valor"})["coerencia"] is None
+    assert extrair_campos_derivados(None)["coerencia"] is None
+    assert extrair_campos_derivados("json inválido")["coerencia"] is None
+
+
+def test_extracao_admissao_e_ano_mes():
+    campos = extrair_campos_derivados(json.dumps({"Admissão": "15/03/2019", "ano": 2024.0, "mês": "Março"}))
+    assert campos["data_admissao"] == date(2019, 3, 15)
+    assert (campos["ano_planilha"], campos["mes_planilha"]) == (2024, 3)
+    assert extrair_campos_derivados({"Admissão": "2018"})["data_admissao"] == date(2018, 1, 1)
+    assert extrair_campos_derivados({"mês": "13"})["mes_planilha"] is None
+
+
+def test_backfill_preenche_colunas(db):
+    linhas = db.query(Atestado).order_by(Atestado.id).all()
+    assert [a.coerencia for a in linhas[:7]] == [True, False, True, False, None, True, None]
+    assert (linhas[0].ano_planilha, linhas[0].mes_planilha) == (2024, 12)
+    assert linhas[2].data_admissao == date(2010, 5, 1)
+
+
+def test_dias_por_ano_coerencia(db):
+    r = Analytics(db).dias_atestados_por_ano_coerencia(2)
+    assert r["anos"] == ["2024", "2025"]
+    assert r["coerente"] == [2.0, 11.0]
+    assert r["sem_coerencia"] == [0, 15.0]
+    assert r["meses"] == ["2024-12", "2025-01", "2025-02"]
+    assert r["coerente_mensal"] == [2.0, 5.0, 0]
+    assert r["sem_coerencia_mensal"] == [0, 3.0, 12.0]
+
+
+def test_analise_coerencia(db):
+    r = Analytics(db).analise_atestados_coerencia(2, mes_fim="2025-02")
+    assert (r["coerente"], r["sem_coerencia"], r["total"]) == (13.0, 8.0, 21.0)
+    assert r["percentual_coerente"] == pytest.approx(13 / 21 * 100)
+
+
+def test_tempo_servico(db):
+    r = Analytics(db).tempo_servico_atestados(2)
+    assert r == [
+        {"faixa_tempo_servico": "0-1 ano", "dias_afastamento": 8.0, "quantidade_atestados": 2},
+        {"faixa_tempo_servico": "1-3 anos", "dias_afastamento": 3.0, "quantidade_atestados": 1},
+        {"faixa_tempo_servico": "10+ anos", "dias_afastamento": 5.0, "quantidade_atestados": 1},
+        {"faixa_tempo_servico": "Não informado", "dias_afastamento": 12.0, "quantidade_atestados": 3},
+    ]
+
+
+def test_evolucao_mensal_horas(db):
+    r = Analytics(db).evolucao_mensal_horas(2, meses=0)
+    assert [m["mes"] for m in r] == ["2024-12", "2025-01", "2025-02"]
+    jan = r[1]
+    # 3 dias * 8 h (horas_perdi zerado) + 40 h + 48 h (ano sem mês cai em janeiro)
+    assert (jan["horas_perdidas"], jan["dias_perdidos"], jan["quantidade"]) == (112.0, 14.0, 3)
+    assert jan["semanas_perdidas"] == round(112 / 44, 2)
+
+
+def test_analises_nao_leem_dados_originais(db):
+    from sqlalchemy import event
+
+    statements = []
+
+    def _conta(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _conta)
+    try:
+        a = Analytics(db)
+        a.dias_atestados_por_ano_coerencia(2)
+        a.analise_atestados_coerencia(2)
+        a.tempo_servico_atestados(2)
+        a.evolucao_mensal_horas(2)
+    finally:
+        event.remove(engine, "before_cursor_execute", _conta)
+    assert len(statements) == 4
+    assert all("dados_originais" not in s for s in statements)
+
+
+def test_excel_processor_grava_campos_derivados(tmp_path):
+    caminho = tmp_path / "roda.xlsx"
+    pd.DataFrame(
+        {
+            "NOMECOMPLETO": ["ANA", "BRUNO"],
+            "DIAS ATESTADOS": [2, 3],
+            "ano": [2025, 2025],
+            "mês": [3, 4],
+            "coerente": ["COERENTE", "SEM COERÊNCIA"],
+            "Admissão": ["01/02/2020", None],
+        }
+    ).to_excel(caminho, index=False)
+
+    registros = ExcelProcessor(str(caminho)).processar()
+    assert [r["coerencia"] for r in registros] == [True, False]
+    assert [(r["ano_planilha"], r["mes_planilha"]) for r in registros] == [(2025, 3), (2025, 4)]
+    assert registros[0]["data_admissao"] == date(2020, 2, 1)
+    assert registros[1]["data_admissao"] is None
@@ -0,0 +1,122 @@
+"""
+PERF-05 — Regressão de plano de consulta das análises.
+
+Executa cada método público de Analytics sobre a fixture canônica
+(tests/fixtures/performance/canonical_db.py), roda EXPLAIN QUERY PLAN em
+cada SQL emitido e falha se alguma tabela for varrida por inteiro (SCAN)
+em vez de buscada por índice (SEARCH).
+"""
+from __future__ import annotations
+
+import inspect
+import re
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+import backend.cache_service as cache_module
+from backend.analytics import Analytics
+from backend.cache_service import CacheService
+from backend.database import Base, ensure_indexes
+from tests.fixtures.performance.canonical_db import make_memory_session, seed_performance_adapter_fixture
+
+TABELAS = {t.name for t in Base.metadata.sorted_tables}
+METODOS = sorted(
+    nome for nome, fn in inspect.getmembers(Analytics, inspect.isfunction) if not nome.startswith("_")
+)
+FILTROS = {
+    "sem_filtro": {},
+    "periodo": {"mes_inicio": "2025-06", "mes_fim": "2026-06"},
+    "setor_funcionario": {"setor": ["PRODUCAO"], "funcionario": ["FUNC ALPHA", "FUNC BETA"]},
+}
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+
+@pytest.fixture(autouse=True)
+def sem_cache(monkeypatch):
+    # O plano é medido sobre o SQL emitido: resultados em cache não emitiriam nada
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=0))
+
+
+@pytest.fixture(scope="module")
+def db():
+    session = make_memory_session()
+    seed_performance_adapter_fixture(session)
+    yield session
+    session.close()
+
+
+def _executar_capturando(db, fn):
+    capturados = []
+
+    def _captura(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            capturados.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _captura)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _captura)
+    return capturados
+
+
+def _varreduras(db, statement, parameters):
+    if not re.match(r"\s*(SELECT|WITH|DELETE|UPDATE)\b", statement, re.IGNORECASE):
+        return []
+    plano = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    encontrados = []
+    for linha in plano:
+        detalhe = linha[-1]
+        m = _SCAN.match(detalhe)
+        if m and m.group(1) in TABELAS:
+            encontrados.append(detalhe)
+    return encontrados
+
+
+def test_lista_de_metodos_cobre_analytics():
+    assert len(METODOS) >= 35
+    assert {"metricas_gerais", "top_funcionarios", "heatmap_setores_meses"} <= set(METODOS)
+
+
+@pytest.mark.parametrize("filtro", sorted(FILTROS))
+@pytest.mark.parametrize("metodo", METODOS)
+def test_sem_varredura_completa(db, metodo, filtro):
+    fn = getattr(Analytics(db), metodo)
+    parametros = inspect.signature(fn).parameters
+    kwargs = {k: v for k, v in FILTROS[filtro].items() if k in parametros}
+
+    capturados = _executar_capturando(db, lambda: fn(2, **kwargs))
+    assert capturados, f"{metodo} não emitiu SQL"
+
+    falhas = []
+    for statement, parameters in capturados:
+        for detalhe in _varreduras(db, statement, parameters):
+            falhas.append(f"{detalhe}\n    {' '.join(statement.split())[:300]}")
+    assert not falhas, f"{metodo} ({filtro}) varre tabela inteira:\n" + "\n".join(falhas)
+
+
+def test_ensure_indexes_cria_indices_em_banco_existente(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}")
+    with engine.begin() as conn:
+        # Esquema anterior aos índices: só as colunas usadas pelos índices
+        conn.execute(text("CREATE TABLE uploads (id INTEGER PRIMARY KEY, client_id INTEGER, mes_referencia VARCHAR(7))"))
+        conn.execute(text(
+            "CREATE TABLE atestados (id INTEGER PRIMARY KEY, upload_id INTEGER, setor VARCHAR, "
+            "nomecompleto VARCHAR, cid VARCHAR, coerencia BOOLEAN, data_admissao DATE, data_afastamento DATE)"
+        ))
+
+    ensure_indexes(bind=engine)
+    ensure_indexes(bind=engine)  # idempotente
+
+    with engine.connect() as conn:
+        nomes = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {
+        "ix_uploads_client_mes",
+        "ix_atestados_upload_setor",
+        "ix_atestados_upload_nome",
+        "ix_atestados_upload_cid",
+        "ix_atestados_upload_afastamento",
+    } <= nomes
+    engine.dispose()
@@ -0,0 +1,160 @@
+"""
+PERF-06 — SQLite em WAL com PRAGMAs e pool explícito.
+
+Verifica os PRAGMAs aplicados pelo hook de conexão (e a configuração por
+ambiente) e mede leituras concorrentes enquanto uma importação em massa
+segura a transação de escrita: os leitores não podem bloquear nem receber
+"database is locked". Dados fictícios em banco temporário.
+"""
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, create_sqlite_engine, sqlite_pragmas
+from backend.models import Atestado, Client, Upload
+
+LINHAS_IMPORTACAO = 20000
+LOTE = 2000
+LEITORES = 4
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    eng = create_sqlite_engine(f"sqlite:///{tmp_path / 'perf06.db'}")
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+def _pragma(conn, nome):
+    return conn.exec_driver_sql(f"PRAGMA {nome}").scalar()
+
+
+def test_pragmas_padrao(engine):
+    with engine.connect() as conn:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 1  # NORMAL
+        assert _pragma(conn, "busy_timeout") == 5000
+        assert _pragma(conn, "cache_size") == -64000
+        assert _pragma(conn, "temp_store") == 2  # MEMORY
+        assert _pragma(conn, "mmap_size") == 256 * 1024 * 1024
+
+
+def test_pool_explicito(engine):
+    assert engine.pool.size() == 10
+    assert engine.pool._max_overflow == 20
+    assert engine.pool._pre_ping is True
+
+
+def test_pragmas_configuraveis_por_ambiente(tmp_path, monkeypatch):
+    monkeypatch.setenv("ABSENTEISMO_SQLITE_SYNCHRONOUS", "full")
+    monkeypatch.setenv("ABSENTEISMO_SQLITE_BUSY_TIMEOUT_MS", "1234")
+    monkeypatch.setenv("ABSENTEISMO_SQLITE_CACHE_SIZE", "-2000")
+    monkeypatch.setenv("ABSENTEISMO_DB_POOL_SIZE", "3")
+    eng = create_sqlite_engine(f"sqlite:///{tmp_path / 'env.db'}")
+    try:
+        with eng.connect() as conn:
+            assert _pragma(conn, "synchronous") == 2  # FULL
+            assert _pragma(conn, "busy_timeout") == 1234
+            assert _pragma(conn, "cache_size") == -2000
+        assert eng.pool.size() == 3
+    finally:
+        eng.dispose()
+
+
+def test_valor_invalido_no_ambiente_falha_cedo(monkeypatch):
+    monkeypatch.setenv("ABSENTEISMO_SQLITE_JOURNAL_MODE", "WALL")
+    with pytest.raises(RuntimeError, match="ABSENTEISMO_SQLITE_JOURNAL_MODE"):
+        sqlite_pragmas()
+    monkeypatch.setenv("ABSENTEISMO_SQLITE_JOURNAL_MODE", "WAL")
+    monkeypatch.setenv("ABSENTEISMO_SQLITE_MMAP_SIZE", "muito")
+    with pytest.raises(RuntimeError, match="ABSENTEISMO_SQLITE_MMAP_SIZE"):
+        sqlite_pragmas()
+
+
+def test_leitores_nao_bloqueiam_durante_importacao(engine):
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    with Session() as db:
+        db.add(Client(id=2, nome="Cliente Perf", situacao="ativo"))
+        db.add(Upload(id=1, client_id=2, filename="base.xlsx", mes_referencia="2026-01", total_registros=100))
+        db.bulk_insert_mappings(
+            Atestado,
+            [{"upload_id": 1, "nomecompleto": f"BASE {i}", "setor": "ADMIN", "dias_atestados": 1.0} for i in range(100)],
+        )
+        db.commit()
+
+    importando = threading.Event()
+    terminou = threading.Event()
+    latencias, contagens, erros = [], [], []
+    trava = threading.Lock()
+
+    def _importar():
+        try:
+            with Session() as db:
+                db.add(Upload(id=2, client_id=2, filename="massa.xlsx", mes_referencia="2026-02"))
+                db.flush()
+                for inicio in range(0, LINHAS_IMPORTACAO, LOTE):
+                    db.bulk_insert_mappings(
+                        Atestado,
+                        [
+                            {"upload_id": 2, "nomecompleto": f"FUNC {i}", "setor": "PRODUCAO", "dias_atestados": 2.0}
+                            for i in range(inicio, inicio + LOTE)
+                        ],
+                    )
+                    importando.set()
+                    time.sleep(0.02)  # mantém a transação de escrita aberta
+                db.commit()
+        except Exception as exc:  # pragma: no cover - reportado abaixo
+            erros.append(exc)
+        finally:
+            importando.set()
+            terminou.set()
+
+    def _ler():
+        importando.wait()
+        while not terminou.is_set():
+            inicio = time.perf_counter()
+            try:
+                with Session() as db:
+                    total = db.query(func.count(Atestado.id)).scalar()
+                    db.query(Atestado.setor, func.sum(Atestado.dias_atestados)).group_by(Atestado.setor).all()
+            except Exception as exc:  # pragma: no cover - reportado abaixo
+                with trava:
+                    erros.append(exc)
+                return
+            with trava:
+                latencias.append(time.perf_counter() - inicio)
+                contagens.append(total)
+
+    escritor = threading.Thread(target=_importar)
+    leitores = [threading.Thread(target=_ler) for _ in range(LEITORES)]
+    inicio = time.perf_counter()
+    escritor.start()
+    for t in leitores:
+        t.start()
+    escritor.join(timeout=60)
+    for t in leitores:
+        t.join(timeout=60)
+    duracao = time.perf_counter() - inicio
+
+    assert not erros, f"erros durante importação concorrente: {erros!r}"
+    assert len(latencias) >= LEITORES * 5
+    p95 = sorted(latencias)[int(len(latencias) * 0.95) - 1]
+    print(
+        f"\nPERF-06: importação de {LINHAS_IMPORTACAO} linhas em {duracao:.2f}s; "
+        f"{len(latencias)} leituras concorrentes, mediana {statistics.median(latencias) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, máx {max(latencias) * 1000:.1f} ms"
+    )
+    # Leitores enxergam o snapshot confirmado, nunca a importação pela metade
+    assert set(contagens) <= {100, 100 + LINHAS_IMPORTACAO}
+    # Sem espera pelo lock de escrita (busy_timeout é 5 s)
+    assert max(latencias) < 1.0
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM atestados")).scalar() == 100 + LINHAS_IMPORTACAO
@@ -0,0 +1,98 @@
+"""
+PERF-08 — ExcelProcessor.processar coluna a coluna (sem iterrows).
+
+A saída precisa ser idêntica à da implementação linha a linha: os hashes
+abaixo foram gerados com ela sobre as mesmas planilhas. Dados fictícios,
+exceto as planilhas de Dados/ (só o hash é comparado; ignoradas se ausentes).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from backend.excel_processor import ExcelProcessor
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# sha256 da saída (serialização canônica abaixo) gerada pela implementação com iterrows
+HASHES_ESPERADOS = {
+    "tests/fixtures/ingestion/sample_atestados.xlsx": "2d700b0b651b9ba4acdb9e2e5f8e0db5d8742437530aa699034a99121d7ffcb6",
+    "Dados/Atestados 09.2025.xlsx": "57867cc80757fb61239246d1d55b0f8ff5b06a1ad84ed3e8a36c64602eca6b4d",
+    "Dados/INDICADORES SETEMBRO 2025.xlsx": "a05cd63a628f0797597090704c6e10fe621f011e2419396b3592a587ac9f4362",
+    "sintetica": "bcf68b3e44103abe219e7d5f31bd9eb2285083414009767e417da9a0aae6eef1",
+}
+
+
+def _canonico(registros) -> str:
+    return json.dumps(registros, ensure_ascii=False, default=lambda o: f"{type(o).__name__}:{o}")
+
+
+def _hash(registros) -> str:
+    return hashlib.sha256(_canonico(registros).encode("utf-8")).hexdigest()
+
+
+def _planilha_sintetica(caminho: Path) -> Path:
+    """Tipos misturados: inteiros, floats, datas, textos com espaços, coluna mista e booleanos"""
+    n = 60
+    pd.DataFrame(
+        {
+            "Nome Completo": [("MARIA SILVA", "joão pereira", None, "  ", "Bruna Costa")[i % 5] for i in range(n)],
+            "DIAS ATESTADOS": [(i % 7) + 0.5 if i % 6 else None for i in range(n)],
+            "CID-10": [("m54", "J11", None, 10)[i % 4] for i in range(n)],
+            "setor": [("PRODUCAO", "ADMIN\nlinha 2", None)[i % 3] for i in range(n)],
+            "Horas/dia": [8 for _ in range(n)],
+            "Horas perdi": [("16", "x", 4.5, None)[i % 4] for i in range(n)],
+            "DATA_AFASTAMENTO": [datetime(2025, 1 + i % 12, 1 + i % 28) if i % 5 else None for i in range(n)],
+            "TIPO_INFO_ATESTADO": [(0, 1, "3", None)[i % 4] for i in range(n)],
+            "coerente": [("COERENTE", "SEM COERÊNCIA", None)[i % 3] for i in range(n)],
+            "ano": [2025 for _ in range(n)],
+            "mês": [("Março", 4, None)[i % 3] for i in range(n)],
+            "Admissão": [("01/02/2020", datetime(2019, 5, 1), None)[i % 3] for i in range(n)],
+            "Ativo": [bool(i % 2) for i in range(n)],
+        }
+    ).to_excel(caminho, index=False)
+    return caminho
+
+
+def _processar(caminho) -> list:
+    return ExcelProcessor(str(caminho)).processar()
+
+
+@pytest.mark.parametrize("relativo", [k for k in HASHES_ESPERADOS if k != "sintetica"])
+def test_saida_identica_nas_planilhas_existentes(relativo):
+    caminho = ROOT / relativo
+    if not caminho.exists():
+        pytest.skip(f"{relativo} ausente")
+    assert _hash(_processar(caminho)) == HASHES_ESPERADOS[relativo]
+
+
+def test_saida_identica_na_planilha_sintetica(tmp_path):
+    registros = _processar(_planilha_sintetica(tmp_path / "sintetica.xlsx"))
+    assert len(registros) == 60
+    assert _hash(registros) == HASHES_ESPERADOS["sintetica"]
+
+
+def test_nao_itera_linhas(tmp_path, monkeypatch):
+    def _proibido(*args, **kwargs):
+        raise AssertionError("iterrows não deve ser usado")
+
+    monkeypatch.setattr(pd.DataFrame, "iterrows", _proibido)
+    assert len(_processar(_planilha_sintetica(tmp_path / "s.xlsx"))) == 60
+
+
+def test_dados_originais_alinhados_apos_linha_em_branco(tmp_path):
+    caminho = tmp_path / "branco.xlsx"
+    pd.DataFrame(
+        {"NOMECOMPLETO": ["ANA", None, "BRUNO"], "DIAS ATESTADOS": [1, None, 2], "coerente": ["COERENTE", None, "SEM COERÊNCIA"]}
+    ).to_excel(caminho, index=False)
+
+    registros = _processar(caminho)
+    assert [r["nomecompleto"] for r in registros] == ["ANA", "BRUNO"]
+    # A linha vazia é descartada; dados_originais acompanham a própria linha
+    assert [json.loads(r["dados_originais"])["NOMECOMPLETO"] for r in registros] == ["ANA", "BRUNO"]
+    assert [r["coerencia"] for r in registros] == [True, False]
@@ -0,0 +1,301 @@
+"""
+PERF-09 — Leitura em streaming (xlsx/csv) com memória limitada.
+
+StreamingSpreadsheetReader lê a planilha inteira em lotes: os DataFrames
+precisam equivaler a pd.read_excel (mesmos valores e tipos em todos os lotes),
+o upload legado e o ImportService consomem lote a lote e cada upload informa
+o uso de memória. Dados fictícios.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from backend.excel_processor import ExcelProcessor
+from backend.ingestion.exceptions import ConfirmationError, FormulaRejectedError
+from backend.ingestion.import_service import ImportService
+from backend.ingestion.limits import MAX_PREVIEW_ROWS
+from backend.ingestion.preview_service import PreviewService
+from backend.ingestion.schema_sql import apply_epic1_schema
+from backend.ingestion.streaming_reader import MemoryTracker, StreamingSpreadsheetReader
+from tests.fixtures.ingestion.builders import make_csv_bytes, sample_atestado_rows, xlsx_bytes
+from tests.test_perf08_excel_vectorized import HASHES_ESPERADOS, _hash, _planilha_sintetica
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _planilha_tipos_mistos(caminho: Path) -> Path:
+    """Colunas cujo tipo só se define olhando o arquivo inteiro"""
+    n = 40
+    pd.DataFrame(
+        {
+            "NOMECOMPLETO": [f"FUNC {i}" if i % 9 else None for i in range(n)],
+            # "16" num lote, "x" em outro: a leitura inteira mantém texto
+            "MATRICULA": ["16" if i < 30 else "x" for i in range(n)],
+            # inteiros e uma célula vazia no fim: float na leitura inteira
+            "DIAS ATESTADOS": [i % 5 if i != n - 1 else None for i in range(n)],
+            # booleanos com vazio: float (True -> 1.0)
+            "Ativo": [bool(i % 2) if i % 13 else None for i in range(n)],
+            "DATA_AFASTAMENTO": [datetime(2025, 1 + i % 12, 1 + i % 28) if i % 7 else None for i in range(n)],
+            "Misto": [(5, "abc", 2.5, None, datetime(2025, 1, 2), True)[i % 6] for i in range(n)],
+        }
+    ).to_excel(caminho, index=False)
+    return caminho
+
+
+@pytest.mark.parametrize("lote", [1, 3, 7, 1000])
+def test_lotes_equivalem_a_read_excel(tmp_path, lote):
+    caminho = _planilha_tipos_mistos(tmp_path / "mistos.xlsx")
+    esperado = pd.read_excel(caminho, sheet_name=0, engine="openpyxl")
+
+    lotes = list(StreamingSpreadsheetReader(lote).iter_dataframes(caminho, filename=caminho.name))
+
+    assert all(len(f) <= lote for f in lotes)
+    assert all(list(f.dtypes) == list(esperado.dtypes) for f in lotes)
+    pd.testing.assert_frame_equal(pd.concat(lotes, ignore_index=True), esperado)
+
+
+def test_linhas_em_branco_internas_mantidas_e_finais_descartadas(tmp_path):
+    from openpyxl import Workbook
+
+    caminho = tmp_path / "brancos.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    for linha in (["DIAS ATESTADOS"], [None], [datetime(2025, 3, 1)], [None], [2], [None], [None]):
+        ws.append(linha)
+    wb.save(caminho)
+
+    lotes = list(StreamingSpreadsheetReader(2).iter_dataframes(caminho, filename=caminho.name))
+    pd.testing.assert_frame_equal(pd.concat(lotes, ignore_index=True), pd.read_excel(caminho))
+
+
+def test_processador_em_lotes_gera_os_mesmos_registros(tmp_path):
+    caminho = _planilha_sintetica(tmp_path / "sintetica.xlsx")
+    for lote in (1, 7, 25):
+        lotes = list(ExcelProcessor(str(caminho)).processar_em_lotes(lote))
+        assert all(len(registros) <= lote for registros in lotes)
+        assert _hash([r for registros in lotes for r in registros]) == HASHES_ESPERADOS["sintetica"]
+
+
+def test_linhas_cruas_csv_e_xlsx_em_lotes():
+    linhas = sample_atestado_rows()
+    for dados, nome in ((make_csv_bytes(linhas, delimiter=";"), "a.csv"), (xlsx_bytes({"Atestados": linhas}), "a.xlsx")):
+        lotes = list(StreamingSpreadsheetReader(2).iter_row_batches(dados, filename=nome, start_row=1))
+        assert [len(lote) for lote in lotes] == [2, 1]
+        assert [str(lote_linha[0]) for lote in lotes for lote_linha in lote] == [r[0] for r in linhas[1:]]
+
+
+def test_linhas_cruas_rejeitam_formula_fora_do_preview():
+    linhas = sample_atestado_rows() + [["Ana Teste", "T1", "Producao", "CC", "J00", "2024-01-10", "1", "8"]] * 600
+    linhas.append(["=1+1", "T9", "Producao", "CC", "J00", "2024-01-10", "1", "8"])
+    with pytest.raises(FormulaRejectedError):
+        for _ in StreamingSpreadsheetReader(100).iter_row_batches(make_csv_bytes(linhas), filename="a.csv"):
+            pass
+
+
+def test_memory_tracker_relatorio():
+    memoria = MemoryTracker()
+    assert sum(len(lote) for lote in memoria.track([[1, 2], [3]])) == 3
+    relatorio = memoria.report().to_dict()
+    assert (relatorio["rows"], relatorio["batches"]) == (3, 2)
+    assert relatorio["rss_peak_mb"] >= relatorio["rss_start_mb"] > 0
+
+
+# --- ImportService: arquivo inteiro em vez das 500 linhas do preview ---------
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setenv("ENABLE_INTELLIGENT_INGESTION", "true")
+    c = sqlite3.connect(":memory:")
+    apply_epic1_schema(c, db_path=":memory:")
+    yield c
+    c.close()
+
+
+def _csv_grande(linhas: int) -> bytes:
+    cabecalho = sample_atestado_rows()[0]
+    corpo = [
+        [f"Pessoa {i}", f"T{i:05d}", ("Producao", "Administrativo")[i % 2], "CC-01", "J06.9",
+         f"2024-01-{1 + i % 28:02d}", str(1 + i % 3), "8"]
+        for i in range(linhas)
+    ]
+    return make_csv_bytes([cabecalho] + corpo)
+
+
+def _preview_confirmado(conn, dados: bytes):
+    svc = PreviewService(conn)
+    summary = svc.preview(data=dados, original_name="grande.csv", client_id=7, competencia="2024-01")
+    svc.confirm_preview(summary.preview_id, token=summary.confirmation_token, client_id=7)
+    return svc, summary
+
+
+def test_import_do_arquivo_inteiro_em_lotes(conn):
+    dados = _csv_grande(1200)
+    svc, summary = _preview_confirmado(conn, dados)
+    assert summary.total_rows == MAX_PREVIEW_ROWS - 1  # preview limitado
+
+    resultado = ImportService(conn, svc, batch_rows=250).import_preview(
+        preview_id=summary.preview_id,
+        token=summary.confirmation_token,
+        client_id=7,
+        competencia="2024-01",
+        file_data=dados,
+    )
+
+    assert resultado.status == "succeeded"
+    assert (resultado.inserted, resultado.errors) == (1200, 0)
+    assert resultado.memory["rows"] == 1200 and resultado.memory["batches"] == 5
+    assert conn.execute("SELECT COUNT(*) FROM ingestion_canonical_rows").fetchone()[0] == 1200
+    total, inseridas = conn.execute(
+        "SELECT total_rows, inserted_rows FROM ingestion_executions WHERE execution_uuid = ?",
+        (resultado.execution_id,),
+    ).fetchone()
+    assert (total, inseridas) == (1200, 1200)
+    # As primeiras linhas têm a mesma impressão digital calculada no preview
+    fps = {r[0] for r in conn.execute("SELECT line_fingerprint FROM ingestion_canonical_rows")}
+    assert set(svc._load_preview(summary.preview_id)["fingerprints"]) <= fps
+
+
+def test_import_sem_arquivo_usa_linhas_do_preview(conn):
+    dados = _csv_grande(1200)
+    svc, summary = _preview_confirmado(conn, dados)
+    resultado = ImportService(conn, svc).import_preview(
+        preview_id=summary.preview_id, token=summary.confirmation_token, client_id=7, competencia="2024-01",
+    )
+    assert resultado.inserted == summary.total_rows
+    assert resultado.memory is None
+
+
+def test_import_rejeita_arquivo_diferente_do_preview(conn):
+    svc, summary = _preview_confirmado(conn, _csv_grande(20))
+    with pytest.raises(ConfirmationError):
+        ImportService(conn, svc).import_preview(
+            preview_id=summary.preview_id,
+            token=summary.confirmation_token,
+            client_id=7,
+            competencia="2024-01",
+            file_data=_csv_grande(21),
+        )
+    assert conn.execute("SELECT COUNT(*) FROM ingestion_canonical_rows").fetchone()[0] == 0
+
+
+# --- Upload legado -----------------------------------------------------------
+
+
+def test_rota_upload_consome_lotes_e_informa_memoria(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    import backend.main as main
+    from backend.auth import create_access_token, get_password_hash
+    from backend.database import Base, get_db
+    from backend.models import Atestado, Upload, UploadJob, User
+    from backend.upload_jobs import UploadJobWorkerPool, resumo_job
+    from tests.fixtures.canonical_metrics import seed_clients
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_clients(db, (2,))
+    db.add(User(username="perf09", email="perf09@test.local", password_hash=get_password_hash("p"),
+                is_active=True, is_admin=False, client_id=2))
+    db.commit()
+
+    monkeypatch.setattr(main, "UPLOADS_DIR", str(tmp_path))
+    planilha = tmp_path / "entrada.xlsx"
+    n = 2500
+    pd.DataFrame(
+        {
+            "NOMECOMPLETO": [f"FUNC {i}" for i in range(n)],
+            "DIAS ATESTADOS": [1 + i % 3 for i in range(n)],
+            "DATA_AFASTAMENTO": [datetime(2026, 4, 1 + i % 28) for i in range(n)],
+        }
+    ).to_excel(planilha, index=False)
+
+    def _override():
+        yield db
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        client = TestClient(main.app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'perf09'})}"}
+        with open(planilha, "rb") as fh:
+            r = client.post(
+                "/api/upload",
+                data={"client_id": "2"},
+                files={"file": ("entrada.xlsx", fh, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                headers=headers,
+            )
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert r.status_code == 200, r.text
+    # A rota só enfileira; o worker da fila lê a planilha em lotes
+    UploadJobWorkerPool(sessionmaker(bind=engine, autocommit=False, autoflush=False)).executar_pendentes()
+    db.expire_all()
+    corpo = resumo_job(db.get(UploadJob, r.json()["job_id"]))
+    assert corpo["total_registros"] == n and corpo["mes_referencia"] == "2026-04"
+    assert (corpo["memoria"]["rows"], corpo["memoria"]["batches"]) == (n, 3)
+    assert db.get(Upload, corpo["upload_id"]).total_registros == n
+    assert db.query(Atestado).filter(Atestado.upload_id == corpo["upload_id"]).count() == n
+    db.close()
+    engine.dispose()
+
+
+# --- Memória: pico de RSS não cresce com a planilha -------------------------
+
+_SCRIPT_PICO = """
+import sys
+sys.path.insert(0, {root!r})
+modo, caminho = sys.argv[1], sys.argv[2]
+import pandas as pd
+from backend.ingestion.streaming_reader import StreamingSpreadsheetReader
+
+def pico_kb():
+    # VmHWM: pico de RSS deste processo (ru_maxrss herda o valor do pai no exec)
+    with open("/proc/self/status") as fh:
+        return next(int(l.split()[1]) for l in fh if l.startswith("VmHWM"))
+
+antes = pico_kb()
+if modo == "read_excel":
+    linhas = len(pd.read_excel(caminho, sheet_name=0, engine="openpyxl"))
+else:
+    linhas = sum(len(f) for f in StreamingSpreadsheetReader().iter_dataframes(caminho, filename=caminho))
+print(linhas, (pico_kb() - antes) / 1024)
+"""
+
+
+def _pico_mb(modo: str, caminho: Path) -> float:
+    saida = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_PICO.format(root=str(ROOT)), modo, str(caminho)],
+        capture_output=True, text=True, check=True, timeout=600,
+    ).stdout.split()
+    return float(saida[1])
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="VmHWM só no Linux")
+def test_benchmark_pico_de_memoria(tmp_path):
+    from scripts.benchmark_excel_processor import gerar_planilha
+
+    pequena = gerar_planilha(tmp_path / "p.xlsx", 2500)
+    grande = gerar_planilha(tmp_path / "g.xlsx", 20000)
+
+    stream_p, stream_g = _pico_mb("stream", pequena), _pico_mb("stream", grande)
+    inteira_g = _pico_mb("read_excel", grande)
+    print(
+        f"\nPERF-09: pico de RSS acima da base — streaming 2,5k {stream_p:.1f} MB, 20k {stream_g:.1f} MB; "
+        f"read_excel 20k {inteira_g:.1f} MB"
+    )
+    # 8x mais linhas e o pico do streaming quase não muda; a leitura inteira cresce com o arquivo
+    assert stream_g < stream_p + 15
+    assert stream_g < inteira_g
@@ -0,0 +1,364 @@
+"""
+PERF-10 — Fila durável de uploads (upload_jobs.py).
+
+POST /api/upload só enfileira e devolve o job_id; workers reivindicam os jobs
+no SQLite, gravam progresso por lote e a ingestão numa única transação.
+Jobs sobrevivem a reinício (heartbeat expirado volta para a fila) e podem ser
+cancelados na fila ou durante a leitura. Dados fictícios em SQLite temporário.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, create_sqlite_engine
+from backend.models import Atestado, MonthlyRollup, Upload, UploadJob
+from backend.upload_ingest import UploadIngestService
+from backend.upload_jobs import (
+    FASE_GRAVACAO,
+    STATUS_CANCELADO,
+    STATUS_CONCLUIDO,
+    STATUS_ERRO,
+    STATUS_NA_FILA,
+    STATUS_PROCESSANDO,
+    UploadJobService,
+    UploadJobWorkerPool,
+    resumo_job,
+    worker_vivo,
+)
+from tests.fixtures.canonical_metrics import seed_clients
+
+
+@pytest.fixture()
+def Session(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'fila.db'}")
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    with fabrica() as db:
+        seed_clients(db, (2, 3))
+        db.commit()
+    yield fabrica
+    engine.dispose()
+
+
+def _planilha(caminho, n: int):
+    pd.DataFrame(
+        {
+            "NOMECOMPLETO": [f"FUNC {i}" for i in range(n)],
+            "DIAS ATESTADOS": [1 + i % 3 for i in range(n)],
+            "setor": [("ADMIN", "PRODUCAO")[i % 2] for i in range(n)],
+            "DATA_AFASTAMENTO": [datetime(2026, 5, 1 + i % 28) for i in range(n)],
+        }
+    ).to_excel(caminho, index=False)
+    return str(caminho)
+
+
+def _enfileirar(Session, caminho, client_id=2, mes_referencia=None) -> str:
+    with Session() as db:
+        job = UploadJobService(db).enfileirar(client_id, "entrada.xlsx", caminho, mes_referencia)
+        db.commit()
+        return job.id
+
+
+def _job(Session, job_id) -> UploadJob:
+    with Session() as db:
+        job = db.get(UploadJob, job_id)
+        db.expunge(job)
+        return job
+
+
+def test_job_processado_registra_resultado_e_vazao(Session, tmp_path):
+    job_id = _enfileirar(Session, _planilha(tmp_path / "a.xlsx", 1500))
+    assert _job(Session, job_id).status == STATUS_NA_FILA
+
+    assert UploadJobWorkerPool(Session).executar_pendentes() == 1
+
+    job = _job(Session, job_id)
+    resumo = resumo_job(job)
+    assert (job.status, job.fase, job.tentativas) == (STATUS_CONCLUIDO, STATUS_CONCLUIDO, 1)
+    assert (resumo["linhas_lidas"], resumo["linhas_gravadas"], resumo["total_registros"]) == (1500, 1500, 1500)
+    assert resumo["mes_referencia"] == "2026-05"  # detectado nas datas de afastamento
+    assert resumo["linhas_por_segundo"] > 0
+    assert resumo["memoria"]["batches"] == 2
+    with Session() as db:
+        assert db.get(Upload, job.upload_id).total_registros == 1500
+        assert db.query(Atestado).filter(Atestado.upload_id == job.upload_id).count() == 1500
+        total = db.query(MonthlyRollup).filter(MonthlyRollup.client_id == 2, MonthlyRollup.dimensao == "total").one()
+        assert (total.mes_referencia, total.quantidade) == ("2026-05", 1500)
+
+
+def test_reivindicacao_concorrente_nao_duplica_jobs(Session, tmp_path):
+    ids = {_enfileirar(Session, str(tmp_path / f"{i}.xlsx")) for i in range(24)}
+    reivindicados = []
+    trava = threading.Lock()
+
+    def _worker(n):
+        with Session() as db:
+            service = UploadJobService(db)
+            while True:
+                job_id = service.reivindicar(f"teste:{n}:{len(reivindicados)}:{time.perf_counter_ns()}")
+                if not job_id:
+                    return
+                with trava:
+                    reivindicados.append(job_id)
+
+    threads = [threading.Thread(target=_worker, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(reivindicados) == sorted(ids)
+    with Session() as db:
+        assert {j.status for j in db.query(UploadJob)} == {STATUS_PROCESSANDO}
+
+
+def test_progresso_visivel_e_cancelamento_durante_leitura(Session, tmp_path, monkeypatch):
+    job_id = _enfileirar(Session, _planilha(tmp_path / "b.xlsx", 2500))
+    vistos = []
+    original = UploadJobService._registrar_progresso
+
+    def _registrar_e_cancelar(self, job, worker, lidos):
+        original(self, job, worker, lidos)
+        if not vistos:
+            # Outra sessão (como a API) já enxerga o progresso e pede o cancelamento
+            with Session() as api:
+                outro = api.get(UploadJob, job_id)
+                vistos.append((outro.fase, outro.linhas_lidas))
+                assert UploadJobService(api).solicitar_cancelamento(outro)
+
+    monkeypatch.setattr(UploadJobService, "_registrar_progresso", _registrar_e_cancelar)
+    UploadJobWorkerPool(Session).executar_pendentes()
+
+    assert vistos == [("leitura", 1000)]
+    job = _job(Session, job_id)
+    assert (job.status, job.fase, job.upload_id) == (STATUS_CANCELADO, STATUS_CANCELADO, None)
+    with Session() as db:
+        assert db.query(Upload).count() == 0 and db.query(Atestado).count() == 0
+
+
+def test_cancelamento_na_fila_e_apos_termino(Session, tmp_path):
+    na_fila = _enfileirar(Session, _planilha(tmp_path / "c.xlsx", 5))
+    concluido = _enfileirar(Session, _planilha(tmp_path / "d.xlsx", 5))
+
+    with Session() as db:
+        assert UploadJobService(db).solicitar_cancelamento(db.get(UploadJob, na_fila))
+    assert UploadJobWorkerPool(Session).executar_pendentes() == 1
+    assert _job(Session, na_fila).status == STATUS_CANCELADO
+
+    with Session() as db:
+        job = db.get(UploadJob, concluido)
+        assert job.status == STATUS_CONCLUIDO
+        assert not UploadJobService(db).solicitar_cancelamento(job)
+
+
+def test_job_orfao_volta_para_a_fila_apos_reinicio(Session, tmp_path):
+    job_id = _enfileirar(Session, _planilha(tmp_path / "e.xlsx", 30))
+    # Processo que reivindicou o job morreu na leitura: heartbeat parado
+    with Session() as db:
+        UploadJobService(db).reivindicar("host:1:morto:abc")
+        job = db.get(UploadJob, job_id)
+        job.linhas_lidas = 10
+        job.heartbeat_em = datetime.now() - timedelta(minutes=10)
+        db.commit()
+
+    pool = UploadJobWorkerPool(Session, expira_segundos=60)
+    assert pool.recuperar_orfaos() == 1
+    assert _job(Session, job_id).status == STATUS_NA_FILA
+    assert pool.executar_pendentes() == 1
+
+    job = _job(Session, job_id)
+    assert (job.status, job.tentativas, job.linhas_lidas) == (STATUS_CONCLUIDO, 2, 30)
+
+
+def test_job_orfao_com_heartbeat_recente_nao_e_recuperado(Session, tmp_path):
+    job_id = _enfileirar(Session, str(tmp_path / "f.xlsx"))
+    with Session() as db:
+        UploadJobService(db).reivindicar("host:1:vivo:abc")
+
+    assert UploadJobWorkerPool(Session, expira_segundos=60).recuperar_orfaos() == 0
+    assert _job(Session, job_id).status == STATUS_PROCESSANDO
+
+
+def test_job_orfao_esgota_tentativas(Session, tmp_path):
+    job_id = _enfileirar(Session, str(tmp_path / "g.xlsx"))
+    with Session() as db:
+        UploadJobService(db).reivindicar("host:1:morto:abc")
+        job = db.get(UploadJob, job_id)
+        job.tentativas = 3
+        job.heartbeat_em = datetime.now() - timedelta(minutes=10)
+        db.commit()
+
+    assert UploadJobWorkerPool(Session, expira_segundos=60, max_tentativas=3).recuperar_orfaos() == 1
+    job = _job(Session, job_id)
+    assert job.status == STATUS_ERRO and "interrompido 3 vezes" in job.erro
+
+
+def test_gravacao_longa_nao_e_recuperada_enquanto_o_worker_vive(Session, tmp_path, monkeypatch):
+    job_id = _enfileirar(Session, _planilha(tmp_path / "l.xlsx", 20))
+    pool = UploadJobWorkerPool(Session, expira_segundos=60)
+    original = UploadIngestService.ingerir_lotes
+    recuperados = []
+
+    def _gravacao_longa(self, *args, **kwargs):
+        # Transação de gravação além de JOB_EXPIRA_SEGUNDOS: heartbeat parado
+        with Session() as db:
+            db.get(UploadJob, job_id).heartbeat_em = datetime.now() - timedelta(minutes=10)
+            db.commit()
+        recuperados.append(pool.recuperar_orfaos())
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(UploadIngestService, "ingerir_lotes", _gravacao_longa)
+    assert pool.executar_pendentes() == 1
+    assert recuperados == [0]
+    job = _job(Session, job_id)
+    assert (job.status, job.tentativas, job.linhas_gravadas) == (STATUS_CONCLUIDO, 1, 20)
+
+
+def test_gravacao_de_worker_morto_volta_para_a_fila(Session, tmp_path):
+    processo = subprocess.Popen([sys.executable, "-c", "pass"])
+    processo.wait()
+    # Outro host (só o heartbeat vale) e processo já encerrado neste host
+    tokens = ("host:1:morto:abc", f"{socket.gethostname()}:{processo.pid}:morto:abc")
+    job_ids = [_enfileirar(Session, str(tmp_path / f"m{n}.xlsx")) for n in range(len(tokens))]
+    with Session() as db:
+        for job_id, worker in zip(job_ids, tokens):
+            assert UploadJobService(db).reivindicar(worker) == job_id
+            job = db.get(UploadJob, job_id)
+            job.fase = FASE_GRAVACAO
+            job.heartbeat_em = datetime.now() - timedelta(minutes=10)
+            db.commit()
+
+    assert UploadJobWorkerPool(Session, expira_segundos=60).recuperar_orfaos() == 2
+    assert [_job(Session, job_id).status for job_id in job_ids] == [STATUS_NA_FILA] * 2
+    assert worker_vivo(f"{socket.gethostname()}:{os.getppid()}:vivo:abc")
+
+
+def test_planilha_invalida_ou_vazia_termina_em_erro(Session, tmp_path):
+    corrompida = tmp_path / "corrompida.xlsx"
+    corrompida.write_bytes(b"isto nao e um xlsx")
+    vazia = tmp_path / "vazia.xlsx"
+    pd.DataFrame({"NOMECOMPLETO": []}).to_excel(vazia, index=False)
+    ids = [_enfileirar(Session, str(corrompida)), _enfileirar(Session, str(vazia))]
+
+    assert UploadJobWorkerPool(Session).executar_pendentes() == 2
+
+    for job_id in ids:
+        job = _job(Session, job_id)
+        assert job.status == STATUS_ERRO and job.finalizado_em is not None
+        assert "não contém dados válidos" in job.erro
+    with Session() as db:
+        assert db.query(Upload).count() == 0
+
+
+def test_pool_de_threads_processa_em_background(Session, tmp_path):
+    pool = UploadJobWorkerPool(Session, workers=2, intervalo=0.05)
+    pool.start()
+    try:
+        ids = [_enfileirar(Session, _planilha(tmp_path / f"h{i}.xlsx", 20 + i)) for i in range(3)]
+        pool.notificar()
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite:
+            if all(_job(Session, j).status == STATUS_CONCLUIDO for j in ids):
+                break
+            time.sleep(0.05)
+    finally:
+        pool.stop(timeout=30)
+
+    assert [_job(Session, j).linhas_gravadas for j in ids] == [20, 21, 22]
+    assert len({_job(Session, j).worker for j in ids}) == 3
+
+
+def test_rotas_de_upload_e_jobs(Session, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import backend.main as main
+    from backend.auth import create_access_token, get_password_hash
+    from backend.database import get_db
+    from backend.models import User
+
+    with Session() as db:
+        db.add(User(username="perf10", email="perf10@test.local", password_hash=get_password_hash("p"),
+                    is_active=True, is_admin=False, client_id=2))
+        db.add(User(username="perf10b", email="perf10b@test.local", password_hash=get_password_hash("p"),
+                    is_active=True, is_admin=False, client_id=3))
+        db.commit()
+    monkeypatch.setattr(main, "UPLOADS_DIR", str(tmp_path / "uploads"))
+    planilha = _planilha(tmp_path / "entrada.xlsx", 40)
+
+    # Rotas de job consultam o banco: precisam rodar fora do event loop
+    no_event_loop = []
+    resumo_original = main.resumo_job
+
+    def _resumo(job):
+        try:
+            asyncio.get_running_loop()
+            no_event_loop.append(True)
+        except RuntimeError:
+            no_event_loop.append(False)
+        return resumo_original(job)
+
+    monkeypatch.setattr(main, "resumo_job", _resumo)
+
+    def _override():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        client = TestClient(main.app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'perf10'})}"}
+        outro = {"Authorization": f"Bearer {create_access_token({'sub': 'perf10b'})}"}
+
+        def _enviar():
+            with open(planilha, "rb") as fh:
+                return client.post(
+                    "/api/upload",
+                    data={"client_id": "2", "mes_referencia": "2026-06"},
+                    files={"file": ("entrada.xlsx", fh, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                    headers=headers,
+                )
+
+        r = _enviar()
+        assert r.status_code == 200, r.text
+        job_id = r.json()["job_id"]
+        assert r.json()["status"] == STATUS_NA_FILA
+
+        r = client.get(f"/api/jobs/{job_id}?client_id=2", headers=headers)
+        assert r.status_code == 200 and r.json()["fase"] == STATUS_NA_FILA
+        # Outro tenant não enxerga o job
+        assert client.get(f"/api/jobs/{job_id}?client_id=3", headers=outro).status_code == 404
+
+        UploadJobWorkerPool(Session).executar_pendentes()
+        corpo = client.get(f"/api/jobs/{job_id}?client_id=2", headers=headers).json()
+        assert (corpo["status"], corpo["total_registros"], corpo["mes_referencia"]) == (STATUS_CONCLUIDO, 40, "2026-06")
+        assert client.post(f"/api/jobs/{job_id}/cancel?client_id=2", headers=headers).status_code == 409
+
+        segundo = _enviar().json()["job_id"]
+        r = client.post(f"/api/jobs/{segundo}/cancel?client_id=2", headers=headers)
+        assert r.status_code == 200 and r.json()["status"] == STATUS_CANCELADO
+
+        with open(planilha, "rb") as fh:
+            r = client.post(
+                "/api/upload",
+                data={"client_id": "2", "mes_referencia": "2026-13"},
+                files={"file": ("entrada.xlsx", fh, "application/octet-stream")},
+                headers=headers,
+            )
+        assert r.status_code == 400
+        assert no_event_loop and not any(no_event_loop)
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,226 @@
+"""
+PERF-11 — Cache LRU limitado e por cliente (cache_service.py).
+
+CacheService limita entradas e bytes, expira por TTL (na leitura e em
+varredura periódica) e invalida um cliente em O(1) pela geração. As leituras
+de Analytics, DashboardAggregator, InsightsEngine e MetricService repetidas
+não executam SQL até os dados do cliente mudarem. Dados fictícios em SQLite
+em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.cache_service as cache_module
+from backend.analytics import Analytics
+from backend.cache_service import CacheService
+from backend.dashboard_aggregator import DashboardAggregator
+from backend.database import Base
+from backend.insights import InsightsEngine
+from backend.models import Atestado, Upload
+from backend.services.metric_service import MetricService
+from backend.upload_ingest import UploadIngestService
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    novo = CacheService(max_entries=500, max_bytes=8 * 1024 * 1024, default_ttl=300)
+    monkeypatch.setattr(cache_module, "cache_service", novo)
+    return novo
+
+
+def _engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    return eng
+
+
+@pytest.fixture()
+def engine():
+    eng = _engine()
+    yield eng
+    eng.dispose()
+
+
+def _semear(db):
+    seed_clients(db, (2, 4))
+    for client_id, setores in ((2, ("ADMIN", "PRODUCAO")), (4, ("LOGISTICA",))):
+        upload = add_upload(db, client_id=client_id, mes_referencia="2026-01")
+        for i in range(12):
+            add_atestado(db, upload, nomecompleto=f"FUNC {i % 5}", setor=setores[i % len(setores)],
+                         cid="M54" if i % 2 else "J11", dias_atestados=1 + i % 3)
+    db.commit()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    _semear(session)
+    yield session
+    session.close()
+
+
+class _ContaSQL:
+    def __init__(self, engine):
+        self.engine = engine
+        self.n = 0
+
+    def _conta(self, *args):
+        self.n += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._conta)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._conta)
+
+
+# --- CacheService ---------------------------------------------------------------
+
+def test_lru_limitado_por_entradas():
+    c = CacheService(max_entries=3)
+    for k in "abc":
+        c.set(k, k.upper())
+    assert c.get("a") == "A"  # "a" passa a ser a mais recente
+    c.set("d", "D")
+
+    assert c.get("b") is None
+    assert [c.get(k) for k in "acd"] == ["A", "C", "D"]
+    stats = c.get_stats()
+    assert (stats["total_entries"], stats["evictions"], stats["hits"], stats["misses"]) == (3, 1, 4, 1)
+
+
+def test_lru_limitado_por_bytes():
+    c = CacheService(max_entries=100, max_bytes=3000)
+    for i in range(5):
+        c.set(f"k{i}", "x" * 1000)
+
+    assert c.bytes <= 3000
+    assert len(c.cache) == 2 and c.get("k4") is not None
+    assert c.get_stats()["evictions"] == 3
+    c.set("grande", "x" * 5000)  # maior que o limite: não entra nem derruba as outras
+    assert c.get("grande") is None and len(c.cache) == 2
+
+
+def test_expiracao_preguicosa_e_periodica(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: agora[0])
+    c = CacheService(default_ttl=10, intervalo_limpeza=60)
+    c.set("curta", 1)
+    c.set("longa", 2, ttl=300)
+
+    agora[0] += 11
+    assert c.get("curta") is None  # expirada na leitura
+    c.set("outra", 3, ttl=5)
+    agora[0] += 61
+    assert c.get("longa") == 2  # a leitura dispara a varredura periódica
+    assert "outra" not in c.cache
+    assert c.get_stats()["expirations"] == 2
+
+
+def test_leitura_devolve_copia():
+    c = CacheService()
+    c.set("k", {"lista": [1, 2]})
+    c.get("k")["lista"].append(3)
+    assert c.get("k") == {"lista": [1, 2]}
+
+
+def test_invalidacao_por_geracao_e_o1():
+    c = CacheService()
+    c.set("client:2:g0:x", 1)
+    assert c.geracao(("client", 2)) == 0
+    c.invalidate_namespace(("client", 2))
+    assert c.geracao(("client", 2)) == 1 and c.geracao(("client", 4)) == 0
+    assert c.get_stats()["invalidations"] == 1
+
+
+# --- Leituras por cliente ---------------------------------------------------------
+
+LEITURAS = [
+    ("analytics", lambda db: Analytics(db).metricas_gerais(2, "2026-01", "2026-12")),
+    ("analytics_top", lambda db: Analytics(db).top_cids(2, 5, setor=["ADMIN"])),
+    ("dashboard", lambda db: DashboardAggregator(db).calcular(2)),
+    ("insights", lambda db: InsightsEngine(db).gerar_insights(2)),
+    ("metric_service", lambda db: MetricService(db).compute(2, "2026-01", "2026-01").to_dict()),
+]
+
+
+@pytest.mark.parametrize("nome,leitura", LEITURAS, ids=[n for n, _ in LEITURAS])
+def test_leitura_repetida_nao_executa_sql(cache, engine, db, nome, leitura):
+    primeira = leitura(db)
+    with _ContaSQL(engine) as sql:
+        segunda = leitura(db)
+    assert sql.n == 0
+    assert segunda == primeira
+
+
+def test_filtros_diferentes_sao_entradas_diferentes(cache, db):
+    analytics = Analytics(db)
+    todos = analytics.top_setores(2)
+    admin = analytics.top_setores(2, setor="ADMIN")
+    assert todos != admin
+    assert analytics.top_setores(2) == todos and analytics.top_setores(2, setor="ADMIN") == admin
+    assert cache.get_stats()["hits"] >= 2
+
+
+def test_ingestao_invalida_so_o_cliente_alterado(cache, engine, db):
+    antes_2 = Analytics(db).metricas_gerais(2)
+    antes_4 = Analytics(db).metricas_gerais(4)
+
+    UploadIngestService(db).ingerir(2, "novo.xlsx", "2026-02", [{"nomecompleto": "NOVO", "dias_atestados": 10}])
+    # Antes do commit a própria sessão enxerga os dados novos (sem usar o cache)
+    assert Analytics(db).metricas_gerais(2)["total_dias_perdidos"] == antes_2["total_dias_perdidos"] + 10
+    db.commit()
+
+    with _ContaSQL(engine) as sql:
+        assert Analytics(db).metricas_gerais(4) == antes_4
+    assert sql.n == 0
+    depois_2 = Analytics(db).metricas_gerais(2)
+    assert depois_2["total_dias_perdidos"] == antes_2["total_dias_perdidos"] + 10
+
+
+def test_alteracao_orm_e_exclusao_em_massa_invalidam(cache, db):
+    antes = DashboardAggregator(db).calcular(2)["metricas"]["total_dias_perdidos"]
+
+    upload = db.query(Upload).filter(Upload.client_id == 2).first()
+    add_atestado(db, upload, nomecompleto="ORM", dias_atestados=7)
+    db.commit()
+    assert DashboardAggregator(db).calcular(2)["metricas"]["total_dias_perdidos"] == antes + 7
+
+    db.query(Atestado).filter(Atestado.nomecompleto == "ORM").delete()
+    db.commit()
+    assert DashboardAggregator(db).calcular(2)["metricas"]["total_dias_perdidos"] == antes
+
+
+def test_rollback_nao_invalida_outros_clientes(cache, engine, db):
+    Analytics(db).metricas_gerais(4)
+    UploadIngestService(db).ingerir(2, "x.xlsx", "2026-03", [{"nomecompleto": "X"}])
+    db.rollback()
+    with _ContaSQL(engine) as sql:
+        Analytics(db).metricas_gerais(4)
+    assert sql.n == 0
+
+
+def test_bancos_diferentes_nao_compartilham_entradas(cache, db):
+    outro = _engine()
+    try:
+        with sessionmaker(bind=outro, autocommit=False, autoflush=False)() as vazio:
+            seed_clients(vazio, (2,))
+            vazio.commit()
+            assert Analytics(db).metricas_gerais(2)["total_atestados"] == 12
+            assert Analytics(vazio).metricas_gerais(2)["total_atestados"] == 0
+    finally:
+        outro.dispose()
+
+
+def test_cache_desligado(monkeypatch, engine, db):
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=0))
+    Analytics(db).metricas_gerais(2)
+    with _ContaSQL(engine) as sql:
+        Analytics(db).metricas_gerais(2)
+    assert sql.n > 0
@@ -0,0 +1,215 @@
+"""
+PERF-12 — clients.data_version e ETags por cliente (http_cache.py).
+
+data_version sobe na mesma transação de qualquer alteração dos dados do cliente
+(ingestão, edição ORM, produtividade, exclusão em massa) e não sobe em rollback.
+/api/dashboard, /api/apresentacao, /api/filtros, /api/tendencias e as rotas
+executivas respondem If-None-Match com 304 sem rodar as análises. Dados fictícios
+em SQLite em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.main as main
+from backend.auth import create_access_token, get_password_hash
+from backend.database import Base, get_db, run_migrations
+from backend.http_cache import etag_corresponde
+from backend.models import Atestado, Client, Produtividade, Upload, User
+from backend.upload_ingest import UploadIngestService
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+
+@pytest.fixture()
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_clients(session, (2, 4))
+    for client_id in (2, 4):
+        upload = add_upload(session, client_id=client_id, mes_referencia="2026-01")
+        for i in range(6):
+            add_atestado(session, upload, nomecompleto=f"FUNC {i}", setor=("ADMIN", "PRODUCAO")[i % 2],
+                         cid="M54", dias_atestados=1 + i)
+    session.add(User(username="perf12", email="perf12@test.local", password_hash=get_password_hash("p"),
+                     is_active=True, is_admin=False, client_id=2))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _versoes(db):
+    return dict(db.execute(text("SELECT id, data_version FROM clients")).all())
+
+
+# --- data_version ----------------------------------------------------------------
+
+def test_ingestao_incrementa_so_o_cliente_alterado(db):
+    antes = _versoes(db)
+    UploadIngestService(db).ingerir(2, "novo.xlsx", "2026-02", [{"nomecompleto": "NOVO", "dias_atestados": 3}])
+    assert _versoes(db) == antes  # ainda não confirmado
+    db.commit()
+    assert _versoes(db) == {2: antes[2] + 1, 4: antes[4]}
+
+
+def test_edicao_orm_e_produtividade_incrementam(db):
+    antes = _versoes(db)
+    db.query(Atestado).join(Upload).filter(Upload.client_id == 4).first().dias_atestados = 30
+    db.commit()
+    db.add(Produtividade(client_id=2, mes_referencia="2026-01", numero_tipo=1, tipo_consulta="X", total=1))
+    db.commit()
+    assert _versoes(db) == {2: antes[2] + 1, 4: antes[4] + 1}
+
+
+def test_exclusao_em_massa_incrementa_todos_e_rollback_nenhum(db):
+    antes = _versoes(db)
+    db.query(Atestado).filter(Atestado.nomecompleto == "FUNC 0").delete(synchronize_session=False)
+    db.commit()
+    assert _versoes(db) == {2: antes[2] + 1, 4: antes[4] + 1}
+
+    UploadIngestService(db).ingerir(2, "x.xlsx", "2026-03", [{"nomecompleto": "X"}])
+    db.rollback()
+    db.commit()  # commit seguinte (sem alterações) não herda a marca descartada
+    assert _versoes(db) == {2: antes[2] + 1, 4: antes[4] + 1}
+
+
+def test_migracao_adiciona_coluna_em_banco_existente(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'legado.db'}")
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE clients (id INTEGER PRIMARY KEY, nome VARCHAR(200), logo_url VARCHAR(500))"))
+        conn.execute(text("INSERT INTO clients (id, nome) VALUES (2, 'Legado')"))
+        for tabela in ("uploads", "atestados"):
+            Base.metadata.tables[tabela].create(conn)
+    run_migrations(bind=eng)
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT data_version FROM clients WHERE id = 2")).scalar() == 0
+    eng.dispose()
+
+
+# --- ETag / 304 --------------------------------------------------------------------
+
+def test_if_none_match_fraco_lista_e_curinga():
+    assert etag_corresponde('W/"abc"', 'W/"abc"')
+    assert etag_corresponde('"x", "abc"', 'W/"abc"')
+    assert etag_corresponde("*", 'W/"abc"')
+    assert not etag_corresponde('W/"abd"', 'W/"abc"')
+    assert not etag_corresponde(None, 'W/"abc"')
+
+
+@pytest.fixture()
+def http(db):
+    def _override():
+        yield db
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        yield TestClient(main.app), {"Authorization": f"Bearer {create_access_token({'sub': 'perf12'})}"}
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+ROTAS = [
+    ("/api/dashboard", "DashboardAggregator"),
+    ("/api/apresentacao", "DashboardAggregator"),
+    ("/api/filtros", None),
+    ("/api/tendencias", "Analytics"),
+]
+
+
+@pytest.mark.parametrize("rota,classe", ROTAS, ids=[r for r, _ in ROTAS])
+def test_rota_responde_304_sem_recalcular(http, monkeypatch, rota, classe):
+    client, headers = http
+    r = client.get(rota, params={"client_id": 2}, headers=headers)
+    assert r.status_code == 200, r.text
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"].startswith("no-store")  # o navegador não grava; auth.js reenvia o ETag
+
+    if classe:
+        def _nao_deve_rodar(*args, **kwargs):
+            raise AssertionError("análise executada em resposta condicional")
+        monkeypatch.setattr(main, classe, _nao_deve_rodar)
+    r304 = client.get(rota, params={"client_id": 2}, headers={**headers, "If-None-Match": etag})
+    assert r304.status_code == 304 and r304.headers["etag"] == etag and not r304.content
+
+
+def test_etag_muda_com_filtros_e_com_os_dados(http, db):
+    client, headers = http
+    etag = client.get("/api/dashboard", params={"client_id": 2}, headers=headers).headers["etag"]
+    filtrado = client.get("/api/dashboard", params={"client_id": 2, "setor": "ADMIN"}, headers=headers)
+    assert filtrado.headers["etag"] != etag
+
+    UploadIngestService(db).ingerir(2, "novo.xlsx", "2026-02", [{"nomecompleto": "NOVO", "dias_atestados": 9}])
+    db.commit()
+    r = client.get("/api/dashboard", params={"client_id": 2}, headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+
+
+def test_alteracao_de_outro_worker_troca_etag_e_corpo(http, db, engine):
+    client, headers = http
+    r = client.get("/api/dashboard", params={"client_id": 2}, headers=headers)
+    antes = r.json()["metricas"]["total_dias_perdidos"]
+
+    # Outro worker: grava por outra conexão; as gerações do cache deste processo não mudam
+    upload_id = db.query(Upload.id).filter(Upload.client_id == 2).scalar()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO atestados (upload_id, nomecompleto, setor, dias_atestados) "
+                          "VALUES (:u, 'OUTRO', 'ADMIN', 50)"), {"u": upload_id})
+        conn.execute(text("UPDATE clients SET data_version = data_version + 1 WHERE id = 2"))
+    db.rollback()  # nova requisição: sessão sem estado da anterior
+
+    r2 = client.get("/api/dashboard", params={"client_id": 2}, headers={**headers, "If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 200 and r2.headers["etag"] != r.headers["etag"]
+    assert r2.json()["metricas"]["total_dias_perdidos"] == antes + 50
+    r304 = client.get("/api/dashboard", params={"client_id": 2}, headers={**headers, "If-None-Match": r2.headers["etag"]})
+    assert r304.status_code == 304
+
+
+def test_etag_nao_vaza_entre_clientes(http):
+    client, headers = http
+    etag = client.get("/api/filtros", params={"client_id": 2}, headers=headers).headers["etag"]
+    r = client.get("/api/filtros", params={"client_id": 4}, headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 403
+
+
+def test_rota_executiva_responde_304(db, monkeypatch):
+    monkeypatch.setenv("ENABLE_EXECUTIVE_UI", "true")
+    from backend.executive import api as executive_api
+    from backend.executive.aggregate_service import ExecutiveAggregateService
+
+    app = FastAPI()
+    executive_api.register_executive_routes(app, str(main.FRONTEND_DIR))
+
+    def _override():
+        yield db
+
+    app.dependency_overrides[get_db] = _override
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'perf12'})}"}
+    params = {"client_id": 2, "periodo_inicio": "2026-01", "periodo_fim": "2026-01"}
+
+    r = client.get("/api/executive/command-center", params=params, headers=headers)
+    assert r.status_code == 200, r.text
+    monkeypatch.setattr(ExecutiveAggregateService, "build_command_center",
+                        lambda *a, **k: pytest.fail("painel recalculado"))
+    r304 = client.get("/api/executive/command-center", params=params,
+                      headers={**headers, "If-None-Match": r.headers["etag"]})
+    assert r304.status_code == 304
+
+    db.get(Client, 2).nome_fantasia = "Renomeado"
+    db.commit()
+    monkeypatch.undo()
+    monkeypatch.setenv("ENABLE_EXECUTIVE_UI", "true")
+    r = client.get("/api/executive/command-center", params=params,
+                   headers={**headers, "If-None-Match": r.headers["etag"]})
+    assert r.status_code == 200
@@ -0,0 +1,221 @@
+"""
+PERF-13 — Cache compartilhado entre workers (cache_compartilhado.py).
+
+Vários processos locais abrem o mesmo arquivo SQLite: a invalidação de um cliente
+(nova geração na tabela de versões) vale para todos e update() é atômico entre
+processos. Só valores operacionais vão para o arquivo, em JSON; as leituras de
+clientes ficam na memória de cada worker. Em falha do arquivo o backend usa o LRU
+em memória e reaplica as invalidações quando o arquivo volta. Dados fictícios em
+SQLite temporário.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import backend.cache_compartilhado as compartilhado_module
+import backend.cache_service as cache_module
+from backend.analytics import Analytics
+from backend.cache_compartilhado import SQLiteCacheCompartilhado
+from backend.cache_service import CacheService, _token_engine, criar_cache_service
+from backend.database import Base, create_sqlite_engine
+from backend.notification_service import NotificationLevel, NotificationService
+from backend.upload_ingest import UploadIngestService
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+_CTX = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+
+
+def _rodar(alvo, *args, processos: int = 1):
+    fila = _CTX.Queue()
+    workers = [_CTX.Process(target=alvo, args=(*args, fila)) for _ in range(processos)]
+    for w in workers:
+        w.start()
+    resultados = [fila.get(timeout=60) for _ in workers]
+    for w in workers:
+        w.join(timeout=60)
+        assert w.exitcode == 0
+    return resultados
+
+
+def _cache(caminho, **kwargs):
+    """Backend com todas as chaves no arquivo (testes do próprio armazenamento)"""
+    return SQLiteCacheCompartilhado(caminho, prefixos_no_arquivo=("",), **kwargs)
+
+
+def _worker_contador(caminho, n, fila):
+    cache = _cache(caminho, timeout=30)
+    for _ in range(n):
+        cache.update("contador", lambda v: (v or 0) + 1, ttl=300)
+    fila.put(cache.falhas)
+
+
+def _worker_ingestao(caminho_cache, caminho_db, fila):
+    """Outro worker do gunicorn: engine e cache próprios, mesmo banco e mesmo arquivo de cache"""
+    cache_module.cache_service = SQLiteCacheCompartilhado(caminho_cache, timeout=30)
+    engine = create_sqlite_engine(f"sqlite:///{caminho_db}")
+    with sessionmaker(bind=engine, autocommit=False, autoflush=False)() as db:
+        UploadIngestService(db).ingerir(2, "novo.xlsx", "2026-02", [{"nomecompleto": "NOVO", "dias_atestados": 7}])
+        db.commit()
+    engine.dispose()
+    fila.put(True)
+
+
+@pytest.fixture()
+def caminho(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+# --- Backend -------------------------------------------------------------------------
+
+def test_lru_por_entradas_com_totais_por_trigger(caminho, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(compartilhado_module.time, "time", lambda: agora[0])
+    c = _cache(caminho, max_entries=3)
+    for k in "abc":
+        c.set(k, k.upper())
+        agora[0] += 10
+    assert c.get("a") == "A"  # acesso regravado: "a" passa a ser a mais recente
+    c.set("d", "D")
+
+    assert c.get("b") is None
+    assert [c.get(k) for k in "acd"] == ["A", "C", "D"]
+    stats = c.get_stats()
+    assert (stats["total_entries"], stats["evictions"], stats["hits"], stats["misses"]) == (3, 1, 4, 1)
+
+
+def test_limite_de_bytes_e_expiracao(caminho, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(compartilhado_module.time, "time", lambda: agora[0])
+    c = _cache(caminho, max_bytes=3000, default_ttl=10)
+    for i in range(5):
+        c.set(f"k{i}", "x" * 1000)
+        agora[0] += 1
+    assert c.get_stats()["bytes"] <= 3000 and c.get("k4") is not None
+
+    agora[0] += 10
+    assert c.get("k4") is None
+    assert c.purge_expired() >= 1 and c.get_stats()["total_entries"] == 0
+
+
+def test_invalidacao_vista_por_outra_instancia(caminho):
+    a = _cache(caminho)
+    b = _cache(caminho)
+    a.set("k", {"v": 1})
+    assert b.get("k") == {"v": 1}
+    a.invalidate_namespace(("client", 2))
+    assert (b.geracao(("client", 2)), b.geracao(("client", 4))) == (1, 0)
+    b.invalidate_prefix("k")
+    assert a.get("k") is None
+
+
+def test_update_atomico_entre_processos(caminho):
+    assert _rodar(_worker_contador, caminho, 100, processos=4) == [0, 0, 0, 0]
+    assert _cache(caminho).get("contador") == 400
+
+
+def test_leitura_e_invalidacao_entre_workers(tmp_path, caminho, monkeypatch):
+    caminho_db = str(tmp_path / "dados.db")
+    engine = create_sqlite_engine(f"sqlite:///{caminho_db}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine, autocommit=False, autoflush=False)() as db:
+        seed_clients(db, (2,))
+        upload = add_upload(db, client_id=2, mes_referencia="2026-01")
+        for i in range(5):
+            add_atestado(db, upload, nomecompleto=f"FUNC {i}", dias_atestados=2)
+        db.commit()
+
+    monkeypatch.setattr(cache_module, "cache_service", SQLiteCacheCompartilhado(caminho))
+    sql = []
+    event.listen(engine, "before_cursor_execute", lambda *a: sql.append(1))
+
+    def _metricas():
+        sql.clear()
+        with sessionmaker(bind=engine, autocommit=False, autoflush=False)() as db:
+            return Analytics(db).metricas_gerais(2)["total_dias_perdidos"], len(sql)
+
+    (dias, sql_primeiro), (dias_cache, sql_segundo) = _metricas(), _metricas()
+    assert sql_primeiro > 0 and (dias_cache, sql_segundo) == (dias, 0)
+    # Leituras com dados de trabalhadores não vão para o arquivo
+    with sqlite3.connect(caminho) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM cache_entradas").fetchone()[0] == 0
+
+    # Outro processo grava dados do cliente: a nova geração (no arquivo) vale para este
+    assert _rodar(_worker_ingestao, caminho, caminho_db) == [True]
+    dias_novos, sql_terceiro = _metricas()
+    assert sql_terceiro > 0 and dias_novos == dias + 7
+    engine.dispose()
+
+
+def test_valores_em_json_e_pickle_antigo_descartado(caminho):
+    c = _cache(caminho)
+    c.set("k", {"v": [1, 2]})
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("INSERT INTO cache_entradas VALUES ('antigo', X'80049500', 4, 9e18, 0)")
+        assert conn.execute("SELECT valor FROM cache_entradas WHERE chave = 'k'").fetchone()[0] == '{"v":[1,2]}'
+    c.set("objeto", object())  # não serializável em JSON: não é gravado
+    assert c.get("objeto") is None
+
+    c = _cache(caminho)
+    assert c.get("antigo") is None and c.get("k") == {"v": [1, 2]}
+
+
+def test_falha_usa_memoria_e_reaplica_invalidacoes(caminho, monkeypatch):
+    c = _cache(caminho)
+    conexao = c._conexao
+
+    def _quebrada():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(c, "_conexao", _quebrada)
+    c.set("k", 1)
+    assert c.get("k") == 1  # veio do LRU em memória
+    c.invalidate_namespace(("client", 2))
+    assert c.geracao(("client", 2)) == 1 and not c.get_stats()["available"]
+
+    monkeypatch.setattr(c, "_conexao", conexao)
+    c._indisponivel_ate = 0.0
+    assert SQLiteCacheCompartilhado(caminho).geracao(("client", 2)) == 0
+    c.geracao(("client", 4))  # primeira operação com o arquivo de volta reaplica a invalidação
+    assert SQLiteCacheCompartilhado(caminho).geracao(("client", 2)) == 1
+    assert c.get_stats()["failures"] == 1
+
+
+def test_notificacoes_compartilhadas(caminho, monkeypatch):
+    monkeypatch.setattr(cache_module, "cache_service", SQLiteCacheCompartilhado(caminho))
+    worker_a, worker_b = NotificationService(), NotificationService()
+    worker_a.notify(NotificationLevel.INFO, "Backup", "ok")
+    worker_b.notify(NotificationLevel.ERROR, "Falha", "erro")
+
+    assert sorted((n["id"], n["title"]) for n in worker_a.get_notifications()) == [(1, "Backup"), (2, "Falha")]
+    assert worker_b.mark_as_read(1) and not worker_b.mark_as_read(99)
+    assert worker_a.get_unread_count() == 1
+
+
+def test_backend_escolhido_por_ambiente(tmp_path, monkeypatch):
+    monkeypatch.setenv("ABSENTEISMO_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("ABSENTEISMO_CACHE_PATH", str(tmp_path / "c.db"))
+    assert isinstance(criar_cache_service(), SQLiteCacheCompartilhado)
+
+    (tmp_path / "arquivo").write_text("x")
+    monkeypatch.setenv("ABSENTEISMO_CACHE_PATH", str(tmp_path / "arquivo" / "c.db"))
+    assert type(criar_cache_service()) is CacheService  # arquivo inutilizável: memória local
+
+    monkeypatch.delenv("ABSENTEISMO_CACHE_BACKEND")
+    assert type(criar_cache_service()) is CacheService
+
+
+def test_token_do_banco_igual_entre_engines_do_mesmo_arquivo(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / 'x.db'}") for _ in range(2)]
+    memoria = [create_engine("sqlite://") for _ in range(2)]
+    for e in engines + memoria:
+        Base.metadata.create_all(bind=e)
+    tokens = [_token_engine(sessionmaker(bind=e)()) for e in engines + memoria]
+    assert tokens[0] == tokens[1]
+    assert len({tokens[0], tokens[2], tokens[3]}) == 3
+    for e in engines + memoria:
+        e.dispose()
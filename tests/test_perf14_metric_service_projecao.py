@@ -0,0 +1,84 @@
+"""
+PERF-14 — MetricService.compute com consulta projetada.
+
+compute() lê só as colunas usadas nas métricas, com Upload.mes_referencia no
+join: uma única consulta, sem consulta extra por linha/upload no pós-filtro de
+período e sem objetos Atestado no identity map da sessão. O resultado é o mesmo
+da carga ORM completa. Dados fictícios (fixture de performance) em SQLite em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+
+import backend.cache_service as cache_module
+from backend.cache_service import CacheService
+from backend.models import Atestado, Upload
+from backend.services.metric_service import MetricService
+from tests.fixtures.canonical_metrics import add_atestado, add_upload
+from tests.fixtures.performance.canonical_db import make_memory_session, seed_performance_adapter_fixture
+
+
+class _MetricServiceOrm(MetricService):
+    """Consulta anterior (entidades completas; mês via relacionamento) como referência"""
+
+    def _base_query(self, client_id, periodo_inicio, periodo_fim, setor=None, centro_custo=None):
+        q = self.db.query(Atestado).join(Upload).filter(Upload.client_id == client_id)
+        if periodo_inicio is not None:
+            q = q.filter(Upload.mes_referencia >= periodo_inicio)
+        if periodo_fim is not None:
+            q = q.filter(Upload.mes_referencia <= periodo_fim)
+        if setor:
+            q = q.filter(Atestado.setor == setor)
+        if centro_custo:
+            q = q.filter(Atestado.centro_custo == centro_custo)
+        return q
+
+
+@pytest.fixture(autouse=True)
+def sem_cache(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=0))
+
+
+@pytest.fixture()
+def db():
+    session = make_memory_session()
+    seed_performance_adapter_fixture(session)
+    malformado = add_upload(session, client_id=2, mes_referencia="2026-5")  # fora do pós-filtro
+    add_atestado(session, malformado, nomecompleto="FUNC MAL", dias_atestados=9)
+    session.commit()
+    yield session
+    session.close()
+
+
+CASOS = [
+    dict(client_id=2),
+    dict(client_id=2, periodo_inicio="2025-05", periodo_fim="2025-07"),
+    dict(client_id=2, periodo_inicio="2026-01"),
+    dict(client_id=4, periodo_fim="2026-12", setor="PRODUCAO"),
+    dict(client_id=2, suppress_small_groups=True, small_group_threshold=2, efetivo_trabalhadores=40),
+]
+
+
+@pytest.mark.parametrize("kwargs", CASOS)
+def test_resultado_igual_a_carga_orm(db, kwargs):
+    esperado = _MetricServiceOrm(db).compute(**kwargs).to_dict()
+    db.expunge_all()
+    assert MetricService(db).compute(**kwargs).to_dict() == esperado
+
+
+def test_uma_consulta_sem_entidades_na_sessao(db):
+    for mes in ("2024-01", "2024-02", "2024-03"):
+        upload = add_upload(db, client_id=2, mes_referencia=mes)
+        for i in range(20):
+            add_atestado(db, upload, nomecompleto=f"EXTRA {i}", dias_atestados=1)
+    db.commit()
+    db.expunge_all()
+
+    sql = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda _c, _cur, stmt, *a: sql.append(stmt))
+    r = MetricService(db).compute(client_id=2, periodo_inicio="2024-01", periodo_fim="2024-03")
+
+    assert r.metricas.eventos_brutos == 60
+    assert len(sql) == 1 and "mes_referencia" in sql[0] and "dados_originais" not in sql[0]
+    assert not any(isinstance(obj, Atestado) for obj in db.identity_map.values())
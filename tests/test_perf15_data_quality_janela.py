@@ -0,0 +1,81 @@
+"""
+PERF-15 — DataQualityService.analyze com janela na SQL e passada única em lotes.
+
+A consulta de eventos traz só as colunas da análise e só os uploads válidos da
+janela (resolvida na auditoria de uploads); os eventos de uploads com período
+inválido são apenas contados na SQL. As linhas chegam em lotes (yield_per) e
+não ficam na sessão; o resultado não depende do tamanho do lote. Dados fictícios
+em SQLite em memória.
+"""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+import backend.services.data_quality_service as dq_module
+from backend.models import Atestado
+from backend.services.data_quality_service import DataQualityService
+from tests.fixtures.data_quality import (
+    add_atestado,
+    add_upload,
+    make_test_session,
+    seed_quality_problems_fixture,
+)
+
+REF = date(2026, 6, 1)
+
+
+@pytest.fixture()
+def db():
+    session = make_test_session()
+    seed_quality_problems_fixture(session)
+    for mes in ("2024-01", "2024-02", "2024-03"):  # histórico fora da janela
+        upload = add_upload(session, client_id=2, mes_referencia=mes)
+        for i in range(30):
+            add_atestado(session, upload, nomecompleto=f"HIST {i}", matricula=f"H{i}", dias_atestados=2)
+    invalido = add_upload(session, client_id=2, mes_referencia="2026/01")
+    add_atestado(session, invalido, nomecompleto="PERIODO INVALIDO", dias_atestados=1)
+    session.commit()
+    yield session
+    session.close()
+
+
+def _linhas_lidas(monkeypatch):
+    lidas = []
+    original = DataQualityService._window_rows
+
+    def _contar(self, client_id, upload_ids):
+        for row in original(self, client_id, upload_ids):
+            lidas.append(row)
+            yield row
+
+    monkeypatch.setattr(DataQualityService, "_window_rows", _contar)
+    return lidas
+
+
+def test_janela_aplicada_na_consulta(db, monkeypatch):
+    lidas = _linhas_lidas(monkeypatch)
+    r = DataQualityService(db).analyze(2, "2026-01", "2026-12", reference_date=REF)
+
+    assert len(lidas) == r.completude["eventos"] > 0
+    assert not any((row.nomecompleto or "").startswith("HIST") for row in lidas)
+    assert r.periodos_invalidos["eventos_excluidos_do_calculo_da_janela"] == 1
+
+    lidas.clear()
+    completo = DataQualityService(db).analyze(2, reference_date=REF)
+    assert completo.completude["eventos"] == r.completude["eventos"] + 90
+
+
+def test_resultado_independe_do_lote_e_sessao_limpa(db, monkeypatch):
+    sql = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda _c, _cur, stmt, *a: sql.append(stmt))
+    padrao = DataQualityService(db).analyze(2, "2024-02", "2026-12", reference_date=REF).to_dict()
+
+    assert not any(isinstance(obj, Atestado) for obj in db.identity_map.values())
+    assert not any("dados_originais" in stmt for stmt in sql)
+
+    monkeypatch.setattr(dq_module, "_LOTE_LINHAS", 1)
+    db.expunge_all()
+    assert DataQualityService(db).analyze(2, "2024-02", "2026-12", reference_date=REF).to_dict() == padrao
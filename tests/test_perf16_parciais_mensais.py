@@ -0,0 +1,117 @@
+"""
+PERF-16 — Parciais mensais do MetricService e painel executivo em uma leitura.
+
+compute_monthly_partials lê a janela uma vez e guarda os acumuladores por
+competência; compute_from_partials mescla as parciais de qualquer subjanela com
+o mesmo resultado de compute(). O command center deriva atual, baseline e série
+dessas parciais: o número de consultas não cresce com a janela. Dados fictícios
+em SQLite em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+
+import backend.cache_service as cache_module
+from backend.cache_service import CacheService
+from backend.executive.aggregate_service import ExecutiveAggregateService
+from backend.services.metric_service import MetricasParciais, MetricService
+from tests.fixtures.canonical_metrics import add_atestado, add_upload
+from tests.fixtures.performance.canonical_db import make_memory_session, seed_performance_adapter_fixture
+
+
+@pytest.fixture(autouse=True)
+def sem_cache(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=0))
+
+
+@pytest.fixture()
+def db():
+    session = make_memory_session()
+    seed_performance_adapter_fixture(session)
+    for mes in ("2025-09", "2025-10", "2025-10", "2026-01"):
+        upload = add_upload(session, client_id=2, mes_referencia=mes)
+        for i in range(6):
+            add_atestado(session, upload, nomecompleto=f"FUNC {i % 4}", matricula=f"M{i}" if i % 2 else None,
+                         setor=("ADMIN", "PRODUCAO")[i % 2], cid=("M54", "J11", None)[i % 3],
+                         dias_atestados=1.5 * i, horas_dia=8, horas_perdi=4.0 * i if i % 3 else 0)
+    for mes in ("2026-01 ", "2026/02", ""):  # espaço no fim, malformado, vazio
+        upload = add_upload(session, client_id=2, mes_referencia=mes)
+        add_atestado(session, upload, nomecompleto="BORDA", dias_atestados=4)
+    session.commit()
+    yield session
+    session.close()
+
+
+JANELAS = [
+    ("2025-05", "2026-07"),
+    ("2025-09", "2025-10"),
+    ("2026-01", "2026-01"),
+    ("2026-01", "2026-02"),
+    ("2026-06", None),
+    (None, None),
+]
+
+
+def test_mescla_de_parciais_igual_a_compute(db):
+    svc = MetricService(db)
+    parciais = svc.compute_monthly_partials(2)
+    kwargs = dict(efetivo_trabalhadores=30, suppress_small_groups=True, small_group_threshold=2)
+    for inicio, fim in JANELAS:
+        esperado = svc.compute(2, inicio, fim, **kwargs).to_dict()
+        assert svc.compute_from_partials(2, parciais, inicio, fim, **kwargs).to_dict() == esperado, (inicio, fim)
+
+
+def test_mesclar_nao_altera_as_parciais(db):
+    parciais = MetricService(db).compute_monthly_partials(2, "2025-09", "2025-10")
+    antes = {mes: (p.eventos_brutos, set(p.worker_keys), len(p.setor_map["ADMIN"]["trabalhadores"]))
+             for mes, p in parciais.items()}
+    MetricasParciais.mesclar(parciais.values())
+    MetricasParciais.mesclar(parciais.values())
+    assert {mes: (p.eventos_brutos, set(p.worker_keys), len(p.setor_map["ADMIN"]["trabalhadores"]))
+            for mes, p in parciais.items()} == antes
+
+
+def test_parciais_com_identidades_nao_vao_para_o_cache(db, monkeypatch):
+    cache = CacheService(max_entries=100)
+    monkeypatch.setattr(cache_module, "cache_service", cache)
+    svc = MetricService(db)
+    svc.compute_monthly_partials(2)
+    svc.compute_monthly_partials(2)
+    assert len(cache.cache) == 0 and cache.hits == 0
+
+    svc.compute(2, "2025-09", "2026-01")
+    assert len(cache.cache) == 1
+    serializado = b"".join(valor for valor, _ in cache.cache.values())
+    assert b"FUNC 0" not in serializado and b"mat:" not in serializado
+
+
+def _consultas(db, inicio, fim):
+    sql = []
+    ouvinte = lambda _c, _cur, stmt, *a: sql.append(stmt)  # noqa: E731
+    event.listen(db.get_bind(), "before_cursor_execute", ouvinte)
+    try:
+        ExecutiveAggregateService(db).build_command_center(client_id=2, periodo_inicio=inicio, periodo_fim=fim)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", ouvinte)
+    return len(sql)
+
+
+def test_command_center_com_consultas_independentes_da_janela(db, monkeypatch):
+    series = []
+    original = ExecutiveAggregateService._build_temporal_series
+
+    def _guardar(self, *args):
+        series.append(original(self, *args))
+        return series[-1]
+
+    monkeypatch.setattr(ExecutiveAggregateService, "_build_temporal_series", _guardar)
+    curta = _consultas(db, "2026-07", "2026-07")
+    longa = _consultas(db, "2024-08", "2026-07")
+    assert longa == curta
+
+    svc = MetricService(db)
+    assert len(series[-1]) == 24
+    for ponto in series[-1]:
+        m = svc.compute(2, ponto["mes"], ponto["mes"]).metricas
+        assert (ponto["eventos"], ponto["dias"]) == (m.eventos_brutos, m.dias_perdidos)
@@ -0,0 +1,150 @@
+"""
+PERF-17 — /api/dados/todos paginado por cursor (keyset) e em NDJSON.
+
+Sem limit a resposta continua completa. Com limit, páginas encadeadas por
+proximo_cursor cobrem todos os registros uma única vez, na ordem
+(data_afastamento desc, nulos no fim; id), com os totais do filtro inteiro em
+todas as páginas. A leitura é por lote (consultas fixas, sem uma por registro), e
+formato=ndjson transmite os mesmos registros linha a linha. Dados fictícios em
+SQLite em memória.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.main as main
+from backend.auth import create_access_token, get_password_hash
+from backend.database import Base, get_db
+from backend.models import User
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+
+@pytest.fixture()
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_clients(session, (2, 4))
+    for k, mes in enumerate(("2026-01", "2026-02")):
+        upload = add_upload(session, client_id=2, mes_referencia=mes)
+        for i in range(23):
+            row = add_atestado(session, upload, nomecompleto=f"FUNC {i}", dias_atestados=0.5 * i)
+            # datas repetidas e nulas para cruzar as fronteiras das páginas
+            row.data_afastamento = date(2026, 1 + k, 1 + i % 4) if i % 5 else None
+            if i % 3:
+                row.dados_originais = json.dumps({"NOME": f"FUNC {i}", f"EXTRA{i % 4}": i})
+    add_atestado(session, add_upload(session, client_id=4, mes_referencia="2026-01"), nomecompleto="OUTRO")
+    session.add(User(username="perf17", email="perf17@test.local", password_hash=get_password_hash("p"),
+                     is_active=True, is_admin=False, client_id=2))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture()
+def http(db):
+    def _override():
+        yield db
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        yield TestClient(main.app), {"Authorization": f"Bearer {create_access_token({'sub': 'perf17'})}"}
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def _ordem(registro):
+    data = registro["data_afastamento"]
+    return (data is None, "" if data is None else "".join(chr(255 - ord(c)) for c in data), registro["id"])
+
+
+def test_paginas_cobrem_tudo_na_ordem_com_totais_globais(http):
+    client, headers = http
+    completo = client.get("/api/dados/todos", params={"client_id": 2}, headers=headers).json()
+    assert "proximo_cursor" not in completo and len(completo["dados"]) == 46
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        params = {"client_id": 2, "limit": 7, **({"cursor": cursor} if cursor else {})}
+        pagina = client.get("/api/dados/todos", params=params, headers=headers).json()
+        assert pagina["estatisticas"] == completo["estatisticas"]
+        vistos += pagina["dados"]
+        paginas += 1
+        cursor = pagina["proximo_cursor"]
+        if not cursor:
+            break
+
+    assert paginas == 7
+    assert vistos == completo["dados"]
+    assert [r["id"] for r in vistos] == [r["id"] for r in sorted(vistos, key=_ordem)]
+    assert completo["estatisticas"] == {"total_registros": 46, "total_atestados_dias": 253.0,
+                                        "total_dias_perdidos": 253.0}
+
+
+def test_consultas_por_pagina_nao_dependem_do_tamanho(http, engine):
+    client, headers = http
+    client.get("/api/auth/me", headers=headers)  # usuário do token já em cache_usuarios
+    sql = []
+    event.listen(engine, "before_cursor_execute", lambda _c, _cur, stmt, *a: sql.append(stmt))
+    contagens = []
+    for limite in (3, 40):
+        sql.clear()
+        assert client.get("/api/dados/todos", params={"client_id": 2, "limit": limite}, headers=headers).status_code == 200
+        contagens.append(len(sql))
+    assert contagens[0] == contagens[1]
+
+
+def test_ndjson_transmite_os_mesmos_registros(http):
+    client, headers = http
+    completo = client.get("/api/dados/todos", params={"client_id": 2}, headers=headers).json()
+    r = client.get("/api/dados/todos", params={"client_id": 2, "formato": "ndjson"}, headers=headers)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+
+    linhas = [json.loads(l) for l in r.text.splitlines()]
+    assert linhas[0] == {"tipo": "estatisticas", "estatisticas": completo["estatisticas"]}
+    assert [l["registro"] for l in linhas if l["tipo"] == "registro"] == completo["dados"]
+    colunas = [c for l in linhas if l["tipo"] == "colunas" for c in l["colunas"]]
+    assert colunas == completo["colunas_originais"] == linhas[-1]["colunas_originais"]
+    assert linhas[-1]["tipo"] == "fim" and linhas[-1]["proximo_cursor"] is None
+
+
+def test_ndjson_usa_sessao_propria(http, engine):
+    client, headers = http
+    fechamentos = []
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    def _override():
+        # Como get_db: a sessão da requisição é fechada antes de o corpo ser transmitido
+        db = fabrica()
+        db.close = lambda fechar=db.close: (fechamentos.append(db), fechar())
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = _override
+    r = client.get("/api/dados/todos", params={"client_id": 2, "formato": "ndjson"}, headers=headers)
+    linhas = [json.loads(l) for l in r.text.splitlines()]
+    assert sum(l["tipo"] == "registro" for l in linhas) == 46 and linhas[-1]["tipo"] == "fim"
+    # A sessão da requisição (rota + autenticação) é fechada só pelo get_db, uma vez cada
+    assert len(fechamentos) == len({id(s) for s in fechamentos})
+
+
+def test_cursor_e_limite_invalidos(http):
+    client, headers = http
+    assert client.get("/api/dados/todos", params={"client_id": 2, "cursor": "xx!"}, headers=headers).status_code == 400
+    assert client.get("/api/dados/todos", params={"client_id": 2, "limit": 0}, headers=headers).status_code == 422
+    assert client.get("/api/dados/todos", params={"client_id": 2, "formato": "csv"}, headers=headers).status_code == 422
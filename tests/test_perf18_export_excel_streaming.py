@@ -0,0 +1,158 @@
+"""
+PERF-18 — /api/export/excel em fluxo: consulta projetada em lotes e workbook write_only.
+
+As linhas de "Dados Completos" saem de uma consulta só com as colunas da planilha,
+lida com yield_per (sem Atestado na sessão, sem dados_originais) e com os mesmos
+filtros de antes; o ReportGenerator aceita um gerador e escreve cada linha direto
+no arquivo, com cabeçalhos no estilo nomeado "cabecalho". Filtro sem registros
+responde 404 antes de montar o relatório. Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.cache_service as cache_module
+import backend.exportacao_excel as exportacao_excel
+import backend.main as main
+from backend.auth import create_access_token, get_password_hash
+from backend.cache_service import CacheService
+from backend.database import Base, get_db
+from backend.models import Atestado, Upload, User
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+CABECALHO = ['Nome', 'Setor', 'CID', 'Diagnóstico', 'Dias Atestados', 'Horas Perdidas', 'Motivo', 'Escala']
+
+
+@pytest.fixture(autouse=True)
+def sem_cache(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=0))
+
+
+@pytest.fixture()
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_clients(session, (2, 4))
+    for mes in ("2026-01", "2026-02", "2026-03"):
+        upload = add_upload(session, client_id=2, mes_referencia=mes)
+        for i in range(12):
+            row = add_atestado(session, upload, nomecompleto=f"FUNC {i}" if i % 4 else None,
+                               setor=("ADMIN", "PRODUCAO")[i % 2], cid=("M54", "J11")[i % 2],
+                               dias_atestados=i or None, horas_perdi=2.0 * i)
+            row.nome_funcionario = f"LEGADO {i}"
+            row.descricao_cid = "DESCRICAO"
+            row.diagnostico = "DIAG" if i % 3 else None
+            row.dados_originais = '{"NOME": "x"}'
+    add_atestado(session, add_upload(session, client_id=4, mes_referencia="2026-01"), nomecompleto="OUTRO")
+    session.add(User(username="perf18", email="perf18@test.local", password_hash=get_password_hash("p"),
+                     is_active=True, is_admin=False, client_id=2))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _linhas_orm(db, **filtros):
+    """Montagem anterior (entidades completas) como referência"""
+    query = db.query(Atestado).join(Upload).filter(Upload.client_id == 2)
+    if filtros.get("mes"):
+        query = query.filter(Upload.mes_referencia == filtros["mes"])
+    if filtros.get("setor"):
+        query = query.filter(Atestado.setor.in_(filtros["setor"]))
+    return [{
+        'Nome': a.nomecompleto or a.nome_funcionario,
+        'Setor': a.setor,
+        'CID': a.cid,
+        'Diagnóstico': a.diagnostico or a.descricao_cid,
+        'Dias Atestados': a.dias_atestados or 0,
+        'Horas Perdidas': a.horas_perdi or 0,
+        'Motivo': a.motivo_atestado,
+        'Escala': a.escala,
+    } for a in query.order_by(Atestado.id).all()]
+
+
+@pytest.mark.parametrize("filtros", [{}, {"mes": "2026-02"}, {"setor": ["ADMIN"]}])
+def test_linhas_projetadas_iguais_a_carga_orm(db, engine, filtros):
+    esperado = _linhas_orm(db, **filtros)
+    db.expunge_all()
+
+    sql = []
+    event.listen(engine, "before_cursor_execute", lambda _c, _cur, stmt, *a: sql.append(stmt))
+    consulta = exportacao_excel.consulta_export(db, 2, **filtros)
+    assert list(exportacao_excel.iterar_linhas(consulta, lote=5)) == esperado
+
+    assert len(sql) == 1 and "dados_originais" not in sql[0]
+    assert not any(isinstance(obj, Atestado) for obj in db.identity_map.values())
+
+
+def test_workbook_escrito_a_partir_de_gerador(db, tmp_path):
+    pytest.importorskip("reportlab")
+    from backend.report_generator import ReportGenerator
+
+    lidas = []
+
+    def _linhas():
+        for linha in exportacao_excel.iterar_linhas(exportacao_excel.consulta_export(db, 2), lote=7):
+            lidas.append(linha)
+            yield linha
+
+    destino = tmp_path / "export.xlsx"
+    ok = ReportGenerator(db=db, client_id=2).generate_excel_report(
+        str(destino), _linhas(), {"total_atestados": 36}, {"top_setores": [{"setor": "ADMIN", "dias": 3}]},
+        client_id=2,
+    )
+    assert ok and len(lidas) == 36
+
+    wb = load_workbook(destino)
+    assert wb.sheetnames == ["Dados Completos", "Métricas", "TOP Setores"]
+    ws = wb["Dados Completos"]
+    valores = list(ws.iter_rows(values_only=True))
+    assert list(valores[0]) == CABECALHO
+    assert [dict(zip(CABECALHO, v)) for v in valores[1:]] == lidas
+    assert {c.style for c in ws[1]} == {"cabecalho"}
+    assert wb["Métricas"]["B2"].value == 36 and wb["TOP Setores"]["A2"].style == "celula"
+
+
+@pytest.fixture()
+def http(db):
+    def _override():
+        yield db
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        yield TestClient(main.app), {"Authorization": f"Bearer {create_access_token({'sub': 'perf18'})}"}
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def test_export_sem_registros_responde_404(http, monkeypatch):
+    client, headers = http
+    chamadas = []
+    monkeypatch.setattr(main, "buscar_dados_dashboard_completo", lambda *a: chamadas.append(a))
+    r = client.get("/api/export/excel", params={"client_id": 2, "mes": "2030-01"}, headers=headers)
+    assert r.status_code == 404 and chamadas == []
+
+
+def test_export_devolve_planilha_do_filtro(http, tmp_path, monkeypatch):
+    pytest.importorskip("reportlab")
+    monkeypatch.setattr(main, "EXPORTS_DIR", str(tmp_path))
+    client, headers = http
+    r = client.get("/api/export/excel", params={"client_id": 2, "mes": "2026-03"}, headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/vnd.openxmlformats-officedocument.spreadsheetml")
+
+    ws = load_workbook(io.BytesIO(r.content))["Dados Completos"]
+    assert ws.max_row == 1 + 12
@@ -0,0 +1,115 @@
+"""
+PERF-19 — Gráficos dos relatórios renderizados em pool de processos, com cache por conteúdo.
+
+O endereço do PNG depende só do método, dos dados (JSON canônico), das cores do
+cliente e da revisão do renderizador. A segunda renderização dos mesmos gráficos sai do cache, com o tempo de
+cada gráfico informado; o arquivo entregue ao relatório é uma cópia (apagá-lo não
+afeta o cache). O pool de processos gera os mesmos gráficos que a execução em
+sequência. Dados fictícios.
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+
+import pytest
+
+import backend.graficos_render as graficos_module
+from backend.graficos_render import RenderizadorGraficos, chave_cache
+
+# Os gráficos são os métodos do ReportGenerator (que importa reportlab)
+requer_reportlab = pytest.mark.skipif(importlib.util.find_spec("reportlab") is None, reason="reportlab ausente")
+
+CORES = {'primary': '#1a237e', 'secondary': '#556B2F'}
+PALETA = ['#1a237e', '#556B2F']
+
+DADOS = {
+    'top_cids': [{'cid': 'M54', 'quantidade': 7}, {'cid': 'J11', 'quantidade': 3}],
+    'top_setores': [{'setor': 'ADMIN', 'dias_perdidos': 12}, {'setor': 'PRODUCAO', 'dias_perdidos': 5}],
+    'evolucao_mensal': [{'mes': '2026-01', 'quantidade': 4, 'dias_perdidos': 9},
+                        {'mes': '2026-02', 'quantidade': 6, 'dias_perdidos': 11}],
+}
+METODOS = {'top_cids': '_gerar_grafico_cids', 'top_setores': '_gerar_grafico_setores',
+           'evolucao_mensal': '_gerar_grafico_evolucao'}
+
+
+def _pedidos(pasta):
+    return [(chave, METODOS[chave], dados, str(pasta / f"{chave}.png")) for chave, dados in DADOS.items()]
+
+
+def test_chave_de_cache_pelo_conteudo():
+    dados = {'b': 1, 'a': [1, 2]}
+    assert chave_cache('_gerar_grafico_cids', dados, CORES, PALETA, 2) == \
+        chave_cache('_gerar_grafico_cids', dict(reversed(list(dados.items()))), dict(CORES), list(PALETA), 2)
+    outras_cores = dict(CORES, primary='#000000')
+    assert chave_cache('_gerar_grafico_cids', dados, CORES, PALETA, 2) not in {
+        chave_cache('_gerar_grafico_cids', dados, outras_cores, PALETA, 2),
+        chave_cache('_gerar_grafico_setores', dados, CORES, PALETA, 2),
+        chave_cache('_gerar_grafico_cids', {'b': 2, 'a': [1, 2]}, CORES, PALETA, 2),
+    }
+
+
+def test_chave_de_cache_muda_com_o_renderizador(monkeypatch):
+    antes = chave_cache('_gerar_grafico_cids', {'a': 1}, CORES, PALETA, 2)
+    # Deploy que altera report_generator.py (ou o matplotlib): PNGs antigos não servem
+    monkeypatch.setattr(graficos_module, "_revisao_renderizador", lambda: "outra-revisao")
+    assert chave_cache('_gerar_grafico_cids', {'a': 1}, CORES, PALETA, 2) != antes
+
+
+@requer_reportlab
+def test_segunda_renderizacao_sai_do_cache(tmp_path):
+    render = RenderizadorGraficos(processos=0, cache_dir=str(tmp_path / "cache"))
+    (tmp_path / "r1").mkdir()
+    gerados, tempos = render.renderizar(_pedidos(tmp_path / "r1"), CORES, PALETA, 2)
+    assert set(gerados) == set(DADOS) and not any(t['cache'] for t in tempos)
+    assert all(t['ok'] and t['ms'] > 0 for t in tempos)
+    assert len(os.listdir(tmp_path / "cache")) == 3
+
+    for caminho in gerados.values():  # o relatório apaga os temporários
+        os.remove(caminho)
+
+    (tmp_path / "r2").mkdir()
+    de_novo, tempos = render.renderizar(_pedidos(tmp_path / "r2"), CORES, PALETA, 2)
+    assert [t['grafico'] for t in tempos if t['cache']] == list(DADOS)
+    for chave, caminho in de_novo.items():
+        assert open(caminho, 'rb').read()[:8] == b'\x89PNG\r\n\x1a\n'
+
+    _, tempos = render.renderizar(_pedidos(tmp_path / "r2"), dict(CORES, primary='#000000'), PALETA, 2)
+    assert not any(t['cache'] for t in tempos)
+
+
+@requer_reportlab
+def test_cache_podado_pelo_limite(tmp_path):
+    render = RenderizadorGraficos(processos=0, cache_dir=str(tmp_path / "cache"), cache_max=2)
+    render.renderizar(_pedidos(tmp_path), CORES, PALETA, 2)
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+
+@requer_reportlab
+def test_pool_de_processos_gera_os_mesmos_graficos(tmp_path):
+    (tmp_path / "seq").mkdir()
+    (tmp_path / "par").mkdir()
+    sequencial, _ = RenderizadorGraficos(processos=0).renderizar(_pedidos(tmp_path / "seq"), CORES, PALETA, 2)
+
+    render = RenderizadorGraficos(processos=2)
+    try:
+        paralelo, tempos = render.renderizar(_pedidos(tmp_path / "par"), CORES, PALETA, 2)
+    finally:
+        render.shutdown()
+    assert set(paralelo) == set(sequencial) == set(DADOS)
+    assert all(t['ok'] and not t['cache'] for t in tempos)
+    for chave in DADOS:
+        assert os.path.getsize(paralelo[chave]) == os.path.getsize(sequencial[chave])
+
+
+@requer_reportlab
+def test_relatorio_registra_tempos_por_grafico(tmp_path, monkeypatch):
+    import backend.graficos_render as graficos_render
+    from backend.report_generator import ReportGenerator
+
+    monkeypatch.setattr(graficos_render, "renderizador_graficos",
+                        RenderizadorGraficos(processos=0, cache_dir=str(tmp_path / "cache")))
+    gerador = ReportGenerator()
+    assert gerador.generate_excel_report(str(tmp_path / "r.xlsx"), iter([{'Nome': 'A'}]), {}, DADOS)
+    assert sorted(t['grafico'] for t in gerador.tempos_graficos) == sorted(DADOS)
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".png")]
@@ -0,0 +1,117 @@
+"""
+PERF-20 — Apresentação PowerPoint com gráficos nativos (python-pptx) em vez de PNGs.
+
+Com graficos_nativos, cada gráfico com extrator vira um objeto de gráfico editável,
+com as mesmas categorias/valores (e cortes TOP N) do gráfico em imagem; o que não
+tem versão nativa ou não se encaixa continua saindo como imagem. O arquivo fica
+menor que o da versão só com imagens. Dados fictícios.
+"""
+from __future__ import annotations
+
+import importlib.util
+
+import pytest
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+import backend.graficos_render as graficos_render
+from backend.graficos_pptx import grafico_nativo
+from backend.graficos_render import RenderizadorGraficos
+
+requer_reportlab = pytest.mark.skipif(importlib.util.find_spec("reportlab") is None, reason="reportlab ausente")
+
+CORES = {'primary': '#1a237e', 'secondary': '#556B2F', 'primaryLight': '#3949ab', 'secondaryLight': '#6B8E23',
+         'masculino': '#1a237e', 'feminino': '#556B2F'}
+PALETA = ['#1a237e', '#556B2F', '#3949ab']
+
+DADOS_RELATORIO = {
+    'top_cids': [{'cid': f'C{i:02d}', 'quantidade': 20 - i} for i in range(12)],
+    'top_setores': [{'setor': 'ADMINISTRACAO GERAL E FINANCEIRA', 'dias_perdidos': 12},
+                    {'setor': 'PRODUCAO', 'dias_perdidos': 5}],
+    'evolucao_mensal': [{'mes': '2026-01', 'quantidade': 4, 'dias_perdidos': 9},
+                        {'mes': '2026-02', 'quantidade': 6, 'dias_perdidos': 11}],
+    'distribuicao_genero': [{'genero': 'F', 'quantidade': 3}, {'genero': 'M', 'quantidade': 5}],
+    'top_motivos': [{'motivo': 'DOENCA', 'quantidade': 8}, {'motivo': 'ACOMPANHANTE', 'quantidade': 2}],
+    'dias_setor_genero': [{'setor': 'ADMIN', 'genero': 'M', 'dias_perdidos': 4},
+                          {'setor': 'ADMIN', 'genero': 'F', 'dias_perdidos': 6},
+                          {'setor': 'PRODUCAO', 'genero': 'M', 'dias_perdidos': 2}],
+    'media_cid': [{'cid': 'M54', 'diagnostico': 'DORSALGIA', 'media_dias': 2.5}],
+    'top_escalas': "formato inesperado",  # sem versão nativa: segue o caminho da imagem
+}
+
+
+def test_extratores_seguem_os_graficos_em_imagem():
+    cids = grafico_nativo('_gerar_grafico_cids', DADOS_RELATORIO['top_cids'], CORES, PALETA)
+    assert cids.tipo == 'barras' and len(cids.categorias) == 10
+    assert cids.series == [('Quantidade de Atestados', [float(20 - i) for i in range(10)])]
+    assert cids.cores_pontos[:2] == [CORES['primary'], CORES['secondary']]
+
+    setores = grafico_nativo('_gerar_grafico_setores', DADOS_RELATORIO['top_setores'], CORES, PALETA)
+    assert setores.categorias == ['ADMINISTRACAO GERAL ', 'PRODUCAO']  # corte de 20 caracteres
+
+    genero = grafico_nativo('_gerar_grafico_genero', DADOS_RELATORIO['distribuicao_genero'], CORES, PALETA)
+    assert (genero.tipo, genero.categorias, genero.series[0][1]) == ('rosca', ['Masculino', 'Feminino'], [5.0, 3.0])
+
+    setor_genero = grafico_nativo('_gerar_grafico_setor_genero', DADOS_RELATORIO['dias_setor_genero'], CORES, PALETA)
+    assert setor_genero.categorias == ['ADMIN', 'PRODUCAO']
+    assert setor_genero.series == [('Masculino', [4.0, 2.0]), ('Feminino', [6.0, 0.0])]
+
+    assert grafico_nativo('_gerar_grafico_escalas', "formato inesperado", CORES, PALETA) is None
+    assert grafico_nativo('_gerar_grafico_analise_coerencia', {'coerente': 0, 'sem_coerencia': 0}, CORES, PALETA) is None
+    assert grafico_nativo('_gerar_grafico_inexistente', [{'x': 1}], CORES, PALETA) is None
+
+
+def _gerar(tmp_path, nome, nativos):
+    from backend.report_generator import ReportGenerator
+
+    destino = tmp_path / nome
+    assert ReportGenerator().generate_powerpoint_report(
+        str(destino), DADOS_RELATORIO, {'total_atestados': 10}, [], "2026-01 a 2026-02",
+        graficos_nativos=nativos,
+    )
+    return destino
+
+
+def _formas(destino):
+    graficos, imagens = {}, []
+    for slide in Presentation(str(destino)).slides:
+        titulo = slide.shapes.title.text if slide.shapes.title else ""
+        for forma in slide.shapes:
+            if forma.has_chart:
+                graficos[titulo] = forma.chart
+            elif forma.shape_type == MSO_SHAPE_TYPE.PICTURE:
+                imagens.append(titulo)
+    return graficos, imagens
+
+
+@requer_reportlab
+def test_apresentacao_com_graficos_nativos(tmp_path, monkeypatch):
+    monkeypatch.setattr(graficos_render, "renderizador_graficos", RenderizadorGraficos(processos=0))
+    nativa = _gerar(tmp_path, "nativa.pptx", True)
+    imagem = _gerar(tmp_path, "imagem.pptx", False)
+
+    graficos, imagens = _formas(nativa)
+    assert len(graficos) == 7 and imagens == []
+    cids = graficos['TOP 10 Doenças mais Frequentes']
+    assert list(cids.plots[0].categories) == [f'C{i:02d}' for i in range(10)]
+    assert list(cids.plots[0].series[0].values) == [float(20 - i) for i in range(10)]
+    assert len(graficos['Evolução Mensal'].plots[0].series) == 2
+
+    graficos_img, imagens_img = _formas(imagem)
+    assert graficos_img == {} and set(imagens_img) <= set(graficos)
+    assert nativa.stat().st_size < imagem.stat().st_size / 2
+
+
+@requer_reportlab
+def test_falha_no_grafico_nativo_volta_para_imagem(tmp_path, monkeypatch):
+    import backend.graficos_pptx as graficos_pptx
+
+    monkeypatch.setattr(graficos_render, "renderizador_graficos", RenderizadorGraficos(processos=0))
+
+    def _falhar(*args, **kwargs):
+        raise ValueError("falha simulada")
+
+    _, so_imagens = _formas(_gerar(tmp_path, "imagem.pptx", False))
+    monkeypatch.setattr(graficos_pptx, "adicionar_grafico_nativo", _falhar)
+    graficos, imagens = _formas(_gerar(tmp_path, "fallback.pptx", True))
+    assert graficos == {} and imagens == so_imagens
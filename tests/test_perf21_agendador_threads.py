@@ -0,0 +1,117 @@
+"""
+PERF-21 — Agendador de relatórios/alertas fora do event loop.
+
+As tarefas rodam no pool "agendador", com sessão própria: enquanto um relatório
+agendado lento roda (SMTP/consulta simulados com espera), as requisições HTTP
+continuam respondendo rápido. Uma tarefa ainda em execução não é disparada de
+novo (disparos ignorados contados) e cada tarefa registra execuções, erros e
+tempos. Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+pytest.importorskip("reportlab")  # report_scheduler -> report_generator
+
+import backend.background_tasks as background_tasks  # noqa: E402
+import backend.main as main  # noqa: E402
+from backend.background_tasks import BackgroundTaskManager  # noqa: E402
+from backend.database import Base  # noqa: E402
+
+
+@pytest.fixture()
+def session_factory():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield sessionmaker(bind=eng, autocommit=False, autoflush=False)
+    eng.dispose()
+
+
+class _RelatorioLento:
+    """Relatório agendado que bloqueia a thread (como geração + SMTP)"""
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self.threads = []
+        self.simultaneos = 0
+        self.max_simultaneos = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.simultaneos += 1
+            self.max_simultaneos = max(self.max_simultaneos, self.simultaneos)
+            self.threads.append(threading.current_thread().name)
+        time.sleep(self.segundos)
+        with self._lock:
+            self.simultaneos -= 1
+        return [{"schedule_id": 1, "success": True}]
+
+
+def _manager(monkeypatch, session_factory, segundos, intervalo):
+    lento = _RelatorioLento(segundos)
+    monkeypatch.setattr(background_tasks.ReportScheduler, "process_scheduled_reports", lambda self: lento())
+    monkeypatch.setattr(BackgroundTaskManager, "_check_alerts", lambda self, db: None)
+    return BackgroundTaskManager(session_factory=session_factory, intervalo=intervalo), lento
+
+
+def test_requisicoes_nao_esperam_o_relatorio_agendado(monkeypatch, session_factory):
+    manager, lento = _manager(monkeypatch, session_factory, segundos=1.0, intervalo=60)
+    client = TestClient(main.app)
+    client.get("/api/health")  # aquecimento
+
+    manager.start()
+    try:
+        limite = time.monotonic() + 5
+        while not manager.resumo()["relatorios"]["em_execucao"]:
+            assert time.monotonic() < limite, manager.resumo()
+            time.sleep(0.01)
+        latencias = []
+        while manager.resumo()["relatorios"]["em_execucao"]:
+            inicio = time.perf_counter()
+            assert client.get("/api/health").status_code == 200
+            latencias.append(time.perf_counter() - inicio)
+    finally:
+        manager.stop()
+
+    assert len(latencias) >= 5
+    assert max(latencias) < 0.5  # o relatório leva 1 s; nenhuma requisição esperou por ele
+    assert lento.threads and all(nome.startswith("agendador") for nome in lento.threads)
+
+
+def test_sem_sobreposicao_e_com_metricas(monkeypatch, session_factory):
+    manager, lento = _manager(monkeypatch, session_factory, segundos=0.3, intervalo=0.02)
+    manager.start()
+    time.sleep(0.5)
+    assert manager.executar("relatorios") is False  # já em execução no pool
+    manager.stop()
+
+    resumo = manager.resumo()["relatorios"]
+    assert lento.max_simultaneos == 1
+    assert 1 <= resumo["execucoes"] <= 2 and resumo["ignoradas"] > 0
+    assert resumo["ultima_duracao_ms"] >= 300 and resumo["media_ms"] >= 300
+    assert resumo["erros"] == 0 and not resumo["em_execucao"]
+    assert manager.resumo()["alertas"]["execucoes"] >= 1
+
+
+def test_erro_na_tarefa_fica_nas_metricas(monkeypatch, session_factory):
+    manager = BackgroundTaskManager(session_factory=session_factory)
+
+    def _falhar(self, db):
+        raise RuntimeError("SMTP indisponível")
+
+    monkeypatch.setattr(BackgroundTaskManager, "_process_reports", _falhar)
+    manager.tarefas["relatorios"] = manager._process_reports
+    assert manager.executar("relatorios") is False
+    assert manager.executar("alertas") is True
+
+    resumo = manager.resumo()
+    assert resumo["relatorios"]["erros"] == 1 and resumo["relatorios"]["ultimo_erro"] == "SMTP indisponível"
+    assert resumo["alertas"]["execucoes"] == 1 and resumo["alertas"]["erros"] == 0
@@ -0,0 +1,160 @@
+"""
+PERF-22 — Regras de alerta avaliadas só quando algo mudou, em consultas agrupadas.
+
+Um ciclo sem alteração não avalia regra nenhuma (nem consulta atestados). Um novo
+atestado sobe o data_version da empresa e só as regras dela voltam a ser avaliadas;
+a virada do dia/janela ou a edição da regra também reavaliam. Um disparo suprimido
+por alerta recente é reavaliado até o alerta expirar ou ser resolvido. Os dias perdidos saem
+de uma consulta agrupada por período para todas as empresas pendentes, com os mesmos
+valores de Analytics.metricas_gerais. Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.alert_service import AlertService, janela_periodo
+from backend.analytics import Analytics
+from backend.database import Base
+from backend.models import Alert, AlertRule
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+HOJE = datetime(2026, 3, 15, 10, 0)
+MES = HOJE.strftime("%Y-%m")
+
+
+@pytest.fixture()
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    seed_clients(session, (2, 4, 6))
+    for client_id, dias in ((2, [3, 4]), (4, [10]), (6, [1])):
+        upload = add_upload(session, client_id=client_id, mes_referencia=MES)
+        for d in dias:
+            add_atestado(session, upload, nomecompleto=f"FUNC {client_id}", dias_atestados=d)
+    antigo = add_upload(session, client_id=4, mes_referencia="2025-06")  # fora do trimestre
+    add_atestado(session, antigo, nomecompleto="FUNC 4", dias_atestados=50)
+    regras = [
+        AlertRule(client_id=2, nome="Dias no mês", tipo="dias_perdidos", condicao="maior_que",
+                  valor_limite=5, periodo="mensal", enviar_email=False),
+        AlertRule(client_id=4, nome="Taxa trimestral", tipo="taxa_absenteismo", condicao="maior_que",
+                  valor_limite=50, periodo="trimestral", enviar_email=False),
+        AlertRule(client_id=6, nome="Dias no ano", tipo="dias_perdidos", condicao="maior_que",
+                  valor_limite=0, periodo="anual", enviar_email=False),
+        AlertRule(client_id=6, nome="Inativa", tipo="dias_perdidos", condicao="maior_que",
+                  valor_limite=0, periodo="mensal", is_active=False),
+    ]
+    session.add_all(regras)
+    session.commit()
+    yield session
+    session.close()
+
+
+def _consultas_atestados(engine):
+    sqls = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capturar(conn, cursor, statement, *args):
+        if "atestados" in statement and statement.lstrip().upper().startswith("SELECT"):
+            sqls.append(statement)
+
+    return sqls
+
+
+def test_mesmos_totais_que_metricas_gerais(db):
+    service, analytics = AlertService(db), Analytics(db)
+    for periodo in ("mensal", "trimestral", "anual", None):
+        mes_inicio, mes_fim = janela_periodo(periodo, HOJE)
+        agrupado = service._dias_perdidos_por_empresa([2, 4, 6], mes_inicio, mes_fim)
+        for client_id in (2, 4, 6):
+            esperado = analytics.metricas_gerais(client_id, mes_inicio, mes_fim)['total_dias_perdidos']
+            assert agrupado.get(client_id, 0.0) == esperado
+
+
+def test_so_avalia_o_que_mudou(db, engine):
+    avaliadas = {}
+    sqls = _consultas_atestados(engine)
+
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE)
+    assert (resumo['regras_ativas'], resumo['regras_avaliadas'], resumo['empresas_avaliadas']) == (3, 3, 3)
+    assert resumo['consultas'] == len(sqls) == 3  # uma consulta agrupada por período
+    assert set(resumo['ms_por_periodo']) == {f"{janela_periodo(p, HOJE)[0]}..{MES}" for p in ("mensal", "trimestral", "anual")}
+    # 7 dias > 5 (empresa 2) e 1 dia > 0 (empresa 6); a taxa da empresa 4 fica em 10/66
+    assert resumo['alertas'] == 2
+    assert sorted(a.client_id for a in db.query(Alert)) == [2, 6]
+
+    sqls.clear()
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(minutes=1))
+    assert resumo['regras_avaliadas'] == resumo['consultas'] == resumo['alertas'] == 0 and sqls == []
+
+    # Novo atestado na empresa 4: só a regra dela volta, e agora passa do limite
+    upload = add_upload(db, client_id=4, mes_referencia=MES)
+    add_atestado(db, upload, nomecompleto="FUNC 4", dias_atestados=30)
+    db.commit()
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(minutes=2))
+    assert (resumo['regras_avaliadas'], resumo['empresas_avaliadas'], resumo['consultas'], resumo['alertas']) == (1, 1, 1, 1)
+    assert len(sqls) == 1
+
+    # Regra editada: reavaliada
+    regra = db.query(AlertRule).filter(AlertRule.client_id == 2).one()
+    regra.valor_limite = 100
+    db.commit()
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(minutes=3))
+    assert resumo['regras_avaliadas'] == 1 and resumo['alertas'] == 0
+
+
+def test_virada_do_dia_reavalia_e_regra_desativada_sai_do_estado(db):
+    avaliadas = {}
+    AlertService(db).verificar_alteracoes(avaliadas, HOJE)
+    assert len(avaliadas) == 3
+
+    regra = db.query(AlertRule).filter(AlertRule.client_id == 6, AlertRule.is_active == True).one()
+    regra.is_active = False
+    db.commit()
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(days=1))
+    assert resumo['regras_avaliadas'] == 2 and regra.id not in avaliadas
+    # A regra da empresa 2 dispara de novo, suprimida pelo alerta de < 24 h: fica fora do estado
+    assert len(avaliadas) == 1
+
+
+def test_disparo_suprimido_volta_quando_o_alerta_expira_ou_e_resolvido(db):
+    # Alerta da empresa 2 criado há 2 h: a regra dela dispara mas fica suprimida
+    recente = Alert(client_id=2, tipo="dias_perdidos", titulo="Anterior", mensagem="-",
+                    created_at=datetime.now() - timedelta(hours=2))
+    db.add(recente)
+    db.commit()
+    regra_2 = db.query(AlertRule).filter(AlertRule.client_id == 2).one()
+
+    avaliadas = {}
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE)
+    assert resumo['alertas'] == 1 and regra_2.id not in avaliadas  # só a empresa 6
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(minutes=1))
+    assert resumo['regras_avaliadas'] == 1 and resumo['alertas'] == 0
+
+    # O alerta anterior passa de 24 h: o próximo ciclo já dispara, sem esperar a virada do dia
+    recente.created_at = datetime.now() - timedelta(hours=25)
+    db.commit()
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(minutes=2))
+    assert resumo['alertas'] == 1 and regra_2.id in avaliadas
+    assert AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(minutes=3))['regras_avaliadas'] == 0
+
+    # Dia seguinte: alertas do dia anterior ainda recentes suprimem; resolvido, dispara de novo
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(days=1))
+    assert resumo['regras_avaliadas'] == 3 and resumo['alertas'] == 0 and len(avaliadas) == 1
+    for alerta in db.query(Alert).filter(Alert.client_id == 6):
+        alerta.is_resolvido = True
+    db.commit()
+    resumo = AlertService(db).verificar_alteracoes(avaliadas, HOJE + timedelta(days=1, minutes=1))
+    assert (resumo['regras_avaliadas'], resumo['alertas']) == (2, 1)
+    assert db.query(Alert).filter(Alert.client_id == 6, Alert.is_resolvido == False).count() == 1
@@ -0,0 +1,147 @@
+"""
+PERF-23 — Rotas pesadas fora do event loop, em pools de threads separados.
+
+Exportações rodam no pool "exportacao" e consultas no pool "consultas": enquanto
+três exportações lentas (trabalho bloqueante simulado com espera) estão em curso,
+o p99 de /api/health continua baixo, no máximo dois relatórios são gerados ao mesmo
+tempo (os outros esperam a vez sem travar o loop) e o dashboard segue respondendo.
+Dados fictícios em SQLite temporário.
+"""
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import backend.cache_service as cache_module
+import backend.main as main
+import backend.pools_rotas as pools_rotas
+from backend.auth import create_access_token, get_password_hash
+from backend.cache_service import CacheService
+from backend.database import Base, create_sqlite_engine, get_db
+from backend.models import User
+from tests.fixtures.canonical_metrics import add_atestado, add_upload, seed_clients
+
+ESPERA_EXPORT = 1.0
+
+
+@pytest.fixture(autouse=True)
+def sem_cache(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=0))
+
+
+@pytest.fixture()
+def http(tmp_path, monkeypatch):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'perf23.db'}")
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = fabrica()
+    seed_clients(db, (2,))
+    for mes in ("2026-01", "2026-02"):
+        upload = add_upload(db, client_id=2, mes_referencia=mes)
+        for i in range(10):
+            add_atestado(db, upload, nomecompleto=f"FUNC {i}", setor=("ADMIN", "PRODUCAO")[i % 2],
+                         cid=("M54", "J11")[i % 2], dias_atestados=i + 1)
+    db.add(User(username="perf23", email="perf23@test.local", password_hash=get_password_hash("p"),
+                is_active=True, is_admin=False, client_id=2))
+    db.commit()
+    db.close()
+
+    def _override():
+        sessao = fabrica()
+        try:
+            yield sessao
+        finally:
+            sessao.close()
+
+    monkeypatch.setitem(pools_rotas.TAMANHOS, pools_rotas.POOL_EXPORTACAO, 2)
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        with TestClient(main.app) as client:
+            yield client, {"Authorization": f"Bearer {create_access_token({'sub': 'perf23'})}"}
+    finally:
+        main.app.dependency_overrides.clear()
+        engine.dispose()
+
+
+class _ExportLento:
+    """Envolve a montagem dos dados do relatório com trabalho bloqueante e conta a concorrência"""
+
+    def __init__(self, original):
+        self.original = original
+        self.simultaneos = 0
+        self.max_simultaneos = 0
+        self.threads = set()
+        self.primeira_entrada = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.simultaneos += 1
+            self.max_simultaneos = max(self.max_simultaneos, self.simultaneos)
+            self.threads.add(threading.current_thread().name)
+            self.primeira_entrada = self.primeira_entrada or time.monotonic()
+        try:
+            time.sleep(ESPERA_EXPORT)
+            return self.original(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.simultaneos -= 1
+
+
+def _p99(amostras):
+    return statistics.quantiles(amostras, n=100)[98]
+
+
+def test_health_estavel_durante_exportacoes(http, tmp_path, monkeypatch):
+    pytest.importorskip("reportlab")
+    client, headers = http
+    monkeypatch.setattr(main, "EXPORTS_DIR", str(tmp_path))
+    lento = _ExportLento(main.buscar_dados_dashboard_completo)
+    monkeypatch.setattr(main, "buscar_dados_dashboard_completo", lento)
+
+    def _health(n=None, ate=None):
+        latencias = []
+        while (n is not None and len(latencias) < n) or (ate is not None and time.monotonic() < ate):
+            inicio = time.perf_counter()
+            assert client.get("/api/health").status_code == 200
+            latencias.append(time.perf_counter() - inicio)
+        return latencias
+
+    base = _health(n=40)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        exports = [pool.submit(client.get, "/api/export/excel", params={"client_id": 2}, headers=headers)
+                   for _ in range(3)]
+        while not lento.simultaneos:
+            time.sleep(0.005)
+        # Amostras enquanto as duas primeiras exportações estão bloqueadas
+        durante = _health(ate=lento.primeira_entrada + 0.8 * ESPERA_EXPORT)
+        inicio = time.perf_counter()
+        dashboard = client.get("/api/dashboard", params={"client_id": 2}, headers=headers)
+        tempo_dashboard = time.perf_counter() - inicio
+        respostas = [f.result(timeout=30) for f in exports]
+
+    assert all(r.status_code == 200 for r in respostas)
+    assert dashboard.status_code == 200 and tempo_dashboard < ESPERA_EXPORT
+    assert lento.max_simultaneos == 2  # terceira exportação esperou uma thread do pool
+    assert lento.threads.isdisjoint({threading.main_thread().name})
+    # Cada exportação bloqueia por 1 s; nenhuma requisição de health esperou por ela
+    # (uma pausa isolada do processo, ex. GC com a suíte inteira carregada, é tolerada)
+    assert len(durante) >= 10
+    assert sum(t >= ESPERA_EXPORT / 2 for t in durante) <= 1
+    assert statistics.median(durante) < max(0.05, 5 * statistics.median(base))
+    assert sorted(durante)[-2] < max(0.1, 5 * _p99(base))
+
+
+def test_rota_no_pool_mantem_parametros_e_dependencias(http):
+    client, headers = http
+    assert client.get("/api/dashboard", params={"client_id": 2}).status_code == 401
+    r = client.get("/api/dashboard", params={"client_id": 2, "mes_inicio": "2026-02"}, headers=headers)
+    assert r.status_code == 200
+    assert client.get("/api/dashboard", params={"client_id": "x"}, headers=headers).status_code == 422
@@ -0,0 +1,164 @@
+"""
+PERF-24 — Usuário autenticado em cache: o caminho quente só lê (id, data_version).
+
+Depois da primeira requisição, o token resolve o usuário pelo cache (middleware e
+get_current_user) sem ler a linha completa de users. Alterações do usuário pelas
+rotas /api/users/* (desativação, troca de cliente/admin) ou por qualquer commit ORM
+em User valem já na requisição seguinte, também em outro worker (users.data_version);
+rollback não invalida. Dados fictícios em SQLite em memória.
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.cache_service as cache_module
+import backend.main as main
+from backend.auth import create_access_token, get_password_hash
+from backend.cache_service import CacheService
+from backend.cache_usuarios import UsuarioAutenticado, usuario_autenticado
+from backend.database import Base, get_db
+from backend.models import User
+from tests.fixtures.canonical_metrics import seed_clients
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    novo = CacheService(max_entries=1000)
+    monkeypatch.setattr(cache_module, "cache_service", novo)
+    return novo
+
+
+@pytest.fixture()
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture()
+def fabrica(engine):
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = fabrica()
+    seed_clients(db, (2, 4))
+    db.add_all([
+        User(username="admin24", email="admin24@test.local", password_hash=get_password_hash("p"),
+             is_active=True, is_admin=True),
+        User(username="perf24", email="perf24@test.local", password_hash=get_password_hash("p"),
+             is_active=True, is_admin=False, client_id=2, nome_completo="Usuario Ficticio"),
+    ])
+    db.commit()
+    db.close()
+    return fabrica
+
+
+@pytest.fixture()
+def http(fabrica, cache):
+    def _override():
+        db = fabrica()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def _headers(username):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def _consultas_users(engine):
+    """Leituras da linha completa de users (a versão por username não conta)"""
+    sqls = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capturar(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "users.password_hash" in statement:
+            sqls.append(statement)
+
+    return sqls
+
+
+def test_requisicoes_seguintes_sem_consulta_a_users(http, engine):
+    sqls = _consultas_users(engine)
+    r = http.get("/api/auth/me", headers=_headers("perf24"))
+    assert r.status_code == 200 and r.json()["nome_completo"] == "Usuario Ficticio"
+    assert len(sqls) == 1  # middleware e dependência compartilham a mesma entrada
+
+    sqls.clear()
+    for _ in range(5):
+        assert http.get("/api/clientes", headers=_headers("perf24")).status_code == 200
+        assert http.get("/api/auth/me", headers=_headers("perf24")).status_code == 200
+    assert sqls == []
+    assert http.get("/api/auth/me", headers=_headers("inexistente")).status_code == 401
+
+
+def test_alteracoes_pelas_rotas_valem_na_hora(http, fabrica):
+    usuario = _headers("perf24")
+    admin = _headers("admin24")
+    assert http.get("/api/clientes/2", headers=usuario).status_code == 200
+    with fabrica() as db:
+        user_id = db.query(User.id).filter(User.username == "perf24").scalar()
+
+    # Troca de cliente: o cliente antigo deixa de ser acessível
+    assert http.put(f"/api/users/{user_id}", data={"client_id": "4"}, headers=admin).status_code == 200
+    assert http.get("/api/clientes/2", headers=usuario).status_code == 403
+    assert http.get("/api/clientes/4", headers=usuario).status_code == 200
+
+    # Promoção a admin e depois desativação
+    assert http.put(f"/api/users/{user_id}", data={"is_admin": "true"}, headers=admin).status_code == 200
+    assert http.get("/api/auth/me", headers=usuario).json()["is_admin"] is True
+    assert http.post(f"/api/users/{user_id}/desativar", headers=admin).status_code == 200
+    assert http.get("/api/auth/me", headers=usuario).status_code == 401
+
+
+def test_commit_orm_invalida_e_rollback_nao(fabrica, engine, cache):
+    sqls = _consultas_users(engine)
+    with fabrica() as db:
+        antes = usuario_autenticado(db, "perf24")
+        assert isinstance(antes, UsuarioAutenticado) and antes.client_id == 2
+
+        user = db.query(User).filter(User.username == "perf24").one()
+        user.client_id = 4
+        db.rollback()
+        sqls.clear()
+        assert usuario_autenticado(db, "perf24") == antes and sqls == []
+
+    with fabrica() as db:
+        db.query(User).filter(User.username == "perf24").update({"is_active": False})
+        db.commit()
+        assert usuario_autenticado(db, "perf24").is_active is False
+
+    with fabrica() as db:
+        db.query(User).filter(User.username == "perf24").one().nome_completo = "Outro Nome"
+        db.commit()
+        assert usuario_autenticado(db, "perf24").nome_completo == "Outro Nome"
+
+
+def test_alteracao_em_outro_worker_vale_na_hora(fabrica, engine, cache, monkeypatch):
+    with fabrica() as db:
+        assert usuario_autenticado(db, "perf24").is_active is True
+
+    # Outro worker (cache próprio em memória) desativa o usuário: a geração local não muda
+    monkeypatch.setattr(cache_module, "cache_service", CacheService(max_entries=1000))
+    with fabrica() as db:
+        db.query(User).filter(User.username == "perf24").one().is_active = False
+        db.commit()
+
+    monkeypatch.setattr(cache_module, "cache_service", cache)
+    sqls = _consultas_users(engine)
+    with fabrica() as db:
+        assert usuario_autenticado(db, "perf24").is_active is False
+        # A versão subiu só para o usuário alterado
+        versoes = dict(db.query(User.username, User.data_version).all())
+    assert len(sqls) == 1 and versoes == {"admin24": 0, "perf24": 1}
+
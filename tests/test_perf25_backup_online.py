@@ -0,0 +1,225 @@
+"""
+PERF-25 — Backup online do SQLite (API de backup), comprimido, com incrementais por página.
+
+O backup completo sai da API de backup em passos (escritas concorrentes seguem
+durante a cópia), comprimido em gzip e verificado com quick_check numa cópia aberta
+somente leitura. O incremental guarda só as páginas alteradas desde o completo e a
+restauração (completo + delta) reproduz o banco. Cada execução registra duração,
+vazão e tamanhos; o backup manual pela API roda numa thread do pool, fora do event
+loop. Dados fictícios em SQLite temporário.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.backup_service as backup_module
+import backend.main as main
+from backend.auth import create_access_token, get_password_hash
+from backend.backup_service import BackupService
+from backend.database import Base, get_db
+from backend.models import User
+
+
+@pytest.fixture()
+def banco(tmp_path):
+    caminho = str(tmp_path / "absenteismo.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE registros (id INTEGER PRIMARY KEY, setor TEXT, texto TEXT)")
+    conn.executemany("INSERT INTO registros (setor, texto) VALUES (?, ?)",
+                     [(f"SETOR {i % 7}", f"registro ficticio {i} " * 10) for i in range(3000)])
+    conn.commit()
+    conn.close()
+    return caminho
+
+
+@pytest.fixture()
+def servico(tmp_path, banco):
+    return BackupService(banco, backup_dir=str(tmp_path / "backups"))
+
+
+def _linhas(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute("SELECT id, setor, texto FROM registros ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_backup_completo_comprimido_e_verificado(servico, banco, tmp_path):
+    caminho = servico.create_backup(prefix="manual")
+    assert caminho.endswith(".db.gz") and os.path.exists(caminho + ".pages")
+    with gzip.open(caminho, "rb") as f:
+        assert f.read(16) == b"SQLite format 3\x00"
+
+    execucao = servico.ultimo_backup
+    assert execucao["tipo"] == "completo" and execucao["verificado"] is True
+    assert execucao["tamanho_mb"] < execucao["tamanho_banco_mb"]  # gzip
+    assert execucao["duracao_s"] > 0 and execucao["vazao_mb_s"] > 0
+    assert execucao["paginas_gravadas"] == execucao["paginas"] > 0
+
+    restaurado = servico.restaurar_backup(caminho, str(tmp_path / "restaurado.db"))
+    assert _linhas(restaurado) == _linhas(banco)
+    assert [b["tipo"] for b in servico.get_backup_list()] == ["completo"]
+    assert not [f for f in os.listdir(servico.backup_dir) if f.startswith(".")]  # temporários removidos
+
+
+def test_escritas_continuam_durante_o_backup(servico, banco, monkeypatch):
+    monkeypatch.setattr(backup_module, "PAGINAS_POR_PASSO", 8)
+    monkeypatch.setattr(backup_module, "PAUSA_PASSO_MS", 2)
+    parar = threading.Event()
+    esperas = []
+
+    def _escrever():
+        conn = sqlite3.connect(banco, timeout=30)
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            conn.execute("INSERT INTO registros (setor, texto) VALUES ('NOVO', 'durante o backup')")
+            conn.commit()
+            esperas.append(time.perf_counter() - inicio)
+            time.sleep(0.002)
+        conn.close()
+
+    escritor = threading.Thread(target=_escrever)
+    escritor.start()
+    try:
+        caminho = servico.create_backup(prefix="manual")
+    finally:
+        parar.set()
+        escritor.join()
+
+    assert caminho and servico.ultimo_backup["verificado"] is True
+    assert servico.ultimo_backup["reinicios"] >= 1  # a cópia em passos viu as escritas
+    assert len(esperas) >= 10 and max(esperas) < 1.0
+
+
+def test_incremental_guarda_so_paginas_alteradas(servico, banco, tmp_path):
+    completo = servico.create_backup(prefix="auto")
+    conn = sqlite3.connect(banco)
+    conn.execute("UPDATE registros SET setor = 'ALTERADO' WHERE id IN (5, 6, 7)")
+    conn.execute("INSERT INTO registros (setor, texto) VALUES ('NOVO', 'depois do completo')")
+    conn.commit()
+    conn.close()
+
+    delta = servico.create_backup(prefix="auto", incremental=True)
+    assert delta.endswith(".delta.gz")
+    execucao = servico.ultimo_backup
+    assert execucao["tipo"] == "incremental" and execucao["base"] == os.path.basename(completo)
+    assert execucao["verificado"] is True
+    assert 0 < execucao["paginas_gravadas"] <= execucao["paginas"] // 10
+    assert os.path.getsize(delta) < os.path.getsize(completo) / 5
+
+    restaurado = servico.restaurar_backup(delta, str(tmp_path / "restaurado.db"))
+    assert _linhas(restaurado) == _linhas(banco)
+    assert {b["tipo"] for b in servico.get_backup_list()} == {"completo", "incremental"}
+
+    # Sem o completo base, o incremental não tem como ser restaurado: sai na limpeza
+    os.remove(completo)
+    servico.clean_old_backups()
+    assert servico.get_backup_list() == [] and os.listdir(servico.backup_dir) == []
+
+
+def test_incremental_sem_completo_vira_completo(servico):
+    caminho = servico.create_backup(prefix="auto", incremental=True)
+    assert caminho.endswith(".db.gz") and servico.ultimo_backup["tipo"] == "completo"
+
+
+def test_backup_corrompido_falha_na_verificacao(servico, tmp_path):
+    caminho = servico.create_backup(prefix="manual")
+    danificado = str(tmp_path / "backups" / "manual_absenteismo_backup_danificado.db.gz")
+    with gzip.open(caminho, "rb") as f:
+        dados = bytearray(f.read())
+    dados[4096 + 100:4096 + 400] = b"\xff" * 300  # estraga uma página de tabela
+    with gzip.open(danificado, "wb") as f:
+        f.write(bytes(dados))
+
+    assert servico.verificar_backup(caminho) is True
+    assert servico.verificar_backup(danificado) is False
+
+
+def test_backup_manual_pela_api_roda_fora_do_event_loop(servico, monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    with fabrica() as db:
+        db.add(User(username="admin25", email="admin25@test.local", password_hash=get_password_hash("p"),
+                    is_active=True, is_admin=True))
+        db.commit()
+
+    no_event_loop = []
+    original = servico.create_backup
+
+    def _registrar_thread(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            no_event_loop.append(True)
+        except RuntimeError:
+            no_event_loop.append(False)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(servico, "create_backup", _registrar_thread)
+    monkeypatch.setattr(backup_module, "backup_service", servico)
+
+    def _override():
+        db = fabrica()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = _override
+    try:
+        r = TestClient(main.app).post(
+            "/api/backup/create", headers={"Authorization": f"Bearer {create_access_token({'sub': 'admin25'})}"}
+        )
+    finally:
+        main.app.dependency_overrides.clear()
+        engine.dispose()
+
+    assert r.status_code == 200 and r.json()["success"] is True
+    assert r.json()["metricas"]["verificado"] is True
+    assert no_event_loop == [False]  # thread do pool, não a do event loop
+
+
+def test_script_de_restauracao_substitui_o_banco(servico, banco, tmp_path, capsys):
+    from scripts.restore_backup import main as restaurar
+
+    servico.create_backup(prefix="auto")
+    conn = sqlite3.connect(banco)
+    conn.execute("UPDATE registros SET setor = 'NO DELTA' WHERE id = 1")
+    conn.commit()
+    delta = servico.create_backup(prefix="auto", incremental=True)
+    esperado = _linhas(banco)
+    conn.execute("DELETE FROM registros WHERE id > 10")  # alteração a desfazer
+    conn.commit()
+    conn.close()
+    atual = _linhas(banco)
+
+    argumentos = ["--db-path", banco, "--backup-dir", servico.backup_dir]
+    assert restaurar([os.path.basename(delta), *argumentos]) == 0
+    assert _linhas(banco) == esperado
+    # O banco substituído ficou guardado num backup próprio
+    guardado = [b for b in servico.get_backup_list() if b["filename"].startswith("pre_restauracao")]
+    assert len(guardado) == 1
+    assert _linhas(servico.restaurar_backup(guardado[0]["path"], str(tmp_path / "anterior.db"))) == atual
+
+    # Backup danificado: falha na verificação e o banco fica como está
+    danificado = str(tmp_path / "manual_absenteismo_backup_danificado.db.gz")
+    with gzip.open(danificado, "wb") as f:
+        f.write(b"SQLite format 3\x00" + b"\xff" * 8192)
+    assert restaurar([danificado, *argumentos]) == 1
+    assert _linhas(banco) == esperado
+
+    assert restaurar(["--listar", *argumentos]) == 0
+    assert "incremental" in capsys.readouterr().out